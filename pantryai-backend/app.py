@@ -1,35 +1,85 @@
+import threading
 from flask import Flask, jsonify
-from routes.recipes import recipes_bp
-from routes.pantry import pantry_bp
-from routes.scan import scan_bp
-from utils.logger import logger
 from flask_cors import CORS
+from config import Config
+from utils.logger import logger
+
+
+def warm_up():
+    """
+    Builds the per-process heavy resources (recipe index, Gemini, Supabase) ahead of
+    the first request. Each one is otherwise created lazily on first use.
+    """
+    from recipes import recipe_index
+    from utils.embeddings import genai_client
+    from parsers import google_model
+    from db import supabase_client
+    for resource in (recipe_index, genai_client, google_model, supabase_client):
+        try:
+            resource.get()
+        except Exception as e:
+            logger.error("Warm-up of %s failed: %s", resource.name, e, exc_info=True)
+
+
+def create_app() -> Flask:
+    """
+    Application factory. Cheap to call: no index is read and no client is
+    constructed until a request (or warm_up) actually needs it.
+    """
+    from routes.recipes import recipes_bp
+    from routes.pantry import pantry_bp
+    from routes.scan import scan_bp
+    from routes.images import images_bp
+
+    app = Flask(__name__)
+    CORS(app)
+
+    # Correlation id per request, attached to every log record and echoed as X-Request-ID
+    from utils import logger as logging_setup
+    logging_setup.init_app(app)
+
+    # Register blueprints
+    app.register_blueprint(recipes_bp)         # already /recipes/...
+    app.register_blueprint(pantry_bp)          # exposes GET  /pantry
+    app.register_blueprint(scan_bp)            # exposes POST /scan
+    app.register_blueprint(images_bp)          # exposes GET  /images/<recipe_id>
+
+    if Config.METRICS_ENABLED:
+        # Stage histograms at /metrics plus a Server-Timing header on every response
+        from utils import metrics
+        metrics.init_app(app)
+
+    # No-op unless PROFILE_ADMIN_TOKEN or PROFILE_SAMPLE_RATE is set
+    from utils import profiling
+    profiling.init_app(app)
+
+    # Basic Flask routes
+    @app.route('/')
+    def home():
+        return jsonify(message="Welcome to PantryAI! Use /recipes/match or /recipes/search."), 200
+
+    # Error handling
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify(error="Not Found"), 404
 
-app = Flask(__name__)
-CORS(app)
+    @app.errorhandler(500)
+    def internal_error(error):
+        logger.exception("Internal Server Error") # Log the full traceback
+        return jsonify(error="Internal Server Error"), 500
 
-# Register blueprints
-app.register_blueprint(recipes_bp)         # already /recipes/...
-app.register_blueprint(pantry_bp)          # exposes GET  /pantry
-app.register_blueprint(scan_bp)            # exposes POST /scan
+    if Config.WARM_UP_ON_START:
+        # Warm in the background so worker boot itself stays fast
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
-# Basic Flask routes
-@app.route('/')
-def home():
-    return jsonify(message="Welcome to PantryAI! Use /recipes/match or /recipes/search."), 200
+    return app
 
-# Error handling
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify(error="Not Found"), 404
 
-@app.errorhandler(500)
-def internal_error(error):
-    logger.exception("Internal Server Error") # Log the full traceback
-    return jsonify(error="Internal Server Error"), 500
+# gunicorn entry point (app:app)
+app = create_app()
 
 if __name__ == '__main__':
     # This block only runs when app.py is executed directly.
     # For production, gunicorn will manage workers and call the 'app' object.
     logger.info("Running Flask app in development mode.")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,141 @@
+"""
+Throughput of server-side receipt OCR (POST /scan with images) through OcrPool.
+
+Runs every image through the pool with 1, 2, 4... worker processes while several
+client threads submit at once (as concurrent /scan requests would), and reports
+images per second plus per-image latency percentiles, next to an in-process
+sequential baseline. Without --images, synthetic receipts (text-like blocks,
+slightly rotated, unevenly lit) are generated. --preprocess-only skips Tesseract,
+so the benchmark also runs where it isn't installed.
+
+Usage:
+    python benchmarks/ocr_throughput.py [--images path/to/receipts] [--synthetic 12]
+        [--workers 1,2,4] [--clients 4] [--preprocess-only] [--save results.json]
+"""
+import sys, os
+import argparse
+import io
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+from PIL import Image, ImageDraw
+from benchmarks.run_benchmarks import summarize
+from config import Config
+from ocr import OcrPool, image_to_text, preprocess
+
+
+def make_receipt_image(lines: int = 30, angle: float = 2.0, width: int = 1200, seed: int = 0,
+                       lighting: bool = True) -> bytes:
+    """
+    A receipt-like JPEG: rows of dark word blocks on paper, rotated by `angle`
+    degrees, with a left-to-right lighting falloff like a phone photo.
+    """
+    rng = np.random.default_rng(seed)
+    line_height = 40
+    height = line_height * (lines + 4)
+    img = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(img)
+    for line in range(lines):
+        x, y = 60, 2 * line_height + line * line_height
+        while x < width - 200:
+            word = int(rng.integers(40, 160))
+            draw.rectangle([x, y, x + word, y + 18], fill=int(rng.integers(10, 60)))
+            x += word + int(rng.integers(15, 40))
+    img = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=235)
+    if lighting:
+        shade = np.linspace(1.0, 0.6, img.width, dtype=np.float32)[None, :]
+        img = Image.fromarray((np.asarray(img, dtype=np.float32) * shade).astype(np.uint8))
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def preprocess_only(data: bytes, timeout: float | None = None, max_side: int = 2000, lang: str | None = None) -> str:
+    """OcrPool task that stops after preprocessing (no Tesseract)."""
+    page = preprocess(data, max_side)
+    return f"{page.width}x{page.height}"
+
+
+def load_images(directory: str | None, synthetic: int) -> list[bytes]:
+    if directory:
+        names = sorted(n for n in os.listdir(directory) if n.lower().endswith((".jpg", ".jpeg", ".png", ".webp")))
+        images = []
+        for name in names:
+            with open(os.path.join(directory, name), "rb") as f:
+                images.append(f.read())
+        return images
+    return [make_receipt_image(lines=25 + i % 20, angle=(i % 7) - 3, seed=i) for i in range(synthetic)]
+
+
+def run_sequential(fn, images: list[bytes]) -> dict:
+    samples, started = [], time.perf_counter()
+    for data in images:
+        t = time.perf_counter_ns()
+        fn(data, timeout=Config.OCR_TIMEOUT_SECONDS, max_side=Config.OCR_MAX_SIDE, lang=Config.OCR_LANG)
+        samples.append(time.perf_counter_ns() - t)
+    elapsed = time.perf_counter() - started
+    return dict(summarize(samples), images_per_sec=round(len(images) / elapsed, 2))
+
+
+def run_pool(fn, images: list[bytes], workers: int, clients: int) -> dict:
+    pool = OcrPool(workers, max_pending=len(images), timeout=Config.OCR_TIMEOUT_SECONDS,
+                   wait_seconds=600, fn=fn, max_side=Config.OCR_MAX_SIDE, lang=Config.OCR_LANG)
+    try:
+        pool.recognize(images[:workers])  # start the worker processes before timing
+
+        def one(data):
+            t = time.perf_counter_ns()
+            pool.recognize([data])
+            return time.perf_counter_ns() - t
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as threads:
+            samples = list(threads.map(one, images))
+        elapsed = time.perf_counter() - started
+    finally:
+        pool.close()
+    return dict(summarize(samples), images_per_sec=round(len(images) / elapsed, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="directory of sample receipt photos")
+    parser.add_argument("--synthetic", type=int, default=12, help="synthetic receipts when --images is not given")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent submitting threads")
+    parser.add_argument("--preprocess-only", action="store_true")
+    parser.add_argument("--save", help="write results JSON to this path")
+    args = parser.parse_args()
+
+    fn = preprocess_only if args.preprocess_only else image_to_text
+    images = load_images(args.images, args.synthetic)
+    if not images:
+        parser.error("no images to benchmark")
+
+    results = {"sequential": run_sequential(fn, images)}
+    for workers in (int(w) for w in args.workers.split(",") if w):
+        results[f"pool_{workers}"] = run_pool(fn, images, workers, args.clients)
+
+    report = {
+        "meta": {"python": platform.python_version(), "cpus": os.cpu_count(), "images": len(images),
+                 "mode": "preprocess" if args.preprocess_only else "ocr", "clients": args.clients},
+        "results": results,
+    }
+    print(f"{'case':<12} {'img/s':>8} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, stats in results.items():
+        print(f"{name:<12} {stats['images_per_sec']:>8} {stats['p50_ms']:>10} {stats['p95_ms']:>10}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Offline performance benchmarks for PantryAI's hot paths.
+
+Everything runs locally: Supabase is replaced by an in-memory fake (with optional
+injected round-trip latency) and Gemini by a deterministic hashed bag-of-words
+embedder. The catalog is seeded from data/*.json by running the real ingestion
+pipeline into a temporary directory.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # print results
+    python benchmarks/run_benchmarks.py --save benchmarks/baselines/local.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baselines/local.json --threshold 0.25
+    python benchmarks/run_benchmarks.py --only match_recipes,recipes_search_query --latency-ms 40
+
+Fake-backed cases time the app's own work plus the in-memory fake, so compare
+runs against baselines from the same machine rather than reading absolute numbers.
+
+--compare exits with status 1 if any benchmark's median (or p95) got slower than the
+baseline by more than --threshold (a fraction, 0.25 = 25%).
+"""
+import sys, os
+import argparse
+import json
+import logging
+import platform
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import Config
+from utils.logger import logger
+from tests.fakes import FakeSupabase, fake_embedding
+
+BENCH_DEVICE = "bench-device"
+BENCH_PANTRY = [
+    ("chicken breast", 2, "pcs"), ("onion", 3, "pcs"), ("garlic", 1, "pcs"), ("olive oil", 1, "l"),
+    ("tomatoes", 6, "pcs"), ("pasta", 500, "g"), ("parmesan", 200, "g"), ("basil", 1, "pcs"),
+    ("eggs", 12, "pcs"), ("butter", 250, "g"), ("flour", 1, "kg"), ("sugar", 1, "kg"),
+    ("milk", 1, "l"), ("lemon", 2, "pcs"), ("rice", 1, "kg"), ("spinach", 200, "g"),
+]
+BENCH_RECEIPT = "\n".join(
+    [f"{qty} {name}" for name, qty, _ in BENCH_PANTRY] + ["SUBTOTAL $42.10", "TAX $3.20", "TOTAL $45.30"]
+)
+
+
+def summarize(samples_ns: list[int]) -> dict:
+    ms = sorted(s / 1e6 for s in samples_ns)
+
+    def pct(p):
+        return ms[min(len(ms) - 1, int(round(p / 100 * (len(ms) - 1))))]
+
+    return {
+        "iterations": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(pct(50), 4),
+        "p95_ms": round(pct(95), 4),
+        "p99_ms": round(pct(99), 4),
+        "min_ms": round(ms[0], 4),
+        "ops_per_sec": round(1000 / statistics.fmean(ms), 1) if statistics.fmean(ms) else None,
+    }
+
+
+def time_calls(fn, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter_ns()
+        fn()
+        samples.append(time.perf_counter_ns() - started)
+    return summarize(samples)
+
+
+class BenchEnvironment:
+    """
+    Wires the app to local stand-ins and builds a catalog snapshot in a temp directory.
+    """
+
+    def __init__(self, workdir: str, latency_ms: float):
+        self.workdir = workdir
+        self.latency = latency_ms / 1000.0
+        self.db = FakeSupabase(
+            {"pantry": [
+                {"id": str(i), "name": name, "quantity": qty, "unit": unit, "device_id": BENCH_DEVICE,
+                 "expiry": (date.today() + timedelta(days=i % 10)).isoformat()}
+                for i, (name, qty, unit) in enumerate(BENCH_PANTRY)
+            ]},
+        )
+        self.ingestion_stats = None
+        self.client = None
+
+    def ingest(self) -> dict:
+        import data_ingestion_script as ingestion
+
+        ingestion.generate_ingestion_embeddings = lambda texts: [fake_embedding(text) for text in texts]
+        ingestion.FAISS_INDEX_PATH = os.path.join(self.workdir, "recipes.index")
+        ingestion.FAISS_ID_MAP_PATH = os.path.join(self.workdir, "recipes_id_map.json")
+        ingestion.SNAPSHOT_DIR = os.path.join(self.workdir, "snapshots")
+        Config.BULK_WRITE_DEAD_LETTER = os.path.join(self.workdir, "dead_letter.jsonl")
+        Config.DEDUPE_REPORT = os.path.join(self.workdir, "dedupe_report.json")
+
+        started = time.perf_counter()
+        stats = ingestion.ingest_recipes_and_build_index(client=self.db)
+        elapsed = time.perf_counter() - started
+        recipes = stats["index"]["items_out"]
+        self.ingestion_stats = {
+            "iterations": 1,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "recipes": recipes,
+            "recipes_per_sec": round(recipes / elapsed, 1) if elapsed else None,
+            # Reported like the other cases so --compare can treat it uniformly
+            "p50_ms": round(elapsed * 1000, 1),
+            "p95_ms": round(elapsed * 1000, 1),
+        }
+        return self.ingestion_stats
+
+    def start_app(self):
+        import recipes
+        import routes.recipes as recipes_routes
+        import routes.scan as scan_routes
+        from db import supabase_client
+        from app import create_app
+
+        Config.SNAPSHOT_DIR = os.path.join(self.workdir, "snapshots")
+        recipes.index_reloader.interval = 0
+        recipes.index_reloader.root = Config.SNAPSHOT_DIR
+        recipes.recipe_index.reset()
+        # Inject round-trip latency only once seeding is done
+        self.db.latency = self.latency
+        supabase_client.set(self.db)
+        recipes_routes.generate_text_embedding = fake_embedding
+
+        def llm_unavailable(raw_text):
+            raise RuntimeError("LLM disabled for benchmarks")
+        scan_routes.parse_receipt_google = llm_unavailable
+
+        app = create_app()
+        app.testing = True
+        self.client = app.test_client()
+        self.recipes = recipes
+
+    def get(self, url: str, expect: int = 200):
+        resp = self.client.get(url, headers={"X-Device-ID": BENCH_DEVICE})
+        if resp.status_code != expect:
+            raise RuntimeError(f"GET {url} returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+        return resp
+
+    def post(self, url: str, payload: dict, expect: int = 200):
+        resp = self.client.post(url, json=payload, headers={"X-Device-ID": BENCH_DEVICE})
+        if resp.status_code != expect:
+            raise RuntimeError(f"POST {url} returned {resp.status_code}: {resp.get_data(as_text=True)[:200]}")
+        return resp
+
+
+def build_cases(env: BenchEnvironment) -> dict:
+    pantry_vector = fake_embedding(" ".join(name for name, _, _ in BENCH_PANTRY))
+    some_recipe_id = env.recipes.get_recipe_index().id_map[0]
+    return {
+        "match_recipes": lambda: env.recipes.match_recipes(pantry_vector, k=10),
+        "recipes_match_endpoint": lambda: env.get("/recipes/match?k=10"),
+        "recipes_search_query": lambda: env.get("/recipes/search?query=chicken"),
+        "recipes_search_ingredients": lambda: env.get("/recipes/search?ingredients=flour,sugar"),
+        "recipes_filter": lambda: env.get("/recipes/filter?sort_by=rating&sort_order=desc"),
+        "recipes_use_it_up": lambda: env.get("/recipes/use-it-up?k=10"),
+        "recipe_detail": lambda: env.get(f"/recipes/{some_recipe_id}"),
+        "recipe_similar": lambda: env.get(f"/recipes/{some_recipe_id}/similar?k=10"),
+        "scan_fallback_parser": lambda: env.post("/scan", {"parsed_text": BENCH_RECEIPT}),
+    }
+
+
+def run(iterations: int, warmup: int, latency_ms: float, only: set | None) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="pantryai-bench-") as workdir:
+        env = BenchEnvironment(workdir, latency_ms)
+        # Ingestion always runs: it seeds the catalog every other case reads from
+        ingestion_stats = env.ingest()
+        if not only or "ingestion" in only:
+            results["ingestion"] = ingestion_stats
+
+        env.start_app()
+        for name, fn in build_cases(env).items():
+            if only and name not in only:
+                continue
+            results[name] = time_calls(fn, iterations, warmup)
+        env.recipes.get_recipe_index().catalog.close()
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "latency_ms": latency_ms,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Returns a description of every benchmark whose p50 or p95 regressed beyond `threshold`.
+    """
+    regressions = []
+    for name, stats in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if not base.get(metric):
+                continue
+            ratio = stats[metric] / base[metric]
+            if ratio > 1 + threshold:
+                regressions.append(f"{name}.{metric}: {base[metric]:.3f} ms -> {stats[metric]:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def print_table(report: dict, baseline: dict | None = None):
+    print(f"{'benchmark':32} {'p50 ms':>10} {'p95 ms':>10} {'ops/s':>10} {'vs base':>9}")
+    for name, stats in report["results"].items():
+        delta = ""
+        base = (baseline or {}).get("results", {}).get(name)
+        if base and base.get("p50_ms"):
+            delta = f"{stats['p50_ms'] / base['p50_ms']:.2f}x"
+        ops = stats.get("ops_per_sec") or stats.get("recipes_per_sec") or ""
+        print(f"{name:32} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {ops:>10} {delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated Supabase round-trip latency")
+    parser.add_argument("--only", default="", help="comma-separated benchmark names")
+    parser.add_argument("--save", help="write results JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true", help="keep app logging enabled")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Per-request logging would otherwise dominate both the output and the timings
+        logger.setLevel(logging.ERROR)
+
+    only = {name.strip() for name in args.only.split(",") if name.strip()} or None
+    report = run(args.iterations, args.warmup, args.latency_ms, only)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from array import array
+import numpy as np
+from utils.logger import logger
+from ingestion.normalize import parse_minutes
+
+# Bump when the on-disk layout changes in a way older readers can't handle
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+INDEX_FILE = "recipes.index"
+IDS_FILE = "ids.json"
+RECORDS_FILE = "records.bin"
+RECORD_OFFSETS_FILE = "record_offsets.npy"
+INGREDIENT_VOCAB_FILE = "ingredient_vocab.json"
+INGREDIENT_IDS_FILE = "ingredient_ids.npy"
+INGREDIENT_OFFSETS_FILE = "ingredient_offsets.npy"
+NEIGHBORS_FILE = "neighbors.npy"
+NEIGHBOR_SCORES_FILE = "neighbor_scores.npy"
+
+# Numeric columns stored as float32 arrays (NaN = unknown), one value per FAISS row
+NUMERIC_COLUMNS = ["ratings", "vote_count", "serves", "prep_minutes", "cook_minutes", "total_minutes", "kcal"]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(str(value).strip().rstrip("g").strip()) if value is not None else float("nan")
+    except ValueError:
+        return float("nan")
+
+
+def numeric_values(record: dict) -> dict:
+    """
+    Extracts the numeric column values for one catalog record.
+    """
+    times = record.get("times") or {}
+    prep = parse_minutes(times.get("Preparation"))
+    cook = parse_minutes(times.get("Cooking"))
+    total = None if prep is None and cook is None else (prep or 0.0) + (cook or 0.0)
+    return {
+        "ratings": _to_float(record.get("ratings")),
+        "vote_count": _to_float(record.get("vote_count")),
+        "serves": _to_float(record.get("serves")),
+        "prep_minutes": _to_float(prep),
+        "cook_minutes": _to_float(cook),
+        "total_minutes": _to_float(total),
+        "kcal": _to_float((record.get("nutrients") or {}).get("kcal")),
+    }
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SnapshotWriter:
+    """
+    Streams catalog records into a new versioned snapshot directory.
+
+    Records must be added in FAISS row order. Everything is written to a staging
+    directory and only published (renamed + CURRENT pointer swapped) by finalize(),
+    so readers never observe a half-written snapshot. A published version is never
+    overwritten; with `keep`, finalize() then prunes all but the newest `keep`
+    snapshots (see prune_snapshots).
+    """
+
+    def __init__(self, root: str, version: str | None = None, keep: int | None = None):
+        self.root = root
+        # The random suffix keeps two builds started in the same second apart
+        self.version = version or f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        self.keep = keep
+        if os.path.exists(os.path.join(root, self.version)):
+            raise FileExistsError(f"Catalog snapshot {self.version} already exists in {root}.")
+        self.staging_dir = os.path.join(root, f".staging-{self.version}")
+        os.makedirs(self.staging_dir)
+
+        self.ids = []
+        self._records = open(os.path.join(self.staging_dir, RECORDS_FILE), "wb")
+        self._record_offsets = array("q", [0])
+        self._columns = {name: array("f") for name in NUMERIC_COLUMNS}
+        self._vocab = {}
+        self._ingredient_ids = array("i")
+        self._ingredient_offsets = array("q", [0])
+
+    def add(self, record: dict):
+        self.ids.append(record["id"])
+
+        data = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self._records.write(data)
+        self._record_offsets.append(self._record_offsets[-1] + len(data))
+
+        for name, value in numeric_values(record).items():
+            self._columns[name].append(value)
+
+        for ingredient in record.get("cleaned_ingredients_list") or []:
+            self._ingredient_ids.append(self._vocab.setdefault(ingredient, len(self._vocab)))
+        self._ingredient_offsets.append(len(self._ingredient_ids))
+
+    def add_batch(self, records: list[dict]) -> list[dict]:
+        for record in records:
+            self.add(record)
+        return records
+
+    def _save_array(self, name: str, values, dtype: str) -> str:
+        path = os.path.join(self.staging_dir, name)
+        np.save(path, np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype=dtype))
+        return path
+
+    def finalize(self, index, neighbors: tuple[np.ndarray, np.ndarray] | None = None) -> str:
+        """
+        Writes the index, columns and manifest, then atomically publishes the snapshot.
+        `neighbors` is the optional precomputed (row ids, scores) graph, one row per record.
+        Returns the published snapshot directory.
+        """
+        self._records.close()
+        if index.ntotal != len(self.ids):
+            raise ValueError(f"Index has {index.ntotal} vectors but snapshot has {len(self.ids)} records.")
+
+        import faiss
+        index_path = os.path.join(self.staging_dir, INDEX_FILE)
+        faiss.write_index(index, index_path)
+        with open(os.path.join(self.staging_dir, IDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        with open(os.path.join(self.staging_dir, INGREDIENT_VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump(list(self._vocab), f, ensure_ascii=False)
+
+        self._save_array(RECORD_OFFSETS_FILE, self._record_offsets, "int64")
+        self._save_array(INGREDIENT_IDS_FILE, self._ingredient_ids, "int32")
+        self._save_array(INGREDIENT_OFFSETS_FILE, self._ingredient_offsets, "int64")
+        for name, values in self._columns.items():
+            self._save_array(f"{name}.npy", values, "float32")
+        neighbor_k = 0
+        if neighbors is not None:
+            neighbor_ids, neighbor_scores = neighbors
+            if len(neighbor_ids) != len(self.ids):
+                raise ValueError(f"Neighbour graph has {len(neighbor_ids)} rows but snapshot has {len(self.ids)} records.")
+            np.save(os.path.join(self.staging_dir, NEIGHBORS_FILE), np.asarray(neighbor_ids, dtype=np.int32))
+            np.save(os.path.join(self.staging_dir, NEIGHBOR_SCORES_FILE), np.asarray(neighbor_scores, dtype=np.float32))
+            neighbor_k = int(neighbor_ids.shape[1])
+
+        files = {}
+        for name in sorted(os.listdir(self.staging_dir)):
+            files[name] = sha256_file(os.path.join(self.staging_dir, name))
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": self.version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "recipe_count": len(self.ids),
+            "dimension": index.d,
+            "index_type": type(index).__name__,
+            "metric": "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+            "index_checksum": files[INDEX_FILE],
+            "ingredient_vocab_size": len(self._vocab),
+            "numeric_columns": NUMERIC_COLUMNS,
+            "neighbor_k": neighbor_k,
+            "files": files,
+        }
+        _write_atomic(os.path.join(self.staging_dir, MANIFEST_FILE), json.dumps(manifest, indent=2))
+
+        final_dir = os.path.join(self.root, self.version)
+        if os.path.exists(final_dir):
+            raise FileExistsError(f"Catalog snapshot {self.version} already exists in {self.root}.")
+        os.replace(self.staging_dir, final_dir)
+        _write_atomic(os.path.join(self.root, CURRENT_FILE), self.version)
+        logger.info("Catalog snapshot %s published to %s (%s recipes).", self.version, final_dir, len(self.ids))
+        if self.keep:
+            prune_snapshots(self.root, self.keep)
+        return final_dir
+
+    def abort(self):
+        self._records.close()
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+class CatalogSnapshot:
+    """
+    Read-only, memory-mapped view over a published snapshot directory.
+
+    Opening only parses the manifest and id list; record bytes, numeric columns
+    and ingredient arrays are mmapped and paged in by the OS on first access.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format_version')} in {path}")
+
+        self.version = self.manifest["version"]
+        self.dimension = self.manifest["dimension"]
+        with open(os.path.join(path, IDS_FILE), "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.row_by_id = {recipe_id: row for row, recipe_id in enumerate(self.ids)}
+
+        self._records_file = open(os.path.join(path, RECORDS_FILE), "rb")
+        size = os.fstat(self._records_file.fileno()).st_size
+        self._records = mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.record_offsets = self._load(RECORD_OFFSETS_FILE)
+        self.columns = {name: self._load(f"{name}.npy") for name in self.manifest["numeric_columns"]}
+        self.ingredient_ids = self._load(INGREDIENT_IDS_FILE)
+        self.ingredient_offsets = self._load(INGREDIENT_OFFSETS_FILE)
+        # Precomputed "more like this" graph; absent from snapshots built without one
+        has_neighbors = NEIGHBORS_FILE in self.manifest["files"]
+        self.neighbors = self._load(NEIGHBORS_FILE) if has_neighbors else None
+        self.neighbor_scores = self._load(NEIGHBOR_SCORES_FILE) if has_neighbors else None
+        self._vocab = None
+
+        if len(self.ids) != self.manifest["recipe_count"]:
+            raise ValueError(f"Snapshot {self.version} is inconsistent: {len(self.ids)} ids for "
+                             f"{self.manifest['recipe_count']} recipes.")
+
+    def _load(self, name: str) -> np.ndarray:
+        path = os.path.join(self.path, name)
+        # mmap_mode can't map zero-length arrays
+        return np.load(path, mmap_mode="r") if os.path.getsize(path) > 128 else np.load(path)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def ingredient_vocab(self) -> list[str]:
+        if self._vocab is None:
+            with open(os.path.join(self.path, INGREDIENT_VOCAB_FILE), "r", encoding="utf-8") as f:
+                self._vocab = json.load(f)
+        return self._vocab
+
+    def record(self, row: int) -> dict:
+        start, end = int(self.record_offsets[row]), int(self.record_offsets[row + 1])
+        return json.loads(self._records[start:end])
+
+    def get(self, recipe_id: str) -> dict | None:
+        row = self.row_by_id.get(recipe_id)
+        return None if row is None else self.record(row)
+
+    def get_many(self, recipe_ids: list[str]) -> dict:
+        """Returns {recipe_id: record} for the ids present in the snapshot."""
+        return {rid: self.record(self.row_by_id[rid]) for rid in recipe_ids if rid in self.row_by_id}
+
+    def ingredient_row(self, row: int) -> np.ndarray:
+        return self.ingredient_ids[self.ingredient_offsets[row]:self.ingredient_offsets[row + 1]]
+
+    def similar(self, row: int, k: int) -> list[tuple[int, float]]:
+        """Up to k precomputed (row, score) neighbours of `row`, closest first."""
+        if self.neighbors is None:
+            return []
+        return list(zip(self.neighbors[row, :k].tolist(), self.neighbor_scores[row, :k].tolist()))
+
+    def verify(self) -> bool:
+        """Recomputes every file checksum against the manifest."""
+        for name, expected in self.manifest["files"].items():
+            if sha256_file(os.path.join(self.path, name)) != expected:
+                logger.error("Checksum mismatch for %s in snapshot %s.", name, self.version)
+                return False
+        return True
+
+    def load_index(self, verify: bool = True):
+        """
+        Reads the FAISS index shipped with the snapshot, checking it against the manifest.
+        """
+        import faiss
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if verify and sha256_file(index_path) != self.manifest["index_checksum"]:
+            raise ValueError(f"Index checksum mismatch in snapshot {self.version}.")
+        index = faiss.read_index(index_path)
+        if index.ntotal != len(self.ids) or index.d != self.dimension:
+            raise ValueError(f"Index in snapshot {self.version} does not match its manifest.")
+        return index
+
+    def close(self):
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._records_file.close()
+
+
+def current_snapshot_path(root: str) -> str | None:
+    """
+    Resolves the published snapshot directory that CURRENT points at, if any.
+    """
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(root, version)
+    return path if version and os.path.isdir(path) else None
+
+
+def prune_snapshots(root: str, keep: int) -> list[str]:
+    """
+    Deletes published snapshots beyond the `keep` most recently published, never the one
+    CURRENT points at. Workers that still have an older one mapped keep reading it until
+    they reload. Returns the removed versions.
+    """
+    current = current_snapshot_path(root)
+    published = []
+    for name in os.listdir(root):
+        manifest = os.path.join(root, name, MANIFEST_FILE)
+        if not name.startswith(".") and os.path.isfile(manifest):
+            published.append((os.path.getmtime(manifest), name))
+    removed = []
+    for _, name in sorted(published, reverse=True)[max(keep, 1):]:
+        path = os.path.join(root, name)
+        if current and os.path.samefile(path, current):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    if removed:
+        logger.info("Pruned %d old catalog snapshots from %s.", len(removed), root)
+    return removed
+
+
+def open_current_snapshot(root: str) -> CatalogSnapshot | None:
+    path = current_snapshot_path(root)
+    if not path:
+        return None
+    started = time.perf_counter()
+    snapshot = CatalogSnapshot(path)
+    logger.info("Opened catalog snapshot %s (%s recipes) in %.1f ms.",
+                snapshot.version, len(snapshot), (time.perf_counter() - started) * 1000)
+    return snapshot
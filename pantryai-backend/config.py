@@ -11,3 +11,160 @@ class Config:
     SUPABASE_KEY     = os.getenv("SUPABASE_KEY")
     # If FAISS_INDEX_PATH isn’t set (or is an empty string), default to recipes.index
     FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH") or "recipes.index"
+
+    # Gemini calls: per-call deadlines, and a circuit breaker per API that opens after
+    # BREAKER_FAILURES consecutive failures and lets a trial call through RESET_SECONDS later.
+    # While embeddings are unavailable /recipes/match degrades to ingredient-overlap ranking
+    GEMINI_EMBED_TIMEOUT_SECONDS    = float(os.getenv("GEMINI_EMBED_TIMEOUT_SECONDS", "5"))
+    GEMINI_GENERATE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_GENERATE_TIMEOUT_SECONDS", "20"))
+    GEMINI_BREAKER_FAILURES         = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+    GEMINI_BREAKER_RESET_SECONDS    = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+    # Embedding calls arriving within EMBED_BATCH_WINDOW_MS of each other go out as one batch call
+    # (at most EMBED_BATCH_MAX texts, EMBED_BATCH_IN_FLIGHT batch calls at a time); batch calls
+    # are limited to EMBED_RATE_PER_SECOND per process with bursts of EMBED_RATE_BURST (0
+    # disables the limit)
+    EMBED_BATCH_WINDOW_MS           = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    EMBED_BATCH_MAX                 = int(os.getenv("EMBED_BATCH_MAX", "32"))
+    EMBED_BATCH_IN_FLIGHT           = int(os.getenv("EMBED_BATCH_IN_FLIGHT", "4"))
+    EMBED_RATE_PER_SECOND           = float(os.getenv("EMBED_RATE_PER_SECOND", "20"))
+    EMBED_RATE_BURST                = int(os.getenv("EMBED_RATE_BURST", "5"))
+
+    # Ingestion pipeline tuning
+    INGEST_QUEUE_SIZE     = int(os.getenv("INGEST_QUEUE_SIZE", "64"))      # items buffered between stages
+    INGEST_EMBED_WORKERS  = int(os.getenv("INGEST_EMBED_WORKERS", "4"))    # concurrent embedding calls (EMBED_BATCH_MAX recipes each)
+    INGEST_INDEX_BATCH    = int(os.getenv("INGEST_INDEX_BATCH", "64"))     # vectors per index.add call
+    INGEST_DB_BATCH_SIZE  = int(os.getenv("INGEST_DB_BATCH_SIZE", "500"))  # rows per Supabase upsert
+    INGEST_TRAIN_SAMPLE   = int(os.getenv("INGEST_TRAIN_SAMPLE", "20000")) # vectors sampled to train PCA/int8 indexes
+    # Ingestion embeds without the request-path circuit breaker: a failed batch call is
+    # retried up to INGEST_EMBED_MAX_RETRIES times with exponential backoff (seconds)
+    INGEST_EMBED_MAX_RETRIES  = int(os.getenv("INGEST_EMBED_MAX_RETRIES", "5"))
+    INGEST_EMBED_BACKOFF_BASE = float(os.getenv("INGEST_EMBED_BACKOFF_BASE", "1"))
+    INGEST_EMBED_BACKOFF_MAX  = float(os.getenv("INGEST_EMBED_BACKOFF_MAX", "60"))
+    # Ingestion's batch calls draw on their own bucket, not the request path's EMBED_RATE_*
+    # one (0 disables the limit)
+    INGEST_EMBED_RATE_PER_SECOND = float(os.getenv("INGEST_EMBED_RATE_PER_SECOND", "10"))
+    INGEST_EMBED_RATE_BURST      = int(os.getenv("INGEST_EMBED_RATE_BURST", "2"))
+
+    # Near-duplicate removal at ingestion (ingestion/dedupe.py): recipes whose MinHash-estimated
+    # Jaccard similarity (ingredients + name shingles) to an earlier one is >= THRESHOLD are
+    # dropped and listed under it in DEDUPE_REPORT. NUM_PERM / BANDS set the LSH banding
+    DEDUPE_ENABLED   = os.getenv("DEDUPE_ENABLED", "True") == "True"
+    DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+    DEDUPE_NUM_PERM  = int(os.getenv("DEDUPE_NUM_PERM", "128"))
+    DEDUPE_BANDS     = int(os.getenv("DEDUPE_BANDS", "16"))
+    DEDUPE_REPORT    = os.getenv("DEDUPE_REPORT") or "dedupe_report.json"
+
+    # Bulk upsert writer
+    SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "30"))
+    BULK_WRITE_CONCURRENCY   = int(os.getenv("BULK_WRITE_CONCURRENCY", "4"))
+    BULK_WRITE_MAX_RETRIES   = int(os.getenv("BULK_WRITE_MAX_RETRIES", "5"))
+    BULK_WRITE_DEAD_LETTER   = os.getenv("BULK_WRITE_DEAD_LETTER") or "ingest_dead_letter.jsonl"
+
+    # scripts/populate_recipe_images.py: Pexels search for recipes whose page has no image,
+    # and fetcher politeness (requests in flight overall / per host, request starts per second per host)
+    PEXELS_API_KEY          = os.getenv("PEXELS_API_KEY") or None
+    PEXELS_BASE_URL         = os.getenv("PEXELS_BASE_URL") or "https://api.pexels.com/v1"
+    IMAGE_FETCH_CONCURRENCY = int(os.getenv("IMAGE_FETCH_CONCURRENCY", "16"))
+    IMAGE_FETCH_PER_HOST    = int(os.getenv("IMAGE_FETCH_PER_HOST", "2"))
+    IMAGE_FETCH_HOST_RPS    = float(os.getenv("IMAGE_FETCH_HOST_RPS", "2"))
+    IMAGE_UPDATE_BATCH      = int(os.getenv("IMAGE_UPDATE_BATCH", "100"))      # image_url writes per round trip
+    IMAGE_CHECKPOINT        = os.getenv("IMAGE_CHECKPOINT") or "image_checkpoint.jsonl"
+
+    # /images/<recipe_id>?w=: resized WebP/JPEG variants of recipe images, kept in a disk LRU
+    # cache of at most IMAGE_CACHE_MAX_MB. Requested widths snap up to one of IMAGE_VARIANT_WIDTHS
+    IMAGE_CACHE_DIR               = os.getenv("IMAGE_CACHE_DIR") or "image_cache"
+    IMAGE_CACHE_MAX_MB            = float(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+    IMAGE_VARIANT_WIDTHS          = [int(w) for w in (os.getenv("IMAGE_VARIANT_WIDTHS") or "160,320,480,640,960").split(",")]
+    IMAGE_DEFAULT_WIDTH           = int(os.getenv("IMAGE_DEFAULT_WIDTH", "320"))
+    IMAGE_SOURCE_TIMEOUT_SECONDS  = float(os.getenv("IMAGE_SOURCE_TIMEOUT_SECONDS", "10"))
+    IMAGE_CACHE_MAX_AGE_SECONDS   = int(os.getenv("IMAGE_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600)))
+    # Render every variant of every catalog image at the end of ingestion
+    IMAGE_PREGENERATE_AFTER_INGEST = os.getenv("IMAGE_PREGENERATE_AFTER_INGEST", "False") == "True"
+
+    # POST /scan with image uploads: preprocessing + Tesseract in OCR_WORKERS processes, with at
+    # most OCR_MAX_PENDING more images queued (beyond that: 503). TIMEOUT caps one image (tesseract
+    # is killed), WAIT caps a whole request; MAX_SIDE is the long side images are downscaled to
+    OCR_WORKERS          = int(os.getenv("OCR_WORKERS", "2"))
+    OCR_MAX_PENDING      = int(os.getenv("OCR_MAX_PENDING", "8"))
+    OCR_TIMEOUT_SECONDS  = float(os.getenv("OCR_TIMEOUT_SECONDS", "20"))
+    OCR_WAIT_SECONDS     = float(os.getenv("OCR_WAIT_SECONDS", "45"))
+    OCR_MAX_SIDE         = int(os.getenv("OCR_MAX_SIDE", "2000"))
+    OCR_LANG             = os.getenv("OCR_LANG") or "eng"
+    OCR_MAX_IMAGES       = int(os.getenv("OCR_MAX_IMAGES", "5"))        # images per /scan request
+    OCR_MAX_IMAGE_MB     = float(os.getenv("OCR_MAX_IMAGE_MB", "10"))
+
+    # Vector index built by ingestion: INDEX_METRIC "l2" or "cosine" (normalized inner product,
+    # scores in [-1, 1]); INDEX_STORAGE "float32", "float16" or "int8" (scalar quantization);
+    # INDEX_PCA_DIM > 0 projects vectors down with a PCA trained on the catalog
+    INDEX_METRIC  = (os.getenv("INDEX_METRIC") or "l2").lower()
+    INDEX_STORAGE = (os.getenv("INDEX_STORAGE") or "float32").lower()
+    INDEX_PCA_DIM = int(os.getenv("INDEX_PCA_DIM", "0"))
+    # /pantry/search from per-device in-memory trigram indexes (typo-tolerant, no DB call per
+    # keystroke); each index catches up on other workers' writes at most every REFRESH seconds
+    PANTRY_SEARCH_INDEX           = os.getenv("PANTRY_SEARCH_INDEX", "True") == "True"
+    PANTRY_SEARCH_REFRESH_SECONDS = float(os.getenv("PANTRY_SEARCH_REFRESH_SECONDS", "10"))
+    PANTRY_SEARCH_MAX_DEVICES     = int(os.getenv("PANTRY_SEARCH_MAX_DEVICES", "1000"))
+
+    # Most items accepted by one PATCH/DELETE /pantry/bulk request
+    PANTRY_BULK_MAX_ITEMS = int(os.getenv("PANTRY_BULK_MAX_ITEMS", "500"))
+
+    # Neighbours per recipe precomputed by ingestion for /recipes/<id>/similar (0 disables)
+    SIMILAR_NEIGHBORS_K = int(os.getenv("SIMILAR_NEIGHBORS_K", "20"))
+
+    # Versioned on-disk catalog snapshots written by ingestion and mmapped by the API
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR") or "snapshots"
+    # Published snapshots ingestion keeps on disk (the current one is never pruned)
+    SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+    # How often each worker checks for a newly published snapshot to hot-swap (0 disables)
+    INDEX_RELOAD_INTERVAL_SECONDS = float(os.getenv("INDEX_RELOAD_INTERVAL_SECONDS", "30"))
+
+    # Build the recipe index and API clients in a background thread at worker start
+    # instead of on the first request that needs them
+    WARM_UP_ON_START = os.getenv("WARM_UP_ON_START", "False") == "True"
+
+    # MMR diversity re-ranking for /recipes/match?diverse=true: candidates fetched per
+    # requested result, and the default relevance/diversity trade-off (1 = relevance only)
+    MMR_FETCH_FACTOR   = int(os.getenv("MMR_FETCH_FACTOR", "4"))
+    MMR_DEFAULT_LAMBDA = float(os.getenv("MMR_DEFAULT_LAMBDA", "0.7"))
+
+    # /recipes/match stages run concurrently on MATCH_EXECUTOR_THREADS shared threads. A request
+    # gets MATCH_REQUEST_TIMEOUT_SECONDS in total (clients may ask for less with X-Request-Timeout)
+    # and each stage its own timeout; past either the request fails with 504 and its queued work
+    # is cancelled. Repository hydration is split into parallel fetches of MATCH_HYDRATE_CHUNK ids
+    MATCH_EXECUTOR_THREADS         = int(os.getenv("MATCH_EXECUTOR_THREADS", "16"))
+    MATCH_REQUEST_TIMEOUT_SECONDS  = float(os.getenv("MATCH_REQUEST_TIMEOUT_SECONDS", "15"))
+    MATCH_PANTRY_TIMEOUT_SECONDS   = float(os.getenv("MATCH_PANTRY_TIMEOUT_SECONDS", "3"))
+    MATCH_EMBED_TIMEOUT_SECONDS    = float(os.getenv("MATCH_EMBED_TIMEOUT_SECONDS", "8"))
+    MATCH_PREPARE_TIMEOUT_SECONDS  = float(os.getenv("MATCH_PREPARE_TIMEOUT_SECONDS", "10"))  # index (cold) load + filter mask
+    MATCH_HYDRATE_TIMEOUT_SECONDS  = float(os.getenv("MATCH_HYDRATE_TIMEOUT_SECONDS", "3"))
+    MATCH_HYDRATE_CHUNK            = int(os.getenv("MATCH_HYDRATE_CHUNK", "10"))
+    # Pantry text -> embedding cache, so an unchanged pantry skips the embedding call
+    MATCH_EMBED_CACHE_SIZE         = int(os.getenv("MATCH_EMBED_CACHE_SIZE", "1024"))
+    MATCH_EMBED_CACHE_TTL_SECONDS  = float(os.getenv("MATCH_EMBED_CACHE_TTL_SECONDS", "600"))
+
+    # /recipes/use-it-up: an item's urgency halves every HALF_LIFE days before its expiry
+    # and is zero beyond HORIZON days; COVERAGE_WEIGHT scales the share-of-recipe-in-pantry term
+    USE_IT_UP_HALF_LIFE_DAYS   = float(os.getenv("USE_IT_UP_HALF_LIFE_DAYS", "3"))
+    USE_IT_UP_HORIZON_DAYS     = int(os.getenv("USE_IT_UP_HORIZON_DAYS", "14"))
+    USE_IT_UP_COVERAGE_WEIGHT  = float(os.getenv("USE_IT_UP_COVERAGE_WEIGHT", "0.25"))
+
+    # Logging: records are queued to a background writer thread; "json" or "text" output.
+    # LOG_INFO_SAMPLE_RATE keeps that fraction of high-volume INFO events (logged with extra=SAMPLED)
+    LOG_LEVEL            = (os.getenv("LOG_LEVEL") or "INFO").upper()
+    LOG_FORMAT           = (os.getenv("LOG_FORMAT") or "json").lower()
+    LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0"))
+
+    # Prometheus histograms at /metrics and Server-Timing response headers
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+
+    # Opt-in request profiling: requests sending X-Profile-Token=PROFILE_ADMIN_TOKEN, plus a
+    # random PROFILE_SAMPLE_RATE fraction of all requests, write collapsed stacks to PROFILE_DIR
+    PROFILE_ADMIN_TOKEN  = os.getenv("PROFILE_ADMIN_TOKEN") or None
+    PROFILE_SAMPLE_RATE  = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS  = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR          = os.getenv("PROFILE_DIR") or "profiles"
+
+    # Where routes read and write pantry/recipe rows: "supabase", "sqlite" (standalone
+    # local store) or "replica" (reads from SQLite, writes to Supabase and mirrored locally)
+    DATA_BACKEND = (os.getenv("DATA_BACKEND") or "supabase").lower()
+    SQLITE_PATH  = os.getenv("SQLITE_PATH") or os.path.join("data", "pantry.db")
@@ -1,168 +1,165 @@
 import json
 import faiss
-import numpy as np
-# Make sure parse_ingredient_name is imported from utils.embeddings
-from utils.embeddings import generate_text_embedding, create_recipe_text_for_embedding, parse_ingredient_name
-from db import supabase
+from utils.embeddings import generate_ingestion_embeddings
+from db import create_pooled_client
+from config import Config
 from utils.logger import logger
+from ingestion.reader import iter_recipe_files, RECIPE_FILES
+from ingestion.normalize import clean_ingredients, normalize_recipe, build_db_record, build_catalog_record  # noqa: F401 (clean_ingredients re-exported)
+from ingestion.pipeline import Pipeline, Stage, IndexAppender
+from ingestion.dedupe import NearDuplicateFilter
+from ingestion.vector_index import create_index
+from ingestion.neighbors import build_neighbor_graph
+from ingestion.bulk_writer import BulkWriter
+from catalog import SnapshotWriter
 import os
-import re
 
 # Ensure this script is run from the pantryai-backend directory
 # or adjust paths accordingly if running from a different location.
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 FAISS_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'recipes.index')
 FAISS_ID_MAP_PATH = os.path.join(os.path.dirname(__file__), 'recipes_id_map.json')
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), Config.SNAPSHOT_DIR)
 
 
-def clean_ingredients(ingredients_list):
+def make_embed_stage(failed: list):
     """
-    Cleans a list of ingredients for better embedding generation.
-    This can be a simpler cleaning than parse_ingredient_name if you just want to remove symbols.
-    For more robust cleaning of the actual *names* for the embedding text,
-    you might apply parse_ingredient_name to each item and then join.
-    But for simple text cleanup for embedding, this is usually sufficient.
+    Embedding stage: attaches 768-dim vectors to a batch of recipes with one Gemini
+    call. Recipes whose embedding still fails after retries are dropped from the run,
+    and their ids are appended to `failed`.
     """
-    cleaned = []
-    for ingredient in ingredients_list:
-        if isinstance(ingredient, str):
-            cleaned_ingredient = ingredient.strip().lower()
-            cleaned_ingredient = re.sub(r'\s+', ' ', cleaned_ingredient)
-            cleaned_ingredient = re.sub(r'[^a-z0-9\s]', '', cleaned_ingredient) # Remove non-alphanumeric except spaces
-            if cleaned_ingredient:
-                cleaned.append(cleaned_ingredient)
-    return cleaned
-
-def ingest_recipes_and_build_index():
-    logger.info("Starting recipe ingestion and FAISS index building...")
-
-    # 1. Load all recipe JSON files
-    all_recipes = []
-    json_files = ["recipes.json", "inspiration.json", "baking.json", "health.json", "budget.json"]
-    for filename in json_files:
-        filepath = os.path.join(DATA_DIR, filename)
-        if not os.path.exists(filepath):
-            logger.warning(f"File not found: {filepath}. Skipping.")
-            continue
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, dict) and "recipes" in data:
-                all_recipes.extend(data["recipes"])
-            else:
-                all_recipes.extend(data)
-    logger.info(f"Loaded {len(all_recipes)} recipes from JSON files.")
-
-    if not all_recipes:
-        logger.error("No recipes loaded. Exiting ingestion.")
-        return
-
-    # Prepare containers
-    embeddings = []
-    faiss_idx_to_recipe_id_map = []
-    recipes_for_db = []
-
-    # Filter out any recipes missing id or name
-    valid_recipes = [r for r in all_recipes if r.get('id') and r.get('name')]
-    logger.info(f"Processing {len(valid_recipes)} valid recipes for embedding and database insertion.")
-
-    for i, recipe in enumerate(valid_recipes):
-        recipe_id = recipe['id']
-        original_ingredients_list = recipe.get('ingredients', [])
-
-        # --- Build cleaned_ingredients_list with phrase- and token-level keys, preserving order ---
-        seen = {}  # ordered dict by insertion order
-        for raw in original_ingredients_list:
-            if not isinstance(raw, str):
-                logger.warning(f"Ingredient item in recipe {recipe_id} is not a string: {raw}")
+    def embed(batch: list[dict]) -> list[dict | None]:
+        vectors = generate_ingestion_embeddings([recipe.pop('embedding_text') for recipe in batch])
+        embedded = []
+        for recipe, embedding in zip(batch, vectors):
+            if embedding is None or len(embedding) != 768:
+                logger.error("Skipping recipe ID '%s': no valid embedding after retries.", recipe['id'])
+                failed.append(recipe['id'])
+                embedded.append(None)
                 continue
+            recipe['embedding'] = embedding
+            embedded.append(recipe)
+        return embedded
+    return embed
+
+
+def make_snapshot_stage(snapshot: SnapshotWriter):
+    """
+    Snapshot stage: appends catalog records in index-row order (must run on a single worker).
+    """
+    def append(batch: list[dict]) -> list[dict]:
+        snapshot.add_batch([build_catalog_record(recipe) for recipe in batch])
+        return batch
+    return append
+
+
+def make_upsert_stage(writer: BulkWriter):
+    """
+    DB stage: hands recipe rows to the bulk writer, which batches, retries and dead-letters them.
+    """
+    def upsert(batch: list[dict]) -> list[dict]:
+        writer.submit([build_db_record(recipe) for recipe in batch])
+        return batch
+    return upsert
 
-            cleaned = parse_ingredient_name(raw)
-            if not cleaned:
-                continue
 
-            # Keep the full cleaned phrase
-            seen[cleaned] = None
-            # Also split into individual tokens
-            for tok in cleaned.split():
-                seen[tok] = None
-
-        # Assign back as list in original-discovered order (deduped)
-        recipe['cleaned_ingredients_list'] = list(seen)
-        # --- End cleaned_ingredients_list population ---
-
-        # Clean for embedding text (may differ from list used for search)
-        recipe['cleaned_ingredients'] = clean_ingredients(original_ingredients_list)
-
-        # Generate embedding
-        text_for_embedding = create_recipe_text_for_embedding(recipe)
-        embedding = generate_text_embedding(text_for_embedding)
-
-        # Only include valid embeddings
-        if embedding and len(embedding) == 768:
-            embeddings.append(embedding)
-            faiss_idx_to_recipe_id_map.append(recipe_id)
-
-            # Prepare DB record
-            db_entry = {
-                "id": recipe_id,
-                "url": recipe.get('url'),
-                "name": recipe.get('name'),
-                "author": recipe.get('author'),
-                "ratings": recipe.get('rattings'),
-                "description": recipe.get('description'),
-                "ingredients": recipe.get('ingredients'),
-                "steps": recipe.get('steps'),
-                "nutrients": recipe.get('nutrients'),
-                "times": recipe.get('times'),
-                "serves": recipe.get('serves'),
-                "difficulty": recipe.get('difficult'),
-                "vote_count": recipe.get('vote_count'),
-                "subcategory": recipe.get('subcategory'),
-                "dish_type": recipe.get('dish_type'),
-                "maincategory": recipe.get('maincategory'),
-                # include our new column
-                "cleaned_ingredients_list": recipe.get('cleaned_ingredients_list')
-            }
-            recipes_for_db.append(db_entry)
-        else:
-            logger.warning(f"Skipping recipe ID '{recipe_id}' due to invalid or missing embedding.")
-
-        if (i + 1) % 5 == 0:
-            logger.info(f"Processed {i + 1}/{len(valid_recipes)} recipes...")
-
-    # Ensure we have embeddings before proceeding
-    if not embeddings:
-        logger.error("No valid embeddings generated. Cannot build FAISS index or insert into Supabase.")
-        return
-
-    # 2. Build FAISS index
-    embeddings_np = np.array(embeddings, dtype="float32")
-    dimension = embeddings_np.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings_np)
-    faiss.write_index(index, FAISS_INDEX_PATH)
-    logger.info(f"FAISS index built and saved to {FAISS_INDEX_PATH} with {index.ntotal} vectors.")
+def ingest_recipes_and_build_index(data_dir: str = DATA_DIR, filenames: list[str] | None = None, client=None):
+    """
+    Streams recipes through read -> normalize -> dedupe -> embed -> index-append -> snapshot -> DB upsert.
+    Each stage runs on its own thread(s) and stages are connected by bounded queues,
+    so memory stays flat regardless of how large the input dumps are.
+    Near-duplicates are dropped before they are embedded; the removed ones are listed in DEDUPE_REPORT.
+    """
+    logger.info("Starting recipe ingestion and FAISS index building...")
+
+    appender = IndexAppender(
+        lambda dim: create_index(dim, Config.INDEX_METRIC, Config.INDEX_STORAGE, Config.INDEX_PCA_DIM),
+        train_size=Config.INGEST_TRAIN_SAMPLE,
+    )
+    snapshot = SnapshotWriter(SNAPSHOT_DIR, keep=Config.SNAPSHOT_KEEP)
+    writer = BulkWriter(
+        client or create_pooled_client(Config.BULK_WRITE_CONCURRENCY),
+        table='recipes',
+        on_conflict='id',
+        batch_size=Config.INGEST_DB_BATCH_SIZE,
+        concurrency=Config.BULK_WRITE_CONCURRENCY,
+        max_retries=Config.BULK_WRITE_MAX_RETRIES,
+        dead_letter_path=Config.BULK_WRITE_DEAD_LETTER,
+    )
+    embed_failed = []
+    dedupe = NearDuplicateFilter(Config.DEDUPE_THRESHOLD, Config.DEDUPE_NUM_PERM, Config.DEDUPE_BANDS) \
+        if Config.DEDUPE_ENABLED else None
+    pipeline = Pipeline(
+        iter_recipe_files(data_dir, filenames or RECIPE_FILES),
+        [
+            Stage("normalize", normalize_recipe),
+            *([Stage("dedupe", dedupe)] if dedupe else []),
+            Stage("embed", make_embed_stage(embed_failed), workers=Config.INGEST_EMBED_WORKERS,
+                  batch_size=Config.EMBED_BATCH_MAX),
+            Stage("index", appender, batch_size=Config.INGEST_INDEX_BATCH),
+            Stage("snapshot", make_snapshot_stage(snapshot), batch_size=Config.INGEST_INDEX_BATCH),
+            Stage("upsert", make_upsert_stage(writer), batch_size=Config.INGEST_INDEX_BATCH),
+        ],
+        queue_size=Config.INGEST_QUEUE_SIZE,
+    )
+    try:
+        stats = pipeline.run()
+    except Exception:
+        snapshot.abort()
+        # Still drain in-flight batches so the report and dead-letter file are complete, but
+        # let the pipeline's error, not a failed batch's, reach the caller
+        try:
+            writer.close()
+        except Exception as e:
+            logger.error("Bulk writer also failed: %s", e)
+        raise
+    stats["db"] = writer.close()
+    stats["embed_failed"] = len(embed_failed)
+    if embed_failed:
+        logger.error("%d recipes were left out: embedding failed after retries (first ids: %s)",
+                     len(embed_failed), ", ".join(embed_failed[:10]))
+    if dedupe is not None:
+        dedupe.write_report(Config.DEDUPE_REPORT)
+        stats["dedupe"] = dedupe.stats()
+        logger.info("Removed %s duplicate recipes; see %s.", stats['dedupe']['removed'], Config.DEDUPE_REPORT)
+    appender.finish()
+    logger.info("Ingestion pipeline stats: %s", json.dumps(stats))
+
+    # Ensure we have embeddings before writing anything out
+    if appender.index is None or appender.index.ntotal == 0:
+        logger.error("No valid embeddings generated. Cannot build FAISS index.")
+        snapshot.abort()
+        return stats
+
+    faiss.write_index(appender.index, FAISS_INDEX_PATH)
+    logger.info("FAISS index built and saved to %s with %s vectors.", FAISS_INDEX_PATH, appender.index.ntotal)
 
     # Save ID map
     with open(FAISS_ID_MAP_PATH, 'w') as f:
-        json.dump(faiss_idx_to_recipe_id_map, f)
-    logger.info(f"FAISS ID map saved to {FAISS_ID_MAP_PATH}.")
-
-    # 3. Upsert into Supabase
-    logger.info(f"Attempting to insert {len(recipes_for_db)} recipes into Supabase 'recipes' table.")
-    batch_size = 500
-    for start in range(0, len(recipes_for_db), batch_size):
-        batch = recipes_for_db[start:start + batch_size]
+        json.dump(appender.id_map, f)
+    logger.info("FAISS ID map saved to %s.", FAISS_ID_MAP_PATH)
+
+    # Precompute every recipe's nearest neighbours so /recipes/<id>/similar is a lookup
+    neighbors = build_neighbor_graph(appender.index, Config.SIMILAR_NEIGHBORS_K)
+    if neighbors is not None:
+        logger.info("Neighbour graph built: %s neighbours for %s recipes.", neighbors[0].shape[1], len(neighbors[0]))
+
+    # Publish the versioned catalog snapshot the API serves from
+    stats["snapshot_path"] = snapshot.finalize(appender.index, neighbors=neighbors)
+
+    # Optionally render every /images/<id> variant now rather than on first view
+    if Config.IMAGE_PREGENERATE_AFTER_INGEST:
+        from catalog import CatalogSnapshot
+        from thumbnails import catalog_image_urls, get_thumbnailer
+        catalog = CatalogSnapshot(stats["snapshot_path"])
         try:
-            res = supabase.table('recipes').upsert(batch, on_conflict='id').execute()
-            if res.data:
-                logger.info(f"Successfully inserted/updated {len(res.data)} recipes (batch {start//batch_size + 1}).")
-            elif res.error:
-                logger.error(f"Supabase insertion/update error for batch {start//batch_size + 1}: {res.error}")
-        except Exception as e:
-            logger.error(f"General error during Supabase batch insertion/update {start//batch_size + 1}: {e}", exc_info=True)
+            stats["thumbnails"] = get_thumbnailer().pregenerate(catalog_image_urls(catalog))
+        finally:
+            catalog.close()
+        logger.info("Thumbnails pre-generated: %s", json.dumps(stats['thumbnails']))
 
     logger.info("Recipe ingestion and FAISS index building complete.")
+    return stats
 
 
 if __name__ == "__main__":
@@ -172,4 +169,4 @@ if __name__ == "__main__":
     # 3. ***MANUALLY*** run the following SQL command in your Supabase SQL Editor ONCE
     #    to add the 'cleaned_ingredients_list' column to your 'recipes' table:
     #    ALTER TABLE recipes ADD COLUMN cleaned_ingredients_list jsonb;
-    ingest_recipes_and_build_index()
\ No newline at end of file
+    ingest_recipes_and_build_index()
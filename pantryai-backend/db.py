@@ -1,4 +1,85 @@
-from supabase import create_client
+import os
 from config import Config
+from utils.lazy import LazyResource, LazyProxy
 
-supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
\ No newline at end of file
+
+def _create_supabase_client():
+    # Imported here: the supabase package alone adds ~0.5s to every import of the app
+    from supabase import create_client
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+
+
+supabase_client = LazyResource("Supabase client", _create_supabase_client)
+
+
+def get_supabase():
+    """
+    Returns this process's Supabase client, creating it on first use.
+    """
+    return supabase_client.get()
+
+
+# Backwards-compatible module attribute for scripts that do `from db import supabase`
+supabase = LazyProxy(supabase_client)
+
+
+def create_pooled_client(max_connections: int):
+    """
+    Creates a dedicated Supabase client backed by a keep-alive HTTP connection pool
+    sized for `max_connections` concurrent requests (used by bulk writers).
+    """
+    import httpx
+    from supabase import create_client, ClientOptions
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(Config.SUPABASE_TIMEOUT_SECONDS),
+    )
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY, options=ClientOptions(httpx_client=http_client))
+
+
+def _sqlite_store():
+    from repositories.sqlite_repo import SQLiteStore
+    path = Config.SQLITE_PATH
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    return SQLiteStore(path)
+
+
+def _create_backend_repositories():
+    from repositories.supabase_repo import SupabasePantryRepository, SupabaseRecipeRepository
+    if Config.DATA_BACKEND == "supabase":
+        return SupabasePantryRepository(get_supabase), SupabaseRecipeRepository(get_supabase)
+
+    from repositories.sqlite_repo import SQLitePantryRepository, SQLiteRecipeRepository
+    store = _sqlite_store()
+    if Config.DATA_BACKEND == "sqlite":
+        return SQLitePantryRepository(store), SQLiteRecipeRepository(store)
+    if Config.DATA_BACKEND == "replica":
+        from repositories.replicated import ReplicatedPantryRepository, ReplicatedRecipeRepository
+        return (
+            ReplicatedPantryRepository(SupabasePantryRepository(get_supabase), SQLitePantryRepository(store)),
+            ReplicatedRecipeRepository(SupabaseRecipeRepository(get_supabase), SQLiteRecipeRepository(store)),
+        )
+    raise ValueError(f"Unknown DATA_BACKEND '{Config.DATA_BACKEND}' (expected supabase, sqlite or replica).")
+
+
+def _create_repositories():
+    pantry, recipes = _create_backend_repositories()
+    if Config.PANTRY_SEARCH_INDEX:
+        from repositories.search_indexed import SearchIndexedPantryRepository
+        pantry = SearchIndexedPantryRepository(pantry, Config.PANTRY_SEARCH_REFRESH_SECONDS,
+                                               Config.PANTRY_SEARCH_MAX_DEVICES)
+    return pantry, recipes
+
+
+repositories = LazyResource("data repositories", _create_repositories)
+
+
+def get_pantry_repository():
+    """Returns the PantryRepository selected by Config.DATA_BACKEND."""
+    return repositories.get()[0]
+
+
+def get_recipe_repository():
+    """Returns the RecipeRepository selected by Config.DATA_BACKEND."""
+    return repositories.get()[1]
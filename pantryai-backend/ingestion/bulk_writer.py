@@ -0,0 +1,207 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from postgrest.exceptions import APIError
+from utils.logger import logger
+
+# PostgREST / Postgres error codes worth retrying: connection and schema-cache
+# hiccups, statement timeouts, serialization failures, deadlocks, too many connections.
+TRANSIENT_ERROR_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003", "57014", "40001", "40P01", "53300"}
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Returns True for failures that may succeed if the same request is simply sent again.
+    """
+    if isinstance(exc, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(exc, APIError):
+        code = str(exc.code or "")
+        # HTTP-level codes come through as e.g. "503"; 429 is rate limiting
+        return code in TRANSIENT_ERROR_CODES or code == "429" or code.startswith("5")
+    return False
+
+
+class BulkWriteReport:
+    """
+    Counters for one bulk write run. Updated from the writer's worker threads.
+    """
+
+    def __init__(self):
+        self.rows_submitted = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            "rows_submitted": self.rows_submitted,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_written / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+class BulkWriter:
+    """
+    Concurrent, idempotent upserter for a Supabase table.
+
+    Rows are sent in batches of `batch_size` on up to `concurrency` threads that
+    share the client's connection pool. Because every write is an upsert keyed on
+    `on_conflict`, a batch can safely be re-sent: transient errors are retried with
+    exponential backoff and jitter. Permanent errors are narrowed down by splitting
+    the batch so only the offending rows end up in the dead-letter file.
+    """
+
+    def __init__(
+        self,
+        client,
+        table: str = "recipes",
+        on_conflict: str = "id",
+        batch_size: int = 500,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        dead_letter_path: str | None = None,
+        sleep=time.sleep,
+    ):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dead_letter_path = dead_letter_path
+        self.sleep = sleep
+        self.report = BulkWriteReport()
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk-writer")
+        # Bounds in-flight batches so submit() blocks (backpressure) instead of queueing unboundedly
+        self._slots = threading.BoundedSemaphore(concurrency * 2)
+        self._pending = []
+        self._buffer = []
+        self._dead_letter_lock = threading.Lock()
+
+    # --- public API ---
+    def submit(self, rows: list[dict]):
+        """
+        Buffers rows and dispatches every full batch. Blocks while too many batches are in flight.
+        """
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._dispatch(batch)
+
+    def close(self) -> dict:
+        """
+        Flushes remaining rows, waits for all batches and returns the run report.
+        """
+        try:
+            if self._buffer:
+                batch, self._buffer = self._buffer, []
+                self._dispatch(batch)
+            errors = [e for e in (future.exception() for future in self._pending) if e is not None]
+        finally:
+            # Even when a batch failed, every other batch finishes and the run is reported
+            self._pending = []
+            self._executor.shutdown(wait=True)
+            self.report.finished_at = time.perf_counter()
+            summary = self.report.to_dict()
+            logger.info("Bulk write to '%s' finished: %s", self.table, json.dumps(summary))
+            if summary["rows_failed"]:
+                logger.error("%s rows could not be written; see %s", summary['rows_failed'], self.dead_letter_path)
+        if errors:
+            raise errors[0]
+        return summary
+
+    def write(self, rows) -> dict:
+        """
+        Convenience wrapper: submits an iterable of rows and closes the writer.
+        """
+        for row in rows:
+            self.submit([row])
+        return self.close()
+
+    # --- internals ---
+    def _dispatch(self, batch: list[dict]):
+        # Postgres rejects an upsert that touches the same key twice, so keep the last copy
+        deduped = list({row[self.on_conflict]: row for row in batch}.values())
+        self.report.add(rows_submitted=len(deduped))
+        self._slots.acquire()
+        future = self._executor.submit(self._write_batch, deduped)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.append(future)
+        # Sort every batch before raising, so close() still waits for the unfinished ones
+        pending, failed = [], []
+        for f in self._pending:
+            if not f.done():
+                pending.append(f)
+            elif f.exception() is not None:
+                failed.append(f)
+        self._pending = pending
+        if failed:
+            # Re-raise what a finished batch failed with (e.g. an unwritable dead-letter file)
+            failed[0].result()
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _upsert(self, batch: list[dict]):
+        res = self.client.table(self.table).upsert(batch, on_conflict=self.on_conflict).execute()
+        # Older supabase-py versions return errors instead of raising them
+        error = getattr(res, "error", None)
+        if error:
+            raise APIError(error if isinstance(error, dict) else {"message": str(error)})
+        return res
+
+    def _write_batch(self, batch: list[dict]):
+        self.report.add(batches=1)
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._upsert(batch)
+                self.report.add(rows_written=len(batch))
+                return
+            except Exception as e:
+                if is_transient_error(e) and attempt < self.max_retries:
+                    delay = self._backoff(attempt)
+                    logger.warning("Transient error upserting %d rows into '%s' (attempt %d/%d), retrying in %.2fs: %s",
+                                   len(batch), self.table, attempt + 1, self.max_retries + 1, delay, e)
+                    self.report.add(retries=1)
+                    self.sleep(delay)
+                    continue
+                if not is_transient_error(e) and len(batch) > 1:
+                    # Isolate the bad rows instead of dead-lettering the whole batch
+                    mid = len(batch) // 2
+                    self._write_batch(batch[:mid])
+                    self._write_batch(batch[mid:])
+                    return
+                logger.error("Giving up on %s rows for '%s': %s", len(batch), self.table, e)
+                self._dead_letter(batch, e)
+                return
+
+    def _dead_letter(self, rows: list[dict], exc: BaseException):
+        self.report.add(rows_failed=len(rows))
+        if not self.dead_letter_path:
+            return
+        with self._dead_letter_lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({"row": row, "error": str(exc)}, default=str) + "\n")
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import re
+import threading
+import numpy as np
+from utils.embeddings import parse_ingredient_name
+
+# Mersenne prime for the universal hash family (a * x + b) mod p
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def recipe_features(recipe: dict, shingle: int = 3) -> set[str]:
+    """
+    What two recipes must share to count as the same: their canonical ingredient
+    names ("2 large eggs, beaten" -> "eggs beaten") and character shingles of their
+    name, so retitled copies ("Easy chocolate cake" / "Chocolate cake") still overlap.
+    """
+    features = set()
+    for raw in recipe.get('ingredients') or []:
+        if isinstance(raw, str):
+            name = parse_ingredient_name(raw)
+            if name:
+                features.add("i:" + name)
+    title = " ".join(_NON_ALNUM.sub(" ", str(recipe.get('name') or "").lower()).split())
+    if title:
+        features.update("n:" + title[start:start + shingle] for start in range(max(1, len(title) - shingle + 1)))
+    return features
+
+
+class MinHasher:
+    """MinHash signatures of `num_perm` 32-bit values from a fixed, seeded hash family."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a, b < 2**32 keep a * x + b (x < 2**32) within uint64
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, features: set[str]) -> np.ndarray:
+        if not features:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashed = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(f.encode(), digest_size=4).digest(), "little") for f in features),
+            dtype=np.uint64, count=len(features),
+        )
+        return (((self._a * hashed[None, :] + self._b) % _PRIME) & _MAX_HASH).min(axis=1)
+
+
+class NearDuplicateFilter:
+    """
+    Ingestion stage that drops recipes already seen under another id: either the same
+    id again (the category crawls overlap) or a near-duplicate whose estimated Jaccard
+    similarity to a kept recipe (over recipe_features) is at least `threshold`.
+
+    Kept recipes' signatures go into `bands` LSH band tables, so each new recipe is
+    compared only with the kept recipes it shares a band with: near-linear in the
+    number of recipes rather than all-pairs. The first recipe of a cluster in stream
+    order stays canonical and the others become its aliases (see report()). The
+    stage keeps state, so it must run on a single worker.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, seed)
+        self._tables = [{} for _ in range(bands)]  # band key -> [kept position]
+        self._kept_ids = []
+        self._kept_names = []
+        self._signatures = []
+        self._seen_ids = {}  # id -> canonical id
+        self.aliases = {}    # canonical id -> [{"id", "name", "similarity", "reason"}]
+        self.compared = 0
+        self._lock = threading.Lock()
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def __call__(self, recipe: dict) -> dict | None:
+        with self._lock:
+            rid = recipe['id']
+            if rid in self._seen_ids:
+                self._alias(self._seen_ids[rid], recipe, 1.0, "same_id")
+                return None
+
+            signature = self.hasher.signature(recipe_features(recipe))
+            keys = self._band_keys(signature)
+            candidates = {pos for band, key in enumerate(keys) for pos in self._tables[band].get(key, ())}
+            best, best_similarity = None, 0.0
+            for pos in sorted(candidates):
+                self.compared += 1
+                similarity = float(np.mean(self._signatures[pos] == signature))
+                if similarity > best_similarity:
+                    best, best_similarity = pos, similarity
+            if best is not None and best_similarity >= self.threshold:
+                canonical = self._kept_ids[best]
+                self._seen_ids[rid] = canonical
+                self._alias(canonical, recipe, best_similarity, "near_duplicate")
+                return None
+
+            position = len(self._kept_ids)
+            self._kept_ids.append(rid)
+            self._kept_names.append(recipe.get('name'))
+            self._signatures.append(signature)
+            self._seen_ids[rid] = rid
+            for band, key in enumerate(keys):
+                self._tables[band].setdefault(key, []).append(position)
+            return recipe
+
+    def _alias(self, canonical: str, recipe: dict, similarity: float, reason: str):
+        self.aliases.setdefault(canonical, []).append({
+            "id": recipe['id'], "name": recipe.get('name'), "similarity": round(similarity, 3), "reason": reason,
+        })
+
+    def stats(self) -> dict:
+        removed = sum(len(dupes) for dupes in self.aliases.values())
+        return {"kept": len(self._kept_ids), "removed": removed, "clusters": len(self.aliases),
+                "comparisons": self.compared}
+
+    def report(self) -> dict:
+        """Every removed recipe, grouped under the canonical recipe it was folded into."""
+        names = dict(zip(self._kept_ids, self._kept_names))
+        clusters = [{"canonical_id": canonical, "canonical_name": names.get(canonical), "aliases": dupes}
+                    for canonical, dupes in self.aliases.items()]
+        return {"threshold": self.threshold, "num_perm": self.hasher.num_perm, "bands": self.bands,
+                **self.stats(), "clusters": clusters}
+
+    def write_report(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
@@ -0,0 +1,317 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+import aiohttp
+from utils.logger import logger
+
+USER_AGENT = "Mozilla/5.0 (compatible; PantryAI-image-fetcher)"
+# Statuses worth asking again for (after Retry-After or a backoff)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# og:image lives in <head>; nothing past this much of a page is parsed
+MAX_PAGE_BYTES = 512 * 1024
+# What one recipe's lookups can fail with: network errors and timeouts, and responses that
+# aren't what we asked for (an HTML error page instead of JSON, a JSON list, an unknown charset)
+FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError, LookupError, AttributeError)
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _ImageTagParser(HTMLParser):
+    """Collects og:image / twitter:image and the first <img> (preferring one inside <article>)."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.og_image = None
+        self.twitter_image = None
+        self.article_img = None
+        self.first_img = None
+        self.in_article = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            content = (attrs.get("content") or "").strip()
+            if content and key in ("og:image", "og:image:url", "og:image:secure_url"):
+                self.og_image = content
+                raise _StopParsing  # the best answer there is; skip the rest of the page
+            if content and key == "twitter:image" and not self.twitter_image:
+                self.twitter_image = content
+        elif tag == "article":
+            self.in_article = True
+        elif tag == "img":
+            src = (attrs.get("src") or attrs.get("data-src") or "").strip()
+            if not src or src.startswith("data:"):
+                return
+            if self.first_img is None:
+                self.first_img = src
+            if self.in_article and self.article_img is None:
+                self.article_img = src
+
+
+def extract_image_url(html: str, page_url: str) -> str:
+    """
+    The page's representative image: og:image, then twitter:image, then the first
+    <img> in an <article>, then the first <img> at all, resolved against `page_url`.
+    Returns "" if the page has none.
+    """
+    parser = _ImageTagParser()
+    with contextlib.suppress(_StopParsing):
+        parser.feed(html)
+        parser.close()
+    found = parser.og_image or parser.twitter_image or parser.article_img or parser.first_img
+    return urljoin(page_url, found) if found else ""
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to our own backoff
+
+
+class HostRateLimiter:
+    """
+    Per-host politeness for the fetcher: at most `per_host` requests in flight to a
+    host, and request starts to it spaced at least 1 / `rate` seconds apart.
+    Only used from one event loop, so the bookkeeping needs no locks.
+    """
+
+    def __init__(self, rate: float, per_host: int = 2):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.per_host = per_host
+        self._slots = {}
+        self._next_start = {}
+
+    @contextlib.asynccontextmanager
+    async def slot(self, host: str):
+        semaphore = self._slots.get(host)
+        if semaphore is None:
+            semaphore = self._slots[host] = asyncio.Semaphore(self.per_host)
+        async with semaphore:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+    def defer(self, host: str, seconds: float):
+        """Holds every request to `host` back for `seconds` (e.g. after a 429)."""
+        self._next_start[host] = max(self._next_start.get(host, 0.0), time.monotonic() + seconds)
+
+
+class ImageCheckpoint:
+    """
+    Append-only JSONL of finished recipes ({"id", "image_url", "source"}). Lines are
+    written only after the batch they belong to is in the database, so every id in
+    the file can be skipped when the run is resumed.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.done.add(json.loads(line)["id"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # a line cut short by a crash
+
+    def record(self, results: list[dict]):
+        self.done.update(r["id"] for r in results)
+        if not self.path or not results:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps({"id": r["id"], "image_url": r["image_url"], "source": r["source"]}) + "\n")
+
+
+class ImagePopulator:
+    """
+    Finds an image for every recipe that lacks one and writes them back in batches.
+
+    Recipes are paged from the repository into a bounded queue drained by
+    `concurrency` async workers sharing one aiohttp session. Each worker fetches the
+    recipe's page (under the per-host limiter) for its og:image, falls back to a
+    Pexels search when the page has none, and parks the result; every `batch_size`
+    results go to the database in one set_image_urls() call and then into the
+    checkpoint.
+    """
+
+    def __init__(
+        self,
+        repository,
+        pexels_key: str | None = None,
+        pexels_base: str = "https://api.pexels.com/v1",
+        concurrency: int = 16,
+        per_host: int = 2,
+        host_rate: float = 2.0,
+        batch_size: int = 100,
+        checkpoint: ImageCheckpoint | None = None,
+        timeout: float = 15.0,
+        max_retries: int = 2,
+        backoff_base: float = 1.0,
+        page_size: int = 500,
+    ):
+        self.repository = repository
+        self.pexels_key = pexels_key
+        self.pexels_base = pexels_base.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.limiter = HostRateLimiter(host_rate, per_host)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint = checkpoint or ImageCheckpoint(None)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.page_size = page_size
+        self.counts = dict.fromkeys(
+            ("recipes", "skipped", "page", "pexels", "none", "error", "written", "write_failures", "retries"), 0)
+        self._pending = []
+
+    # --- HTTP ---
+    async def _get(self, session: aiohttp.ClientSession, url: str, as_json: bool = False, **kwargs):
+        """
+        (status, body) for a GET, retrying RETRY_STATUSES and connection errors.
+        Raises the last aiohttp.ClientError / TimeoutError once retries run out.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            try:
+                async with self.limiter.slot(host):
+                    async with session.get(url, **kwargs) as resp:
+                        if resp.status in RETRY_STATUSES and not last:
+                            delay = retry_after_seconds(resp.headers.get("Retry-After"))
+                            self.limiter.defer(host, self.backoff_base * 2 ** attempt if delay is None else delay)
+                            self.counts["retries"] += 1
+                            continue
+                        if resp.status != 200:
+                            return resp.status, None
+                        if as_json:
+                            return resp.status, await resp.json(content_type=None)
+                        body = bytearray()
+                        async for chunk in resp.content.iter_chunked(64 * 1024):
+                            body += chunk
+                            if len(body) >= MAX_PAGE_BYTES:
+                                break
+                        return resp.status, bytes(body[:MAX_PAGE_BYTES]).decode(resp.charset or "utf-8", "replace")
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last:
+                    raise
+                self.limiter.defer(host, self.backoff_base * 2 ** attempt)
+                self.counts["retries"] += 1
+
+    async def _from_page(self, session, url: str) -> str:
+        status, html = await self._get(session, url)
+        return extract_image_url(html, url) if html else ""
+
+    async def _from_pexels(self, session, name: str) -> str:
+        status, data = await self._get(
+            session, f"{self.pexels_base}/search", as_json=True,
+            params={"query": f"{name} recipe food", "per_page": 1},
+            headers={"Authorization": self.pexels_key},
+        )
+        photos = (data or {}).get("photos") or []
+        return photos[0].get("src", {}).get("medium", "") if photos else ""
+
+    async def find_image(self, session, recipe: dict) -> dict:
+        """
+        {"id", "image_url", "source"}; source "error" means a failed or unusable response
+        left it undecided (not checkpointed, so the next run tries again).
+        """
+        failed = False
+        if recipe.get("url"):
+            try:
+                image = await self._from_page(session, recipe["url"])
+                if image:
+                    return {"id": recipe["id"], "image_url": image, "source": "page"}
+            except FETCH_ERRORS as exc:
+                logger.warning("Image page fetch failed for recipe %s: %s", recipe["id"], exc)
+                failed = True
+        if self.pexels_key and recipe.get("name"):
+            try:
+                image = await self._from_pexels(session, recipe["name"])
+                if image:
+                    return {"id": recipe["id"], "image_url": image, "source": "pexels"}
+            except FETCH_ERRORS as exc:
+                logger.warning("Pexels search failed for recipe %s: %s", recipe["id"], exc)
+                failed = True
+        return {"id": recipe["id"], "image_url": "", "source": "error" if failed else "none"}
+
+    # --- batching ---
+    async def _flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        urls = {r["id"]: r["image_url"] for r in batch if r["image_url"]}
+        try:
+            if urls:
+                await asyncio.to_thread(self.repository.set_image_urls, urls)
+        except Exception as exc:
+            # Not checkpointed, so the next run picks these recipes up again
+            logger.error("Writing %d recipe images failed: %s", len(urls), exc)
+            self.counts["write_failures"] += len(urls)
+            return
+        self.counts["written"] += len(urls)
+        self.checkpoint.record(batch)
+
+    async def _finish(self, result: dict):
+        self.counts[result["source"]] += 1
+        if result["source"] == "error":
+            return
+        self._pending.append(result)
+        if len(self._pending) >= self.batch_size:
+            await self._flush()
+
+    # --- run ---
+    async def _produce(self, queue: asyncio.Queue, limit: int | None):
+        after_id, queued = "", 0
+        try:
+            while limit is None or queued < limit:
+                page = await asyncio.to_thread(self.repository.missing_images, after_id, self.page_size)
+                for recipe in page:
+                    if recipe["id"] in self.checkpoint.done:
+                        self.counts["skipped"] += 1
+                        continue
+                    if limit is not None and queued >= limit:
+                        break
+                    await queue.put(recipe)
+                    queued += 1
+                if len(page) < self.page_size:
+                    break
+                after_id = page[-1]["id"]
+        finally:
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+    async def _work(self, session, queue: asyncio.Queue):
+        while (recipe := await queue.get()) is not None:
+            self.counts["recipes"] += 1
+            await self._finish(await self.find_image(session, recipe))
+
+    async def run(self, limit: int | None = None) -> dict:
+        started = time.perf_counter()
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": USER_AGENT},
+        ) as session:
+            await asyncio.gather(
+                self._produce(queue, limit),
+                *(self._work(session, queue) for _ in range(self.concurrency)),
+            )
+        await self._flush()
+        elapsed = time.perf_counter() - started
+        report = dict(self.counts, elapsed_seconds=round(elapsed, 3))
+        report["recipes_per_second"] = round(self.counts["recipes"] / elapsed, 1) if elapsed > 0 else 0.0
+        return report
@@ -0,0 +1,63 @@
+import numpy as np
+from ingestion.vector_index import prepare_vectors, uses_cosine
+
+# Upper bound on the query-block x catalog score matrix held at once (float32 elements)
+BLOCK_ELEMENTS = 1 << 24
+
+
+def top_k_neighbors(vectors: np.ndarray, k: int, cosine: bool = False,
+                    block_rows: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exact k nearest neighbours of every row among all other rows.
+
+    Rows are processed in blocks: each block is one (block x n) matrix multiplication
+    against the full matrix, followed by an argpartition for its top k, so peak memory
+    is bounded by BLOCK_ELEMENTS rather than n^2. Scores follow the index metric:
+    squared L2 distances (ascending) or cosine similarities (descending).
+
+    Returns (neighbors int32 [n, k], scores float32 [n, k]), with k capped at n - 1.
+    """
+    vectors = prepare_vectors(vectors, cosine)
+    n = len(vectors)
+    k = max(0, min(k, n - 1))
+    neighbors = np.zeros((n, k), dtype=np.int32)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+
+    block_rows = block_rows or max(1, min(n, BLOCK_ELEMENTS // n))
+    sq_norms = None if cosine else np.einsum("ij,ij->i", vectors, vectors)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        block = vectors[start:stop] @ vectors.T
+        if cosine:
+            # Negate so that "smaller is closer" for both metrics below
+            np.negative(block, out=block)
+        else:
+            block *= -2
+            block += sq_norms[start:stop, None]
+            block += sq_norms[None, :]
+            np.maximum(block, 0, out=block)
+        rows = np.arange(stop - start)
+        block[rows, rows + start] = np.inf  # a recipe is not its own neighbour
+
+        top = np.argpartition(block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(top_scores, axis=1, kind="stable")
+        neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+
+    if cosine:
+        np.negative(scores, out=scores)
+    return neighbors, scores
+
+
+def build_neighbor_graph(index, k: int) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Neighbour graph over every vector stored in a finished FAISS index, scored with
+    the index's own metric. Returns None when k is 0 (disabled) or the index is empty.
+    """
+    if k <= 0 or index is None or index.ntotal == 0:
+        return None
+    vectors = index.reconstruct_n(0, index.ntotal)
+    return top_k_neighbors(vectors, k, cosine=uses_cosine(index))
@@ -0,0 +1,124 @@
+import re
+from utils.embeddings import parse_ingredient_name, create_recipe_text_for_embedding
+from utils.logger import logger
+
+
+def clean_ingredients(ingredients_list):
+    """
+    Cleans a list of ingredients for better embedding generation.
+    This can be a simpler cleaning than parse_ingredient_name if you just want to remove symbols.
+    For more robust cleaning of the actual *names* for the embedding text,
+    you might apply parse_ingredient_name to each item and then join.
+    But for simple text cleanup for embedding, this is usually sufficient.
+    """
+    cleaned = []
+    for ingredient in ingredients_list:
+        if isinstance(ingredient, str):
+            cleaned_ingredient = ingredient.strip().lower()
+            cleaned_ingredient = re.sub(r'\s+', ' ', cleaned_ingredient)
+            cleaned_ingredient = re.sub(r'[^a-z0-9\s]', '', cleaned_ingredient) # Remove non-alphanumeric except spaces
+            if cleaned_ingredient:
+                cleaned.append(cleaned_ingredient)
+    return cleaned
+
+
+_HOURS_REGEX = re.compile(r"(\d+)\s*hrs?\b")
+_MINUTES_REGEX = re.compile(r"(\d+)\s*mins?\b")
+
+
+def parse_minutes(text) -> float | None:
+    """
+    Converts a BBC Good Food style duration ("15 mins", "1 hr and 30 mins", "No Time")
+    into minutes. Ranges such as "10 mins - 15 mins" use the upper bound.
+    Returns None when the value cannot be interpreted.
+    """
+    if isinstance(text, (int, float)):
+        return float(text)
+    if not isinstance(text, str) or not text.strip():
+        return None
+    if text.strip().lower() == "no time":
+        return 0.0
+    best = None
+    for part in text.lower().split("-"):
+        hours = _HOURS_REGEX.findall(part)
+        minutes = _MINUTES_REGEX.findall(part)
+        if hours or minutes:
+            total = sum(int(h) for h in hours) * 60.0 + sum(int(m) for m in minutes)
+            best = total if best is None else max(best, total)
+    return best
+
+
+def build_cleaned_ingredients_list(recipe_id: str, original_ingredients_list: list) -> list[str]:
+    """
+    Builds cleaned_ingredients_list with phrase- and token-level keys, preserving order.
+    """
+    seen = {}  # ordered dict by insertion order
+    for raw in original_ingredients_list:
+        if not isinstance(raw, str):
+            logger.warning("Ingredient item in recipe %s is not a string: %s", recipe_id, raw)
+            continue
+
+        cleaned = parse_ingredient_name(raw)
+        if not cleaned:
+            continue
+
+        # Keep the full cleaned phrase
+        seen[cleaned] = None
+        # Also split into individual tokens
+        for tok in cleaned.split():
+            seen[tok] = None
+
+    # Assign back as list in original-discovered order (deduped)
+    return list(seen)
+
+
+def build_db_record(recipe: dict) -> dict:
+    """
+    Maps a raw (normalized) recipe onto the columns of the Supabase 'recipes' table.
+    """
+    return {
+        "id": recipe['id'],
+        "url": recipe.get('url'),
+        "name": recipe.get('name'),
+        "author": recipe.get('author'),
+        "ratings": recipe.get('rattings'),
+        "description": recipe.get('description'),
+        "ingredients": recipe.get('ingredients'),
+        "steps": recipe.get('steps'),
+        "nutrients": recipe.get('nutrients'),
+        "times": recipe.get('times'),
+        "serves": recipe.get('serves'),
+        "difficulty": recipe.get('difficult'),
+        "vote_count": recipe.get('vote_count'),
+        "subcategory": recipe.get('subcategory'),
+        "dish_type": recipe.get('dish_type'),
+        "maincategory": recipe.get('maincategory'),
+        # include our new column
+        "cleaned_ingredients_list": recipe.get('cleaned_ingredients_list')
+    }
+
+
+def build_catalog_record(recipe: dict) -> dict:
+    """
+    Record stored in the on-disk catalog snapshot: the DB row plus the source image,
+    so the API can serve complete recipe cards without a database round trip.
+    """
+    record = build_db_record(recipe)
+    record["image_url"] = recipe.get('image_url') or recipe.get('image')
+    return record
+
+
+def normalize_recipe(recipe: dict) -> dict | None:
+    """
+    Validates a raw recipe and attaches the derived fields ingestion needs.
+    Returns None for recipes missing an id or name.
+    """
+    if not isinstance(recipe, dict) or not recipe.get('id') or not recipe.get('name'):
+        return None
+
+    original_ingredients_list = recipe.get('ingredients', [])
+    recipe['cleaned_ingredients_list'] = build_cleaned_ingredients_list(recipe['id'], original_ingredients_list)
+    # Clean for embedding text (may differ from list used for search)
+    recipe['cleaned_ingredients'] = clean_ingredients(original_ingredients_list)
+    recipe['embedding_text'] = create_recipe_text_for_embedding(recipe)
+    return recipe
@@ -0,0 +1,260 @@
+import queue
+import tempfile
+import threading
+import time
+import numpy as np
+from utils.logger import logger
+from ingestion.vector_index import prepare_vectors, uses_cosine
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+# How often blocked queue operations wake up to check whether the pipeline was aborted
+_POLL_SECONDS = 0.1
+
+
+class PipelineError(RuntimeError):
+    """Raised when a stage fails; the original exception is chained as __cause__."""
+
+
+class Stage:
+    """
+    One step of an ingestion pipeline.
+
+    `fn` receives a single item (or a list of up to `batch_size` items when batching)
+    and returns the item(s) to pass downstream. Returning None drops the item.
+    `workers` > 1 runs the stage on several threads sharing the same input queue,
+    which is useful for network-bound steps like embedding; output order is then
+    not preserved.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, batch_size: int | None = None):
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+
+class Pipeline:
+    """
+    Runs a source iterable through a chain of stages on separate threads.
+
+    Stages are connected by bounded queues, so a slow stage (e.g. embedding)
+    applies backpressure all the way to the reader and memory stays
+    proportional to `queue_size`, not to the size of the input.
+    """
+
+    def __init__(self, source, stages: list[Stage], queue_size: int = 64):
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self._abort = threading.Event()
+        self._error = None
+        self._error_stage = None
+        self._error_lock = threading.Lock()
+
+    # --- queue helpers that give up once the pipeline is aborted ---
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage_name: str, exc: BaseException):
+        with self._error_lock:
+            if self._error is None:
+                self._error = exc
+                self._error_stage = stage_name
+        self._abort.set()
+
+    # --- thread bodies ---
+    def _produce(self, out_q: queue.Queue):
+        try:
+            for item in self.source:
+                if not self._put(out_q, item):
+                    return
+            self._put(out_q, _DONE)
+        except Exception as e:
+            logger.error("Pipeline source failed: %s", e, exc_info=True)
+            self._fail("source", e)
+
+    def _emit(self, stage: Stage, out_q: queue.Queue, result) -> bool:
+        if result is None:
+            return True
+        if stage.batch_size:
+            results = [r for r in result if r is not None]
+        else:
+            results = [result]
+        with stage._lock:
+            stage.items_out += len(results)
+        if out_q is None:
+            return True
+        for r in results:
+            if not self._put(out_q, r):
+                return False
+        return True
+
+    def _call(self, stage: Stage, payload, count: int):
+        started = time.perf_counter()
+        result = stage.fn(payload)
+        with stage._lock:
+            stage.items_in += count
+            stage.busy_seconds += time.perf_counter() - started
+        return result
+
+    def _work(self, stage: Stage, in_q: queue.Queue, out_q: queue.Queue | None, remaining: list):
+        batch = []
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    # Let sibling workers see the marker too
+                    in_q.put(_DONE)
+                    break
+                if stage.batch_size:
+                    batch.append(item)
+                    if len(batch) >= stage.batch_size:
+                        if not self._emit(stage, out_q, self._call(stage, batch, len(batch))):
+                            return
+                        batch = []
+                elif not self._emit(stage, out_q, self._call(stage, item, 1)):
+                    return
+            if batch and not self._abort.is_set():
+                self._emit(stage, out_q, self._call(stage, batch, len(batch)))
+        except Exception as e:
+            logger.error("Pipeline stage '%s' failed: %s", stage.name, e, exc_info=True)
+            self._fail(stage.name, e)
+            return
+        finally:
+            # The last worker of a stage to finish forwards end-of-stream downstream
+            with stage._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last and out_q is not None and not self._abort.is_set():
+                self._put(out_q, _DONE)
+
+    def run(self) -> dict:
+        """
+        Runs the pipeline to completion and returns per-stage stats.
+        Raises PipelineError if the source or any stage raised.
+        """
+        started = time.perf_counter()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._produce, args=(queues[0],), name="ingest-source", daemon=True)]
+
+        for i, stage in enumerate(self.stages):
+            out_q = queues[i + 1] if i + 1 < len(queues) else None
+            remaining = [stage.workers]
+            for w in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[i], out_q, remaining),
+                    name=f"ingest-{stage.name}-{w}",
+                    daemon=True,
+                ))
+
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._error is not None:
+            raise PipelineError(f"Ingestion stage '{self._error_stage}' failed: {self._error}") from self._error
+
+        stats = {stage.name: stage.stats() for stage in self.stages}
+        stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+
+class IndexAppender:
+    """
+    Pipeline stage that appends embedded recipes to a FAISS index in batches,
+    keeping the FAISS row -> recipe id map aligned with the index.
+
+    Vectors are L2-normalized first when the index scores by inner product (cosine).
+    Indexes that need training (PCA, int8 scalar quantization) can't take vectors
+    until they've seen the data, so those are spilled to a temporary file while a
+    reservoir of at most `train_size` vectors is sampled uniformly from the whole
+    stream (the dumps arrive grouped by category, so a prefix would be skewed).
+    finish(), which must be called once the pipeline has drained, trains on the
+    sample and adds the spilled vectors in row order, `add_chunk` rows at a time.
+    """
+
+    def __init__(self, index_factory, train_size: int = 20000, add_chunk: int = 4096, seed: int = 0):
+        self.index_factory = index_factory
+        self.train_size = train_size
+        self.add_chunk = add_chunk
+        self.index = None
+        self.id_map = []
+        self._cosine = False
+        self._spill = None
+        self._sample = None
+        self._seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def __call__(self, batch: list[dict]) -> list[dict]:
+        vectors = np.asarray([recipe['embedding'] for recipe in batch], dtype="float32")
+        if self.index is None:
+            self.index = self.index_factory(vectors.shape[1])
+            self._cosine = uses_cosine(self.index)
+            if not self.index.is_trained:
+                self._spill = tempfile.TemporaryFile(prefix="index-vectors-")
+                self._sample = np.empty((self.train_size, vectors.shape[1]), dtype="float32")
+        vectors = prepare_vectors(vectors, self._cosine)
+        if self._spill is not None:
+            self._spill.write(np.ascontiguousarray(vectors).tobytes())
+            self._reservoir(vectors)
+        else:
+            self.index.add(vectors)
+        for recipe in batch:
+            self.id_map.append(recipe['id'])
+            # The vector lives in the index now; don't carry it further downstream
+            recipe.pop('embedding', None)
+        return batch
+
+    def _reservoir(self, vectors: np.ndarray):
+        for vector in vectors:
+            slot = self._seen if self._seen < self.train_size else int(self._rng.integers(0, self._seen + 1))
+            if slot < self.train_size:
+                self._sample[slot] = vector
+            self._seen += 1
+
+    def finish(self):
+        """Trains the index on the sample (if it needed training) and adds the spilled vectors."""
+        if self._spill is not None:
+            spill, self._spill = self._spill, None
+            sample, self._sample = self._sample, None
+            dim = sample.shape[1]
+            with spill:
+                self.index.train(sample[:min(self._seen, self.train_size)])
+                del sample
+                spill.seek(0)
+                while True:
+                    chunk = np.fromfile(spill, dtype="float32", count=self.add_chunk * dim)
+                    if not chunk.size:
+                        break
+                    self.index.add(chunk.reshape(-1, dim))
+        return self.index
@@ -0,0 +1,127 @@
+import json
+import os
+from utils.logger import logger
+
+# The five category crawls we ship in data/. Third-party dumps can be passed explicitly.
+RECIPE_FILES = ["recipes.json", "inspiration.json", "baking.json", "health.json", "budget.json"]
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _CharStream:
+    """
+    Minimal buffered character reader over a text file so we can hand
+    complete JSON values to `raw_decode` without ever holding the whole file.
+    """
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed prefix so the buffer only ever holds the current value
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}, found '{self.peek() or 'EOF'}'")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value, reading more chunks until it parses."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may still be incomplete
+            if end == len(self.buf) and not self.eof and isinstance(obj, (int, float)):
+                if self._fill():
+                    continue
+            self.pos = end
+            return obj
+
+
+def _iter_array(stream: _CharStream):
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        sep = stream.peek()
+        stream.pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError(f"Expected ',' or ']' between array items, found '{sep or 'EOF'}'")
+
+
+def iter_json_array(filepath: str, key: str = "recipes", chunk_size: int = 64 * 1024):
+    """
+    Incrementally yields the items of a JSON array stored in `filepath`.
+
+    Accepts either a top-level list or an object whose `key` holds the list
+    (the two shapes our recipe dumps come in). Only one item is decoded and
+    held in memory at a time.
+    """
+    with open(filepath, "r", encoding="utf-8") as f:
+        stream = _CharStream(f, chunk_size)
+        first = stream.peek()
+        if first == "[":
+            yield from _iter_array(stream)
+            return
+        if first != "{":
+            raise ValueError(f"{filepath}: expected a JSON array or object, found '{first or 'EOF'}'")
+
+        stream.expect("{")
+        while stream.peek() not in ("}", ""):
+            name = stream.value()
+            stream.expect(":")
+            if name == key and stream.peek() == "[":
+                yield from _iter_array(stream)
+            else:
+                stream.value()  # skip unrelated members
+            if stream.peek() == ",":
+                stream.pos += 1
+
+
+def iter_recipe_files(data_dir: str, filenames: list[str] | None = None):
+    """
+    Streams recipes from every file in `filenames` (defaults to RECIPE_FILES), one at a time.
+    """
+    for filename in filenames or RECIPE_FILES:
+        filepath = filename if os.path.isabs(filename) else os.path.join(data_dir, filename)
+        if not os.path.exists(filepath):
+            logger.warning("File not found: %s. Skipping.", filepath)
+            continue
+        count = 0
+        for recipe in iter_json_array(filepath):
+            count += 1
+            yield recipe
+        logger.info("Streamed %s recipes from %s.", count, filename)
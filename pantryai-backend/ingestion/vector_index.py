@@ -0,0 +1,54 @@
+import numpy as np
+
+# Config.INDEX_STORAGE -> FAISS factory component for the stored codes
+STORAGE_CODES = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+METRICS = ("l2", "cosine")
+
+
+def index_spec(dim: int, storage: str = "float32", pca_dim: int = 0, cosine: bool = False) -> str:
+    """
+    FAISS index_factory string: optional PCA{pca_dim} projection, then the storage codec.
+    PCA centers the data, so cosine indexes re-normalize the projected vectors.
+    """
+    if storage not in STORAGE_CODES:
+        raise ValueError(f"Unknown index storage '{storage}' (expected one of {', '.join(STORAGE_CODES)}).")
+    parts = []
+    if pca_dim and pca_dim < dim:
+        parts.append(f"PCA{pca_dim}")
+        if cosine:
+            parts.append("L2norm")
+    parts.append(STORAGE_CODES[storage])
+    return ",".join(parts)
+
+
+def create_index(dim: int, metric: str = "l2", storage: str = "float32", pca_dim: int = 0):
+    """
+    Builds an empty FAISS index. "cosine" uses inner-product search; vectors must then
+    be L2-normalized on the way in (see prepare_vectors) so scores are cosines in [-1, 1].
+    """
+    import faiss
+    if metric not in METRICS:
+        raise ValueError(f"Unknown index metric '{metric}' (expected one of {', '.join(METRICS)}).")
+    faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "cosine" else faiss.METRIC_L2
+    return faiss.index_factory(dim, index_spec(dim, storage, pca_dim, metric == "cosine"), faiss_metric)
+
+
+def uses_cosine(index) -> bool:
+    import faiss
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def prepare_vectors(vectors, cosine: bool) -> np.ndarray:
+    """float32 copy of `vectors`, row-normalized when the index scores by cosine."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    if cosine:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+    return vectors
+
+
+def index_nbytes(index) -> int:
+    """Serialized size of the index, i.e. what it costs on disk and (roughly) in RAM."""
+    import faiss
+    return int(faiss.serialize_index(index).size)
@@ -0,0 +1,201 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from config import Config
+from utils.lazy import LazyResource
+from utils.metrics import timed
+from utils.profiling import working_for_request
+
+
+class PipelineError(Exception):
+    """A /recipes/match stage was abandoned before it finished."""
+
+
+class StageTimeout(PipelineError):
+    """A stage ran past its own timeout or the request's remaining budget."""
+
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(f"{stage} did not finish within {seconds:.2f}s")
+        self.stage = stage
+
+
+class RequestCancelled(PipelineError):
+    """The request was cancelled (timed out or finished) while work was still queued."""
+
+
+def _create_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=Config.MATCH_EXECUTOR_THREADS, thread_name_prefix="match-stage")
+
+
+# Shared by every request in the worker process; stages are I/O bound (Supabase, Gemini)
+stage_executor = LazyResource("match stage executor", _create_executor)
+
+
+class MatchPipeline:
+    """
+    Runs the independent stages of one /recipes/match request on the shared stage
+    executor so they overlap, e.g. loading the index while the pantry is fetched, or
+    hydrating recipe rows in parallel chunks.
+
+    Each wait() is bounded by that stage's timeout (STAGE_TIMEOUTS) and by what is left
+    of the request's `budget` seconds. When a stage times out, or the pipeline is
+    closed (the request is done, successfully or not), the request is cancelled: its
+    queued stages never start, and running ones see `cancelled` and stop at their next
+    checkpoint. Stages run with a copy of the request's context, so their timed()
+    stages still show up in the response's Server-Timing header.
+
+    Tasks submitted here must not wait on other tasks of the same executor (that can
+    deadlock a busy pool); only the request thread waits.
+    """
+
+    STAGE_TIMEOUTS = {
+        "pantry_fetch": Config.MATCH_PANTRY_TIMEOUT_SECONDS,
+        "embed": Config.MATCH_EMBED_TIMEOUT_SECONDS,
+        "prepare": Config.MATCH_PREPARE_TIMEOUT_SECONDS,
+        "prefetch": Config.MATCH_HYDRATE_TIMEOUT_SECONDS,
+        "hydrate_fetch": Config.MATCH_HYDRATE_TIMEOUT_SECONDS,
+    }
+
+    def __init__(self, budget: float, executor: ThreadPoolExecutor | None = None):
+        self.deadline = time.monotonic() + budget
+        self.cancelled = threading.Event()
+        self._executor = executor or stage_executor.get()
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cancel()
+        return False
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raises RequestCancelled once the request is cancelled; stages call it between steps."""
+        if self.cancelled.is_set():
+            raise RequestCancelled("Request was cancelled")
+
+    def _run(self, fn, args):
+        self.check()
+        # Lets a profiled request's sampler see the stage running on this pool thread
+        with working_for_request():
+            return fn(*args)
+
+    def submit(self, fn, *args) -> Future:
+        """Runs fn(*args) on the executor; skipped if the request is cancelled before it starts."""
+        self.check()
+        future = self._executor.submit(contextvars.copy_context().run, self._run, fn, args)
+        self._futures.append(future)
+        return future
+
+    def wait(self, stage: str, future: Future):
+        """The result of `future`, timed as `stage`; raises StageTimeout (and cancels) past the limit."""
+        limit = min(self.STAGE_TIMEOUTS.get(stage, float("inf")), self.remaining())
+        with timed(stage):
+            try:
+                return future.result(timeout=limit)
+            except FuturesTimeout:
+                self.cancel()
+                raise StageTimeout(stage, limit) from None
+            except CancelledError:
+                raise RequestCancelled("Request was cancelled") from None
+
+    def wait_optional(self, stage: str, future: Future, default=None):
+        """
+        Like wait(), for speculative stages the request can do without: past the limit
+        it gives up on `future` alone and returns `default`, leaving the request and
+        its other stages running.
+        """
+        limit = min(self.STAGE_TIMEOUTS.get(stage, float("inf")), self.remaining())
+        with timed(stage):
+            try:
+                return future.result(timeout=limit)
+            except FuturesTimeout:
+                future.cancel()
+                return default
+
+    def map_chunks(self, stage: str, fetch, items: list, chunk_size: int) -> list:
+        """
+        fetch(chunk) for `items` split into chunks of `chunk_size`, run in parallel (the
+        first one on the calling thread); returns the concatenated results in order.
+        """
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), max(1, chunk_size))]
+        if not chunks:
+            return []
+        futures = [self.submit(fetch, chunk) for chunk in chunks[1:]]
+        results = list(fetch(chunks[0]))
+        for future in futures:
+            results.extend(self.wait(stage, future))
+        return results
+
+    def cancel(self):
+        self.cancelled.set()
+        for future in self._futures:
+            future.cancel()  # no-op for running or finished ones
+
+
+class EmbeddingCache:
+    """
+    Pantry text -> embedding for up to `max_entries` texts, each kept for `ttl`
+    seconds, so a pantry that hasn't changed since the last match skips the Gemini
+    round trip. Lookups are single-flight: concurrent requests for the same text
+    share one in-flight embedding call. Failed or empty embeddings aren't kept.
+
+    Each entry also remembers the recipe ids the last match for that text returned
+    (see likely_ids), which the route prefetches while the new match runs.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # text -> (expires_at, future)
+        self._likely = OrderedDict()   # (text, params) -> recipe ids
+        self._lock = threading.Lock()
+
+    def get(self, text: str, embed, executor: ThreadPoolExecutor) -> Future:
+        """A future of embed(text), shared with any cached or in-flight call for the same text."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(text)
+                return entry[1]
+            # Not tied to any one request, so a cancelled request can't cancel it for the others
+            future = executor.submit(embed, text)
+            self._entries[text] = (now + self.ttl, future)
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        future.add_done_callback(lambda done: self._forget_failed(text, done))
+        return future
+
+    def _forget_failed(self, text: str, future: Future):
+        if future.cancelled() or future.exception() is not None or not future.result():
+            with self._lock:
+                entry = self._entries.get(text)
+                if entry and entry[1] is future:
+                    del self._entries[text]
+
+    def likely_ids(self, text: str, params) -> list[str] | None:
+        with self._lock:
+            return self._likely.get((text, params))
+
+    def remember_ids(self, text: str, params, recipe_ids: list[str]):
+        with self._lock:
+            self._likely[(text, params)] = recipe_ids
+            self._likely.move_to_end((text, params))
+            while len(self._likely) > self.max_entries:
+                self._likely.popitem(last=False)
+
+
+embedding_cache = LazyResource(
+    "pantry embedding cache",
+    lambda: EmbeddingCache(Config.MATCH_EMBED_CACHE_SIZE, Config.MATCH_EMBED_CACHE_TTL_SECONDS))
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    return embedding_cache.get()
@@ -0,0 +1,206 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
+from config import Config
+from utils.lazy import LazyResource
+
+# Deskew search: angles tried (degrees) on a copy this many pixels wide
+SKEW_MAX_ANGLE = 5.0
+SKEW_STEP = 0.5
+SKEW_SAMPLE_WIDTH = 600
+# Adaptive binarization: ink is anything darker than its neighbourhood mean by OFFSET
+BINARIZE_RADIUS = 15
+BINARIZE_OFFSET = 12
+# --psm 4: a single column of text of variable sizes, which is what a receipt is
+TESSERACT_CONFIG = "--oem 1 --psm 4"
+
+
+class OcrError(Exception):
+    """Tesseract failed on an image."""
+
+
+class OcrImageError(OcrError):
+    """The upload is not an image Pillow can read."""
+
+
+class OcrTimeout(OcrError):
+    """An image took longer than the per-image timeout."""
+
+
+class OcrBusy(OcrError):
+    """Every worker slot and queue slot is taken."""
+
+
+def estimate_skew(gray: Image.Image) -> float:
+    """
+    Rotation (degrees, counter-clockwise) that straightens the text lines: the angle
+    whose row-ink profile is most sharply peaked, since level lines put all their ink
+    in a few rows and the gaps between them in none. Ink pixel coordinates are
+    projected analytically for each candidate angle instead of rotating the image.
+    """
+    sample = gray.copy()
+    sample.thumbnail((SKEW_SAMPLE_WIDTH, SKEW_SAMPLE_WIDTH * 4))
+    ys, xs = np.nonzero(np.asarray(binarize(sample)) == 0)
+    if len(ys) == 0:
+        return 0.0
+    # Integer centre: half-pixel offsets would make rint() merge row pairs at angle 0
+    xs = xs.astype(np.float32) - sample.width // 2
+    ys = ys.astype(np.float32) - sample.height // 2
+    angles = np.arange(-SKEW_MAX_ANGLE, SKEW_MAX_ANGLE + SKEW_STEP / 2, SKEW_STEP)
+    best_angle, best_score = 0.0, -1.0
+    # Smallest corrections first, so a (near) tie keeps the gentler rotation
+    for angle in sorted(angles.tolist(), key=abs):
+        theta = np.deg2rad(angle)
+        # Row of each ink pixel once the image is rotated by `angle` (as Image.rotate does)
+        rows = np.rint(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+        profile = np.bincount(rows - rows.min()).astype(np.float64)
+        score = float(np.dot(profile, profile))
+        if score > best_score * 1.001:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def binarize(gray: Image.Image) -> Image.Image:
+    """
+    Black text on white via a local (box-mean) threshold, which copes with the uneven
+    lighting and shadows of phone photos far better than one global threshold.
+    """
+    pixels = np.asarray(gray, dtype=np.int16)
+    local_mean = np.asarray(gray.filter(ImageFilter.BoxBlur(BINARIZE_RADIUS)), dtype=np.int16)
+    ink = pixels < local_mean - BINARIZE_OFFSET
+    return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8), mode="L")
+
+
+def preprocess(data: bytes, max_side: int = 2000) -> Image.Image:
+    """
+    Receipt photo -> clean page for Tesseract: upright (EXIF), grayscale, long side at
+    most `max_side` pixels, contrast-stretched, deskewed and binarized.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        # JPEGs decode straight to grayscale at a reduced scale when they're far too big
+        img.draft("L", (max_side // 2, max_side // 2))
+        img = ImageOps.exif_transpose(img).convert("L")
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise OcrImageError(f"Unreadable image: {exc}") from exc
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+    img = ImageOps.autocontrast(img, cutoff=1)
+    angle = estimate_skew(img)
+    if angle:
+        img = img.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    return binarize(img)
+
+
+def image_to_text(data: bytes, timeout: float = 20.0, max_side: int = 2000, lang: str = "eng") -> str:
+    """Preprocesses one image and runs Tesseract on it. Runs inside an OcrPool worker."""
+    import pytesseract
+    page = preprocess(data, max_side)
+    try:
+        return pytesseract.image_to_string(page, lang=lang, config=TESSERACT_CONFIG, timeout=timeout)
+    except RuntimeError as exc:
+        # pytesseract kills the tesseract process and raises RuntimeError on timeout
+        if "timeout" in str(exc).lower():
+            raise OcrTimeout(f"OCR took longer than {timeout:g}s") from exc
+        raise OcrError(str(exc)) from exc
+    except pytesseract.TesseractError as exc:
+        raise OcrError(str(exc)) from exc
+
+
+def _init_worker():
+    # Tesseract's OpenMP threads would oversubscribe the CPUs the pool already fills
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+class OcrPool:
+    """
+    Runs `fn` (image bytes -> text) in a pool of `workers` processes, so CPU-heavy
+    preprocessing and Tesseract never hold up the web worker's threads or its GIL.
+
+    At most `workers` images are processed at once and `max_pending` more may wait;
+    past that recognize() raises OcrBusy straight away rather than queueing without
+    bound. Each image is limited to `timeout` seconds inside the worker (Tesseract
+    is killed), and a request gives up after `wait_seconds` in total. Workers are
+    started with "spawn" so they never inherit the web process's threads or locks.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, timeout: float = 20.0,
+                 wait_seconds: float = 45.0, fn=image_to_text, **fn_kwargs):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.wait_seconds = wait_seconds
+        self.fn = fn
+        self.fn_kwargs = fn_kwargs
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, max_pending))
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker)
+
+    def _submit(self, data: bytes):
+        with self._lock:
+            try:
+                return self._executor.submit(self.fn, data, timeout=self.timeout, **self.fn_kwargs)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._new_executor()
+                return self._executor.submit(self.fn, data, timeout=self.timeout, **self.fn_kwargs)
+
+    def recognize(self, images: list[bytes]) -> list[str]:
+        """Text of each image, in order. All images of one call run in parallel."""
+        taken = 0
+        for _ in images:
+            if not self._slots.acquire(blocking=False):
+                for _ in range(taken):
+                    self._slots.release()
+                raise OcrBusy("OCR is at capacity")
+            taken += 1
+
+        futures = []
+        try:
+            for data in images:
+                future = self._submit(data)
+                future.add_done_callback(lambda _: self._slots.release())
+                futures.append(future)
+        except Exception:
+            for _ in range(taken - len(futures)):
+                self._slots.release()
+            for future in futures:
+                future.cancel()
+            raise
+
+        deadline = time.monotonic() + self.wait_seconds
+        try:
+            return [future.result(timeout=max(0.0, deadline - time.monotonic())) for future in futures]
+        except FuturesTimeout:
+            raise OcrTimeout(f"OCR did not finish within {self.wait_seconds:g}s") from None
+        except BrokenProcessPool as exc:
+            raise OcrError("OCR worker crashed") from exc
+        finally:
+            for future in futures:
+                future.cancel()  # no-op for finished ones; frees queued work after a failure
+
+    def close(self):
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _create_pool() -> OcrPool:
+    return OcrPool(Config.OCR_WORKERS, Config.OCR_MAX_PENDING, Config.OCR_TIMEOUT_SECONDS,
+                   Config.OCR_WAIT_SECONDS, max_side=Config.OCR_MAX_SIDE, lang=Config.OCR_LANG)
+
+
+ocr_pool = LazyResource("OCR process pool", _create_pool)
+
+
+def get_ocr_pool() -> OcrPool:
+    return ocr_pool.get()
@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import OrderedDict
+from repositories.base import normalize_name
+
+# Searchable item fields and how much a match in each counts
+SEARCH_FIELDS = (("name", 1.0), ("brand", 0.6), ("category", 0.4))
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+SUBSTRING_SCORE = 0.7
+FUZZY_SCORE = 0.8  # scaled down by the share of the token that had to be edited
+# Fuzzy matching against the typed prefix only kicks in once a few letters are in
+MIN_FUZZY_PREFIX = 5
+
+
+def trigrams(token: str) -> set[str]:
+    """pg_trgm-style trigrams; the two leading pads make every prefix share trigrams with the token."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(token: str) -> int:
+    """Typos tolerated for a query token: none for very short ones, where anything would match."""
+    return 0 if len(token) <= 3 else 1 if len(token) <= 7 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions),
+    giving up with limit + 1 as soon as it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        best = i
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            best = min(best, value)
+        if best > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def token_score(query_token: str, token: str, shared: int, query_grams: int) -> float:
+    """
+    How well `token` matches `query_token`; `shared` is how many of the query's
+    `query_grams` trigrams the token has. Tokens with too few shared trigrams can't
+    be within the edit limit (the q-gram lemma), so they skip the edit distance.
+    """
+    if token == query_token:
+        return EXACT_SCORE
+    if token.startswith(query_token):
+        return PREFIX_SCORE
+    if len(query_token) >= 3 and query_token in token:
+        return SUBSTRING_SCORE
+    limit = max_edits(query_token)
+    if not limit or shared < query_grams - 3 * limit:
+        return 0.0
+    # Compare against the whole token ("tomatos" -> "tomatoes") and against the
+    # prefix the user has typed so far ("chedde" while typing "chedder" -> "cheddar")
+    distance = edit_distance(query_token, token, limit)
+    if distance and len(query_token) >= MIN_FUZZY_PREFIX:
+        distance = min(distance, edit_distance(query_token, token[:len(query_token)], limit))
+    if distance > limit:
+        return 0.0
+    return FUZZY_SCORE * (1 - distance / len(query_token))
+
+
+class DeviceSearchIndex:
+    """
+    Trigram index over the distinct words of one device's pantry items.
+
+    A query word is scored only against vocabulary words sharing a trigram with it
+    (exact > prefix > substring > edit distance), once per distinct word rather than
+    once per item, and items then inherit the best score of their words weighted by
+    field. Every query word has to match for an item to be returned.
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.item_tokens = {}  # item id -> {token: best field weight}
+        self.token_items = {}  # token -> {item id: field weight}
+        self.postings = {}     # trigram -> {tokens}
+        self.revision = 0
+        self.synced_at = 0.0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def upsert(self, item: dict):
+        item_id = str(item["id"])
+        self.remove(item_id)
+        tokens = {}
+        for field, weight in SEARCH_FIELDS:
+            for token in normalize_name(item.get(field)).split():
+                tokens[token] = max(weight, tokens.get(token, 0.0))
+        for token, weight in tokens.items():
+            holders = self.token_items.get(token)
+            if holders is None:
+                holders = self.token_items[token] = {}
+                for gram in trigrams(token):
+                    self.postings.setdefault(gram, set()).add(token)
+            holders[item_id] = weight
+        self.items[item_id] = item
+        self.item_tokens[item_id] = tokens
+
+    def remove(self, item_id: str):
+        item_id = str(item_id)
+        self.items.pop(item_id, None)
+        for token in self.item_tokens.pop(item_id, ()):
+            holders = self.token_items[token]
+            del holders[item_id]
+            if holders:
+                continue
+            # Last item using this word: drop it from the vocabulary
+            del self.token_items[token]
+            for gram in trigrams(token):
+                tokens = self.postings[gram]
+                tokens.discard(token)
+                if not tokens:
+                    del self.postings[gram]
+
+    def _match(self, query_token: str) -> dict[str, float]:
+        """{item id: best weighted score} for one query word."""
+        grams = trigrams(query_token)
+        shared = {}
+        for gram in grams:
+            for token in self.postings.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        matched = {}
+        for token, count in shared.items():
+            score = token_score(query_token, token, count, len(grams))
+            if score:
+                for item_id, weight in self.token_items[token].items():
+                    if score * weight > matched.get(item_id, 0.0):
+                        matched[item_id] = score * weight
+        return matched
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        query_norm = normalize_name(query)
+        query_tokens = list(dict.fromkeys(query_norm.split()))
+        if not query_tokens:
+            return []
+
+        totals = None
+        for query_token in query_tokens:
+            matched = self._match(query_token)
+            if totals is None:
+                totals = matched
+            else:
+                totals = {item_id: total + matched[item_id] for item_id, total in totals.items() if item_id in matched}
+            if not totals:
+                return []
+
+        scored = []
+        for item_id, total in totals.items():
+            item = self.items[item_id]
+            name = str(item.get("name") or "")
+            score = total / len(query_tokens)
+            # Multi-word queries typed exactly as in the name rank with exact matches
+            if len(query_tokens) > 1 and query_norm in normalize_name(name):
+                score = max(score, EXACT_SCORE)
+            scored.append((-score, name, item_id))
+        scored.sort()
+        return [self.items[item_id] for _, _, item_id in scored[:limit]]
+
+
+class PantrySearchIndexes:
+    """
+    Per-device DeviceSearchIndex cache (LRU, at most `max_devices`).
+
+    A device's index is built from the repository on first search, patched
+    directly by this worker's own writes, and caught up with writes made
+    elsewhere (other workers, other clients) through a changes_since() delta at
+    most every `refresh_seconds`, so type-ahead keystrokes in between never reach
+    the database.
+    """
+
+    def __init__(self, repository, refresh_seconds: float = 10.0, max_devices: int = 1000):
+        self.repository = repository
+        self.refresh_seconds = refresh_seconds
+        self.max_devices = max_devices
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, device_id: str) -> DeviceSearchIndex:
+        with self._lock:
+            index = self._indexes.get(device_id)
+            if index is None:
+                index = self._indexes[device_id] = DeviceSearchIndex()
+                while len(self._indexes) > self.max_devices:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(device_id)
+            return index
+
+    def get(self, device_id: str) -> DeviceSearchIndex:
+        index = self._entry(device_id)
+        with index.lock:
+            if not index.synced_at or time.monotonic() - index.synced_at >= self.refresh_seconds:
+                since = index.revision if index.synced_at else 0
+                changes = self.repository.changes_since(device_id, since)
+                if since <= 0 or changes["reset"]:
+                    # A full snapshot: anything not in it is gone
+                    for item_id in list(index.items):
+                        index.remove(item_id)
+                for item_id in changes["deleted"]:
+                    index.remove(item_id)
+                for item in changes["upserts"]:
+                    index.upsert(item)
+                index.revision = changes["revision"]
+                index.synced_at = time.monotonic()
+        return index
+
+    def _existing(self, device_id: str) -> DeviceSearchIndex | None:
+        with self._lock:
+            return self._indexes.get(device_id)
+
+    def written(self, rows: list[dict]):
+        """Applies rows this worker just inserted or updated to any loaded index."""
+        for row in rows:
+            index = self._existing(row.get("device_id"))
+            if index is not None and index.synced_at:
+                with index.lock:
+                    index.upsert(row)
+
+    def deleted(self, device_id: str, item_ids: list[str]):
+        index = self._existing(device_id)
+        if index is not None and index.synced_at:
+            with index.lock:
+                for item_id in item_ids:
+                    index.remove(item_id)
+
+    def search(self, device_id: str, query: str, limit: int = 20) -> list[dict]:
+        index = self.get(device_id)
+        with index.lock:
+            return index.search(query, limit)
@@ -1,13 +1,21 @@
 import re
 import json
-import google.generativeai as genai
-from google.generativeai import GenerativeModel
-from config import Config
 from utils.logger import logger
+from utils.lazy import LazyResource
+from config import Config
+from utils.circuit import CircuitBreaker
+from utils.embeddings import get_genai
+
+
+def _create_google_model():
+    # Reuses the per-process genai configuration from utils.embeddings
+    return get_genai().GenerativeModel(model_name="gemini-2.0-flash")
+
 
-# Configure LLM API
-genai.configure(api_key=Config.GOOGLE_API_KEY)
-google_model = GenerativeModel(model_name="gemini-2.0-flash")
+google_model = LazyResource("Gemini generative model", _create_google_model)
+# Receipt parsing fails fast (and /scan falls back to parse_items) while Gemini is failing
+generation_breaker = CircuitBreaker("gemini_generate", Config.GEMINI_BREAKER_FAILURES,
+                                    Config.GEMINI_BREAKER_RESET_SECONDS)
 
 def parse_items(raw_text: str) -> list[dict]:
     """
@@ -36,7 +44,7 @@ def parse_items(raw_text: str) -> list[dict]:
 import json
 from datetime import datetime, timedelta
 from utils.logger import logger
-# Assuming google_model is already imported and configured
+# google_model is created (and genai configured) lazily on first use
 
 def parse_receipt_google(raw_text: str) -> list[dict]:
     """
@@ -105,12 +113,14 @@ def parse_receipt_google(raw_text: str) -> list[dict]:
         # Use a more descriptive model if available (e.g., gemini-1.5-pro-latest)
         # and consider a lower temperature for more deterministic JSON output.
         # Ensure 'google_model' is configured to use a model that supports structured output well.
-        resp = google_model.generate_content(
+        resp = generation_breaker.call(
+            google_model.get().generate_content,
             prompt,
             generation_config={
                 "response_mime_type": "application/json",
                 "temperature": 0.2, # Lower temperature for more precise JSON
-            }
+            },
+            request_options={"timeout": Config.GEMINI_GENERATE_TIMEOUT_SECONDS},
         )
 
         # It's good practice to validate the JSON even if response_mime_type is set,
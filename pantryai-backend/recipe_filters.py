@@ -0,0 +1,92 @@
+import math
+import numpy as np
+from recipes import RecipeIndex, register_cache_warmer
+
+# Exact-match (case-insensitive) attributes accepted by filtered matching
+FILTER_ATTRIBUTES = ("maincategory", "subcategory", "dish_type", "difficulty")
+# Upper-bound filters, mapped to the snapshot's parsed numeric columns
+MAX_MINUTES_FILTERS = {"max_minutes": "total_minutes", "max_cook_minutes": "cook_minutes", "max_prep_minutes": "prep_minutes"}
+
+
+class AttributeBitmaps:
+    """
+    Per-attribute row masks over the FAISS rows of one index generation: for every
+    value of every FILTER_ATTRIBUTES field, a boolean array of the recipes having it.
+    Numeric upper bounds are evaluated against the snapshot's mmapped columns.
+    """
+
+    def __init__(self, catalog):
+        self.n = len(catalog)
+        self.columns = catalog.columns
+        self.values = {attr: {} for attr in FILTER_ATTRIBUTES}
+        for row in range(self.n):
+            record = catalog.record(row)
+            for attr in FILTER_ATTRIBUTES:
+                value = record.get(attr)
+                if value is None:
+                    continue
+                key = str(value).strip().lower()
+                rows = self.values[attr].get(key)
+                if rows is None:
+                    rows = self.values[attr][key] = np.zeros(self.n, dtype=bool)
+                rows[row] = True
+
+    def mask(self, filters: dict) -> np.ndarray | None:
+        """
+        Rows satisfying every filter, or None when `filters` is empty.
+        Raises ValueError for unknown filter names or non-numeric time bounds.
+        """
+        result = None
+        for name, wanted in filters.items():
+            if wanted is None or wanted == "":
+                continue
+            if name in self.values:
+                rows = self.values[name].get(str(wanted).strip().lower())
+                rows = rows if rows is not None else np.zeros(self.n, dtype=bool)
+            elif name in MAX_MINUTES_FILTERS:
+                try:
+                    bound = float(wanted)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{name} must be a number of minutes")
+                if math.isnan(bound):
+                    raise ValueError(f"{name} must be a number of minutes")
+                column = self.columns.get(MAX_MINUTES_FILTERS[name])
+                # NaN (unknown time) never satisfies an upper bound
+                rows = np.asarray(column) <= bound if column is not None else np.zeros(self.n, dtype=bool)
+            else:
+                raise ValueError(f"Unsupported filter: {name}")
+            result = rows.copy() if result is None else result & rows
+        return result
+
+    def facets(self) -> dict:
+        """{attribute: {value: recipe count}} for clients building filter menus."""
+        return {attr: {value: int(rows.sum()) for value, rows in sorted(values.items())}
+                for attr, values in self.values.items()}
+
+
+def build_attribute_bitmaps(state: RecipeIndex) -> AttributeBitmaps | None:
+    return AttributeBitmaps(state.catalog) if state.catalog is not None else None
+
+
+@register_cache_warmer
+def _warm_attribute_bitmaps(state: RecipeIndex):
+    state.cached("attribute_bitmaps", build_attribute_bitmaps)
+
+
+def search_with_mask(index, queries: np.ndarray, k: int, mask: np.ndarray):
+    """
+    Exact top-k restricted to the rows in `mask`, evaluated inside FAISS through an
+    IDSelectorBitmap: excluded rows are skipped during the scan rather than filtered
+    out of an over-fetched result, so k results come back whenever k rows qualify.
+    """
+    import faiss
+    k = min(k, int(mask.sum()))
+    if k == 0:
+        return np.zeros((len(queries), 0), dtype=np.float32), np.zeros((len(queries), 0), dtype=np.int64)
+    packed = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(packed))
+    params = faiss.SearchParameters(sel=selector)
+    if isinstance(index, faiss.IndexPreTransform):
+        params = faiss.SearchParametersPreTransform(index_params=params)
+    # The selector only holds a pointer into `packed`, which stays alive for this call
+    return index.search(queries, k, params=params)
@@ -1,46 +1,287 @@
-import faiss
+import os
+import threading
+import time
 import numpy as np
 from config import Config
-from utils.logger import logger
-from db import supabase
+from utils.logger import logger, SAMPLED
+from utils.lazy import LazyResource
+from utils.metrics import timed
+from utils.mmr import unit_rows, mmr_select
+from ingestion.vector_index import prepare_vectors, uses_cosine
+from db import get_recipe_repository
 import json
 from utils.embeddings import generate_text_embedding # Also used to embed incoming pantry_vector
+from catalog import CatalogSnapshot, current_snapshot_path
+from match_pipeline import PipelineError
 
-# Initialize FAISS index and recipe ID map globally
-index = None
-recipe_id_map = []
-
-# Load the FAISS index and ID map when the module is imported
-try:
-    index = faiss.read_index(Config.FAISS_INDEX_PATH)
-    id_map_path = Config.FAISS_INDEX_PATH.replace('.index', '_id_map.json')
-    with open(id_map_path, 'r') as f:
-        recipe_id_map = json.load(f)
-    logger.info(f"FAISS index loaded from {Config.FAISS_INDEX_PATH} with {index.ntotal} vectors.")
-    logger.info(f"Recipe ID map loaded from {id_map_path}.")
-except Exception as e:
-    logger.error(f"Error loading FAISS index or ID map: {e}", exc_info=True)
-    index = faiss.IndexFlatL2(768) # Fallback to an empty index if loading fails
-    logger.warning("Initialized empty FAISS index due to load failure.")
-
-def match_recipes(pantry_vector: list[float], k: int = 5) -> dict:
+
+class RecipeIndex:
+    """
+    One immutable generation of the search state: the FAISS index, its row -> recipe id
+    map, the catalog snapshot they came from (None when loaded from the bare
+    FAISS_INDEX_PATH files) and any caches derived from them.
+
+    Requests should call get_recipe_index() once and use that object throughout, so a
+    hot reload swapping in a new generation never mixes an old index with a new id map.
+    """
+
+    def __init__(self, index, id_map: list[str], catalog=None, version: str | None = None):
+        if index.ntotal != len(id_map):
+            raise ValueError(f"FAISS index has {index.ntotal} vectors but the id map has {len(id_map)} entries.")
+        self.index = index
+        self.id_map = id_map
+        self.catalog = catalog
+        self.version = version
+        # Scores are cosine similarities (higher is better) rather than L2 distances
+        self.cosine = uses_cosine(index)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def cached(self, name: str, builder):
+        """
+        Returns a structure derived from this generation, building it once on first use.
+        """
+        value = self._cache.get(name)
+        if value is None:
+            with self._cache_lock:
+                value = self._cache.get(name)
+                if value is None:
+                    value = builder(self)
+                    self._cache[name] = value
+        return value
+
+
+# Functions (state -> None) that pre-build derived caches before a generation goes live
+_cache_warmers = []
+
+
+def register_cache_warmer(fn):
+    """Decorator: registers fn(state) to run on every newly loaded index before it is swapped in."""
+    _cache_warmers.append(fn)
+    return fn
+
+
+def _warm(state: RecipeIndex) -> RecipeIndex:
+    for warmer in _cache_warmers:
+        try:
+            warmer(state)
+        except Exception as e:
+            logger.error("Cache warmer %s failed for index %s: %s", warmer.__name__, state.version, e, exc_info=True)
+    return state
+
+
+def load_snapshot_index(path: str) -> RecipeIndex:
+    """
+    Loads and verifies the snapshot at `path` (index checksum, dimension and row count
+    are checked against its manifest).
+    """
+    catalog = CatalogSnapshot(path)
+    return RecipeIndex(catalog.load_index(verify=True), catalog.ids, catalog, version=catalog.version)
+
+
+def _load_recipe_index() -> RecipeIndex:
+    import faiss
+
+    # Prefer the versioned catalog snapshot: it carries the index, id map and full records,
+    # so matching and hydration work without a database round trip.
+    try:
+        path = current_snapshot_path(Config.SNAPSHOT_DIR)
+        if path:
+            return _warm(load_snapshot_index(path))
+    except Exception as e:
+        logger.error("Error loading catalog snapshot from %s: %s", Config.SNAPSHOT_DIR, e, exc_info=True)
+
+    # Otherwise load the bare FAISS index and ID map
+    try:
+        index = faiss.read_index(Config.FAISS_INDEX_PATH)
+        id_map_path = Config.FAISS_INDEX_PATH.replace('.index', '_id_map.json')
+        with open(id_map_path, 'r') as f:
+            recipe_id_map = json.load(f)
+        state = RecipeIndex(index, recipe_id_map)
+        logger.info("FAISS index loaded from %s with %s vectors.", Config.FAISS_INDEX_PATH, index.ntotal)
+        logger.info("Recipe ID map loaded from %s.", id_map_path)
+        return _warm(state)
+    except Exception as e:
+        logger.error("Error loading FAISS index or ID map: %s", e, exc_info=True)
+        logger.warning("Initialized empty FAISS index due to load failure.")
+        return RecipeIndex(faiss.IndexFlatL2(768), []) # Fallback to an empty index if loading fails
+
+
+# Loaded on first use in each worker process rather than at import time
+recipe_index = LazyResource("recipe index", _load_recipe_index)
+
+
+class IndexReloader:
+    """
+    Background thread that watches the snapshot CURRENT pointer and hot-swaps new versions.
+
+    The new generation is fully loaded, verified and warmed off the request path; the
+    swap itself is a single reference assignment, so in-flight requests finish on the
+    generation they started with and no request ever waits on a reload.
+    """
+
+    def __init__(self, resource: LazyResource, root: str, interval: float):
+        self.resource = resource
+        self.root = root
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        self._failed_versions = set()
+
+    def check_once(self) -> bool:
+        """Loads and swaps in a newer snapshot if CURRENT moved. Returns True on swap."""
+        path = current_snapshot_path(self.root)
+        if not path:
+            return False
+        version = os.path.basename(path)
+        current = self.resource.get()
+        if version == current.version or version in self._failed_versions:
+            return False
+
+        started = time.perf_counter()
+        try:
+            state = _warm(load_snapshot_index(path))
+        except Exception as e:
+            # Keep serving the current generation; don't retry a broken version every tick
+            self._failed_versions.add(version)
+            logger.error("Rejected index snapshot %s, still serving %s: %s", version, current.version, e, exc_info=True)
+            return False
+        self.resource.set(state)
+        logger.info("Hot-swapped recipe index %s -> %s (%s vectors, loaded in %.0f ms).",
+                    current.version, version, state.index.ntotal, (time.perf_counter() - started) * 1000)
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check_once()
+            except Exception as e:
+                logger.error("Index reload check failed: %s", e, exc_info=True)
+
+    def ensure_running(self):
+        """Starts the watcher thread once per process (cheap to call on every request)."""
+        if self.interval <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name="index-reloader", daemon=True).start()
+                self._pid = os.getpid()
+
+
+index_reloader = IndexReloader(recipe_index, Config.SNAPSHOT_DIR, Config.INDEX_RELOAD_INTERVAL_SECONDS)
+
+
+def get_recipe_index() -> RecipeIndex:
+    index_reloader.ensure_running()
+    return recipe_index.get()
+
+
+def get_catalog():
+    """Returns the catalog snapshot backing the current index, or None."""
+    return get_recipe_index().catalog
+
+
+def get_recipe_records(recipe_ids: list[str], state: RecipeIndex | None = None, pipeline=None) -> dict:
+    """
+    Returns {recipe_id: full recipe} for the given ids, served from the mmapped
+    catalog snapshot when possible and falling back to the recipe repository for any misses.
+    Pass `state` to hydrate from the same index generation a search ran against.
+    With a MatchPipeline, repository misses are fetched in parallel chunks of
+    MATCH_HYDRATE_CHUNK ids, bounded by the pipeline's hydrate timeout.
+    """
+    catalog = (state or get_recipe_index()).catalog
+    found = catalog.get_many(recipe_ids) if catalog else {}
+    missing = [rid for rid in recipe_ids if rid not in found]
+    if missing:
+        repository = get_recipe_repository()
+        if pipeline is None:
+            fetched = repository.get_many(missing)
+        else:
+            fetched = pipeline.map_chunks("hydrate_fetch", repository.get_many, missing, Config.MATCH_HYDRATE_CHUNK)
+        for recipe in fetched:
+            found[recipe['id']] = recipe
+    return found
+
+
+def build_unit_vectors(state: RecipeIndex) -> np.ndarray:
+    """Every indexed recipe vector, row-normalized, in FAISS row order (for MMR)."""
+    if state.index.ntotal == 0:
+        return np.zeros((0, state.index.d), dtype=np.float32)
+    return unit_rows(state.index.reconstruct_n(0, state.index.ntotal))
+
+
+@register_cache_warmer
+def _warm_unit_vectors(state: RecipeIndex):
+    state.cached("unit_vectors", build_unit_vectors)
+
+
+def filter_mask(state: RecipeIndex, filters: dict | None) -> np.ndarray | None:
+    """
+    Rows of `state` matching `filters` (see recipe_filters), or None without filters.
+    Raises ValueError for invalid filters or when there is no catalog snapshot to filter on.
     """
-    Matches recipes based on the provided pantry vector using FAISS and fetches full recipe details from Supabase.
+    if not filters:
+        return None
+    from recipe_filters import build_attribute_bitmaps
+    bitmaps = state.cached("attribute_bitmaps", build_attribute_bitmaps)
+    if bitmaps is None:
+        raise ValueError("Filtered matching needs a catalog snapshot.")
+    return bitmaps.mask(filters)
+
+
+def match_recipes(pantry_vector: list[float], k: int = 5, diversity: float | None = None,
+                  filters: dict | None = None, state: RecipeIndex | None = None, mask: np.ndarray | None = None,
+                  prefetched=None, pipeline=None) -> dict:
+    """
+    Matches recipes based on the provided pantry vector using FAISS and fetches full recipe details
+    from the catalog snapshot (or Supabase when no snapshot is available).
+
+    With `diversity` (an MMR lambda in [0, 1]), MMR_FETCH_FACTOR * k candidates are
+    fetched and re-ranked by maximal marginal relevance so near-duplicate recipes
+    don't crowd out the top k; lower values favour variety over closeness.
+
+    `filters` (see recipe_filters) restricts the search itself to matching recipes,
+    e.g. {"maincategory": "baking", "max_minutes": 30}; raises ValueError if invalid.
+
+    The /recipes/match pipeline passes the `state` and filter `mask` it prepared
+    concurrently with the embedding, a `prefetched` future of {recipe_id: recipe} for
+    the ids it expects, and itself as `pipeline` (see get_recipe_records).
     """
+    state = state or get_recipe_index()
+    index, recipe_id_map = state.index, state.id_map
     if not index or index.ntotal == 0:
         logger.warning("FAISS index is not loaded or is empty. Cannot match recipes.")
         return {"matched_recipes": []}
 
-    vec = np.array(pantry_vector, dtype="float32").reshape(1, -1)
+    # Cosine indexes hold unit vectors, so the query must be normalized the same way
+    vec = prepare_vectors(np.asarray(pantry_vector, dtype="float32").reshape(1, -1), state.cosine)
 
     # Validate input vector dimension against FAISS index dimension
     if vec.shape[1] != index.d:
-        logger.error(f"Input vector dimension {vec.shape[1]} does not match FAISS index dimension {index.d}.")
+        logger.error("Input vector dimension %d does not match FAISS index dimension %d.", vec.shape[1], index.d)
         return {"matched_recipes": []}
 
+    if mask is None:
+        mask = filter_mask(state, filters)
+
     try:
         # Perform the FAISS search
-        D, I = index.search(vec, min(k, index.ntotal)) # D: distances, I: internal FAISS indices
+        fetch = k if diversity is None else k * Config.MMR_FETCH_FACTOR
+        with timed("index_search"):
+            if mask is None:
+                D, I = index.search(vec, min(fetch, index.ntotal)) # D: distances, I: internal FAISS indices
+            else:
+                from recipe_filters import search_with_mask
+                D, I = search_with_mask(index, vec, fetch, mask)
+
+        if diversity is not None:
+            with timed("diversify"):
+                valid = I[0] >= 0
+                candidate_rows, candidate_distances = I[0][valid], D[0][valid]
+                vectors = state.cached("unit_vectors", build_unit_vectors)
+                picked = mmr_select(vec[0], vectors[candidate_rows], k, diversity)
+                I, D = candidate_rows[picked][None, :], candidate_distances[picked][None, :]
 
         matched_results_minimal = []
         for rank, faiss_internal_idx in enumerate(I[0]):
@@ -53,20 +294,22 @@ def match_recipes(pantry_vector: list[float], k: int = 5) -> dict:
                     "score": score
                 })
             else:
-                logger.warning(f"FAISS returned an out-of-bounds internal index: {faiss_internal_idx}. Skipping.")
+                logger.warning("FAISS returned an out-of-bounds internal index: %s. Skipping.", faiss_internal_idx)
 
         # If no matches or invalid indices, return early
         if not matched_results_minimal:
-            logger.info("No valid recipe matches found by FAISS.")
+            logger.info("No valid recipe matches found by FAISS.", extra=SAMPLED)
             return {"matched_recipes": []}
 
-        # Fetch full recipe details from Supabase for the matched IDs
+        # Fetch full recipe details for the matched IDs
         recipe_ids_to_fetch = [res['recipe_id'] for res in matched_results_minimal]
-        res = supabase.table('recipes').select('*').in_('id', recipe_ids_to_fetch).execute()
+        with timed("hydrate"):
+            fetched_recipes_by_id = _prefetched_records(prefetched, recipe_ids_to_fetch, pipeline)
+            missing = [rid for rid in recipe_ids_to_fetch if rid not in fetched_recipes_by_id]
+            if missing:
+                fetched_recipes_by_id.update(get_recipe_records(missing, state, pipeline))
 
-        if res.data:
-            # Create a dictionary for quick lookup of fetched recipes by their ID
-            fetched_recipes_by_id = {recipe['id']: recipe for recipe in res.data}
+        if fetched_recipes_by_id:
             final_recipes_with_scores = []
             for match in matched_results_minimal:
                 full_recipe = fetched_recipes_by_id.get(match['recipe_id'])
@@ -74,12 +317,32 @@ def match_recipes(pantry_vector: list[float], k: int = 5) -> dict:
                     # Combine the score with the full recipe data
                     full_recipe['score'] = match['score']
                     final_recipes_with_scores.append(full_recipe)
-            logger.info(f"Successfully fetched {len(final_recipes_with_scores)} full recipe details from Supabase.")
+            logger.info("Successfully fetched %d full recipe details.", len(final_recipes_with_scores), extra=SAMPLED)
             return {"matched_recipes": final_recipes_with_scores}
         else:
-            logger.warning("No recipe details found in Supabase for the matched IDs. This might indicate a data inconsistency.")
+            logger.warning("No recipe details found for the matched IDs. This might indicate a data inconsistency.")
             return {"matched_recipes": []}
 
+    except PipelineError:
+        raise
+    except Exception as e:
+        logger.error("Error during FAISS search or recipe data retrieval: %s", e, exc_info=True)
+        return {"matched_recipes": []}
+
+
+def _prefetched_records(prefetched, recipe_ids: list[str], pipeline=None) -> dict:
+    """The records among `recipe_ids` that a prefetch already fetched ({} if it failed or was too slow)."""
+    if prefetched is None:
+        return {}
+    try:
+        # Speculative: a slow prefetch is given up on without cancelling the request
+        records = pipeline.wait_optional("prefetch", prefetched) if pipeline else prefetched.result()
+        if records is None:
+            logger.warning("Recipe prefetch gave up after its timeout")
+            return {}
+    except PipelineError:
+        raise
     except Exception as e:
-        logger.error(f"Error during FAISS search or Supabase data retrieval: {e}", exc_info=True)
-        return {"matched_recipes": []}
\ No newline at end of file
+        logger.warning("Recipe prefetch failed: %s", e)
+        return {}
+    return {rid: records[rid] for rid in recipe_ids if rid in records}
\ No newline at end of file
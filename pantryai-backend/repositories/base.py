@@ -0,0 +1,150 @@
+import re
+from abc import ABC, abstractmethod
+
+# Columns a pantry row may carry; anything else in a client payload is ignored
+PANTRY_COLUMNS = [
+    "id", "device_id", "name", "category", "quantity", "unit", "expiry", "purchase_date",
+    "location", "brand", "barcode", "notes", "is_opened", "added_at", "image_url", "revision",
+]
+# Columns the server owns; client payloads can't set them
+SERVER_COLUMNS = ("id", "device_id", "revision")
+# JSON value types each client-writable column accepts (None clears it, except for name)
+PANTRY_COLUMN_TYPES = {
+    "name": str, "category": str, "quantity": (int, float), "unit": str, "expiry": str,
+    "purchase_date": str, "location": str, "brand": str, "barcode": str, "notes": str,
+    "is_opened": bool, "added_at": str, "image_url": str,
+}
+
+# Recipe columns that can be matched exactly by /recipes/filter
+RECIPE_FILTER_COLUMNS = ["dietary_restrictions", "cuisine", "difficulty", "maincategory", "subcategory", "dish_type"]
+
+# Sort keys accepted by /recipes/filter, mapped to the underlying (PostgREST-style) column
+RECIPE_SORT_COLUMNS = {
+    "name": "name",
+    "rating": "ratings",
+    "time": "times->cook",
+    "calories": "nutrients->calories",
+}
+
+_NON_WORD_REGEX = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name: str | None) -> str:
+    """
+    Case- and punctuation-insensitive form of an item or recipe name, used as an index key.
+    """
+    return _NON_WORD_REGEX.sub(" ", (name or "").lower()).strip()
+
+
+def pantry_changes(since: int, current: int, rows: list[dict], tombstones: list[dict], full: bool) -> dict:
+    """
+    Shapes a delta-sync response as of `current`, the device's revision counter read
+    before the rows and tombstones. Writes commit in revision order with the counter
+    bump, so everything up to `current` is visible to both reads; anything newer is
+    left out here (the two reads may each have caught only part of it) and returned
+    by the next sync, which starts from `current`.
+    """
+    rows = [row for row in rows if (row.get("revision") or 0) <= current]
+    return {
+        "revision": current,
+        "upserts": rows,
+        "deleted": [] if full else [t["item_id"] for t in tombstones if t["revision"] <= current],
+        # The client is ahead of the server (e.g. a restored database): replace local state
+        "reset": since > current,
+    }
+
+
+class PantryRepository(ABC):
+    """
+    Storage operations for the per-device 'pantry' table.
+    Every method is scoped to a device except list_all_items.
+
+    Every write that changes rows stamps them with the device's next revision, allocated
+    in the write's own transaction, and deletes leave a tombstone at their revision in
+    that same transaction, so changes_since() can return just what changed after a
+    client's last sync.
+    """
+
+    @abstractmethod
+    def list_items(self, device_id: str) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def list_all_items(self) -> list[dict]:
+        """All pantry rows regardless of device (legacy /recipes/match behaviour)."""
+
+    @abstractmethod
+    def get_item(self, device_id: str, item_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def insert_items(self, items: list[dict]) -> list[dict]:
+        """Inserts fully-formed rows (including device_id) and returns them as stored."""
+
+    @abstractmethod
+    def update_item(self, device_id: str, item_id: str, changes: dict) -> dict | None:
+        """Applies `changes` and returns the updated row, or None if no such item."""
+
+    @abstractmethod
+    def delete_item(self, device_id: str, item_id: str) -> dict | None:
+        """Deletes the item and returns the deleted row, or None if no such item."""
+
+    @abstractmethod
+    def update_items(self, device_id: str, updates: dict[str, dict]) -> list[dict]:
+        """
+        Applies {item_id: changes} in one batch and returns the updated rows;
+        ids that don't exist for the device are simply absent from the result.
+        """
+
+    @abstractmethod
+    def delete_items(self, device_id: str, item_ids: list[str]) -> list[dict]:
+        """Deletes the device's items among `item_ids` in one batch and returns the deleted rows."""
+
+    @abstractmethod
+    def search_items(self, device_id: str, query: str) -> list[dict]:
+        """Case-insensitive substring match on the item name."""
+
+    @abstractmethod
+    def changes_since(self, device_id: str, since: int) -> dict:
+        """
+        {"revision", "upserts", "deleted", "reset"}: rows written and item ids deleted after
+        revision `since`. since <= 0 (or a reset) returns every row instead.
+        """
+
+
+class RecipeRepository(ABC):
+    """
+    Read operations on the 'recipes' table (plus the bulk upsert ingestion uses).
+    """
+
+    @abstractmethod
+    def get(self, recipe_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def get_many(self, recipe_ids: list[str]) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def search_text(self, query: str, limit: int = 20) -> list[dict]:
+        """Case-insensitive substring match on name or description."""
+
+    @abstractmethod
+    def search_ingredients(self, ingredients: list[str], limit: int = 20) -> list[dict]:
+        """Recipes whose cleaned_ingredients_list contains every given ingredient."""
+
+    @abstractmethod
+    def filter(self, filters: dict, sort_by: str = "name", descending: bool = False, limit: int = 50) -> list[dict]:
+        """Exact-match `filters` on RECIPE_FILTER_COLUMNS, ordered by a RECIPE_SORT_COLUMNS key."""
+
+    @abstractmethod
+    def upsert(self, rows: list[dict]) -> list[dict]:
+        ...
+
+    @abstractmethod
+    def missing_images(self, after_id: str = "", limit: int = 500) -> list[dict]:
+        """Recipes with no image_url and an id after `after_id`, in id order (for paging)."""
+
+    @abstractmethod
+    def set_image_urls(self, urls: dict[str, str]) -> int:
+        """Sets image_url for each {recipe id: url} in one round trip; returns rows updated."""
@@ -0,0 +1,133 @@
+from repositories.base import PantryRepository, RecipeRepository
+from utils.logger import logger
+
+
+class ReplicatedPantryRepository(PantryRepository):
+    """
+    Reads from a local replica (SQLite) and writes to the primary (Supabase), mirroring
+    each successful write into the replica so a device sees its own changes immediately.
+    """
+
+    def __init__(self, primary: PantryRepository, replica: PantryRepository):
+        self.primary = primary
+        self.replica = replica
+
+    def sync(self) -> int:
+        """
+        Copies every primary pantry row into the replica and deletes the replica rows the
+        primary no longer has (a delete whose mirroring failed). Returns the number of rows.
+        """
+        rows = self.primary.list_all_items()
+        if rows:
+            self.replica.insert_items(rows)
+        kept = {(row['device_id'], str(row['id'])) for row in rows}
+        stale = {}
+        for row in self.replica.list_all_items():
+            if (row['device_id'], str(row['id'])) not in kept:
+                stale.setdefault(row['device_id'], []).append(str(row['id']))
+        for device_id, item_ids in stale.items():
+            # Tombstone at the primary's current revision (at or after its own tombstones), so
+            # clients syncing from the replica pick the deletes up
+            since = max((row.get('revision') or 0 for row in rows if row['device_id'] == device_id), default=0)
+            revision = self.primary.changes_since(device_id, since)['revision']
+            self.replica.delete_items(device_id, item_ids, revision=revision)
+            logger.info("Removed %d pantry rows the primary no longer has from the replica", len(item_ids))
+        return len(rows)
+
+    def _mirror(self, rows: list[dict]):
+        try:
+            if rows:
+                self.replica.insert_items(rows)
+        except Exception as e:
+            # The primary write already succeeded; the next sync() repairs the replica
+            logger.warning("Failed to mirror %s pantry rows into the replica: %s", len(rows), e)
+
+    def list_items(self, device_id: str) -> list[dict]:
+        return self.replica.list_items(device_id)
+
+    def list_all_items(self) -> list[dict]:
+        return self.replica.list_all_items()
+
+    def get_item(self, device_id: str, item_id: str) -> dict | None:
+        return self.replica.get_item(device_id, item_id)
+
+    def insert_items(self, items: list[dict]) -> list[dict]:
+        rows = self.primary.insert_items(items)
+        self._mirror(rows)
+        return rows
+
+    def update_item(self, device_id: str, item_id: str, changes: dict) -> dict | None:
+        row = self.primary.update_item(device_id, item_id, changes)
+        if row:
+            self._mirror([row])
+        return row
+
+    def delete_item(self, device_id: str, item_id: str) -> dict | None:
+        rows = self.delete_items(device_id, [item_id])
+        return rows[0] if rows else None
+
+    def update_items(self, device_id: str, updates: dict[str, dict]) -> list[dict]:
+        rows = self.primary.update_items(device_id, updates)
+        self._mirror(rows)
+        return rows
+
+    def delete_items(self, device_id: str, item_ids: list[str]) -> list[dict]:
+        rows = self.primary.delete_items(device_id, item_ids)
+        try:
+            if rows:
+                # Tombstone at the primary's revision so changes_since() agrees with it
+                self.replica.delete_items(device_id, [str(row['id']) for row in rows], revision=rows[0].get('revision'))
+        except Exception as e:
+            # The primary delete already succeeded; the next sync() removes the rows
+            logger.warning("Failed to delete %s pantry items from the replica: %s", len(rows), e)
+        return rows
+
+    def changes_since(self, device_id: str, since: int) -> dict:
+        return self.replica.changes_since(device_id, since)
+
+    def search_items(self, device_id: str, query: str) -> list[dict]:
+        return self.replica.search_items(device_id, query)
+
+
+class ReplicatedRecipeRepository(RecipeRepository):
+    """
+    Recipe reads served by the local replica; lookups by id fall back to the primary
+    for anything the replica has not been synced with yet.
+    """
+
+    def __init__(self, primary: RecipeRepository, replica: RecipeRepository):
+        self.primary = primary
+        self.replica = replica
+
+    def get(self, recipe_id: str) -> dict | None:
+        return self.replica.get(recipe_id) or self.primary.get(recipe_id)
+
+    def get_many(self, recipe_ids: list[str]) -> list[dict]:
+        found = self.replica.get_many(recipe_ids)
+        have = {r["id"] for r in found}
+        missing = [rid for rid in recipe_ids if rid not in have]
+        if missing:
+            found.extend(self.primary.get_many(missing))
+        return found
+
+    def search_text(self, query: str, limit: int = 20) -> list[dict]:
+        return self.replica.search_text(query, limit)
+
+    def search_ingredients(self, ingredients: list[str], limit: int = 20) -> list[dict]:
+        return self.replica.search_ingredients(ingredients, limit)
+
+    def filter(self, filters: dict, sort_by: str = "name", descending: bool = False, limit: int = 50) -> list[dict]:
+        return self.replica.filter(filters, sort_by, descending, limit)
+
+    def upsert(self, rows: list[dict]) -> list[dict]:
+        written = self.primary.upsert(rows)
+        self.replica.upsert(rows)
+        return written
+
+    def missing_images(self, after_id: str = "", limit: int = 500) -> list[dict]:
+        return self.primary.missing_images(after_id, limit)
+
+    def set_image_urls(self, urls: dict[str, str]) -> int:
+        updated = self.primary.set_image_urls(urls)
+        self.replica.set_image_urls(urls)
+        return updated
@@ -0,0 +1,56 @@
+from repositories.base import PantryRepository
+from pantry_search import PantrySearchIndexes
+
+
+class SearchIndexedPantryRepository(PantryRepository):
+    """
+    Wraps another pantry repository and answers search_items from per-device
+    in-memory trigram indexes (see pantry_search) instead of an ILIKE query.
+    Writes go to the wrapped repository and are then applied to the loaded indexes.
+    """
+
+    def __init__(self, inner: PantryRepository, refresh_seconds: float = 10.0, max_devices: int = 1000):
+        self.inner = inner
+        self.indexes = PantrySearchIndexes(inner, refresh_seconds, max_devices)
+
+    def list_items(self, device_id: str) -> list[dict]:
+        return self.inner.list_items(device_id)
+
+    def list_all_items(self) -> list[dict]:
+        return self.inner.list_all_items()
+
+    def get_item(self, device_id: str, item_id: str) -> dict | None:
+        return self.inner.get_item(device_id, item_id)
+
+    def insert_items(self, items: list[dict]) -> list[dict]:
+        rows = self.inner.insert_items(items)
+        self.indexes.written(rows)
+        return rows
+
+    def update_item(self, device_id: str, item_id: str, changes: dict) -> dict | None:
+        row = self.inner.update_item(device_id, item_id, changes)
+        if row:
+            self.indexes.written([row])
+        return row
+
+    def update_items(self, device_id: str, updates: dict[str, dict]) -> list[dict]:
+        rows = self.inner.update_items(device_id, updates)
+        self.indexes.written(rows)
+        return rows
+
+    def delete_item(self, device_id: str, item_id: str) -> dict | None:
+        row = self.inner.delete_item(device_id, item_id)
+        if row:
+            self.indexes.deleted(device_id, [item_id])
+        return row
+
+    def delete_items(self, device_id: str, item_ids: list[str]) -> list[dict]:
+        rows = self.inner.delete_items(device_id, item_ids)
+        self.indexes.deleted(device_id, [str(row["id"]) for row in rows])
+        return rows
+
+    def search_items(self, device_id: str, query: str) -> list[dict]:
+        return self.indexes.search(device_id, query)
+
+    def changes_since(self, device_id: str, since: int) -> dict:
+        return self.inner.changes_since(device_id, since)
@@ -0,0 +1,391 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from repositories.base import (
+    PantryRepository, RecipeRepository, PANTRY_COLUMNS, RECIPE_FILTER_COLUMNS, RECIPE_SORT_COLUMNS, SERVER_COLUMNS,
+    normalize_name, pantry_changes,
+)
+from catalog import numeric_values
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pantry (
+    id            TEXT PRIMARY KEY,
+    device_id     TEXT NOT NULL,
+    name          TEXT NOT NULL,
+    name_norm     TEXT NOT NULL,
+    category      TEXT,
+    quantity      NUMERIC,
+    unit          TEXT,
+    expiry        TEXT,
+    purchase_date TEXT,
+    location      TEXT,
+    brand         TEXT,
+    barcode       TEXT,
+    notes         TEXT,
+    is_opened     INTEGER,
+    added_at      TEXT,
+    image_url     TEXT,
+    revision      INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_pantry_device ON pantry(device_id);
+CREATE INDEX IF NOT EXISTS idx_pantry_device_name ON pantry(device_id, name_norm);
+
+CREATE TABLE IF NOT EXISTS pantry_revisions (
+    device_id TEXT PRIMARY KEY,
+    revision  INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS pantry_tombstones (
+    device_id TEXT NOT NULL,
+    item_id   TEXT NOT NULL,
+    revision  INTEGER NOT NULL,
+    PRIMARY KEY (device_id, item_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_pantry_tombstones_revision ON pantry_tombstones(device_id, revision);
+
+CREATE TABLE IF NOT EXISTS recipes (
+    id                   TEXT PRIMARY KEY,
+    name                 TEXT,
+    name_norm            TEXT,
+    description          TEXT,
+    difficulty           TEXT,
+    dietary_restrictions TEXT,
+    cuisine              TEXT,
+    maincategory         TEXT,
+    subcategory          TEXT,
+    dish_type            TEXT,
+    ratings              REAL,
+    total_minutes        REAL,
+    kcal                 REAL,
+    data                 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recipes_name ON recipes(name_norm);
+
+CREATE TABLE IF NOT EXISTS recipe_ingredients (
+    ingredient TEXT NOT NULL,
+    recipe_id  TEXT NOT NULL,
+    PRIMARY KEY (ingredient, recipe_id)
+) WITHOUT ROWID;
+"""
+
+_PANTRY_SELECT = ", ".join(PANTRY_COLUMNS)
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class SQLiteStore:
+    """
+    Shared SQLite database handle: one connection per thread, WAL journaling so
+    readers never block behind a writer, and the schema created on first open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            # Files created before pantry revisions existed
+            if "revision" not in {row[1] for row in conn.execute("PRAGMA table_info(pantry)")}:
+                conn.execute("ALTER TABLE pantry ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pantry_device_revision ON pantry(device_id, revision)")
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+
+
+def _next_revision(conn: sqlite3.Connection, device_id: str, at_least: int | None = None) -> int:
+    """
+    Bumps the device's revision counter inside the caller's transaction and returns it.
+    `at_least` adopts a revision assigned elsewhere (replica mirroring) instead.
+    """
+    if at_least is not None:
+        conn.execute("INSERT INTO pantry_revisions (device_id, revision) VALUES (?, ?) "
+                     "ON CONFLICT(device_id) DO UPDATE SET revision = max(revision, excluded.revision)",
+                     (device_id, at_least))
+        return at_least
+    return conn.execute("INSERT INTO pantry_revisions (device_id, revision) VALUES (?, 1) "
+                        "ON CONFLICT(device_id) DO UPDATE SET revision = revision + 1 RETURNING revision",
+                        (device_id,)).fetchone()[0]
+
+
+def _pantry_row(row: sqlite3.Row) -> dict:
+    item = dict(row)
+    if item.get("is_opened") is not None:
+        item["is_opened"] = bool(item["is_opened"])
+    return item
+
+
+class SQLitePantryRepository(PantryRepository):
+    """
+    Pantry storage in a local SQLite file, indexed on id, device_id and (device_id, normalized name).
+    """
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    def _query(self, sql: str, params=()) -> list[dict]:
+        return [_pantry_row(r) for r in self.store.connection().execute(sql, params).fetchall()]
+
+    def list_items(self, device_id: str) -> list[dict]:
+        return self._query(f"SELECT {_PANTRY_SELECT} FROM pantry WHERE device_id = ?", (device_id,))
+
+    def list_all_items(self) -> list[dict]:
+        return self._query(f"SELECT {_PANTRY_SELECT} FROM pantry")
+
+    def get_item(self, device_id: str, item_id: str) -> dict | None:
+        rows = self._query(f"SELECT {_PANTRY_SELECT} FROM pantry WHERE id = ? AND device_id = ?",
+                           (str(item_id), device_id))
+        return rows[0] if rows else None
+
+    def insert_items(self, items: list[dict]) -> list[dict]:
+        """Rows that already carry a revision (mirrored from the primary) keep it."""
+        rows = []
+        for item in items:
+            row = {column: item.get(column) for column in PANTRY_COLUMNS}
+            row["id"] = str(row["id"] or uuid.uuid4())
+            row["name_norm"] = normalize_name(row["name"])
+            rows.append(row)
+        columns = PANTRY_COLUMNS + ["name_norm"]
+        placeholders = ", ".join(f":{c}" for c in columns)
+        conn = self.store.connection()
+        with conn:
+            revisions = {}
+            for row in rows:
+                if row["revision"] is not None:
+                    _next_revision(conn, row["device_id"], at_least=row["revision"])
+                else:
+                    if row["device_id"] not in revisions:
+                        revisions[row["device_id"]] = _next_revision(conn, row["device_id"])
+                    row["revision"] = revisions[row["device_id"]]
+            conn.executemany(f"INSERT OR REPLACE INTO pantry ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        for row in rows:
+            del row["name_norm"]
+            if row["is_opened"] is not None:
+                row["is_opened"] = bool(row["is_opened"])
+        return rows
+
+    def update_item(self, device_id: str, item_id: str, changes: dict) -> dict | None:
+        changes = {k: v for k, v in changes.items() if k in PANTRY_COLUMNS and k not in SERVER_COLUMNS}
+        if "name" in changes:
+            changes["name_norm"] = normalize_name(changes["name"])
+        if changes:
+            conn = self.store.connection()
+            with conn:
+                assignments = ", ".join(f"{column} = :{column}" for column in changes)
+                cur = conn.execute(f"UPDATE pantry SET {assignments} WHERE id = :_id AND device_id = :_device",
+                                   {**changes, "_id": str(item_id), "_device": device_id})
+                if cur.rowcount == 0:
+                    return None
+                # Still inside the write transaction, so no other write can take a revision in between
+                conn.execute("UPDATE pantry SET revision = ? WHERE id = ? AND device_id = ?",
+                             (_next_revision(conn, device_id), str(item_id), device_id))
+        return self.get_item(device_id, item_id)
+
+    def delete_item(self, device_id: str, item_id: str, revision: int | None = None) -> dict | None:
+        deleted = self.delete_items(device_id, [item_id], revision=revision)
+        return deleted[0] if deleted else None
+
+    def update_items(self, device_id: str, updates: dict[str, dict]) -> list[dict]:
+        # One executemany per distinct set of changed columns, all in a single transaction
+        if not updates:
+            return []
+        groups = {}
+        for item_id, changes in updates.items():
+            changes = {k: v for k, v in changes.items() if k in PANTRY_COLUMNS and k not in SERVER_COLUMNS}
+            if "name" in changes:
+                changes["name_norm"] = normalize_name(changes["name"])
+            groups.setdefault(tuple(sorted(changes)), []).append({**changes, "_id": str(item_id), "_device": device_id})
+        conn = self.store.connection()
+        ids = [str(item_id) for item_id in updates]
+        placeholders = ", ".join("?" for _ in ids)
+        with conn:
+            updated, written = 0, []
+            for columns, params in groups.items():
+                if columns:
+                    assignments = ", ".join(f"{column} = :{column}" for column in columns)
+                    updated += conn.executemany(f"UPDATE pantry SET {assignments} WHERE id = :_id AND device_id = :_device",
+                                                params).rowcount
+                    written.extend(p["_id"] for p in params)
+            # A revision only once something was written, allocated in the same transaction
+            if updated:
+                conn.execute(f"UPDATE pantry SET revision = ? WHERE device_id = ? AND id IN ({', '.join('?' for _ in written)})",
+                             [_next_revision(conn, device_id), device_id, *written])
+            rows = conn.execute(f"SELECT {_PANTRY_SELECT} FROM pantry WHERE device_id = ? AND id IN ({placeholders})",
+                                [device_id, *ids]).fetchall()
+        return [_pantry_row(r) for r in rows]
+
+    def delete_items(self, device_id: str, item_ids: list[str], revision: int | None = None) -> list[dict]:
+        """
+        Deletes and tombstones the items; the returned rows carry the tombstone revision.
+        `revision` adopts the primary's revision when mirroring a delete into a replica.
+        """
+        if not item_ids:
+            return []
+        ids = [str(item_id) for item_id in item_ids]
+        placeholders = ", ".join("?" for _ in ids)
+        conn = self.store.connection()
+        with conn:
+            rows = [_pantry_row(r) for r in conn.execute(
+                f"DELETE FROM pantry WHERE device_id = ? AND id IN ({placeholders}) RETURNING {_PANTRY_SELECT}",
+                [device_id, *ids],
+            ).fetchall()]
+            mirrored = revision is not None
+            if rows or mirrored:
+                revision = _next_revision(conn, device_id, at_least=revision)
+                # A mirrored delete is authoritative even if the replica never had the row
+                tombstoned = ids if mirrored else [row["id"] for row in rows]
+                conn.executemany("INSERT OR REPLACE INTO pantry_tombstones (device_id, item_id, revision) VALUES (?, ?, ?)",
+                                 [(device_id, item_id, revision) for item_id in tombstoned])
+                for row in rows:
+                    row["revision"] = revision
+        return rows
+
+    def changes_since(self, device_id: str, since: int) -> dict:
+        conn = self.store.connection()
+        # Counter first: anything committed after this read just shows up again next sync
+        counter = conn.execute("SELECT revision FROM pantry_revisions WHERE device_id = ?", (device_id,)).fetchone()
+        current = counter[0] if counter else 0
+        full = since <= 0 or since > current
+        if full:
+            return pantry_changes(since, current, self.list_items(device_id), [], full)
+        rows = self._query(f"SELECT {_PANTRY_SELECT} FROM pantry WHERE device_id = ? AND revision > ?",
+                           (device_id, since))
+        tombstones = [dict(r) for r in conn.execute(
+            "SELECT item_id, revision FROM pantry_tombstones WHERE device_id = ? AND revision > ?",
+            (device_id, since))]
+        return pantry_changes(since, current, rows, tombstones, full)
+
+    def search_items(self, device_id: str, query: str) -> list[dict]:
+        # Matches on the stored normalized name, so case and punctuation don't matter
+        normalized = normalize_name(query)
+        if not normalized:
+            return []
+        return self._query(
+            f"SELECT {_PANTRY_SELECT} FROM pantry WHERE device_id = ? AND name_norm LIKE ? ESCAPE '\\'",
+            (device_id, _like_pattern(normalized)),
+        )
+
+
+def _order_expression(column: str) -> str:
+    # "times->cook" style JSON paths are read out of the stored record
+    if "->" in column:
+        return f"json_extract(data, '$.{'.'.join(column.split('->'))}')"
+    return column
+
+
+class SQLiteRecipeRepository(RecipeRepository):
+    """
+    Recipe catalog in SQLite: filterable columns plus the full record as JSON, and an
+    (ingredient, recipe_id) table so "contains all ingredients" is an index lookup.
+    """
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+
+    def _records(self, sql: str, params=()) -> list[dict]:
+        return [json.loads(r["data"]) for r in self.store.connection().execute(sql, params).fetchall()]
+
+    def get(self, recipe_id: str) -> dict | None:
+        rows = self._records("SELECT data FROM recipes WHERE id = ?", (recipe_id,))
+        return rows[0] if rows else None
+
+    def get_many(self, recipe_ids: list[str]) -> list[dict]:
+        if not recipe_ids:
+            return []
+        placeholders = ", ".join("?" for _ in recipe_ids)
+        return self._records(f"SELECT data FROM recipes WHERE id IN ({placeholders})", list(recipe_ids))
+
+    def search_text(self, query: str, limit: int = 20) -> list[dict]:
+        return self._records(
+            "SELECT data FROM recipes WHERE name_norm LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\' LIMIT ?",
+            (_like_pattern(normalize_name(query) or query), _like_pattern(query), limit),
+        )
+
+    def search_ingredients(self, ingredients: list[str], limit: int = 20) -> list[dict]:
+        wanted = sorted(set(ingredients))
+        if not wanted:
+            return self._records("SELECT data FROM recipes LIMIT ?", (limit,))
+        placeholders = ", ".join("?" for _ in wanted)
+        return self._records(
+            f"""SELECT data FROM recipes WHERE id IN (
+                    SELECT recipe_id FROM recipe_ingredients WHERE ingredient IN ({placeholders})
+                    GROUP BY recipe_id HAVING COUNT(*) = ?
+                ) LIMIT ?""",
+            (*wanted, len(wanted), limit),
+        )
+
+    def filter(self, filters: dict, sort_by: str = "name", descending: bool = False, limit: int = 50) -> list[dict]:
+        clauses, params = [], []
+        for column, value in filters.items():
+            if column not in RECIPE_FILTER_COLUMNS:
+                raise ValueError(f"Unsupported recipe filter: {column}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        sql = "SELECT data FROM recipes"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if sort_by in RECIPE_SORT_COLUMNS:
+            expr = _order_expression(RECIPE_SORT_COLUMNS[sort_by])
+            # Match Postgres: NULLs last ascending, first descending
+            sql += f" ORDER BY ({expr} IS NULL) {'DESC' if descending else 'ASC'}, {expr} {'DESC' if descending else 'ASC'}"
+        sql += " LIMIT ?"
+        return self._records(sql, (*params, limit))
+
+    def upsert(self, rows: list[dict]) -> list[dict]:
+        conn = self.store.connection()
+        with conn:
+            for row in rows:
+                numbers = numeric_values(row)
+                conn.execute(
+                    """INSERT OR REPLACE INTO recipes (id, name, name_norm, description, difficulty,
+                           dietary_restrictions, cuisine, maincategory, subcategory, dish_type,
+                           ratings, total_minutes, kcal, data)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        row["id"], row.get("name"), normalize_name(row.get("name")), row.get("description"),
+                        row.get("difficulty"), row.get("dietary_restrictions"), row.get("cuisine"),
+                        row.get("maincategory"), row.get("subcategory"), row.get("dish_type"),
+                        None if numbers["ratings"] != numbers["ratings"] else numbers["ratings"],
+                        None if numbers["total_minutes"] != numbers["total_minutes"] else numbers["total_minutes"],
+                        None if numbers["kcal"] != numbers["kcal"] else numbers["kcal"],
+                        json.dumps(row, ensure_ascii=False),
+                    ),
+                )
+                conn.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (row["id"],))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO recipe_ingredients (ingredient, recipe_id) VALUES (?, ?)",
+                    [(ingredient, row["id"]) for ingredient in row.get("cleaned_ingredients_list") or []],
+                )
+        return rows
+
+    def missing_images(self, after_id: str = "", limit: int = 500) -> list[dict]:
+        rows = self.store.connection().execute(
+            """SELECT id, name, json_extract(data, '$.url') AS url FROM recipes
+               WHERE id > ? AND json_extract(data, '$.image_url') IS NULL ORDER BY id LIMIT ?""",
+            (after_id or "", limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def set_image_urls(self, urls: dict[str, str]) -> int:
+        conn = self.store.connection()
+        with conn:
+            cursor = conn.executemany(
+                "UPDATE recipes SET data = json_set(data, '$.image_url', ?) WHERE id = ?",
+                [(url, recipe_id) for recipe_id, url in urls.items()],
+            )
+        return cursor.rowcount
@@ -0,0 +1,158 @@
+import json
+from repositories.base import (
+    PantryRepository, RecipeRepository, PANTRY_COLUMNS, RECIPE_SORT_COLUMNS, SERVER_COLUMNS, pantry_changes,
+)
+
+
+class SupabasePantryRepository(PantryRepository):
+    """
+    Pantry storage on the Supabase 'pantry' table. `client_getter` is called per
+    operation so the lazily-created (or test-injected) client is always used.
+
+    Revisions and tombstones rely on the tables, trigger and functions in sql/pantry_sync.sql:
+    the trigger stamps written rows inside the write's own transaction, so nothing here
+    allocates revisions. Bulk updates use the function in sql/pantry_bulk.sql.
+    """
+
+    def __init__(self, client_getter):
+        self._client = client_getter
+
+    def _table(self):
+        return self._client().table('pantry')
+
+    def _delete(self, device_id: str, item_ids: list[str]) -> list[dict]:
+        # The delete and its tombstones commit together, so a sync never sees one without the other
+        return self._client().rpc('delete_pantry_items', {
+            'p_device_id': device_id, 'p_item_ids': [str(item_id) for item_id in item_ids],
+        }).execute().data or []
+
+    def list_items(self, device_id: str) -> list[dict]:
+        return self._table().select('*').eq('device_id', device_id).execute().data or []
+
+    def list_all_items(self) -> list[dict]:
+        return self._table().select('*').execute().data or []
+
+    def get_item(self, device_id: str, item_id: str) -> dict | None:
+        res = self._table().select('*').eq('id', item_id).eq('device_id', device_id).execute()
+        return res.data[0] if res.data else None
+
+    def insert_items(self, items: list[dict]) -> list[dict]:
+        items = [{k: v for k, v in item.items() if k != 'revision'} for item in items]
+        return self._table().insert(items).execute().data or []
+
+    def update_item(self, device_id: str, item_id: str, changes: dict) -> dict | None:
+        changes = {k: v for k, v in changes.items() if k in PANTRY_COLUMNS and k not in SERVER_COLUMNS}
+        if not changes:
+            return self.get_item(device_id, item_id)
+        res = self._table().update(changes).eq('id', item_id).eq('device_id', device_id).execute()
+        return res.data[0] if res.data else None
+
+    def delete_item(self, device_id: str, item_id: str) -> dict | None:
+        rows = self._delete(device_id, [item_id])
+        return rows[0] if rows else None
+
+    def update_items(self, device_id: str, updates: dict[str, dict]) -> list[dict]:
+        # One statement for every item's own change set, so the whole edit is one round trip
+        # and one transaction (see sql/pantry_bulk.sql)
+        rows, unchanged = [], []
+        for item_id, changes in updates.items():
+            changes = {k: v for k, v in changes.items() if k in PANTRY_COLUMNS and k not in SERVER_COLUMNS}
+            if changes:
+                rows.append({'id': str(item_id), 'changes': changes})
+            else:
+                unchanged.append(item_id)
+        updated = []
+        if rows:
+            updated.extend(self._client().rpc('update_pantry_items', {
+                'p_device_id': device_id, 'p_rows': rows,
+            }).execute().data or [])
+        if unchanged:
+            updated.extend(self._table().select('*').in_('id', unchanged).eq('device_id', device_id).execute().data or [])
+        return updated
+
+    def delete_items(self, device_id: str, item_ids: list[str]) -> list[dict]:
+        if not item_ids:
+            return []
+        return self._delete(device_id, item_ids)
+
+    def changes_since(self, device_id: str, since: int) -> dict:
+        client = self._client()
+        # Counter first: anything committed after this read just shows up again next sync
+        counter = client.table('pantry_revisions').select('revision').eq('device_id', device_id).execute().data
+        current = counter[0]['revision'] if counter else 0
+        full = since <= 0 or since > current
+        if full:
+            return pantry_changes(since, current, self.list_items(device_id), [], full)
+        rows = self._table().select('*').eq('device_id', device_id).gt('revision', since).execute().data or []
+        tombstones = (client.table('pantry_tombstones').select('item_id, revision')
+                      .eq('device_id', device_id).gt('revision', since).execute().data or [])
+        return pantry_changes(since, current, rows, tombstones, full)
+
+    def search_items(self, device_id: str, query: str) -> list[dict]:
+        return self._table().select('*').ilike('name', f'%{query}%').eq('device_id', device_id).execute().data or []
+
+
+class SupabaseRecipeRepository(RecipeRepository):
+    """
+    Recipe reads against the Supabase 'recipes' table.
+    """
+
+    def __init__(self, client_getter):
+        self._client = client_getter
+
+    def _table(self):
+        return self._client().table('recipes')
+
+    def get(self, recipe_id: str) -> dict | None:
+        res = self._table().select('*').eq('id', recipe_id).limit(1).execute()
+        return res.data[0] if res.data else None
+
+    def get_many(self, recipe_ids: list[str]) -> list[dict]:
+        if not recipe_ids:
+            return []
+        return self._table().select('*').in_('id', recipe_ids).execute().data or []
+
+    def search_text(self, query: str, limit: int = 20) -> list[dict]:
+        pattern = f"%{query}%"
+        return (
+            self._table()
+            .select('*')
+            .or_(f"name.ilike.{pattern},description.ilike.{pattern}")
+            .limit(limit)
+            .execute()
+            .data or []
+        )
+
+    def search_ingredients(self, ingredients: list[str], limit: int = 20) -> list[dict]:
+        return (
+            self._table()
+            .select('*')
+            .filter('cleaned_ingredients_list', 'cs', json.dumps(ingredients))
+            .limit(limit)
+            .execute()
+            .data or []
+        )
+
+    def filter(self, filters: dict, sort_by: str = "name", descending: bool = False, limit: int = 50) -> list[dict]:
+        query = self._table().select('*')
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if sort_by in RECIPE_SORT_COLUMNS:
+            query = query.order(RECIPE_SORT_COLUMNS[sort_by], desc=descending)
+        return query.limit(limit).execute().data or []
+
+    def upsert(self, rows: list[dict]) -> list[dict]:
+        return self._table().upsert(rows, on_conflict='id').execute().data or []
+
+    def missing_images(self, after_id: str = "", limit: int = 500) -> list[dict]:
+        query = self._table().select('id,name,url').is_('image_url', 'null')
+        if after_id:
+            query = query.gt('id', after_id)
+        return query.order('id').limit(limit).execute().data or []
+
+    def set_image_urls(self, urls: dict[str, str]) -> int:
+        # Every row gets a different value, which a PostgREST update can't express: see sql/recipe_images.sql
+        if not urls:
+            return 0
+        rows = [{"id": recipe_id, "image_url": url} for recipe_id, url in urls.items()]
+        return self._client().rpc('set_recipe_image_urls', {'p_rows': rows}).execute().data or 0
@@ -0,0 +1,72 @@
+# routes/images.py
+
+import hashlib
+from flask import Blueprint, Response, request, jsonify
+from config import Config
+from db import get_recipe_repository
+from recipes import get_catalog
+from thumbnails import FORMATS, ImageSourceError, get_thumbnailer
+from utils.logger import logger, SAMPLED
+from utils.metrics import timed
+
+images_bp = Blueprint('images', __name__)
+
+
+def recipe_image_source(recipe_id: str) -> str | None:
+    """The recipe's original image_url: from the catalog snapshot, else the repository (e.g. images added since ingestion)."""
+    catalog = get_catalog()
+    recipe = catalog.get(recipe_id) if catalog else None
+    if not recipe or not recipe.get('image_url'):
+        recipe = get_recipe_repository().get(recipe_id)
+    return (recipe or {}).get('image_url') or None
+
+
+def negotiate_format() -> str | None:
+    fmt = request.args.get('fmt')
+    if fmt:
+        fmt = fmt.lower().replace('jpg', 'jpeg')
+        return fmt if fmt in FORMATS else None
+    return 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+
+
+@images_bp.route('/images/<recipe_id>', methods=['GET'])
+def recipe_image(recipe_id):
+    """
+    The recipe's image resized to ?w= pixels wide (snapped up to a configured width),
+    as WebP when the client accepts it and JPEG otherwise. Variants are rendered once
+    and served from the disk cache with long-lived Cache-Control and an ETag.
+    """
+    try:
+        width = int(request.args.get('w', Config.IMAGE_DEFAULT_WIDTH))
+    except ValueError:
+        return jsonify(error="w must be an integer"), 400
+    if width <= 0:
+        return jsonify(error="w must be positive"), 400
+    fmt = negotiate_format()
+    if fmt is None:
+        return jsonify(error=f"fmt must be one of: {', '.join(FORMATS)}"), 400
+
+    try:
+        with timed("db"):
+            source_url = recipe_image_source(recipe_id)
+        if not source_url:
+            return jsonify(error="Recipe has no image"), 404
+
+        thumbnailer = get_thumbnailer()
+        with timed("image"):
+            data = thumbnailer.variant(source_url, thumbnailer.snap_width(width), fmt)
+    except ImageSourceError as e:
+        logger.warning("Image for recipe %s unavailable: %s", recipe_id, e)
+        return jsonify(error="Source image unavailable"), 502
+    except Exception as e:
+        logger.error("Error in /images/<recipe_id> endpoint", exc_info=e)
+        return jsonify(error=str(e)), 500
+
+    logger.info("Served %s image for recipe %s (%d bytes)", fmt, recipe_id, len(data), extra=SAMPLED)
+    response = Response(data, mimetype=FORMATS[fmt])
+    response.set_etag(hashlib.blake2b(data, digest_size=12).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.IMAGE_CACHE_MAX_AGE_SECONDS
+    if 'fmt' not in request.args:
+        response.vary.add('Accept')
+    return response.make_conditional(request)
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
-from db import supabase
-from utils.logger import logger
+from db import get_pantry_repository
+from repositories.base import PANTRY_COLUMN_TYPES
+from utils.logger import logger, SAMPLED
+from utils.metrics import timed
+from config import Config
 from datetime import datetime, timedelta # Import these for date handling
 
 pantry_bp = Blueprint('pantry', __name__)
@@ -12,16 +15,99 @@ def get_device_id():
     return device_id
 
 
+def normalize_dates(data: dict) -> dict:
+    """
+    Rewrites 'expiry' / 'purchase_date' in `data` as YYYY-MM-DD.
+    Raises ValueError naming the offending field.
+    """
+    if 'expiry' in data:
+        try:
+            data['expiry'] = datetime.fromisoformat(data['expiry']).date().isoformat()
+        except (TypeError, ValueError):
+            raise ValueError("Invalid expiry date format")
+
+    if 'purchase_date' in data:
+        try:
+            data['purchase_date'] = datetime.fromisoformat(data['purchase_date']).date().isoformat()
+        except (TypeError, ValueError):
+            raise ValueError("Invalid purchase date format")
+    return data
+
+
+def validate_changes(changes: dict) -> dict:
+    """
+    Checks that every field is a client-writable pantry column holding a value of its
+    type, so one bad entry can't fail a whole batch in the database.
+    Raises ValueError naming the offending field.
+    """
+    for field, value in changes.items():
+        expected = PANTRY_COLUMN_TYPES.get(field)
+        if expected is None:
+            raise ValueError(f"Unknown or read-only field '{field}'")
+        if value is None and field != "name":
+            continue
+        # bool is an int subclass, but true isn't a quantity
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise ValueError(f"Invalid value for '{field}'")
+    if "name" in changes and not changes["name"].strip():
+        raise ValueError("Invalid value for 'name'")
+    return changes
+
+
+def get_bulk_list(key: str) -> list:
+    """The non-empty `key` list from a bulk request body; raises ValueError otherwise."""
+    data = request.get_json(silent=True)
+    entries = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Invalid request payload. Expected a non-empty list of '{key}'.")
+    if len(entries) > Config.PANTRY_BULK_MAX_ITEMS:
+        raise ValueError(f"At most {Config.PANTRY_BULK_MAX_ITEMS} {key} per request.")
+    return entries
+
+
+def summarize(results: list[dict]) -> dict:
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
+
+
 @pantry_bp.route('/pantry', methods=['GET'])
 def list_pantry():
     try:
         device_id = get_device_id()
-        res = supabase.table('pantry').select('*').eq('device_id', device_id).execute()
-        return jsonify(res.data), 200
+        with timed("db"):
+            items = get_pantry_repository().list_items(device_id)
+        return jsonify(items), 200
     except Exception as e:
         logger.error("Error fetching pantry", exc_info=e)
         return jsonify(error=str(e)), 500
 
+@pantry_bp.route('/pantry/changes', methods=['GET'])
+def pantry_changes():
+    """
+    Delta sync: items inserted or updated and ids deleted after revision `since`.
+    Clients store the returned `revision` and send it back next time; since=0 (or a
+    "reset": true response) means the full pantry, replacing local state.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify(error="since must be an integer revision"), 400
+    try:
+        device_id = get_device_id()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    try:
+        with timed("db"):
+            changes = get_pantry_repository().changes_since(device_id, max(since, 0))
+        return jsonify(changes), 200
+    except Exception as e:
+        logger.error("Error fetching pantry changes", exc_info=e)
+        return jsonify(error=str(e)), 500
+
+
 @pantry_bp.route('/pantry/<item_id>', methods=['PUT'])
 def update_pantry_item(item_id):
     try:
@@ -30,54 +116,134 @@ def update_pantry_item(item_id):
             return jsonify(error="No data provided"), 400
 
         # Validate and process dates if they exist
-        if 'expiry' in data:
-            try:
-                data['expiry'] = datetime.fromisoformat(data['expiry']).date().isoformat()
-            except ValueError:
-                return jsonify(error="Invalid expiry date format"), 400
-
-        if 'purchase_date' in data:
-            try:
-                data['purchase_date'] = datetime.fromisoformat(data['purchase_date']).date().isoformat()
-            except ValueError:
-                return jsonify(error="Invalid purchase date format"), 400
+        try:
+            normalize_dates(data)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
 
         device_id = get_device_id()
-        res = supabase.table('pantry').update(data).eq('id', item_id).eq('device_id', device_id).execute()
+        with timed("db"):
+            updated = get_pantry_repository().update_item(device_id, item_id, data)
         
-        if not res.data:
+        if not updated:
             return jsonify(error="Item not found"), 404
             
-        return jsonify(res.data[0]), 200
+        return jsonify(updated), 200
     except Exception as e:
-        logger.error(f"Error updating pantry item {item_id}", exc_info=e)
+        logger.error("Error updating pantry item %s", item_id, exc_info=e)
         return jsonify(error=str(e)), 500
 
 @pantry_bp.route('/pantry/<item_id>', methods=['DELETE'])
 def delete_pantry_item(item_id):
     try:
-        logger.info(f"Attempting to delete pantry item with ID: {item_id}")
+        logger.info("Attempting to delete pantry item with ID: %s", item_id, extra=SAMPLED)
         
         device_id = get_device_id()
-        check = supabase.table('pantry').select('id').eq('id', item_id).eq('device_id', device_id).execute()
-        if not check.data:
-            logger.warning(f"Item not found for deletion: {item_id}")
+        with timed("db"):
+            deleted = get_pantry_repository().delete_item(device_id, item_id)
+        if not deleted:
+            logger.warning("Item not found for deletion: %s", item_id)
             return jsonify(error="Item not found"), 404
-
-        # Perform the deletion
-        res = supabase.table('pantry').delete().eq('id', item_id).eq('device_id', device_id).execute()
-        
-        if not res.data:
-            logger.error(f"Deletion failed for item {item_id}: No data returned")
-            return jsonify(error="Failed to delete item"), 500
             
-        logger.info(f"Successfully deleted item {item_id}")
+        logger.info("Successfully deleted item %s", item_id, extra=SAMPLED)
         return jsonify({"message": "Item deleted successfully", "deleted_id": item_id}), 200
         
     except Exception as e:
-        logger.error(f"Error deleting pantry item {item_id}", exc_info=e)
+        logger.error("Error deleting pantry item %s", item_id, exc_info=e)
+        return jsonify(error=str(e)), 500
+
+@pantry_bp.route('/pantry/bulk', methods=['PATCH'])
+def bulk_update_pantry_items():
+    """
+    Updates many items at once: {"items": [{"id": ..., <changed fields>}, ...]}.
+    Every entry is validated first; the valid ones are applied as one repository batch
+    and each entry gets its own status: "updated", "not_found" or "invalid".
+    """
+    try:
+        device_id = get_device_id()
+        entries = get_bulk_list('items')
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    results, updates = [], {}
+    for entry in entries:
+        item_id = str(entry['id']) if isinstance(entry, dict) and entry.get('id') else None
+        if item_id is None:
+            results.append({"id": None, "status": "invalid", "error": "Missing 'id'"})
+            continue
+        if item_id in updates:
+            results.append({"id": item_id, "status": "invalid", "error": "Duplicate id in request"})
+            continue
+        changes = {k: v for k, v in entry.items() if k != 'id'}
+        if not changes:
+            results.append({"id": item_id, "status": "invalid", "error": "No changes provided"})
+            continue
+        try:
+            updates[item_id] = normalize_dates(validate_changes(changes))
+        except ValueError as e:
+            results.append({"id": item_id, "status": "invalid", "error": str(e)})
+            continue
+        results.append({"id": item_id, "status": None})
+
+    try:
+        with timed("db"):
+            updated = get_pantry_repository().update_items(device_id, updates) if updates else []
+    except Exception as e:
+        logger.error("Error bulk-updating %s pantry items", len(updates), exc_info=e)
         return jsonify(error=str(e)), 500
 
+    updated_by_id = {str(row['id']): row for row in updated}
+    for result in results:
+        if result["status"] is None:
+            row = updated_by_id.get(result["id"])
+            result["status"] = "updated" if row else "not_found"
+            if row:
+                result["item"] = row
+    logger.info("Bulk update: %d items, %d applied", len(results), len(updated), extra=SAMPLED)
+    return jsonify(results=results, summary=summarize(results)), 200
+
+
+@pantry_bp.route('/pantry/bulk', methods=['DELETE'])
+def bulk_delete_pantry_items():
+    """
+    Deletes many items at once: {"ids": [...]}, as one repository batch.
+    Each id gets its own status: "deleted", "not_found" or "invalid".
+    """
+    try:
+        device_id = get_device_id()
+        entries = get_bulk_list('ids')
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    results, item_ids = [], []
+    seen = set()
+    for entry in entries:
+        if not isinstance(entry, (str, int)) or isinstance(entry, bool) or str(entry) == "":
+            results.append({"id": entry, "status": "invalid", "error": "Item ids must be strings"})
+            continue
+        item_id = str(entry)
+        if item_id in seen:
+            results.append({"id": item_id, "status": "invalid", "error": "Duplicate id in request"})
+            continue
+        seen.add(item_id)
+        item_ids.append(item_id)
+        results.append({"id": item_id, "status": None})
+
+    try:
+        with timed("db"):
+            deleted = get_pantry_repository().delete_items(device_id, item_ids) if item_ids else []
+    except Exception as e:
+        logger.error("Error bulk-deleting %s pantry items", len(item_ids), exc_info=e)
+        return jsonify(error=str(e)), 500
+
+    deleted_ids = {str(row['id']) for row in deleted}
+    for result in results:
+        if result["status"] is None:
+            result["status"] = "deleted" if result["id"] in deleted_ids else "not_found"
+    logger.info("Bulk delete: %d ids, %d deleted", len(results), len(deleted), extra=SAMPLED)
+    return jsonify(results=results, summary=summarize(results)), 200
+
+
 @pantry_bp.route('/pantry/confirm-add', methods=['POST'])
 def confirm_add_items():
     """
@@ -108,14 +274,14 @@ def confirm_add_items():
         # Basic validation and defaulting for each field
         name = item.get("name")
         if not name:
-            logger.warning(f"Skipping item due to missing 'name' during confirmation: {item}")
+            logger.warning("Skipping item due to missing 'name' during confirmation: %s", item)
             continue # Don't insert items without a name
 
         quantity = item.get("quantity", 1)
         try:
             quantity = int(quantity)
         except (ValueError, TypeError):
-            logger.warning(f"Invalid 'quantity' value '{item.get('quantity')}' for item '{name}', defaulting to 1.")
+            logger.warning("Invalid 'quantity' value '%s' for item '%s', defaulting to 1.", item.get('quantity'), name)
             quantity = 1
 
         is_opened = bool(item.get("is_opened", False))
@@ -127,7 +293,7 @@ def confirm_add_items():
                 # Attempt to re-parse or validate ISO format
                 expiry_date = datetime.fromisoformat(expiry_date).date().isoformat()
             except ValueError:
-                logger.warning(f"Invalid 'expiry' date format '{expiry_date}' for item '{name}', defaulting to 7 days from now.")
+                logger.warning("Invalid 'expiry' date format '%s' for item '%s', defaulting to 7 days from now.", expiry_date, name)
                 expiry_date = (now_utc.date() + timedelta(days=7)).isoformat()
         else:
             expiry_date = (now_utc.date() + timedelta(days=7)).isoformat() # Default expiry if none provided
@@ -137,7 +303,7 @@ def confirm_add_items():
             try:
                 purchase_date = datetime.fromisoformat(purchase_date).date().isoformat()
             except ValueError:
-                logger.warning(f"Invalid 'purchase_date' format '{purchase_date}' for item '{name}', defaulting to today.")
+                logger.warning("Invalid 'purchase_date' format '%s' for item '%s', defaulting to today.", purchase_date, name)
                 purchase_date = today_iso
         else:
             purchase_date = today_iso # Default purchase date if none provided
@@ -163,11 +329,11 @@ def confirm_add_items():
         return jsonify(error="No valid items to insert after server-side processing."), 400
 
     try:
-        # Perform the actual Supabase insert
-        res = supabase.table('pantry').insert(processed_items_for_db).execute()
-        return jsonify(inserted=res.data), 201
+        with timed("db"):
+            inserted = get_pantry_repository().insert_items(processed_items_for_db)
+        return jsonify(inserted=inserted), 201
     except Exception as e:
-        logger.error("Supabase insert error during pantry confirmation", exc_info=e)
+        logger.error("Insert error during pantry confirmation", exc_info=e)
         return jsonify(error=f"Failed to add items to pantry: {e}"), 500
 
 @pantry_bp.route('/pantry/search', methods=['GET'])
@@ -178,9 +344,9 @@ def search_pantry():
             return jsonify([]), 200
 
         device_id = get_device_id()
-        res = supabase.table('pantry').select('*').ilike('name', f'%{query}%').eq('device_id', device_id).execute()
-
-        return jsonify(res.data), 200
+        with timed("db"):
+            items = get_pantry_repository().search_items(device_id, query)
+        return jsonify(items), 200
     except Exception as e:
         logger.error("Error searching pantry", exc_info=e)
         return jsonify(error=str(e)), 500
\ No newline at end of file
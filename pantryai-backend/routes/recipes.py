@@ -1,22 +1,27 @@
 from flask import Blueprint, request, jsonify
-from recipes import match_recipes
-from utils.logger import logger
-from db import supabase  # To fetch pantry items
+from recipes import match_recipes, filter_mask, get_catalog, get_recipe_index, get_recipe_records
+from match_pipeline import MatchPipeline, StageTimeout, get_embedding_cache, stage_executor
+from use_it_up import build_ingredient_matrix, rank_pantry_overlap, rank_use_it_up
+from recipe_filters import FILTER_ATTRIBUTES, MAX_MINUTES_FILTERS, build_attribute_bitmaps
+from utils.logger import logger, SAMPLED
+from utils.metrics import timed
+from config import Config
+from db import get_pantry_repository, get_recipe_repository
 from utils.embeddings import generate_text_embedding, parse_ingredient_name
-import json
 
 recipes_bp = Blueprint('recipes', __name__)
 
-def get_pantry_items_text_for_embedding() -> str:
+def get_pantry_for_match() -> tuple[str, list[str]]:
     """
-    Fetches current pantry items from Supabase, cleans their names, and concatenates them
-    into a single string suitable for embedding.
+    Fetches current pantry items from the pantry repository and returns the text to
+    embed (cleaned names with quantities and units, comma-separated) along with the
+    items' raw names, which the degraded lexical match ranks by.
     """
     try:
-        res = supabase.table('pantry').select('name', 'quantity', 'unit').execute()
-        pantry_items_data = res.data or []
+        pantry_items_data = get_pantry_repository().list_all_items()
 
         item_strings = []
+        names = []
         for item in pantry_items_data:
             name = item.get('name', '').strip()
             cleaned_name = parse_ingredient_name(name)
@@ -32,39 +37,182 @@ def get_pantry_items_text_for_embedding() -> str:
                 parts.append(unit)
             parts.append(cleaned_name)
             item_strings.append(" ".join(parts))
+            names.append(name)
 
-        return ", ".join(item_strings)
+        return ", ".join(item_strings), names
 
     except Exception as e:
-        logger.error(f"Error fetching pantry items for embedding: {e}", exc_info=True)
-        return ""
+        logger.error("Error fetching pantry items for embedding: %s", e, exc_info=True)
+        return "", []
+
+
+def request_budget() -> float:
+    """
+    Seconds this /recipes/match request may take: MATCH_REQUEST_TIMEOUT_SECONDS, or less
+    when the client sends X-Request-Timeout (it gives up after that anyway).
+    """
+    budget = Config.MATCH_REQUEST_TIMEOUT_SECONDS
+    try:
+        asked = float(request.headers.get('X-Request-Timeout', ''))
+    except ValueError:
+        return budget
+    return min(budget, asked) if asked > 0 else budget
+
+
+def prepare_search(filters: dict | None):
+    """The index generation to search and its filter mask; runs while the pantry is fetched and embedded."""
+    state = get_recipe_index()
+    return state, filter_mask(state, filters)
+
+
+def lexical_match(state, pantry_names: list[str], k: int, mask) -> dict | None:
+    """
+    Degraded /recipes/match for when embeddings are unavailable: recipes ranked by
+    ingredient overlap with the pantry over the catalog snapshot, flagged as degraded.
+    None when there is no snapshot to rank.
+    """
+    matrix = state.cached("ingredient_matrix", build_ingredient_matrix)
+    if matrix is None:
+        return None
+    ranked = rank_pantry_overlap(matrix, pantry_names, k=k, mask=mask)
+    results = []
+    for entry in ranked:
+        recipe = state.catalog.record(entry["row"])
+        recipe['score'] = entry["score"]
+        recipe['matched_ingredients'] = entry["matched"]
+        results.append(recipe)
+    return {"matched_recipes": results, "degraded": True, "degraded_reason": "embedding_unavailable"}
 
 
 @recipes_bp.route('/recipes/match', methods=['GET'])
 def match_recipes_from_pantry():
+    k_param = request.args.get('k', 5)
     try:
-        pantry_text = get_pantry_items_text_for_embedding()
-        if not pantry_text:
-            return jsonify(message="Your pantry is empty. Please add items to get recipe suggestions."), 200
-
-        pantry_embedding = generate_text_embedding(pantry_text)
-        if not pantry_embedding:
-            return jsonify(error="Failed to generate embedding for your pantry items. Please try again."), 500
+        k_param = int(k_param)
+    except ValueError:
+        k_param = 5
 
-        k_param = request.args.get('k', 5)
+    # Optional MMR re-ranking: ?diversity=<lambda in [0, 1]>, or ?diverse=true for the default
+    diversity = None
+    if request.args.get('diversity') is not None:
         try:
-            k_param = int(k_param)
+            diversity = min(max(float(request.args['diversity']), 0.0), 1.0)
         except ValueError:
-            k_param = 5
+            return jsonify(error="diversity must be a number between 0 and 1"), 400
+    elif request.args.get('diverse', '').lower() in ('1', 'true', 'yes'):
+        diversity = Config.MMR_DEFAULT_LAMBDA
+
+    # Optional pre-filters applied inside the vector search, e.g. ?maincategory=baking&max_minutes=30
+    filters = {name: request.args[name] for name in (*FILTER_ATTRIBUTES, *MAX_MINUTES_FILTERS) if request.args.get(name)}
 
-        results = match_recipes(pantry_embedding, k=k_param)
+    try:
+        # Stages that don't depend on each other overlap: the index (re)load and filter mask are
+        # prepared while the pantry is fetched and embedded, and the recipes the last match for
+        # this pantry returned are prefetched while the new one is computed. Without an embedding
+        # (Gemini down, too slow, or its circuit open) the match degrades to ingredient overlap
+        with MatchPipeline(request_budget()) as pipeline:
+            prepared = pipeline.submit(prepare_search, filters or None)
+            pantry_text, pantry_names = pipeline.wait("pantry_fetch", pipeline.submit(get_pantry_for_match))
+            if not pantry_text:
+                return jsonify(message="Your pantry is empty. Please add items to get recipe suggestions."), 200
+
+            cache = get_embedding_cache()
+            embedding = cache.get(pantry_text, generate_text_embedding, stage_executor.get())
+            try:
+                state, mask = pipeline.wait("prepare", prepared)
+            except ValueError as e:
+                return jsonify(error=str(e)), 400
+
+            params = (k_param, diversity, tuple(sorted(filters.items())), state.version)
+            likely_ids = cache.likely_ids(pantry_text, params)
+            prefetched = pipeline.submit(get_recipe_records, likely_ids, state) if likely_ids else None
+
+            try:
+                pantry_embedding = pipeline.wait("embed", embedding)
+            except StageTimeout as e:
+                logger.warning("/recipes/match embedding gave up: %s", e)
+                pantry_embedding = None
+            if not pantry_embedding:
+                # Gemini is failing, slow or its circuit is open: rank locally instead
+                with timed("lexical_match"):
+                    results = lexical_match(state, pantry_names, k_param, mask)
+                if results is None:
+                    return jsonify(error="Recipe matching is temporarily unavailable. Please try again."), 503, \
+                        {"Retry-After": str(int(Config.GEMINI_BREAKER_RESET_SECONDS))}
+                return jsonify(results), 200
+
+            try:
+                results = match_recipes(pantry_embedding, k=k_param, diversity=diversity, filters=filters or None,
+                                        state=state, mask=mask, prefetched=prefetched, pipeline=pipeline)
+            except ValueError as e:
+                return jsonify(error=str(e)), 400
+            cache.remember_ids(pantry_text, params, [r['id'] for r in results['matched_recipes'] if 'id' in r])
         return jsonify(results), 200
 
+    except StageTimeout as e:
+        logger.warning("/recipes/match gave up: %s", e)
+        return jsonify(error=f"Matching took too long ({e.stage})."), 504
     except Exception as e:
         logger.error("Error in /recipes/match endpoint", exc_info=e)
         return jsonify(error=str(e)), 500
 
 
+@recipes_bp.route('/recipes/facets', methods=['GET'])
+def recipe_facets():
+    """Values (with recipe counts) accepted by the /recipes/match attribute filters."""
+    try:
+        bitmaps = get_recipe_index().cached("attribute_bitmaps", build_attribute_bitmaps)
+        if bitmaps is None:
+            return jsonify(error="Recipe catalog snapshot is not available."), 503
+        return jsonify(facets=bitmaps.facets(), time_filters=list(MAX_MINUTES_FILTERS)), 200
+    except Exception as e:
+        logger.error("Error in /recipes/facets endpoint", exc_info=e)
+        return jsonify(error=str(e)), 500
+
+
+@recipes_bp.route('/recipes/use-it-up', methods=['GET'])
+def use_it_up():
+    """
+    Recipes that consume the device's soonest-expiring pantry items, scored locally
+    over the whole catalog snapshot.
+    """
+    device_id = request.headers.get("X-Device-ID")
+    if not device_id:
+        return jsonify(error="Missing X-Device-ID header"), 400
+    try:
+        k_param = int(request.args.get('k', 10))
+    except ValueError:
+        k_param = 10
+
+    try:
+        with timed("pantry_fetch"):
+            pantry_items = get_pantry_repository().list_items(device_id)
+
+        state = get_recipe_index()
+        with timed("score"):
+            matrix = state.cached("ingredient_matrix", build_ingredient_matrix)
+            if matrix is None:
+                return jsonify(error="Recipe catalog snapshot is not available."), 503
+            ranked, at_risk = rank_use_it_up(matrix, pantry_items, k=k_param)
+
+        if not at_risk:
+            return jsonify(message="Nothing in your pantry is close to expiring.", recipes=[], at_risk=[]), 200
+
+        with timed("hydrate"):
+            results = []
+            for entry in ranked:
+                recipe = state.catalog.record(entry["row"])
+                recipe['use_it_up_score'] = entry["score"]
+                recipe['pantry_coverage'] = entry["coverage"]
+                recipe['uses_expiring'] = entry["uses"]
+                results.append(recipe)
+        return jsonify(recipes=results, at_risk=at_risk), 200
+
+    except Exception as e:
+        logger.error("Error in /recipes/use-it-up endpoint", exc_info=e)
+        return jsonify(error=str(e)), 500
+
+
 @recipes_bp.route('/recipes/search', methods=['GET'])
 def search_recipes():
     query = request.args.get('query', '')
@@ -73,39 +221,25 @@ def search_recipes():
     if not query and not ingredients:
         return jsonify(error="Please provide either a search query or ingredients"), 400
 
-    logger.info(f"Searching recipes with query: {query} or ingredients: {ingredients}")
+    logger.info("Searching recipes with query: %s or ingredients: %s", query, ingredients, extra=SAMPLED)
 
     try:
         if query:
-            # Text-based search using ilike for case-insensitive partial matching
-            search_query = f"%{query}%"
-            res = (
-                supabase
-                .table('recipes')
-                .select('*')
-                .or_(f"name.ilike.{search_query},description.ilike.{search_query}")
-                .limit(20)
-                .execute()
-            )
-            logger.info(f"Found {len(res.data)} recipes matching query: {query}")
+            # Case-insensitive partial match on name or description
+            with timed("db"):
+                results = get_recipe_repository().search_text(query, limit=20)
+            logger.info("Found %d recipes matching query: %s", len(results), query, extra=SAMPLED)
         else:
             # Ingredient-based search
             ingredients_list = [i.strip().lower() for i in ingredients.split(',') if i.strip()]
-            payload = json.dumps(ingredients_list)
-            res = (
-                supabase
-                .table('recipes')
-                .select('*')
-                .filter('cleaned_ingredients_list', 'cs', payload)
-                .limit(20)
-                .execute()
-            )
-            logger.info(f"Found {len(res.data)} recipes matching ingredients: {ingredients_list}")
-
-        return jsonify(results=res.data), 200
+            with timed("db"):
+                results = get_recipe_repository().search_ingredients(ingredients_list, limit=20)
+            logger.info("Found %d recipes matching ingredients: %s", len(results), ingredients_list, extra=SAMPLED)
+
+        return jsonify(results=results), 200
 
     except Exception as e:
-        logger.exception(f"Error searching recipes: {str(e)}")
+        logger.exception("Error searching recipes: %s", e)
         return jsonify(error=str(e)), 500
 
 
@@ -117,62 +251,81 @@ def filter_recipes():
     cuisine = request.args.get('cuisine', '')
     difficulty = request.args.get('difficulty', '')
     
-    logger.info(f"Filtering recipes with params: sort_by={sort_by}, sort_order={sort_order}, dietary={dietary}, cuisine={cuisine}, difficulty={difficulty}")
+    logger.info("Filtering recipes with params: sort_by=%s, sort_order=%s, dietary=%s, cuisine=%s, difficulty=%s",
+                sort_by, sort_order, dietary, cuisine, difficulty, extra=SAMPLED)
     
     try:
-        query = supabase.table('recipes').select('*')
-        
-        # Apply filters
+        filters = {}
         if dietary:
-            query = query.eq('dietary_restrictions', dietary.lower())
+            filters['dietary_restrictions'] = dietary.lower()
         if cuisine:
-            query = query.eq('cuisine', cuisine.lower())
+            filters['cuisine'] = cuisine.lower()
         if difficulty:
-            query = query.eq('difficulty', difficulty.lower())
-            
-        # Apply sorting
-        if sort_by == 'name':
-            query = query.order('name', desc=(sort_order == 'desc'))
-        elif sort_by == 'rating':
-            query = query.order('ratings', desc=(sort_order == 'desc'))
-        elif sort_by == 'time':
-            query = query.order('times->cook', desc=(sort_order == 'desc'))
-        elif sort_by == 'calories':
-            query = query.order('nutrients->calories', desc=(sort_order == 'desc'))
-            
-        # Execute query
-        logger.info("Executing Supabase query...")
-        res = query.limit(50).execute()
-        logger.info(f"Query returned {len(res.data)} results")
+            filters['difficulty'] = difficulty.lower()
+
+        with timed("db"):
+            results = get_recipe_repository().filter(filters, sort_by=sort_by, descending=(sort_order == 'desc'), limit=50)
+        logger.info("Query returned %d results", len(results), extra=SAMPLED)
         
-        return jsonify(results=res.data), 200
+        return jsonify(results=results), 200
         
     except Exception as e:
-        logger.exception(f"Error filtering recipes: {str(e)}")
+        logger.exception("Error filtering recipes: %s", e)
+        return jsonify(error=str(e)), 500
+
+
+@recipes_bp.route('/recipes/<recipe_id>/similar', methods=['GET'])
+def similar_recipes(recipe_id):
+    """
+    "More like this": the recipe's neighbours from the graph precomputed at ingestion,
+    read straight out of the mmapped snapshot (no embedding, FAISS or database call).
+    """
+    try:
+        k_param = int(request.args.get('k', 10))
+    except ValueError:
+        k_param = 10
+
+    try:
+        with timed("catalog"):
+            catalog = get_catalog()
+            if catalog is None or catalog.neighbors is None:
+                return jsonify(error="Similar recipes are not available for the current catalog."), 503
+            row = catalog.row_by_id.get(recipe_id)
+            if row is None:
+                return jsonify(error="Recipe not found"), 404
+            similar = []
+            for neighbor, score in catalog.similar(row, max(k_param, 1)):
+                recipe = catalog.record(neighbor)
+                recipe['score'] = score
+                similar.append(recipe)
+        return jsonify(recipe_id=recipe_id, similar=similar), 200
+    except Exception as e:
+        logger.error("Error in /recipes/<id>/similar endpoint", exc_info=e)
         return jsonify(error=str(e)), 500
 
 
 @recipes_bp.route('/recipes/<recipe_id>', methods=['GET'])
 def get_recipe(recipe_id):
-    logger.info(f"Fetching recipe with ID: {recipe_id}")
+    logger.info("Fetching recipe with ID: %s", recipe_id, extra=SAMPLED)
     
     try:
-        res = (
-            supabase
-            .table('recipes')
-            .select('*')
-            .eq('id', recipe_id)
-            .single()
-            .execute()
-        )
+        # Served straight from the mmapped catalog snapshot when it has the recipe
+        with timed("catalog"):
+            catalog = get_catalog()
+            cached = catalog.get(recipe_id) if catalog else None
+        if cached:
+            return jsonify(recipe=cached), 200
+
+        with timed("db"):
+            recipe = get_recipe_repository().get(recipe_id)
         
-        if not res.data:
-            logger.warning(f"Recipe not found with ID: {recipe_id}")
+        if not recipe:
+            logger.warning("Recipe not found with ID: %s", recipe_id)
             return jsonify(error="Recipe not found"), 404
             
-        logger.info(f"Found recipe: {res.data['name']}")
-        return jsonify(recipe=res.data), 200
+        logger.info("Found recipe: %s", recipe['name'], extra=SAMPLED)
+        return jsonify(recipe=recipe), 200
         
     except Exception as e:
-        logger.exception(f"Error fetching recipe: {str(e)}")
+        logger.exception("Error fetching recipe: %s", e)
         return jsonify(error=str(e)), 500
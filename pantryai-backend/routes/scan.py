@@ -1,30 +1,75 @@
 # routes/scan.py
 
 from flask import Blueprint, request, jsonify
+from config import Config
+from ocr import OcrBusy, OcrImageError, OcrTimeout, get_ocr_pool
 from parsers import parse_receipt_google, parse_items
-from db import supabase
 from utils.logger import logger
+from utils.metrics import timed
 from datetime import datetime, timedelta, timezone
 
 scan_bp = Blueprint('scan', __name__)
 
+
+def get_upload_images() -> list[bytes]:
+    """The non-empty multipart 'image' uploads; raises ValueError if there are none or too many/large."""
+    files = request.files.getlist('image')
+    if len(files) > Config.OCR_MAX_IMAGES:
+        raise ValueError(f"At most {Config.OCR_MAX_IMAGES} images per scan.")
+    max_bytes = int(Config.OCR_MAX_IMAGE_MB * 1024 * 1024)
+    images = []
+    for f in files:
+        data = f.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise ValueError(f"Images must be at most {Config.OCR_MAX_IMAGE_MB:g} MB.")
+        if data:
+            images.append(data)
+    if not images:
+        raise ValueError("No image received.")
+    return images
+
+
 @scan_bp.route('/scan', methods=['POST'])
 def scan_receipt():
+    """
+    Receipt text -> pantry items for the user to confirm. Accepts either JSON
+    {"parsed_text": ...} extracted on the phone, or one or more multipart 'image'
+    uploads that are OCRed here.
+    """
     try:
-        data = request.get_json()
-        if not data or 'parsed_text' not in data:
-            return jsonify(error="No parsed text received"), 400
-            
-        raw_text = data['parsed_text']
-        if not raw_text.strip():
-            return jsonify(error="No text content to parse"), 400
+        ocr_text = None
+        if request.files:
+            try:
+                images = get_upload_images()
+                with timed("ocr"):
+                    texts = get_ocr_pool().recognize(images)
+            except (ValueError, OcrImageError) as e:
+                return jsonify(error=str(e)), 400
+            except OcrBusy:
+                return jsonify(error="Scanner is busy, try again shortly"), 503, {"Retry-After": "2"}
+            except OcrTimeout as e:
+                logger.warning("OCR timed out: %s", e)
+                return jsonify(error="Reading the receipt took too long"), 504
+            raw_text = ocr_text = "\n".join(text.strip() for text in texts if text.strip())
+            if not raw_text:
+                return jsonify(error="No text found in the image"), 422
+        else:
+            data = request.get_json(silent=True)
+            if not data or 'parsed_text' not in data:
+                return jsonify(error="No parsed text received"), 400
+
+            raw_text = data['parsed_text']
+            if not raw_text.strip():
+                return jsonify(error="No text content to parse"), 400
 
         try:
-            items = parse_receipt_google(raw_text)
+            with timed("llm_parse"):
+                items = parse_receipt_google(raw_text)
         except Exception as parse_e:
             logger.warning("Google LLM parse failed, attempting fallback parser.", exc_info=parse_e)
             try:
-                items = parse_items(raw_text)
+                with timed("fallback_parse"):
+                    items = parse_items(raw_text)
             except Exception as fallback_e:
                 logger.error("Both parsers failed.", exc_info=fallback_e)
                 return jsonify(error=f"Failed to parse receipt: {fallback_e}"), 500
@@ -40,7 +85,7 @@ def scan_receipt():
                 try:
                     quantity = int(it['quantity'])
                 except (ValueError, TypeError):
-                    logger.warning(f"Could not convert quantity '{it['quantity']}' to int for display, defaulting to 1.")
+                    logger.warning("Could not convert quantity '%s' to int for display, defaulting to 1.", it['quantity'])
 
             is_opened = bool(it.get("is_opened", False))
 
@@ -60,6 +105,8 @@ def scan_receipt():
             })
 
         # Return the parsed items to the frontend for confirmation
+        if ocr_text is not None:
+            return jsonify(parsed_items=formatted_for_frontend, ocr_text=ocr_text), 200
         return jsonify(parsed_items=formatted_for_frontend), 200
 
     except Exception as e:
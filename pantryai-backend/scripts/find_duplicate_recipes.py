@@ -0,0 +1,49 @@
+"""
+Dry run of ingestion's near-duplicate removal: streams the recipe dumps through
+normalize + dedupe only (no embedding, no writes) and writes the report of recipes
+that ingestion would drop, grouped under the recipe each one duplicates.
+
+Usage:
+    python scripts/find_duplicate_recipes.py [--data-dir data] [--threshold 0.8]
+        [--num-perm 128] [--bands 16] [--report dedupe_report.json] [files ...]
+"""
+import sys, os
+import argparse
+import json
+import time
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import Config
+from ingestion.dedupe import NearDuplicateFilter
+from ingestion.normalize import normalize_recipe
+from ingestion.reader import iter_recipe_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="recipe dumps (default: the five category crawls)")
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "data"))
+    parser.add_argument("--threshold", type=float, default=Config.DEDUPE_THRESHOLD)
+    parser.add_argument("--num-perm", type=int, default=Config.DEDUPE_NUM_PERM)
+    parser.add_argument("--bands", type=int, default=Config.DEDUPE_BANDS)
+    parser.add_argument("--report", default=Config.DEDUPE_REPORT)
+    args = parser.parse_args()
+
+    dedupe = NearDuplicateFilter(args.threshold, args.num_perm, args.bands)
+    started = time.perf_counter()
+    for recipe in iter_recipe_files(args.data_dir, args.files or None):
+        recipe = normalize_recipe(recipe)
+        if recipe is not None:
+            dedupe(recipe)
+    elapsed = time.perf_counter() - started
+
+    dedupe.write_report(args.report)
+    print(json.dumps(dict(dedupe.stats(), seconds=round(elapsed, 2), report=args.report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compares vector index variants (metric, float16/int8 storage, PCA reduction) against
+the current exact float32 L2 index: memory footprint, recall@k of the current top-k,
+and average query latency.
+
+Vectors are read back from the published catalog snapshot (or --index), so run it
+after a normal float32 ingestion.
+
+Usage:
+    python scripts/index_report.py [--index recipes.index] [--k 10] [--queries 500] [--pca 256,128] [--json out.json]
+"""
+import sys, os
+import argparse
+import json
+import time
+import numpy as np
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import Config
+from catalog import open_current_snapshot
+from ingestion.vector_index import create_index, prepare_vectors, index_nbytes
+
+
+def load_vectors(index_path: str | None) -> np.ndarray:
+    import faiss
+    if index_path:
+        index = faiss.read_index(index_path)
+    else:
+        catalog = open_current_snapshot(os.path.join(ROOT, Config.SNAPSHOT_DIR))
+        if catalog is None:
+            raise SystemExit("No catalog snapshot published; pass --index.")
+        index = catalog.load_index()
+    if index.ntotal == 0:
+        raise SystemExit("Index is empty.")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build_variant(vectors: np.ndarray, metric: str, storage: str, pca_dim: int):
+    index = create_index(vectors.shape[1], metric, storage, pca_dim)
+    data = prepare_vectors(vectors, metric == "cosine")
+    if not index.is_trained:
+        index.train(data)
+    index.add(data)
+    return index
+
+
+def evaluate(vectors: np.ndarray, k: int = 10, n_queries: int = 500, pca_dims: tuple = (256,), seed: int = 0) -> list[dict]:
+    """
+    Recall is measured against the exact float32 L2 top-k (today's index) for a
+    random sample of catalog vectors used as queries.
+    """
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+
+    variants = [("l2", "float32", 0)]
+    for metric in ("cosine",):
+        for storage in ("float32", "float16", "int8"):
+            variants.append((metric, storage, 0))
+        for pca_dim in pca_dims:
+            if 0 < pca_dim < vectors.shape[1] and pca_dim <= len(vectors):
+                variants.append((metric, "float16", pca_dim))
+                variants.append((metric, "int8", pca_dim))
+
+    rows, truth, baseline_bytes = [], None, None
+    for metric, storage, pca_dim in variants:
+        index = build_variant(vectors, metric, storage, pca_dim)
+        q = prepare_vectors(queries, metric == "cosine")
+        started = time.perf_counter()
+        _, I = index.search(q, k)
+        per_query_ms = (time.perf_counter() - started) * 1000 / len(q)
+        if truth is None:
+            truth, baseline_bytes = I, index_nbytes(index)
+        recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(I.tolist(), truth.tolist())])
+        size = index_nbytes(index)
+        rows.append({
+            "variant": f"{metric}/{storage}" + (f"/pca{pca_dim}" if pca_dim else ""),
+            "bytes": size,
+            "memory_ratio": round(size / baseline_bytes, 4),
+            f"recall@{k}": round(float(recall), 4),
+            "query_ms": round(per_query_ms, 4),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", help="FAISS index file to read vectors from (default: current snapshot)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--pca", default="256,128", help="comma-separated PCA output dimensions to try")
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.index)
+    pca_dims = tuple(int(d) for d in args.pca.split(",") if d.strip())
+    rows = evaluate(vectors, args.k, args.queries, pca_dims)
+
+    recall_key = f"recall@{min(args.k, len(vectors))}"
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims; baseline = exact l2/float32\n")
+    print(f"{'variant':24} {'size MB':>9} {'vs base':>8} {recall_key:>10} {'query ms':>9}")
+    for row in rows:
+        print(f"{row['variant']:24} {row['bytes'] / 1e6:>9.2f} {row['memory_ratio']:>7.0%} "
+              f"{row[recall_key]:>10.3f} {row['query_ms']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "dimension": int(vectors.shape[1]), "variants": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Measures how long it takes a fresh interpreter to import the app (what every
+gunicorn worker boot and every pytest collection pays), and which modules
+dominate that cost.
+
+Usage:
+    python scripts/measure_import_time.py [--runs 5] [--top 15] [--module app] [--resources]
+
+--resources additionally times the first use of each lazily-initialized resource
+(needs real credentials / index files to be meaningful).
+"""
+import sys, os
+import argparse
+import json
+import statistics
+import subprocess
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_TIME_IMPORT = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t)"
+)
+
+_TIME_RESOURCES = """
+import json, time
+import app
+from recipes import recipe_index
+from utils.embeddings import genai_client
+from parsers import google_model
+from db import supabase_client
+out = {}
+for resource in (recipe_index, genai_client, google_model, supabase_client):
+    t = time.perf_counter()
+    try:
+        resource.get()
+        out[resource.name] = round((time.perf_counter() - t) * 1000, 1)
+    except Exception as e:
+        out[resource.name] = f"failed: {e}"
+print(json.dumps(out))
+"""
+
+
+def _run(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def time_import(module: str, runs: int) -> list[float]:
+    return [float(_run(_TIME_IMPORT.format(module=module)).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+
+
+def top_imports(module: str, top: int) -> list[tuple[str, int]]:
+    """Parses `python -X importtime` output into (module, cumulative microseconds)."""
+    stderr = _run(f"import {module}", "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+            rows.append((name.strip(), int(cumulative)))
+        except ValueError:
+            continue  # header line
+    # Only show top-level packages so nested modules don't double count
+    seen, result = set(), []
+    for name, cumulative in sorted(rows, key=lambda r: r[1], reverse=True):
+        root = name.split(".")[0]
+        if root in seen:
+            continue
+        seen.add(root)
+        result.append((name, cumulative))
+    return result[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--resources", action="store_true")
+    args = parser.parse_args()
+
+    samples = time_import(args.module, args.runs)
+    print(f"import {args.module}: median {statistics.median(samples) * 1000:.1f} ms, "
+          f"min {min(samples) * 1000:.1f} ms over {args.runs} runs")
+
+    print(f"\nTop {args.top} imports by cumulative time:")
+    for name, cumulative in top_imports(args.module, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.resources:
+        print("\nFirst-use initialization (ms):")
+        print(json.dumps(json.loads(_run(_TIME_RESOURCES).stdout.strip().splitlines()[-1]), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Renders every /images/<recipe_id> variant (each configured width, WebP and JPEG) for
+the recipes in the current catalog snapshot, so the first visitor to a recipe card
+doesn't wait for the original to be fetched and resized. Run after ingestion, or set
+IMAGE_PREGENERATE_AFTER_INGEST=True to have ingestion do it.
+
+Usage:
+    python scripts/pregenerate_thumbnails.py [--workers 8] [--limit N] [--formats webp,jpeg]
+"""
+import sys, os
+import argparse
+import json
+import time
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import Config
+from catalog import open_current_snapshot
+from thumbnails import FORMATS, catalog_image_urls, get_thumbnailer
+from utils.logger import logger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot-dir", default=os.path.join(ROOT, Config.SNAPSHOT_DIR))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    args = parser.parse_args()
+
+    formats = tuple(f for f in args.formats.split(",") if f)
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(sorted(unknown))}")
+    catalog = open_current_snapshot(args.snapshot_dir)
+    if catalog is None:
+        parser.error(f"no published catalog snapshot in {args.snapshot_dir}")
+
+    urls = catalog_image_urls(catalog)[:args.limit]
+    started = time.perf_counter()
+    counts = get_thumbnailer().pregenerate(urls, formats=formats, workers=args.workers)
+    logger.info("Thumbnails for %s images: %s in %.1fs.", len(urls), json.dumps(counts), time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
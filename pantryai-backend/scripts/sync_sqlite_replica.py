@@ -0,0 +1,63 @@
+"""
+Copies the Supabase 'pantry' and 'recipes' tables into the local SQLite store used
+when DATA_BACKEND is "sqlite" or "replica".
+
+Usage:
+    python scripts/sync_sqlite_replica.py [--path data/pantry.db] [--page-size 1000] [--skip-recipes]
+"""
+import sys, os
+import argparse
+import time
+
+# Ensure project root is on Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from config import Config
+from db import get_supabase
+from repositories.sqlite_repo import SQLiteStore, SQLitePantryRepository, SQLiteRecipeRepository
+from utils.logger import logger
+
+
+def iter_table(client, table: str, page_size: int):
+    offset = 0
+    while True:
+        rows = client.table(table).select('*').order('id').range(offset, offset + page_size - 1).execute().data or []
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def sync(store: SQLiteStore, client, page_size: int = 1000, recipes: bool = True) -> dict:
+    counts = {"pantry": 0, "recipes": 0}
+    pantry_repo = SQLitePantryRepository(store)
+    for rows in iter_table(client, 'pantry', page_size):
+        pantry_repo.insert_items(rows)
+        counts["pantry"] += len(rows)
+    if recipes:
+        recipe_repo = SQLiteRecipeRepository(store)
+        for rows in iter_table(client, 'recipes', page_size):
+            recipe_repo.upsert(rows)
+            counts["recipes"] += len(rows)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=os.path.join(ROOT, Config.SQLITE_PATH))
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--skip-recipes", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = sync(SQLiteStore(args.path), get_supabase(), args.page_size, recipes=not args.skip_recipes)
+    logger.info("Synced %s pantry rows and %s recipes into %s in %.1fs.",
+                counts['pantry'], counts['recipes'], args.path, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
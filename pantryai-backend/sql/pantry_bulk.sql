@@ -0,0 +1,19 @@
+-- Bulk pantry edits (PATCH /pantry/bulk).
+-- Run once in the Supabase SQL editor, after sql/pantry_sync.sql, before deploying the matching backend.
+
+-- Applies a different change set to each of the device's items in one statement (one
+-- transaction, so every row gets the same revision from the pantry_revision trigger).
+-- p_rows is [{"id", "changes": {column: value, ...}}, ...]; columns missing from an item's
+-- changes keep their value. Returns the updated rows; ids the device doesn't own are skipped.
+CREATE OR REPLACE FUNCTION update_pantry_items(p_device_id text, p_rows jsonb) RETURNS SETOF pantry
+LANGUAGE sql AS $$
+    UPDATE pantry p SET
+        (name, category, quantity, unit, expiry, purchase_date, location, brand, barcode, notes,
+         is_opened, added_at, image_url) =
+        (SELECT r.name, r.category, r.quantity, r.unit, r.expiry, r.purchase_date, r.location, r.brand,
+                r.barcode, r.notes, r.is_opened, r.added_at, r.image_url
+         FROM jsonb_populate_record(p, x.changes) AS r)
+    FROM jsonb_to_recordset(p_rows) AS x(id text, changes jsonb)
+    WHERE p.device_id = p_device_id AND p.id::text = x.id
+    RETURNING p.*;
+$$;
@@ -0,0 +1,72 @@
+-- Incremental pantry sync (GET /pantry/changes?since=<revision>).
+-- Run once in the Supabase SQL editor before deploying the matching backend.
+
+ALTER TABLE pantry ADD COLUMN IF NOT EXISTS revision bigint NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_pantry_device_revision ON pantry (device_id, revision);
+
+-- Per-device revision counter. txid is the transaction that last bumped it, so every
+-- row a single request writes shares one revision
+CREATE TABLE IF NOT EXISTS pantry_revisions (
+    device_id text PRIMARY KEY,
+    revision  bigint NOT NULL,
+    txid      bigint
+);
+
+-- One row per deleted item, so clients can drop it locally
+CREATE TABLE IF NOT EXISTS pantry_tombstones (
+    device_id  text NOT NULL,
+    item_id    text NOT NULL,
+    revision   bigint NOT NULL,
+    deleted_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (device_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pantry_tombstones_revision ON pantry_tombstones (device_id, revision);
+
+-- The device's revision for the current transaction: bumped by its first write, reused by
+-- the rest. The counter row stays locked until commit, so a device's writes commit in
+-- revision order and a sync that has read the counter has seen every revision up to it.
+CREATE OR REPLACE FUNCTION pantry_transaction_revision(p_device_id text) RETURNS bigint
+LANGUAGE sql AS $$
+    INSERT INTO pantry_revisions (device_id, revision, txid) VALUES (p_device_id, 1, txid_current())
+    ON CONFLICT (device_id) DO UPDATE SET
+        revision = CASE WHEN pantry_revisions.txid = txid_current() THEN pantry_revisions.revision
+                        ELSE pantry_revisions.revision + 1 END,
+        txid = txid_current()
+    RETURNING revision;
+$$;
+
+-- Stamps inserted and updated rows; an UPDATE that matches nothing allocates nothing
+CREATE OR REPLACE FUNCTION stamp_pantry_revision() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.revision := pantry_transaction_revision(NEW.device_id);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS pantry_revision ON pantry;
+CREATE TRIGGER pantry_revision BEFORE INSERT OR UPDATE ON pantry
+FOR EACH ROW EXECUTE FUNCTION stamp_pantry_revision();
+
+-- Deletes the device's items among p_item_ids and tombstones them in the same transaction;
+-- returns the deleted rows, each carrying the tombstone revision
+CREATE OR REPLACE FUNCTION delete_pantry_items(p_device_id text, p_item_ids text[]) RETURNS jsonb
+LANGUAGE plpgsql AS $$
+DECLARE
+    deleted pantry[];
+    rev bigint;
+BEGIN
+    WITH d AS (
+        DELETE FROM pantry WHERE device_id = p_device_id AND id::text = ANY(p_item_ids) RETURNING *
+    )
+    SELECT array_agg(d) INTO deleted FROM d;
+    IF deleted IS NULL THEN
+        RETURN '[]'::jsonb;
+    END IF;
+    rev := pantry_transaction_revision(p_device_id);
+    INSERT INTO pantry_tombstones (device_id, item_id, revision)
+    SELECT p_device_id, r.id::text, rev FROM unnest(deleted) AS r
+    ON CONFLICT (device_id, item_id) DO UPDATE SET revision = EXCLUDED.revision, deleted_at = now();
+    RETURN (SELECT jsonb_agg(to_jsonb(r) || jsonb_build_object('revision', rev)) FROM unnest(deleted) AS r);
+END;
+$$;
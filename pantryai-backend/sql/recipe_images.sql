@@ -0,0 +1,17 @@
+-- Batched recipe image updates (scripts/populate_recipe_images.py).
+-- Run once in the Supabase SQL editor before running the script against Supabase.
+
+-- Keeps "recipes still without an image" paging cheap as the backlog shrinks
+CREATE INDEX IF NOT EXISTS idx_recipes_missing_image ON recipes (id) WHERE image_url IS NULL;
+
+-- Sets a different image_url on each recipe in one statement; p_rows is [{"id", "image_url"}, ...]
+CREATE OR REPLACE FUNCTION set_recipe_image_urls(p_rows jsonb) RETURNS integer
+LANGUAGE sql AS $$
+    WITH updated AS (
+        UPDATE recipes r SET image_url = x.image_url
+        FROM jsonb_to_recordset(p_rows) AS x(id text, image_url text)
+        WHERE r.id::text = x.id
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM updated;
+$$;
@@ -0,0 +1,316 @@
+# File: tests/fakes.py
+"""
+In-memory stand-in for the subset of the supabase-py client this app uses.
+Queries are applied to plain lists of dicts so routes and scripts can be exercised offline.
+"""
+
+import copy
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import numpy as np
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table_name = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.limit_n = None
+        self.range_ = None
+        self.single_row = False
+        self.on_conflict = "id"
+
+    # --- operations ---
+    def select(self, *columns, **kwargs):
+        self.op = "select"
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict="id", **kwargs):
+        self.op, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # --- filters / modifiers ---
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def is_(self, column, value):
+        if value != "null":
+            raise ValueError(f"Unsupported fake is_ value: {value}")
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def ilike(self, column, pattern):
+        needle = pattern.strip("%").lower()
+        self.filters.append(lambda row: needle in str(row.get(column) or "").lower())
+        return self
+
+    def or_(self, expression: str):
+        # Supports the "col.ilike.%x%,col2.ilike.%x%" form used by /recipes/search
+        clauses = []
+        for clause in expression.split(","):
+            column, op, pattern = clause.split(".", 2)
+            if op != "ilike":
+                raise ValueError(f"Unsupported fake or_ operator: {op}")
+            clauses.append((column, pattern.strip("%").lower()))
+        self.filters.append(lambda row: any(needle in str(row.get(col) or "").lower() for col, needle in clauses))
+        return self
+
+    def filter(self, column, operator, value):
+        if operator != "cs":
+            raise ValueError(f"Unsupported fake filter operator: {operator}")
+        wanted = json.loads(value) if isinstance(value, str) else value
+        self.filters.append(lambda row: set(wanted) <= set(row.get(column) or []))
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.range_ = (start, end)
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class FakeRpc:
+    def __init__(self, client, name: str, params: dict):
+        self.client, self.name, self.params = client, name, params
+
+    def execute(self):
+        return self.client._call_rpc(self.name, self.params)
+
+
+class FakeSupabase:
+    """
+    Fake `supabase.Client`. `tables` maps table name -> list of row dicts.
+
+    `failures` is a list of exceptions raised (one per call, in order) by the
+    next write operations, to simulate flaky networks. `latency` (seconds, with
+    +/- `jitter` fraction) is slept on every execute() to mimic HTTPS round trips.
+    """
+
+    def __init__(self, tables: dict | None = None, failures: list | None = None,
+                 latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.tables = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.failures = list(failures or [])
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self.calls = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> "FakeRpc":
+        return FakeRpc(self, name, params)
+
+    def _call_rpc(self, name: str, params: dict) -> FakeResponse:
+        # Mirrors the SQL functions in sql/pantry_sync.sql, sql/pantry_bulk.sql and sql/recipe_images.sql
+        with self._lock:
+            self.calls.append(("rpc", name))
+            if name == "delete_pantry_items":
+                device_id, item_ids = params["p_device_id"], set(params["p_item_ids"])
+                pantry = self.tables.setdefault("pantry", [])
+                deleted = [r for r in pantry if r.get("device_id") == device_id and str(r.get("id")) in item_ids]
+                if not deleted:
+                    return FakeResponse([])
+                self.tables["pantry"] = [r for r in pantry if r not in deleted]
+                revision = self._bump_revision(device_id)
+                tombstones = self.tables.setdefault("pantry_tombstones", [])
+                tombstones[:] = [t for t in tombstones
+                                 if not (t["device_id"] == device_id and t["item_id"] in item_ids)]
+                tombstones.extend({"device_id": device_id, "item_id": str(r["id"]), "revision": revision}
+                                  for r in deleted)
+                return FakeResponse([{**r, "revision": revision} for r in deleted])
+            if name == "update_pantry_items":
+                # sql/pantry_bulk.sql: one statement, so one revision for every row it hits
+                device_id = params["p_device_id"]
+                rows = {str(r.get("id")): r for r in self.tables.setdefault("pantry", [])
+                        if r.get("device_id") == device_id}
+                updated = []
+                for change in params["p_rows"]:
+                    row = rows.get(change["id"])
+                    if row is not None:
+                        row.update(change["changes"])
+                        updated.append(row)
+                if updated:
+                    revision = self._bump_revision(device_id)
+                    for row in updated:
+                        row["revision"] = revision
+                return FakeResponse([dict(row) for row in updated])
+            if name == "set_recipe_image_urls":
+                # sql/recipe_images.sql
+                recipes = {r.get("id"): r for r in self.tables.setdefault("recipes", [])}
+                updated = 0
+                for row in params["p_rows"]:
+                    if row["id"] in recipes:
+                        recipes[row["id"]]["image_url"] = row["image_url"]
+                        updated += 1
+                return FakeResponse(updated)
+            raise ValueError(f"Unsupported fake rpc: {name}")
+
+    def _bump_revision(self, device_id: str) -> int:
+        counters = self.tables.setdefault("pantry_revisions", [])
+        counter = next((c for c in counters if c["device_id"] == device_id), None)
+        if counter is None:
+            counter = {"device_id": device_id, "revision": 0}
+            counters.append(counter)
+        counter["revision"] += 1
+        return counter["revision"]
+
+    def _stamp_revisions(self, query: FakeQuery, rows: list[dict]):
+        # Mirrors the pantry_revision trigger: one revision per device per request, written rows only
+        if query.table_name == "pantry":
+            revisions = {}
+            for row in rows:
+                device_id = row.get("device_id")
+                if device_id not in revisions:
+                    revisions[device_id] = self._bump_revision(device_id)
+                row["revision"] = revisions[device_id]
+
+    def _matches(self, query, row) -> bool:
+        return all(f(row) for f in query.filters)
+
+    def _execute(self, query: FakeQuery) -> FakeResponse:
+        if self.latency:
+            time.sleep(self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+        with self._lock:
+            self.calls.append((query.table_name, query.op))
+            if query.op != "select" and self.failures:
+                raise self.failures.pop(0)
+            rows = self.tables.setdefault(query.table_name, [])
+
+            if query.op == "select":
+                result = [copy.deepcopy(r) for r in rows if self._matches(query, r)]
+                for column, desc in reversed(query.order_by):
+                    result.sort(key=lambda r: _sort_key(_json_path(r, column)), reverse=desc)
+                if query.range_:
+                    result = result[query.range_[0]:query.range_[1] + 1]
+                if query.limit_n is not None:
+                    result = result[:query.limit_n]
+                if query.single_row:
+                    return FakeResponse(result[0] if result else None)
+                return FakeResponse(result)
+
+            if query.op in ("insert", "upsert"):
+                payload = query.payload if isinstance(query.payload, list) else [query.payload]
+                written = []
+                for new in payload:
+                    new = dict(new)
+                    if query.op == "insert" and "id" not in new:
+                        taken = {str(r.get("id")) for r in rows}
+                        while str(self._next_id) in taken:
+                            self._next_id += 1
+                        new["id"] = str(self._next_id)
+                        self._next_id += 1
+                    existing = None
+                    if query.op == "upsert":
+                        existing = next((r for r in rows if r.get(query.on_conflict) == new.get(query.on_conflict)), None)
+                    if existing is not None:
+                        existing.update(new)
+                        written.append(existing)
+                    else:
+                        rows.append(new)
+                        written.append(new)
+                self._stamp_revisions(query, written)
+                return FakeResponse([dict(r) for r in written])
+
+            if query.op == "update":
+                updated = []
+                for r in rows:
+                    if self._matches(query, r):
+                        r.update(query.payload)
+                        updated.append(r)
+                self._stamp_revisions(query, updated)
+                updated = [dict(r) for r in updated]
+                return FakeResponse(updated)
+
+            if query.op == "delete":
+                deleted = [r for r in rows if self._matches(query, r)]
+                self.tables[query.table_name] = [r for r in rows if not self._matches(query, r)]
+                return FakeResponse(deleted)
+
+            raise ValueError(f"Unsupported fake operation: {query.op}")
+
+
+def _json_path(row: dict, column: str):
+    # PostgREST "times->cook" style access into JSON columns
+    value = row
+    for part in column.split("->"):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _sort_key(value):
+    # None sorts last; numbers before strings so mixed JSON columns still compare
+    if value is None:
+        return (2, 0, "")
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+_TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+
+
+def fake_embedding(text: str, dim: int = 768) -> list[float]:
+    """
+    Deterministic stand-in for generate_text_embedding: a unit-length hashed
+    bag-of-words vector, so texts sharing words land near each other.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    for token in _TOKEN_REGEX.findall((text or "").lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vec[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        return [0.0] * dim
+    return (vec / norm).tolist()
@@ -0,0 +1,40 @@
+# File: tests/test_benchmarks.py
+
+from benchmarks.run_benchmarks import compare, summarize
+from tests.fakes import FakeSupabase, fake_embedding
+
+
+def test_summarize_percentiles():
+    stats = summarize([i * 1_000_000 for i in range(1, 101)])  # 1..100 ms
+    assert stats["iterations"] == 100
+    assert stats["p50_ms"] == 51.0
+    assert stats["p95_ms"] == 95.0
+    assert stats["min_ms"] == 1.0
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"results": {"a": {"p50_ms": 1.0, "p95_ms": 2.0}, "b": {"p50_ms": 1.0, "p95_ms": 1.0}}}
+    current = {"results": {"a": {"p50_ms": 1.2, "p95_ms": 2.1}, "b": {"p50_ms": 1.5, "p95_ms": 1.0},
+                           "new": {"p50_ms": 9.0, "p95_ms": 9.0}}}
+    regressions = compare(current, baseline, threshold=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("b.p50_ms")
+
+
+def test_fake_embedding_is_deterministic_and_similarity_preserving():
+    a = fake_embedding("chicken garlic onion")
+    assert a == fake_embedding("chicken garlic onion")
+    assert len(a) == 768
+    near = sum(x * y for x, y in zip(a, fake_embedding("chicken garlic")))
+    far = sum(x * y for x, y in zip(a, fake_embedding("chocolate sponge cake")))
+    assert near > far
+
+
+def test_fake_supabase_search_filters():
+    db = FakeSupabase({"recipes": [
+        {"id": "1", "name": "Chicken pie", "description": "", "cleaned_ingredients_list": ["chicken", "flour"]},
+        {"id": "2", "name": "Sponge", "description": "no chicken here", "cleaned_ingredients_list": ["flour", "sugar"]},
+    ]})
+    res = db.table("recipes").select("*").or_("name.ilike.%chicken%,description.ilike.%chicken%").execute()
+    assert [r["id"] for r in res.data] == ["1", "2"]
+    res = db.table("recipes").select("*").filter("cleaned_ingredients_list", "cs", '["flour", "sugar"]').execute()
+    assert [r["id"] for r in res.data] == ["2"]
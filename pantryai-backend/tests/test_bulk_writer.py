@@ -0,0 +1,98 @@
+# File: tests/test_bulk_writer.py
+
+import json
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+from ingestion.bulk_writer import BulkWriter, is_transient_error
+from tests.fakes import FakeSupabase
+
+
+def make_rows(n):
+    return [{"id": f"r{i}", "name": f"Recipe {i}"} for i in range(n)]
+
+
+def test_bulk_writer_writes_all_rows_concurrently():
+    client = FakeSupabase()
+    writer = BulkWriter(client, batch_size=10, concurrency=4, sleep=lambda s: None)
+    report = writer.write(make_rows(95))
+    assert report["rows_written"] == 95
+    assert report["batches"] == 10
+    assert report["rows_failed"] == 0
+    assert sorted(r["id"] for r in client.tables["recipes"]) == sorted(f"r{i}" for i in range(95))
+
+
+def test_bulk_writer_is_idempotent_on_rerun():
+    client = FakeSupabase()
+    BulkWriter(client, batch_size=7, sleep=lambda s: None).write(make_rows(20))
+    BulkWriter(client, batch_size=7, sleep=lambda s: None).write(make_rows(20))
+    assert len(client.tables["recipes"]) == 20
+
+
+def test_bulk_writer_retries_transient_errors():
+    client = FakeSupabase(failures=[httpx.ConnectError("reset"), APIError({"code": "503", "message": "busy"})])
+    delays = []
+    writer = BulkWriter(client, batch_size=50, concurrency=1, sleep=delays.append)
+    report = writer.write(make_rows(30))
+    assert report["rows_written"] == 30
+    assert report["retries"] == 2
+    # Exponential backoff (with jitter in [0.5, 1.0] of the nominal delay)
+    assert 0.25 <= delays[0] <= 0.5 and 0.5 <= delays[1] <= 1.0
+
+
+def test_bulk_writer_dead_letters_permanent_failures(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+
+    class RejectingClient(FakeSupabase):
+        def _execute(self, query):
+            if any(row["id"] == "r3" for row in query.payload):
+                raise APIError({"code": "22P02", "message": "invalid input syntax"})
+            return super()._execute(query)
+
+    client = RejectingClient()
+    writer = BulkWriter(client, batch_size=8, concurrency=2, dead_letter_path=str(dead_letter), sleep=lambda s: None)
+    report = writer.write(make_rows(8))
+    assert report["rows_written"] == 7
+    assert report["rows_failed"] == 1
+    lines = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert [entry["row"]["id"] for entry in lines] == ["r3"]
+
+
+def test_bulk_writer_gives_up_after_max_retries(tmp_path):
+    client = FakeSupabase(failures=[httpx.ReadTimeout("slow")] * 10)
+    writer = BulkWriter(client, batch_size=5, max_retries=2, dead_letter_path=str(tmp_path / "dl.jsonl"), sleep=lambda s: None)
+    report = writer.write(make_rows(5))
+    assert report["rows_failed"] == 5
+    assert report["retries"] == 2
+
+
+def test_bulk_writer_surfaces_failed_batches(tmp_path):
+    # A dead-letter path that can't be opened makes the batch itself raise
+    client = FakeSupabase(failures=[APIError({"code": "22P02", "message": "bad row"})])
+    writer = BulkWriter(client, batch_size=1, concurrency=1, dead_letter_path=str(tmp_path / "missing" / "dl.jsonl"),
+                        sleep=lambda s: None)
+    writer.submit(make_rows(1))
+    writer._pending[0].exception()  # wait for it to finish
+    with pytest.raises(FileNotFoundError):
+        writer.submit(make_rows(2)[1:])
+    writer.close()
+
+
+def test_bulk_writer_close_finishes_and_reports_before_raising(tmp_path):
+    client = FakeSupabase(failures=[APIError({"code": "22P02", "message": "bad row"})])
+    writer = BulkWriter(client, batch_size=1, concurrency=1, dead_letter_path=str(tmp_path / "missing" / "dl.jsonl"),
+                        sleep=lambda s: None)
+    writer.submit(make_rows(1))
+    writer._buffer = make_rows(3)[1:]
+    with pytest.raises(FileNotFoundError):
+        writer.close()
+    # The other rows were still written and the executor shut down
+    assert writer.report.rows_written == 2 and writer.report.finished_at is not None
+    assert writer._executor._shutdown
+
+
+def test_is_transient_error():
+    assert is_transient_error(httpx.ConnectTimeout("t"))
+    assert is_transient_error(APIError({"code": "57014"}))
+    assert not is_transient_error(APIError({"code": "42703"}))
+    assert not is_transient_error(ValueError("nope"))
@@ -0,0 +1,126 @@
+# File: tests/test_catalog.py
+
+import math
+import os
+import faiss
+import numpy as np
+import pytest
+from catalog import SnapshotWriter, CatalogSnapshot, open_current_snapshot, current_snapshot_path, prune_snapshots
+from ingestion.normalize import parse_minutes
+
+
+def make_records(n):
+    return [
+        {
+            "id": f"r{i}",
+            "name": f"Recipe {i}",
+            "ratings": i % 5,
+            "vote_count": 10 * i,
+            "serves": 2,
+            "times": {"Preparation": "10 mins", "Cooking": "1 hr and 5 mins" if i % 2 else "No Time"},
+            "nutrients": {"kcal": str(100 + i)} if i % 3 else {},
+            "cleaned_ingredients_list": ["flour", "sugar"] if i % 2 else ["egg"],
+        }
+        for i in range(n)
+    ]
+
+
+def build_snapshot(root, n=6, dim=8, version="v1"):
+    rng = np.random.default_rng(0)
+    index = faiss.IndexFlatL2(dim)
+    index.add(rng.random((n, dim), dtype=np.float32))
+    writer = SnapshotWriter(str(root), version=version)
+    writer.add_batch(make_records(n))
+    return writer.finalize(index)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = build_snapshot(tmp_path)
+    assert current_snapshot_path(str(tmp_path)) == path
+
+    snapshot = open_current_snapshot(str(tmp_path))
+    assert snapshot.version == "v1"
+    assert len(snapshot) == 6
+    assert snapshot.manifest["dimension"] == 8
+    assert snapshot.get("r3")["name"] == "Recipe 3"
+    assert snapshot.get("missing") is None
+    assert set(snapshot.get_many(["r1", "r4", "nope"])) == {"r1", "r4"}
+
+    # Numeric columns are mmapped float32 arrays aligned with FAISS rows
+    assert isinstance(snapshot.columns["total_minutes"], np.memmap)
+    assert snapshot.columns["total_minutes"][1] == 75.0
+    assert snapshot.columns["total_minutes"][0] == 10.0
+    assert math.isnan(snapshot.columns["kcal"][0])
+    assert snapshot.columns["kcal"][1] == 101.0
+
+    vocab = snapshot.ingredient_vocab
+    assert [vocab[i] for i in snapshot.ingredient_row(1)] == ["flour", "sugar"]
+    assert [vocab[i] for i in snapshot.ingredient_row(2)] == ["egg"]
+
+    assert snapshot.verify()
+    assert snapshot.load_index().ntotal == 6
+    snapshot.close()
+
+
+def test_snapshot_detects_corrupt_index(tmp_path):
+    path = build_snapshot(tmp_path)
+    with open(os.path.join(path, "recipes.index"), "ab") as f:
+        f.write(b"garbage")
+    snapshot = CatalogSnapshot(path)
+    assert not snapshot.verify()
+    with pytest.raises(ValueError, match="checksum"):
+        snapshot.load_index()
+
+
+def test_snapshot_rejects_misaligned_index(tmp_path):
+    writer = SnapshotWriter(str(tmp_path), version="bad")
+    writer.add_batch(make_records(3))
+    with pytest.raises(ValueError):
+        writer.finalize(faiss.IndexFlatL2(4))
+    writer.abort()
+    assert current_snapshot_path(str(tmp_path)) is None
+
+
+def test_new_snapshot_replaces_current_pointer(tmp_path):
+    build_snapshot(tmp_path, version="v1")
+    build_snapshot(tmp_path, n=3, version="v2")
+    snapshot = open_current_snapshot(str(tmp_path))
+    assert snapshot.version == "v2" and len(snapshot) == 3
+
+
+def test_parse_minutes():
+    assert parse_minutes("15 mins") == 15
+    assert parse_minutes("1 hr and 30 mins") == 90
+    assert parse_minutes("10 mins - 15 mins") == 15
+    assert parse_minutes("No Time") == 0
+    assert parse_minutes("soon") is None
+
+
+def test_snapshot_versions_never_collide_or_overwrite(tmp_path):
+    # Two default-versioned builds in the same second still get distinct directories
+    first, second = SnapshotWriter(str(tmp_path)), SnapshotWriter(str(tmp_path))
+    assert first.version != second.version
+    first.abort()
+    second.abort()
+
+    build_snapshot(tmp_path, version="v1")
+    with pytest.raises(FileExistsError):
+        SnapshotWriter(str(tmp_path), version="v1")
+    assert open_current_snapshot(str(tmp_path)).version == "v1"
+
+
+def test_prune_keeps_newest_and_current(tmp_path):
+    for i in range(4):
+        build_snapshot(tmp_path, version=f"v{i}")
+        os.utime(os.path.join(tmp_path, f"v{i}", "manifest.json"), (1000 + i, 1000 + i))
+    # Roll back to an old snapshot: it survives pruning even though it isn't among the newest
+    (tmp_path / "CURRENT").write_text("v0")
+    assert sorted(prune_snapshots(str(tmp_path), keep=2)) == ["v1"]
+    assert sorted(p for p in os.listdir(tmp_path) if p.startswith("v")) == ["v0", "v2", "v3"]
+
+    writer = SnapshotWriter(str(tmp_path), version="v4", keep=1)
+    writer.add_batch(make_records(2))
+    index = faiss.IndexFlatL2(8)
+    index.add(np.zeros((2, 8), dtype=np.float32))
+    writer.finalize(index)
+    assert sorted(p for p in os.listdir(tmp_path) if p.startswith("v")) == ["v4"]
@@ -0,0 +1,146 @@
+import faiss
+import numpy as np
+import pytest
+import match_pipeline
+import recipes
+import routes.recipes as recipes_module
+import utils.embeddings as embeddings
+from app import create_app
+from catalog import SnapshotWriter
+from utils.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from utils.metrics import REGISTRY
+
+get_pantry_for_match = recipes_module.get_pantry_for_match
+
+RECIPES = [
+    {"id": "r1", "name": "Spinach omelette", "maincategory": "Breakfast", "cleaned_ingredients_list": ["eggs", "spinach", "butter"]},
+    {"id": "r2", "name": "Chicken traybake", "maincategory": "Dinner", "cleaned_ingredients_list": ["chicken thighs", "potatoes", "garlic"]},
+    {"id": "r3", "name": "Plain rice", "maincategory": "Dinner", "cleaned_ingredients_list": ["rice"]},
+    {"id": "r4", "name": "Spinach curry", "maincategory": "Dinner", "cleaned_ingredients_list": ["chicken breast", "spinach", "rice"]},
+]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def boom():
+    raise TimeoutError("deadline exceeded")
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    clock = Clock()
+    breaker = CircuitBreaker("test_upstream", failure_threshold=3, reset_seconds=10, clock=clock)
+    assert breaker.call(lambda: "ok") == "ok"
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            breaker.call(boom)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+
+    # Half-open: one trial call; failing it reopens the circuit for another reset period
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now = 20
+    assert breaker.call(lambda: "ok") == "ok" and breaker.state == CLOSED
+
+    metrics = REGISTRY.render()
+    assert 'pantryai_circuit_state{upstream="test_upstream"} 0' in metrics
+    assert 'pantryai_upstream_calls_total{upstream="test_upstream",outcome="rejected"} 1' in metrics
+
+
+def test_embedding_calls_have_deadlines_and_stop_when_open(monkeypatch):
+    calls = []
+
+    class FailingGenai:
+        def embed_content(self, **kwargs):
+            calls.append(kwargs["request_options"])
+            raise TimeoutError("deadline exceeded")
+
+    monkeypatch.setattr(embeddings, "get_genai", FailingGenai)
+    monkeypatch.setattr(embeddings, "embedding_breaker", CircuitBreaker("gemini_embed", 2, 30))
+    assert embeddings.embedding_available()
+    assert [embeddings.generate_text_embedding("eggs") for _ in range(4)] == [[]] * 4
+    assert calls == [{"timeout": embeddings.Config.GEMINI_EMBED_TIMEOUT_SECONDS}] * 2
+    assert not embeddings.embedding_available()
+
+
+def test_ingestion_embeds_past_an_open_breaker_with_retries(monkeypatch):
+    attempts = []
+
+    class FlakyGenai:
+        def embed_content(self, content, **kwargs):
+            attempts.append(list(content))
+            if len(attempts) < 3:
+                raise TimeoutError("deadline exceeded")
+            return {"embedding": [[1.0] * 768 for _ in content]}
+
+    breaker = CircuitBreaker("gemini_embed", 1, 30)
+    with pytest.raises(TimeoutError):
+        breaker.call(boom)
+    monkeypatch.setattr(embeddings, "get_genai", FlakyGenai)
+    monkeypatch.setattr(embeddings, "embedding_breaker", breaker)
+    monkeypatch.setattr(embeddings.Config, "INGEST_EMBED_BACKOFF_BASE", 0.001)
+    embeddings.ingestion_rate_limiter.set(None)
+    try:
+        assert embeddings.generate_ingestion_embeddings(["eggs"]) == [[1.0] * 768]
+        assert len(attempts) == 3 and breaker.state == OPEN
+
+        # Out of retries: the text is reported as failed instead of getting an empty vector
+        monkeypatch.setattr(embeddings.Config, "INGEST_EMBED_MAX_RETRIES", 1)
+        attempts.clear()
+        assert embeddings.generate_ingestion_embeddings(["milk"]) == [None]
+    finally:
+        embeddings.ingestion_rate_limiter.reset()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    index = faiss.IndexFlatL2(4)
+    index.add(np.zeros((len(RECIPES), 4), dtype=np.float32))
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch(RECIPES)
+    recipes.recipe_index.set(recipes.load_snapshot_index(writer.finalize(index)))
+    monkeypatch.setattr(recipes_module, "get_pantry_for_match",
+                        lambda: ("2 spinach, 1 kg rice, 6 eggs", ["spinach", "rice", "eggs"]))
+    monkeypatch.setattr(recipes_module, "generate_text_embedding", lambda text: [])
+    try:
+        yield create_app().test_client()
+    finally:
+        recipes.recipe_index.reset()
+        match_pipeline.embedding_cache.reset()
+
+
+def test_match_degrades_to_ingredient_overlap(client):
+    resp = client.get("/recipes/match?k=3")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["degraded"] is True
+    # rice 1/1, spinach+rice 2/3, eggs+spinach 2/3 (ties keep catalog order)
+    assert [r["id"] for r in body["matched_recipes"]] == ["r3", "r1", "r4"]
+    assert body["matched_recipes"][1]["matched_ingredients"] == 2
+
+    resp = client.get("/recipes/match?maincategory=dinner")
+    assert [r["id"] for r in resp.get_json()["matched_recipes"]] == ["r3", "r4"]
+
+
+def test_degraded_match_ranks_by_raw_pantry_names(client, monkeypatch):
+    class Pantry:
+        def list_all_items(self):
+            return [{"name": "chicken breast", "quantity": 2, "unit": "pcs"},
+                    {"name": "Milk", "quantity": 1, "unit": "gallon"}]
+
+    # "pcs" is not a unit parse_ingredient_name strips, so "2 pcs chicken breast" matched nothing
+    monkeypatch.setattr(recipes_module, "get_pantry_for_match", get_pantry_for_match)
+    monkeypatch.setattr(recipes_module, "get_pantry_repository", Pantry)
+    body = client.get("/recipes/match?k=3").get_json()
+    assert body["degraded"] is True
+    assert [r["id"] for r in body["matched_recipes"]] == ["r4"]
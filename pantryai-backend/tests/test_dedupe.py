@@ -0,0 +1,70 @@
+import json
+import numpy as np
+from ingestion.dedupe import MinHasher, NearDuplicateFilter, recipe_features
+from ingestion.pipeline import Pipeline, Stage
+
+BASE_INGREDIENTS = ["200g plain flour", "2 large eggs", "100g caster sugar", "1 tsp baking powder",
+                    "50g butter, melted", "150ml milk", "1 tsp vanilla extract", "pinch of salt"]
+
+
+def recipe(rid, name, ingredients):
+    return {"id": rid, "name": name, "ingredients": ingredients}
+
+
+def test_signature_agreement_estimates_jaccard():
+    hasher = MinHasher(num_perm=256)
+    a = {f"x{i}" for i in range(100)}
+    b = {f"x{i}" for i in range(20, 120)}  # Jaccard 80 / 120
+    agreement = np.mean(hasher.signature(a) == hasher.signature(b))
+    assert abs(agreement - 80 / 120) < 0.1
+    assert (hasher.signature(a) == hasher.signature(set(a))).all()
+
+
+def test_features_ignore_quantities_and_case():
+    assert recipe_features(recipe("a", "Easy Pancakes!", ["2 large eggs", "100g caster sugar"])) == \
+        recipe_features(recipe("b", "easy pancakes", ["3 eggs", "caster sugar (50g)"]))
+
+
+def test_filter_keeps_first_of_each_cluster():
+    dedupe = NearDuplicateFilter(threshold=0.8)
+    stream = [
+        recipe("r1", "Fluffy pancakes", BASE_INGREDIENTS),
+        recipe("r2", "Banana bread", ["3 ripe bananas", "250g self-raising flour", "2 eggs", "100g butter"]),
+        recipe("r1", "Fluffy pancakes", BASE_INGREDIENTS),  # same recipe, second crawl
+        recipe("r3", "Fluffy pancakes", [i.replace("2 large", "3") for i in BASE_INGREDIENTS]),
+        recipe("r4", "Fluffy American pancakes", BASE_INGREDIENTS[:-1] + ["1 tbsp oil"]),  # a variant, kept
+    ]
+    kept = [r["id"] for r in stream if dedupe(dict(r)) is not None]
+    assert kept == ["r1", "r2", "r4"]
+
+    report = dedupe.report()
+    assert report["removed"] == 2 and report["kept"] == 3
+    (cluster,) = report["clusters"]
+    assert cluster["canonical_id"] == "r1"
+    assert [(a["id"], a["reason"]) for a in cluster["aliases"]] == [("r1", "same_id"), ("r3", "near_duplicate")]
+
+
+def test_lsh_limits_comparisons():
+    rng = np.random.default_rng(0)
+    # Letters only: ingredient cleaning drops tokens containing digits
+    random_word = lambda: "".join(rng.choice(list("abcdefghijklmnopqrstuvwxyz"), size=8))
+    words = [random_word() for _ in range(2000)]
+    dedupe = NearDuplicateFilter()
+    for i in range(500):
+        dedupe(recipe(f"r{i}", random_word(), list(rng.choice(words, size=10, replace=False))))
+    # Unrelated recipes rarely share a band, so hardly any pairs are compared
+    assert dedupe.stats()["removed"] == 0
+    assert dedupe.compared < 50
+
+
+def test_dedupe_as_pipeline_stage_writes_report(tmp_path):
+    dedupe = NearDuplicateFilter()
+    seen = []
+    source = [recipe(f"r{i}", "Fluffy pancakes", BASE_INGREDIENTS) for i in range(3)]
+    Pipeline(source, [Stage("dedupe", dedupe), Stage("sink", lambda r: seen.append(r["id"]) or r)]).run()
+    assert seen == ["r0"]
+
+    path = tmp_path / "report.json"
+    dedupe.write_report(str(path))
+    report = json.loads(path.read_text())
+    assert [a["id"] for a in report["clusters"][0]["aliases"]] == ["r1", "r2"]
@@ -0,0 +1,174 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import utils.embeddings as embeddings
+from utils.circuit import CircuitBreaker
+from utils.embedding_batcher import EmbeddingBatcher, TokenBucket
+
+
+class FakeBackend:
+    """Embeds text as [len(text)], recording every batch call it receives."""
+
+    def __init__(self, delay: float = 0.0, error: Exception | None = None):
+        self.delay, self.error = delay, error
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+
+def test_concurrent_requests_share_batch_calls():
+    backend = FakeBackend(delay=0.01)
+    batcher = EmbeddingBatcher(backend, window=0.02, max_batch=8)
+    try:
+        texts = [f"pantry {'x' * i}" for i in range(20)] + ["pantry x"] * 4
+        with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+            vectors = list(pool.map(lambda text: batcher.embed(text, timeout=5), texts))
+    finally:
+        batcher.close()
+    assert vectors == [[float(len(text))] for text in texts]
+    # Duplicates are sent once per batch
+    assert sum(len(batch) for batch in backend.batches) < len(texts)
+    assert len(backend.batches) <= 5 and all(len(batch) <= 8 for batch in backend.batches)
+
+
+def test_batch_errors_reach_every_caller():
+    batcher = EmbeddingBatcher(FakeBackend(error=TimeoutError("deadline exceeded")), window=0.01)
+    try:
+        futures = [batcher.submit(text) for text in ("eggs", "milk")]
+        for future in futures:
+            with pytest.raises(TimeoutError):
+                future.result(timeout=5)
+        # Short batches (backend bug) fail instead of handing out the wrong vectors
+        batcher.backend = lambda texts: []
+        with pytest.raises(ValueError):
+            [f.result(timeout=5) for f in [batcher.submit("eggs"), batcher.submit("milk")]]
+    finally:
+        batcher.close()
+
+
+def test_failed_batches_are_retried_one_text_at_a_time():
+    backend = FakeBackend()
+
+    def picky(texts):
+        if "poison" in texts:
+            raise ValueError("400 invalid argument")
+        return backend(texts)
+
+    batcher = EmbeddingBatcher(picky, window=0.05)
+    try:
+        futures = [batcher.submit(text) for text in ("eggs", "poison", "milk")]
+        assert futures[0].result(timeout=5) == [4.0] and futures[2].result(timeout=5) == [4.0]
+        with pytest.raises(ValueError):
+            futures[1].result(timeout=5)
+    finally:
+        batcher.close()
+    assert backend.batches == [["eggs"], ["milk"]]
+
+
+def test_slow_batches_do_not_hold_up_later_ones():
+    release = threading.Event()
+
+    def backend(texts):
+        if "slow" in texts:
+            release.wait(5)
+        return [[float(len(text))] for text in texts]
+
+    batcher = EmbeddingBatcher(backend, window=0.0, max_in_flight=2)
+    try:
+        slow = batcher.submit("slow")
+        time.sleep(0.05)
+        assert batcher.embed("eggs", timeout=1) == [4.0]
+        assert not slow.done()
+        release.set()
+        assert slow.result(timeout=5) == [4.0]
+    finally:
+        release.set()
+        batcher.close()
+
+
+def test_token_bucket_limits_batch_calls_and_grows_batches():
+    bucket = TokenBucket(rate=20, burst=1)
+    backend = FakeBackend()
+    batcher = EmbeddingBatcher(backend, window=0.0, max_batch=100, rate_limiter=bucket)
+    try:
+        started = time.monotonic()
+        futures = []
+        for i in range(30):
+            futures.append(batcher.submit(f"text {i}"))
+            time.sleep(0.005)
+        assert [f.result(timeout=5) for f in futures] == [[float(len(f"text {i}"))] for i in range(30)]
+        elapsed = time.monotonic() - started
+    finally:
+        batcher.close()
+    # At most one call per 50ms after the first, so texts queue up behind the limiter
+    assert len(backend.batches) <= elapsed * 20 + 1
+    assert len(backend.batches) < 30
+
+
+def test_token_bucket_waits_for_tokens():
+    now = [0.0]
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire(timeout=0.05)
+    assert bucket.acquire()
+    assert now[0] == pytest.approx(0.1)
+
+
+def test_batches_fail_when_no_token_comes_in_time():
+    bucket = TokenBucket(rate=0.5, burst=1)
+    assert bucket.acquire()  # spent: the next token is 2s away
+    backend = FakeBackend()
+    batcher = EmbeddingBatcher(backend, window=0.0, rate_limiter=bucket, acquire_timeout=0.05)
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            batcher.embed("eggs", timeout=5)
+        assert time.monotonic() - started < 1
+    finally:
+        batcher.close()
+    assert backend.batches == []
+
+
+def test_ingestion_has_its_own_rate_limit_bucket(monkeypatch):
+    monkeypatch.setattr(embeddings.Config, "EMBED_RATE_PER_SECOND", 20)
+    monkeypatch.setattr(embeddings.Config, "INGEST_EMBED_RATE_PER_SECOND", 10)
+    request = embeddings._create_batcher()
+    try:
+        ingestion = embeddings._create_ingestion_limiter()
+        assert ingestion is not request.rate_limiter and ingestion.rate == 10
+        assert request.acquire_timeout == embeddings.Config.GEMINI_EMBED_TIMEOUT_SECONDS
+    finally:
+        request.close()
+
+
+def test_generate_text_embedding_batches_through_gemini(monkeypatch):
+    calls = []
+
+    class FakeGenai:
+        def embed_content(self, model, content, task_type, request_options):
+            calls.append(list(content))
+            time.sleep(0.02)
+            return {"embedding": [[float(len(text))] * 768 for text in content]}
+
+    monkeypatch.setattr(embeddings, "get_genai", FakeGenai)
+    monkeypatch.setattr(embeddings, "embedding_breaker", CircuitBreaker("gemini_embed", 5, 30))
+    embeddings.embedding_batcher.set(EmbeddingBatcher(
+        lambda texts: embeddings.embedding_breaker.call(embeddings._embed_batch, texts), window=0.02))
+    try:
+        texts = ["eggs", "milk, rice", "flour"] * 3
+        with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+            vectors = list(pool.map(embeddings.generate_text_embedding, texts))
+    finally:
+        embeddings.embedding_batcher.get().close()
+        embeddings.embedding_batcher.reset()
+    assert [v[0] for v in vectors] == [float(len(text)) for text in texts]
+    assert {text for batch in calls for text in batch} == {"eggs", "flour", "milk, rice"}
+    assert len(calls) < len(texts)
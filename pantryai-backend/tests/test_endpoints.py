@@ -1,59 +1,69 @@
 import pytest
 from app import create_app
-from db import supabase
+from db import supabase_client
 import routes.recipes as recipes_module
+from tests.fakes import FakeSupabase
+
+DEVICE = {"X-Device-ID": "device-1"}
+
+
+@pytest.fixture
+def fake_db():
+    # Swap the lazily-created Supabase client for an in-memory stand-in
+    fake = FakeSupabase({"pantry": [
+        {"id": "1", "name": "apple", "quantity": 2, "unit": "", "device_id": "device-1"},
+        {"id": "2", "name": "pear", "quantity": 1, "unit": "", "device_id": "device-2"},
+    ]})
+    supabase_client.set(fake)
+    yield fake
+    supabase_client.reset()
 
-class DummyResult:
-    def __init__(self, data):
-        self.data = data
-    def execute(self):
-        return self
-
-class DummyTable:
-    def __init__(self, name):
-        pass
-    def select(self, *args, **kwargs):
-        # return a dummy result for .execute().data
-        return DummyResult([{"name": "apple", "quantity": 2, "unit": ""}])
-    def insert(self, items):
-        # mimic Supabase insert API
-        return DummyResult(items)
 
 @pytest.fixture
-def client(monkeypatch):
-    # monkey-patch supabase.table to use our dummy
-    monkeypatch.setattr(supabase, "table", lambda name: DummyTable(name))
+def client(fake_db):
     app = create_app()
     app.testing = True
     return app.test_client()
 
 
+def test_create_app_is_lazy():
+    from recipes import recipe_index
+    from utils.embeddings import genai_client
+    for resource in (recipe_index, genai_client, supabase_client):
+        resource.reset()
+    create_app()
+    # Building the app must not read the index or construct any API client
+    assert not recipe_index.initialized
+    assert not genai_client.initialized
+    assert not supabase_client.initialized
+
+
 def test_index_route(client):
     resp = client.get("/")
     assert resp.status_code == 200
-    assert resp.get_json() == {"message": "PantryAI API is running!"}
+    assert resp.get_json() == {"message": "Welcome to PantryAI! Use /recipes/match or /recipes/search."}
 
 
 def test_404_route(client):
     resp = client.get("/no-such-endpoint")
     assert resp.status_code == 404
-    assert resp.get_json() == {"error": "Endpoint not found"}
+    assert resp.get_json() == {"error": "Not Found"}
 
 
 def test_list_pantry(client):
-    resp = client.get("/pantry")
+    resp = client.get("/pantry", headers=DEVICE)
     assert resp.status_code == 200
-    assert resp.get_json() == [{"name": "apple", "quantity": 2}]
+    assert resp.get_json() == [{"id": "1", "name": "apple", "quantity": 2, "unit": "", "device_id": "device-1"}]
 
 
 def test_confirm_add_items_empty_list(client):
-    resp = client.post("/pantry/confirm-add", json={"items": []})
+    resp = client.post("/pantry/confirm-add", json={"items": []}, headers=DEVICE)
     assert resp.status_code == 200
     assert resp.get_json() == {"message": "No items to add."}
 
 
 def test_confirm_add_items_invalid_payload(client):
-    resp = client.post("/pantry/confirm-add", json={})
+    resp = client.post("/pantry/confirm-add", json={}, headers=DEVICE)
     assert resp.status_code == 400
     assert "Invalid request payload" in resp.get_json()["error"]
 
@@ -63,7 +73,7 @@ def test_confirm_add_items_success(client):
         {"name": "banana", "quantity": 3},
         {"name": "rice", "quantity": "two"}  # tests quantity fallback
     ]
-    resp = client.post("/pantry/confirm-add", json={"items": new_items})
+    resp = client.post("/pantry/confirm-add", json={"items": new_items}, headers=DEVICE)
     assert resp.status_code == 201
     inserted = resp.get_json()["inserted"]
     # names should match and quantity "two" should have defaulted to 1
@@ -75,7 +85,7 @@ def test_confirm_add_items_success(client):
 
 def test_match_recipes_empty_pantry(client, monkeypatch):
     # Simulate empty pantry
-    monkeypatch.setattr(recipes_module, "get_pantry_items_text_for_embedding", lambda: "")
+    monkeypatch.setattr(recipes_module, "get_pantry_for_match", lambda: ("", []))
     resp = client.get("/recipes/match")
     assert resp.status_code == 200
     assert resp.get_json() == {"message": "Your pantry is empty. Please add items to get recipe suggestions."}
@@ -83,9 +93,9 @@ def test_match_recipes_empty_pantry(client, monkeypatch):
 
 def test_match_recipes_success(client, monkeypatch):
     # Simulate pantry with items and stub embedding and matching
-    monkeypatch.setattr(recipes_module, "get_pantry_items_text_for_embedding", lambda: "2 apples")
+    monkeypatch.setattr(recipes_module, "get_pantry_for_match", lambda: ("2 apples", ["apples"]))
     monkeypatch.setattr(recipes_module, "generate_text_embedding", lambda text: [0.0] * 768)
-    monkeypatch.setattr(recipes_module, "match_recipes", lambda vec, k=5: {"matched_recipes": [{"recipe_id": "test-id", "score": 0.42}]})
+    monkeypatch.setattr(recipes_module, "match_recipes", lambda vec, k=5, **kwargs: {"matched_recipes": [{"recipe_id": "test-id", "score": 0.42}]})
     resp = client.get("/recipes/match?k=3")
     assert resp.status_code == 200
     data = resp.get_json()
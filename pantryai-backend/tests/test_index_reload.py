@@ -0,0 +1,87 @@
+# File: tests/test_index_reload.py
+
+import threading
+import faiss
+import numpy as np
+import pytest
+import recipes
+from catalog import SnapshotWriter
+from utils.lazy import LazyResource
+
+
+def publish(root, version, n, dim=4):
+    index = faiss.IndexFlatL2(dim)
+    index.add(np.full((n, dim), float(n), dtype=np.float32))
+    writer = SnapshotWriter(str(root), version=version)
+    writer.add_batch([{"id": f"{version}-{i}", "name": f"{version} recipe {i}"} for i in range(n)])
+    return writer.finalize(index)
+
+
+@pytest.fixture
+def reloader(tmp_path):
+    publish(tmp_path, "v1", 3)
+    resource = LazyResource("test index", lambda: recipes.load_snapshot_index(recipes.current_snapshot_path(str(tmp_path))))
+    return recipes.IndexReloader(resource, str(tmp_path), interval=0)
+
+
+def test_reloader_swaps_in_new_snapshot(tmp_path, reloader):
+    assert reloader.resource.get().version == "v1"
+    assert reloader.check_once() is False  # nothing new yet
+
+    publish(tmp_path, "v2", 5)
+    assert reloader.check_once() is True
+    state = reloader.resource.get()
+    assert state.version == "v2"
+    assert state.index.ntotal == len(state.id_map) == 5
+    assert state.catalog.get("v2-4")["name"] == "v2 recipe 4"
+
+
+def test_reloader_keeps_serving_when_new_snapshot_is_corrupt(tmp_path, reloader):
+    assert reloader.resource.get().version == "v1"
+    path = publish(tmp_path, "v2", 5)
+    with open(f"{path}/recipes.index", "ab") as f:
+        f.write(b"corrupt")
+    assert reloader.check_once() is False
+    assert reloader.resource.get().version == "v1"
+
+
+def test_in_flight_readers_keep_a_consistent_generation(tmp_path, reloader):
+    reloader.resource.get()
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            state = reloader.resource.get()
+            _, I = state.index.search(np.zeros((1, 4), dtype=np.float32), state.index.ntotal)
+            # Every row returned by this generation's index must exist in its own id map
+            if any(not (0 <= i < len(state.id_map)) for i in I[0]):
+                errors.append(state.version)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for n, version in enumerate(["v2", "v3", "v4"], start=4):
+        publish(tmp_path, version, n)
+        assert reloader.check_once()
+    stop.set()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert reloader.resource.get().version == "v4"
+
+
+def test_recipe_index_rejects_misaligned_id_map():
+    index = faiss.IndexFlatL2(4)
+    index.add(np.zeros((2, 4), dtype=np.float32))
+    with pytest.raises(ValueError, match="id map"):
+        recipes.RecipeIndex(index, ["only-one"])
+
+
+def test_cached_structures_are_per_generation():
+    index = faiss.IndexFlatL2(4)
+    calls = []
+    state = recipes.RecipeIndex(index, [])
+    assert state.cached("thing", lambda s: calls.append(1) or "built") == "built"
+    assert state.cached("thing", lambda s: calls.append(1) or "rebuilt") == "built"
+    assert calls == [1]
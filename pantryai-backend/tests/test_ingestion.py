@@ -0,0 +1,164 @@
+# File: tests/test_ingestion.py
+
+import json
+import os
+import threading
+import faiss
+import pytest
+from ingestion.reader import iter_json_array, iter_recipe_files
+from ingestion.normalize import normalize_recipe
+from ingestion.pipeline import Pipeline, Stage, IndexAppender, PipelineError
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_iter_json_array_top_level_list(tmp_path):
+    path = tmp_path / "list.json"
+    items = [{"id": str(i), "name": f"r{i}", "n": i * 1.5} for i in range(50)]
+    path.write_text(json.dumps(items, indent=2))
+    # Tiny chunks force values to straddle buffer boundaries
+    assert list(iter_json_array(str(path), chunk_size=7)) == items
+
+
+def test_iter_json_array_wrapped_object(tmp_path):
+    path = tmp_path / "wrapped.json"
+    path.write_text(json.dumps({"meta": {"source": "x"}, "recipes": [1, 22, 333], "tail": []}))
+    assert list(iter_json_array(str(path), chunk_size=3)) == [1, 22, 333]
+
+
+def test_iter_json_array_empty(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text("[ ]")
+    assert list(iter_json_array(str(path))) == []
+
+
+def test_iter_recipe_files_matches_json_load():
+    streamed = list(iter_recipe_files(DATA_DIR, ["budget.json"]))
+    with open(os.path.join(DATA_DIR, "budget.json"), encoding="utf-8") as f:
+        assert streamed == json.load(f)
+
+
+def test_normalize_recipe_skips_invalid_and_builds_fields():
+    assert normalize_recipe({"name": "no id"}) is None
+    recipe = normalize_recipe({"id": "r1", "name": "Toast", "ingredients": ["2 slices white bread", "1 tbsp butter"]})
+    assert recipe["cleaned_ingredients_list"] == ["slices white bread", "slices", "white", "bread", "butter"]
+    assert recipe["embedding_text"].startswith("Recipe: Toast.")
+
+
+def test_pipeline_runs_stages_and_drops_none():
+    seen = []
+    pipeline = Pipeline(
+        range(100),
+        [
+            Stage("double", lambda x: x * 2, workers=3),
+            Stage("odd_tens", lambda x: None if x % 20 else x),
+            Stage("sink", lambda batch: seen.extend(batch) or batch, batch_size=7),
+        ],
+        queue_size=4,
+    )
+    stats = pipeline.run()
+    assert sorted(seen) == list(range(0, 200, 20))
+    assert stats["double"]["items_in"] == 100
+    assert stats["odd_tens"]["items_out"] == 10
+
+
+def test_pipeline_applies_backpressure():
+    gate = threading.Event()
+    pulled = []
+
+    def source():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    def slow(x):
+        gate.wait()
+        return x
+
+    pipeline = Pipeline(source(), [Stage("slow", slow)], queue_size=2)
+    runner = threading.Thread(target=pipeline.run)
+    runner.start()
+    runner.join(timeout=0.3)
+    # Reader is blocked on the bounded queue instead of draining the source
+    assert len(pulled) <= 5
+    gate.set()
+    runner.join()
+    assert len(pulled) == 100
+
+
+def test_pipeline_surfaces_stage_errors():
+    def boom(x):
+        if x == 3:
+            raise RuntimeError("bad item")
+        return x
+
+    with pytest.raises(PipelineError, match="boom"):
+        Pipeline(range(1000), [Stage("boom", boom), Stage("sink", lambda x: x)], queue_size=2).run()
+
+
+def test_index_appender_keeps_id_map_aligned():
+    appender = IndexAppender(faiss.IndexFlatL2)
+    batch = [{"id": f"r{i}", "embedding": [float(i)] * 4} for i in range(3)]
+    appender(batch)
+    assert appender.index.ntotal == 3
+    assert appender.id_map == ["r0", "r1", "r2"]
+    assert all("embedding" not in recipe for recipe in batch)
+
+
+def test_embed_stage_counts_failed_embeddings(monkeypatch):
+    import data_ingestion_script
+
+    def fake_embeddings(texts):
+        return [None if text == "broken" else [0.0] * (768 if text != "short" else 3) for text in texts]
+
+    monkeypatch.setattr(data_ingestion_script, "generate_ingestion_embeddings", fake_embeddings)
+    failed = []
+    embed = data_ingestion_script.make_embed_stage(failed)
+    kept = embed([{"id": rid, "embedding_text": rid} for rid in ("ok", "broken", "short")])
+    assert kept[0]["embedding"] == [0.0] * 768 and kept[1:] == [None, None]
+    assert failed == ["broken", "short"]
+
+
+def test_ingestion_embeddings_isolate_a_text_gemini_rejects(monkeypatch):
+    import utils.embeddings as embeddings
+    calls = []
+
+    class PickyGenai:
+        def embed_content(self, content, **kwargs):
+            calls.append(list(content))
+            if "poison" in content:
+                raise ValueError("400 invalid argument")
+            return {"embedding": [[float(len(text))] * 768 for text in content]}
+
+    monkeypatch.setattr(embeddings, "get_genai", PickyGenai)
+    monkeypatch.setattr(embeddings.Config, "INGEST_EMBED_MAX_RETRIES", 1)
+    monkeypatch.setattr(embeddings.Config, "INGEST_EMBED_BACKOFF_BASE", 0.001)
+    embeddings.ingestion_rate_limiter.set(None)
+    try:
+        vectors = embeddings.generate_ingestion_embeddings(["eggs", "poison", "milk"])
+    finally:
+        embeddings.ingestion_rate_limiter.reset()
+    assert vectors == [[4.0] * 768, None, [4.0] * 768]
+    # Two attempts at the batch, then one call per text
+    assert calls == [["eggs", "poison", "milk"]] * 2 + [["eggs"], ["poison"], ["milk"]]
+
+
+def test_ingestion_raises_the_pipeline_error_not_the_writers(tmp_path, monkeypatch):
+    import data_ingestion_script as ingestion
+    from tests.fakes import FakeSupabase
+
+    def broken_embed_stage(failed):
+        def embed(batch):
+            raise RuntimeError("embedding stage broke")
+        return embed
+
+    def failing_close(writer):
+        raise FileNotFoundError("dead-letter file")
+
+    (tmp_path / "recipes.json").write_text(json.dumps([{"id": "r1", "name": "Toast", "ingredients": ["bread"]}]))
+    monkeypatch.setattr(ingestion, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(ingestion, "make_embed_stage", broken_embed_stage)
+    monkeypatch.setattr(ingestion.BulkWriter, "close", failing_close)
+    with pytest.raises(PipelineError) as raised:
+        ingestion.ingest_recipes_and_build_index(str(tmp_path), ["recipes.json"], client=FakeSupabase())
+    assert "embedding stage broke" in str(raised.value.__cause__)
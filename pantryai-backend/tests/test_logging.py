@@ -0,0 +1,86 @@
+import json
+import logging
+from app import create_app
+from db import supabase_client
+from tests.fakes import FakeSupabase
+from utils.logger import (
+    logger, correlation_id, ContextFilter, JsonFormatter, SAMPLED, _DeferredQueueHandler, flush_logging, configure_logging,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_record(msg, *args, level=logging.INFO, **extra):
+    return logger.makeRecord("pantryai", level, __file__, 1, msg, args, None, extra=extra or None)
+
+
+def test_json_formatter_includes_context_and_extras():
+    token = correlation_id.set("abc123")
+    try:
+        record = make_record("matched %d recipes", 3, route="/recipes/match")
+        assert ContextFilter().filter(record)
+    finally:
+        correlation_id.reset(token)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "matched 3 recipes"
+    assert entry["level"] == "INFO"
+    assert entry["correlation_id"] == "abc123"
+    assert entry["route"] == "/recipes/match"
+
+
+def test_sampling_only_drops_marked_info_records():
+    sampler = ContextFilter(sample_rate=0.0)
+    assert not sampler.filter(make_record("hot path", **SAMPLED))
+    assert sampler.filter(make_record("regular info"))
+    assert sampler.filter(make_record("hot but important", level=logging.WARNING, **SAMPLED))
+    assert ContextFilter(sample_rate=1.0).filter(make_record("hot path", **SAMPLED))
+
+
+def test_queue_handler_defers_formatting():
+    class ExplodingFormatter(logging.Formatter):
+        def format(self, record):
+            raise AssertionError("formatter must not run in the calling thread")
+
+    items = []
+    handler = _DeferredQueueHandler(type("Q", (), {"put_nowait": lambda self, r: items.append(r)})())
+    handler.setFormatter(ExplodingFormatter())
+    args = ["a"]
+    handler.handle(make_record("items %s", args))
+    args.append("b")
+    assert items[0].getMessage() == "items ['a']"
+
+    # Plain values are interpolated later, on the listener thread
+    handler.handle(make_record("%d items in %s", 3, "pantry"))
+    assert items[1].msg == "%d items in %s" and items[1].args == (3, "pantry")
+    assert items[1].getMessage() == "3 items in pantry"
+
+
+def test_requests_carry_correlation_ids():
+    capture = ListHandler()
+    logger.addHandler(capture)
+    supabase_client.set(FakeSupabase())
+    try:
+        client = create_app().test_client()
+        resp = client.get("/recipes/search?query=x", headers={"X-Request-ID": "req-42"})
+        assert resp.headers["X-Request-ID"] == "req-42"
+        assert any(getattr(r, "correlation_id", None) == "req-42" for r in capture.records)
+
+        generated = client.get("/").headers["X-Request-ID"]
+        assert len(generated) == 32
+        assert correlation_id.get() is None
+    finally:
+        logger.removeHandler(capture)
+        supabase_client.reset()
+
+
+def test_flush_and_reconfigure():
+    flush_logging()
+    configure_logging()
+    assert sum(isinstance(h, _DeferredQueueHandler) for h in logger.handlers) == 1
@@ -0,0 +1,187 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+import pytest
+import match_pipeline
+import recipes
+import routes.recipes as recipes_module
+from app import create_app
+from db import repositories, supabase_client
+from match_pipeline import EmbeddingCache, MatchPipeline, RequestCancelled, StageTimeout
+from recipes import RecipeIndex
+from tests.fakes import FakeSupabase
+
+DIM = 4
+N = 30
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=8)
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def test_map_chunks_fetches_in_parallel_and_in_order(executor):
+    threads = set()
+
+    def fetch(chunk):
+        threads.add(threading.current_thread().name)
+        time.sleep(0.1)
+        return [i * 10 for i in chunk]
+
+    with MatchPipeline(5, executor) as pipeline:
+        started = time.monotonic()
+        assert pipeline.map_chunks("hydrate_fetch", fetch, list(range(7)), 2) == [0, 10, 20, 30, 40, 50, 60]
+        assert time.monotonic() - started < 0.3  # 4 chunks of 0.1s, not run one after another
+    assert len(threads) == 4
+
+
+def test_stage_timeout_cancels_queued_work(executor, monkeypatch):
+    monkeypatch.setitem(MatchPipeline.STAGE_TIMEOUTS, "pantry_fetch", 0.1)
+    ran = []
+    single = ThreadPoolExecutor(max_workers=1)
+    try:
+        pipeline = MatchPipeline(5, single)
+        slow = pipeline.submit(time.sleep, 0.5)
+        queued = pipeline.submit(ran.append, "queued")
+        started = time.monotonic()
+        with pytest.raises(StageTimeout) as exc:
+            pipeline.wait("pantry_fetch", slow)
+        assert exc.value.stage == "pantry_fetch" and time.monotonic() - started < 0.3
+        assert pipeline.cancelled.is_set() and queued.cancelled()
+        with pytest.raises(RequestCancelled):
+            pipeline.submit(ran.append, "late")
+    finally:
+        single.shutdown(wait=True)
+    assert ran == []
+
+    # The request budget bounds stages without a timeout of their own
+    pipeline = MatchPipeline(0.1, executor)
+    with pytest.raises(StageTimeout):
+        pipeline.wait("search", pipeline.submit(time.sleep, 0.5))
+
+
+def test_embedding_cache_is_single_flight_and_forgets_failures(executor):
+    cache = EmbeddingCache(max_entries=2, ttl=60)
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        time.sleep(0.05)
+        return [] if text == "empty" else [float(len(text))]
+
+    futures = [cache.get("eggs", embed, executor) for _ in range(3)]
+    assert [f.result() for f in futures] == [[4.0]] * 3
+    assert cache.get("eggs", embed, executor).result() == [4.0]
+    assert calls == ["eggs"]
+
+    cache.get("empty", embed, executor).result()
+    cache.get("empty", embed, executor).result()
+    assert calls.count("empty") == 2
+
+    cache.get("milk", embed, executor).result()
+    cache.get("rice", embed, executor).result()  # evicts "eggs", the least recently used
+    cache.get("eggs", embed, executor).result()
+    assert calls.count("eggs") == 2
+
+
+@pytest.fixture
+def match_client(monkeypatch):
+    vectors = np.random.default_rng(0).normal(size=(N, DIM)).astype(np.float32)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+    ids = [f"r{i}" for i in range(N)]
+    # No snapshot: hydration goes to the (fake) database
+    recipes.recipe_index.set(RecipeIndex(index, ids, version="v1"))
+    fake = FakeSupabase({"recipes": [{"id": rid, "name": f"recipe {rid}"} for rid in ids]})
+    supabase_client.set(fake)
+    repositories.reset()
+    embeds = []
+
+    def embed(text):
+        embeds.append(text)
+        time.sleep(0.2)
+        return vectors[3].tolist()
+
+    def pantry():
+        time.sleep(0.2)
+        return "2 apples, flour", ["apples", "flour"]
+
+    monkeypatch.setattr(recipes_module, "get_pantry_for_match", pantry)
+    monkeypatch.setattr(recipes_module, "generate_text_embedding", embed)
+    try:
+        yield create_app().test_client(), fake, embeds
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
+        repositories.reset()
+        match_pipeline.embedding_cache.reset()
+
+
+def test_match_route_overlaps_stages_and_reuses_work(match_client, monkeypatch):
+    client, fake, embeds = match_client
+    load_index = recipes_module.get_recipe_index
+
+    def slow_index():
+        time.sleep(0.2)
+        return load_index()
+
+    monkeypatch.setattr(recipes_module, "get_recipe_index", slow_index)
+    monkeypatch.setattr(recipes.Config, "MATCH_HYDRATE_CHUNK", 4)
+
+    started = time.monotonic()
+    resp = client.get("/recipes/match?k=10")
+    elapsed = time.monotonic() - started
+    assert resp.status_code == 200
+    first = resp.get_json()["matched_recipes"]
+    assert first[0]["id"] == "r3" and len(first) == 10
+    # Index load overlaps the pantry fetch: 0.2 + 0.2 for pantry + embed, not 0.6
+    assert elapsed < 0.55
+    assert "pantry_fetch;dur=" in resp.headers["Server-Timing"]
+    assert fake.calls.count(("recipes", "select")) == 3  # 10 ids in chunks of 4
+
+    # Same pantry again: cached embedding, and the previous results were prefetched
+    fake.calls.clear()
+    resp = client.get("/recipes/match?k=10")
+    assert resp.get_json()["matched_recipes"] == first
+    assert embeds == ["2 apples, flour"]
+    assert fake.calls.count(("recipes", "select")) == 1
+
+
+def test_slow_prefetch_is_skipped_without_failing_the_request(match_client, monkeypatch):
+    client, fake, embeds = match_client
+    first = client.get("/recipes/match?k=10").get_json()["matched_recipes"]
+    fetch = recipes_module.get_recipe_records
+
+    def slow_prefetch(ids, state):
+        time.sleep(0.5)
+        return fetch(ids, state)
+
+    # The prefetch gives up after 0.05s; hydration fetches the rows itself
+    monkeypatch.setattr(recipes_module, "get_recipe_records", slow_prefetch)
+    monkeypatch.setitem(MatchPipeline.STAGE_TIMEOUTS, "prefetch", 0.05)
+    started = time.monotonic()
+    resp = client.get("/recipes/match?k=10")
+    assert resp.status_code == 200 and resp.get_json()["matched_recipes"] == first
+    assert time.monotonic() - started < 0.45
+
+
+def test_match_route_stage_timeouts(match_client, monkeypatch):
+    client, fake, embeds = match_client
+    monkeypatch.setitem(MatchPipeline.STAGE_TIMEOUTS, "embed", 0.05)
+    resp = client.get("/recipes/match")
+    # A slow embedding degrades to lexical matching, which needs a snapshot this index lacks
+    assert resp.status_code == 503 and "Retry-After" in resp.headers
+
+    # A client deadline shorter than the pantry fetch
+    started = time.monotonic()
+    resp = client.get("/recipes/match", headers={"X-Request-Timeout": "0.05"})
+    assert resp.status_code == 504 and time.monotonic() - started < 0.2
+    assert "pantry_fetch" in resp.get_json()["error"]
+
+    assert client.get("/recipes/match?maincategory=baking").status_code == 400  # needs a snapshot
@@ -0,0 +1,57 @@
+import pytest
+from app import create_app
+from db import supabase_client
+from utils.metrics import Histogram, REGISTRY, timed, server_timing_header
+from tests.fakes import FakeSupabase
+
+
+@pytest.fixture
+def client():
+    supabase_client.set(FakeSupabase({"pantry": [{"id": "1", "name": "apple", "device_id": "device-1"}]}))
+    app = create_app()
+    app.testing = True
+    yield app.test_client()
+    supabase_client.reset()
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        hist.observe(value, "a")
+    lines = hist.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="a"} 4' in lines
+    assert 'test_seconds_sum{stage="a"} 6.05' in lines
+
+
+def test_timed_works_outside_requests():
+    @timed("decorated_stage")
+    def work():
+        return 42
+
+    assert work() == 42
+    with timed("context_stage"):
+        pass
+    rendered = REGISTRY.render()
+    assert 'endpoint="none",stage="decorated_stage"' in rendered
+    assert 'endpoint="none",stage="context_stage"' in rendered
+
+
+def test_server_timing_header_format():
+    assert server_timing_header([("db", 0.0123)], 0.02) == "db;dur=12.30, total;dur=20.00"
+
+
+def test_requests_emit_server_timing_and_metrics(client):
+    resp = client.get("/pantry", headers={"X-Device-ID": "device-1"})
+    assert resp.status_code == 200
+    timing = resp.headers["Server-Timing"]
+    assert timing.startswith("db;dur=") and "total;dur=" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.mimetype == "text/plain"
+    body = metrics.get_data(as_text=True)
+    assert 'pantryai_request_duration_seconds_count{endpoint="/pantry",method="GET",status="200"}' in body
+    assert 'pantryai_stage_duration_seconds_bucket{endpoint="/pantry",stage="db",le="+Inf"}' in body
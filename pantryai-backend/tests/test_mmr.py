@@ -0,0 +1,59 @@
+import time
+import faiss
+import numpy as np
+import recipes
+from catalog import SnapshotWriter
+from db import supabase_client
+from tests.fakes import FakeSupabase
+from utils.mmr import mmr_select, unit_rows
+
+
+def test_lambda_one_keeps_relevance_order():
+    rng = np.random.default_rng(0)
+    candidates = unit_rows(rng.normal(size=(20, 8)))
+    query = rng.normal(size=8)
+    expected = np.argsort(-(candidates @ (query / np.linalg.norm(query))))[:5].tolist()
+    assert mmr_select(query, candidates, 5, lam=1.0) == expected
+
+
+def test_near_duplicates_are_spread_out():
+    # Three copies of the best match, then a distinct but still relevant one
+    candidates = unit_rows(np.array([
+        [1.0, 0.0, 0.0], [1.0, 0.001, 0.0], [1.0, 0.0, 0.001], [0.6, 0.8, 0.0], [0.0, 0.0, 1.0],
+    ]))
+    query = np.array([1.0, 0.2, 0.0])
+    assert mmr_select(query, candidates, 2, lam=1.0) == [1, 0]
+    assert mmr_select(query, candidates, 2, lam=0.5) == [1, 3]
+    assert sorted(mmr_select(query, candidates, 10, lam=0.5)) == [0, 1, 2, 3, 4]
+
+
+def test_mmr_is_sub_millisecond_for_k_50():
+    rng = np.random.default_rng(1)
+    candidates = unit_rows(rng.normal(size=(200, 768)))
+    query = rng.normal(size=768)
+    mmr_select(query, candidates, 50)
+    started = time.perf_counter()
+    for _ in range(20):
+        mmr_select(query, candidates, 50)
+    # Generous bound so slow CI machines don't flake; typically well under 1 ms
+    assert (time.perf_counter() - started) / 20 < 0.005
+
+
+def test_match_recipes_with_diversity(tmp_path):
+    vectors = np.array([[1, 0, 0, 0], [1, 0.01, 0, 0], [1, 0, 0.01, 0], [0.7, 0.7, 0, 0]], dtype=np.float32)
+    index = faiss.IndexFlatL2(4)
+    index.add(vectors)
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch([{"id": f"r{i}", "name": f"recipe {i}"} for i in range(len(vectors))])
+    recipes.recipe_index.set(recipes.load_snapshot_index(writer.finalize(index)))
+    supabase_client.set(FakeSupabase())
+    try:
+        query = [1.0, 0.0, 0.0, 0.0]
+        plain = recipes.match_recipes(query, k=2)["matched_recipes"]
+        assert [r["id"] for r in plain] == ["r0", "r1"]
+        diverse = recipes.match_recipes(query, k=2, diversity=0.3)["matched_recipes"]
+        assert [r["id"] for r in diverse] == ["r0", "r3"]
+        assert diverse[1]["score"] > diverse[0]["score"]  # scores stay FAISS distances
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
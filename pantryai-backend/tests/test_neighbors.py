@@ -0,0 +1,94 @@
+import faiss
+import numpy as np
+import pytest
+import recipes
+from app import create_app
+from catalog import SnapshotWriter
+from ingestion.neighbors import build_neighbor_graph, top_k_neighbors
+from ingestion.vector_index import create_index, prepare_vectors
+
+
+def brute_force(vectors, k, cosine):
+    if cosine:
+        unit = prepare_vectors(vectors, True)
+        scores = unit @ unit.T
+        np.fill_diagonal(scores, -np.inf)
+        return np.argsort(-scores, axis=1)[:, :k]
+    dists = ((vectors[:, None, :] - vectors[None, :, :]) ** 2).sum(-1)
+    np.fill_diagonal(dists, np.inf)
+    return np.argsort(dists, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize("cosine", [False, True])
+def test_blocked_neighbors_match_brute_force(cosine):
+    vectors = np.random.default_rng(0).normal(size=(97, 12)).astype(np.float32)
+    # A block size that doesn't divide n exercises the ragged last block
+    neighbors, scores = top_k_neighbors(vectors, 5, cosine=cosine, block_rows=10)
+    assert neighbors.shape == scores.shape == (97, 5) and neighbors.dtype == np.int32
+    assert (neighbors == brute_force(vectors, 5, cosine)).all()
+    assert not (neighbors == np.arange(97)[:, None]).any()
+    ordered = -scores if cosine else scores
+    assert (np.diff(ordered, axis=1) >= 0).all()
+
+
+def test_k_is_capped_by_catalog_size():
+    neighbors, _ = top_k_neighbors(np.eye(3, dtype=np.float32), 10)
+    assert neighbors.shape == (3, 2)
+    assert top_k_neighbors(np.eye(1, dtype=np.float32), 10)[0].shape == (1, 0)
+
+
+def test_graph_uses_index_metric():
+    vectors = np.random.default_rng(1).normal(size=(30, 8)).astype(np.float32)
+    index = create_index(8, "cosine")
+    index.add(prepare_vectors(vectors, True))
+    neighbors, scores = build_neighbor_graph(index, 3)
+    assert (neighbors == brute_force(vectors, 3, True)).all()
+    assert scores.max() <= 1.0001
+    assert build_neighbor_graph(index, 0) is None
+
+
+@pytest.fixture
+def state(tmp_path):
+    vectors = np.random.default_rng(2).normal(size=(20, 8)).astype(np.float32)
+    index = faiss.IndexFlatL2(8)
+    index.add(vectors)
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch([{"id": f"r{i}", "name": f"recipe {i}"} for i in range(20)])
+    return recipes.load_snapshot_index(writer.finalize(index, neighbors=build_neighbor_graph(index, 4))), vectors
+
+
+def test_similar_endpoint_reads_snapshot_graph(state):
+    state, vectors = state
+    assert state.catalog.manifest["neighbor_k"] == 4
+    expected = [f"r{i}" for i in brute_force(vectors, 3, False)[5]]
+
+    class NoSearch:
+        def search(self, *args, **kwargs):
+            raise AssertionError("similar recipes must not query the index")
+    state.index = NoSearch()
+    recipes.recipe_index.set(state)
+    try:
+        client = create_app().test_client()
+        resp = client.get("/recipes/r5/similar?k=3")
+        assert resp.status_code == 200
+        similar = resp.get_json()["similar"]
+        assert [r["id"] for r in similar] == expected
+        assert similar[0]["name"] == expected[0].replace("r", "recipe ")
+        assert similar[0]["score"] <= similar[-1]["score"]
+        # More than were precomputed returns what the graph has
+        assert len(client.get("/recipes/r5/similar?k=50").get_json()["similar"]) == 4
+        assert client.get("/recipes/nope/similar").status_code == 404
+    finally:
+        recipes.recipe_index.reset()
+
+
+def test_similar_endpoint_without_graph(tmp_path):
+    index = faiss.IndexFlatL2(4)
+    index.add(np.zeros((2, 4), dtype=np.float32))
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch([{"id": "a"}, {"id": "b"}])
+    recipes.recipe_index.set(recipes.load_snapshot_index(writer.finalize(index)))
+    try:
+        assert create_app().test_client().get("/recipes/a/similar").status_code == 503
+    finally:
+        recipes.recipe_index.reset()
@@ -0,0 +1,120 @@
+import io
+import time
+import numpy as np
+import pytest
+from PIL import Image
+import ocr
+import routes.scan as scan_routes
+from app import create_app
+from benchmarks.ocr_throughput import make_receipt_image, preprocess_only
+from ocr import OcrBusy, OcrImageError, OcrPool, OcrTimeout, estimate_skew, preprocess
+
+
+def slow_task(data, timeout=None, **kwargs):
+    time.sleep(float(data))
+    return "done"
+
+
+@pytest.mark.parametrize("angle", [-3.0, 0.0, 1.0, 2.0, 2.5])
+def test_deskew_straightens_rotated_receipts(angle):
+    gray = Image.open(io.BytesIO(make_receipt_image(angle=angle, lighting=False))).convert("L")
+    assert abs(estimate_skew(gray) + angle) <= 0.5
+
+
+def test_preprocess_downscales_and_binarizes():
+    page = preprocess(make_receipt_image(lines=60, width=3000, angle=2.0), max_side=1500)
+    assert max(page.size) <= 1600  # rotation with expand adds a little
+    pixels = np.asarray(page)
+    assert set(np.unique(pixels).tolist()) <= {0, 255}
+    # Mostly paper: the lighting falloff must not turn the dim side black
+    assert 0.6 < (pixels == 255).mean() < 0.98
+    right_third = pixels[:, 2 * pixels.shape[1] // 3:]
+    assert (right_third == 255).mean() > 0.6
+
+    with pytest.raises(OcrImageError):
+        preprocess(b"not an image")
+
+
+def test_pool_runs_images_in_parallel_and_bounds_work():
+    pool = OcrPool(workers=2, max_pending=0, timeout=5, wait_seconds=10, fn=preprocess_only, max_side=800)
+    try:
+        images = [make_receipt_image(lines=10, width=1000, seed=i) for i in range(2)]
+        sizes = pool.recognize(images)
+        assert len(sizes) == 2 and all("x" in s for s in sizes)
+        with pytest.raises(OcrBusy):
+            pool.recognize(images * 2)  # more than workers + max_pending
+        with pytest.raises(OcrImageError):
+            pool.recognize([b"garbage"])
+        # Slots come back after failures
+        assert len(pool.recognize(images)) == 2
+    finally:
+        pool.close()
+
+
+def test_pool_gives_up_after_wait_seconds():
+    pool = OcrPool(workers=1, max_pending=1, timeout=5, wait_seconds=30, fn=slow_task)
+    try:
+        pool.recognize([b"0"])  # let the worker start
+        pool.wait_seconds = 0.3
+        started = time.monotonic()
+        with pytest.raises(OcrTimeout):
+            pool.recognize([b"2"])
+        assert time.monotonic() - started < 1.5
+    finally:
+        pool.close()
+
+
+class FakePool:
+    def __init__(self, texts=None, error=None):
+        self.texts, self.error, self.calls = texts, error, []
+
+    def recognize(self, images):
+        self.calls.append(images)
+        if self.error:
+            raise self.error
+        return self.texts[:len(images)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def llm_unavailable(raw_text):
+        raise RuntimeError("LLM disabled in tests")
+    monkeypatch.setattr(scan_routes, "parse_receipt_google", llm_unavailable)
+    try:
+        yield create_app().test_client()
+    finally:
+        ocr.ocr_pool.reset()
+
+
+def test_scan_image_upload_feeds_parse_path(client):
+    pool = FakePool(["2 eggs\n1 milk", "  ", "3 apples"])
+    ocr.ocr_pool.set(pool)
+    resp = client.post("/scan", data={"image": [(io.BytesIO(b"a"), "1.jpg"), (io.BytesIO(b"b"), "2.jpg"),
+                                                 (io.BytesIO(b"c"), "3.jpg")]},
+                       content_type="multipart/form-data")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["ocr_text"] == "2 eggs\n1 milk\n3 apples"
+    assert [item["name"].lower() for item in body["parsed_items"]] == ["eggs", "milk", "apples"]
+    assert pool.calls == [[b"a", b"b", b"c"]]
+
+    # The JSON text mode is unchanged
+    resp = client.post("/scan", json={"parsed_text": "2 eggs"})
+    assert resp.status_code == 200 and "ocr_text" not in resp.get_json()
+
+
+@pytest.mark.parametrize("error, status", [(OcrBusy("full"), 503), (OcrTimeout("slow"), 504),
+                                           (OcrImageError("bad"), 400)])
+def test_scan_image_errors(client, error, status):
+    ocr.ocr_pool.set(FakePool(error=error))
+    resp = client.post("/scan", data={"image": (io.BytesIO(b"x"), "r.jpg")}, content_type="multipart/form-data")
+    assert resp.status_code == status
+
+
+def test_scan_image_limits(client):
+    ocr.ocr_pool.set(FakePool([""]))
+    upload = lambda n: {"image": [(io.BytesIO(b"x"), f"{i}.jpg") for i in range(n)]}
+    assert client.post("/scan", data=upload(1), content_type="multipart/form-data").status_code == 422
+    assert client.post("/scan", data=upload(6), content_type="multipart/form-data").status_code == 400
+    assert client.post("/scan", data={"image": (io.BytesIO(b""), "e.jpg")},
+                       content_type="multipart/form-data").status_code == 400
@@ -0,0 +1,91 @@
+import pytest
+from app import create_app
+from db import supabase_client
+from tests.fakes import FakeSupabase
+
+DEVICE = {"X-Device-ID": "device-1"}
+
+
+@pytest.fixture
+def fake_db():
+    fake = FakeSupabase({"pantry": [
+        {"id": str(i), "name": f"item {i}", "quantity": 1, "device_id": "device-1"} for i in range(1, 21)
+    ] + [{"id": "99", "name": "not mine", "quantity": 1, "device_id": "device-2"}]})
+    supabase_client.set(fake)
+    yield fake
+    supabase_client.reset()
+
+
+@pytest.fixture
+def client(fake_db):
+    return create_app().test_client()
+
+
+def test_bulk_delete_is_one_round_trip(client, fake_db):
+    ids = [str(i) for i in range(1, 16)] + ["99", "404", "3", ""]
+    fake_db.calls.clear()
+    resp = client.delete("/pantry/bulk", json={"ids": ids}, headers=DEVICE)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    # One call deletes and tombstones every id in a single transaction
+    assert fake_db.calls == [("rpc", "delete_pantry_items")]
+    assert body["summary"] == {"deleted": 15, "not_found": 2, "invalid": 2}
+    statuses = {r["id"]: r["status"] for r in body["results"]}
+    assert statuses["99"] == "not_found"  # belongs to another device
+    assert len(fake_db.tables["pantry"]) == 6
+
+
+def test_bulk_update_validates_then_batches(client, fake_db):
+    items = [{"id": str(i), "is_opened": True} for i in range(1, 11)]
+    items += [
+        {"id": "11", "quantity": 4, "expiry": "2024-06-01T10:00:00"},
+        {"id": "12", "expiry": "next week"},
+        {"id": "13"},
+        {"quantity": 2},
+        {"id": "1", "quantity": 7},
+        {"id": "99", "is_opened": True},
+    ]
+    fake_db.calls.clear()
+    resp = client.patch("/pantry/bulk", json={"items": items}, headers=DEVICE)
+    assert resp.status_code == 200
+    body = resp.get_json()
+    # Every item's own change set goes out in one statement
+    assert fake_db.calls == [("rpc", "update_pantry_items")]
+    assert body["summary"] == {"updated": 11, "invalid": 4, "not_found": 1}
+    by_id = {r["id"]: r for r in body["results"] if r["id"]}
+    assert by_id["11"]["item"]["expiry"] == "2024-06-01"
+    assert by_id["12"]["error"] == "Invalid expiry date format"
+    # One transaction, so one revision across the whole edit
+    assert len({by_id[str(i)]["item"]["revision"] for i in range(2, 12)}) == 1
+    rows = {row["id"]: row for row in fake_db.tables["pantry"]}
+    assert rows["1"]["quantity"] == 1 and rows["1"]["is_opened"] is True
+    assert "is_opened" not in rows["99"]
+
+
+def test_bulk_update_rejects_bad_fields_per_item(client, fake_db):
+    items = [
+        {"id": "1", "quantity": 3},
+        {"id": "2", "colour": "red"},
+        {"id": "3", "quantity": "lots"},
+        {"id": "4", "is_opened": "yes"},
+        {"id": "5", "quantity": True},
+        {"id": "6", "revision": 1},
+        {"id": "7", "name": " "},
+        {"id": "8", "notes": None, "location": "Fridge"},
+    ]
+    resp = client.patch("/pantry/bulk", json={"items": items}, headers=DEVICE)
+    assert resp.status_code == 200
+    by_id = {r["id"]: r for r in resp.get_json()["results"]}
+    assert {i for i, r in by_id.items() if r["status"] == "updated"} == {"1", "8"}
+    assert by_id["2"]["error"] == "Unknown or read-only field 'colour'"
+    assert by_id["3"]["error"] == "Invalid value for 'quantity'"
+    rows = {row["id"]: row for row in fake_db.tables["pantry"]}
+    assert rows["1"]["quantity"] == 3 and "colour" not in rows["2"] and rows["3"]["quantity"] == 1
+
+
+def test_bulk_rejects_malformed_payloads(client, monkeypatch):
+    assert client.patch("/pantry/bulk", json={"items": []}, headers=DEVICE).status_code == 400
+    assert client.delete("/pantry/bulk", json={"ids": "1"}, headers=DEVICE).status_code == 400
+    assert client.delete("/pantry/bulk", json={"ids": ["1"]}).status_code == 400
+    monkeypatch.setattr("config.Config.PANTRY_BULK_MAX_ITEMS", 2)
+    assert client.delete("/pantry/bulk", json={"ids": ["1", "2", "3"]}, headers=DEVICE).status_code == 400
@@ -0,0 +1,121 @@
+import time
+from app import create_app
+from db import supabase_client
+from pantry_search import DeviceSearchIndex, edit_distance
+from repositories.search_indexed import SearchIndexedPantryRepository
+from repositories.supabase_repo import SupabasePantryRepository
+from tests.fakes import FakeSupabase
+
+DEVICE = {"X-Device-ID": "device-1"}
+ITEMS = [
+    {"id": "1", "name": "Cherry Tomatoes", "category": "Produce", "device_id": "device-1"},
+    {"id": "2", "name": "Mature Cheddar", "brand": "Cathedral City", "category": "Dairy & Eggs", "device_id": "device-1"},
+    {"id": "3", "name": "Tomato Ketchup", "brand": "Heinz", "category": "Condiments & Sauces", "device_id": "device-1"},
+    {"id": "4", "name": "Extra Virgin Olive Oil", "category": "Oils & Vinegars", "device_id": "device-1"},
+    {"id": "5", "name": "Tomatoes", "category": "Produce", "device_id": "device-2"},
+]
+
+
+def build(items=ITEMS):
+    index = DeviceSearchIndex()
+    for item in items:
+        if item["device_id"] == "device-1":
+            index.upsert(item)
+    return index
+
+
+def ids(results):
+    return [item["id"] for item in results]
+
+
+def test_edit_distance():
+    assert edit_distance("tomatos", "tomatoes", 2) == 1
+    assert edit_distance("chedder", "cheddar", 2) == 1
+    assert edit_distance("chesee", "cheese", 2) == 1  # transposition
+    assert edit_distance("milk", "bread", 1) == 2  # gives up past the limit
+
+
+def test_typos_prefixes_and_fields():
+    index = build()
+    assert ids(index.search("tomatos")) == ["1", "3"]
+    assert ids(index.search("chedder")) == ["2"]
+    assert ids(index.search("ched")) == ["2"]
+    assert ids(index.search("heinz")) == ["3"]
+    assert ids(index.search("dairy")) == ["2"]
+    assert ids(index.search("olive oil")) == ["4"]
+    assert ids(index.search("OLIVE")) == ["4"]
+    assert index.search("caviar") == [] and index.search("  ") == []
+
+
+def test_exact_name_beats_brand_and_fuzzy_matches():
+    index = build(ITEMS + [{"id": "6", "name": "Ketchup", "brand": "Tomato Co", "device_id": "device-1"}])
+    assert ids(index.search("tomato"))[:2] == ["3", "1"]
+    assert ids(index.search("ketchup"))[0] == "6"
+
+
+def test_remove_and_update_keep_postings_in_sync():
+    index = build()
+    index.remove("1")
+    assert ids(index.search("cherry")) == []
+    index.upsert({**ITEMS[1], "name": "Red Leicester"})
+    assert ids(index.search("cheddar")) == [] and ids(index.search("leicester")) == ["2"]
+    assert all(index.postings.values()) and "cherry" not in index.token_items
+
+
+def test_search_is_sub_millisecond():
+    index = DeviceSearchIndex()
+    words = ["tomato", "cheddar", "milk", "bread", "pasta", "rice", "onion", "garlic", "butter", "yoghurt"]
+    for i in range(300):
+        index.upsert({"id": str(i), "name": f"{words[i % 10]} {words[(i * 7) % 10]} {i}", "brand": f"brand{i % 13}"})
+    queries = ["tom", "chedder", "garlic bread", "yogurt", "pas"]
+    started = time.perf_counter()
+    for _ in range(20):
+        for query in queries:
+            index.search(query)
+    # Generous bound so slow CI machines don't flake
+    assert (time.perf_counter() - started) / (20 * len(queries)) < 0.001
+
+
+def test_repository_serves_searches_from_memory():
+    fake = FakeSupabase({"pantry": [dict(item, revision=1) for item in ITEMS],
+                         "pantry_revisions": [{"device_id": d, "revision": 1} for d in ("device-1", "device-2")]})
+    repo = SearchIndexedPantryRepository(SupabasePantryRepository(lambda: fake), refresh_seconds=3600)
+    assert ids(repo.search_items("device-1", "tomatos")) == ["1", "3"]
+
+    fake.calls.clear()
+    assert ids(repo.search_items("device-1", "tom")) == ["1", "3"]
+    assert ids(repo.search_items("device-2", "tom")) == ["5"]  # builds device-2's index
+    fake.calls.clear()
+    for query in ("t", "to", "tom", "toma"):
+        repo.search_items("device-1", query)
+    assert fake.calls == []
+
+    # This worker's writes are applied to the index directly
+    repo.insert_items([{"name": "Tomato Puree", "device_id": "device-1"}])
+    repo.delete_item("device-1", "1")
+    fake.calls.clear()
+    assert [item["name"] for item in repo.search_items("device-1", "tomato")] == ["Tomato Ketchup", "Tomato Puree"]
+    assert fake.calls == []
+
+
+def test_other_workers_writes_arrive_with_the_next_refresh():
+    fake = FakeSupabase({"pantry": [dict(item, revision=0) for item in ITEMS]})
+    this_worker = SearchIndexedPantryRepository(SupabasePantryRepository(lambda: fake), refresh_seconds=0)
+    other_worker = SupabasePantryRepository(lambda: fake)
+    assert ids(this_worker.search_items("device-1", "ketchup")) == ["3"]
+    other_worker.update_item("device-1", "3", {"name": "Brown Sauce"})
+    other_worker.delete_item("device-1", "2")
+    assert ids(this_worker.search_items("device-1", "ketchup")) == []
+    assert ids(this_worker.search_items("device-1", "brown")) == ["3"]
+    assert ids(this_worker.search_items("device-1", "cheddar")) == []
+
+
+def test_search_route_tolerates_typos():
+    supabase_client.set(FakeSupabase({"pantry": ITEMS}))
+    try:
+        client = create_app().test_client()
+        resp = client.get("/pantry/search?query=chedder", headers=DEVICE)
+        assert resp.status_code == 200
+        assert [item["name"] for item in resp.get_json()] == ["Mature Cheddar"]
+    finally:
+        supabase_client.reset()
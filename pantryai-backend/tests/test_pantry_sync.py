@@ -0,0 +1,124 @@
+import pytest
+from app import create_app
+from db import supabase_client
+from repositories.replicated import ReplicatedPantryRepository
+from repositories.sqlite_repo import SQLiteStore, SQLitePantryRepository
+from repositories.supabase_repo import SupabasePantryRepository
+from tests.fakes import FakeSupabase
+
+DEVICE = {"X-Device-ID": "device-1"}
+
+
+@pytest.fixture(params=["supabase", "sqlite", "replicated"])
+def pantry(request, tmp_path):
+    if request.param == "supabase":
+        fake = FakeSupabase()
+        return SupabasePantryRepository(lambda: fake)
+    replica = SQLitePantryRepository(SQLiteStore(str(tmp_path / "pantry.db")))
+    if request.param == "sqlite":
+        return replica
+    fake = FakeSupabase()
+    return ReplicatedPantryRepository(SupabasePantryRepository(lambda: fake), replica)
+
+
+def names(rows):
+    return sorted(row["name"] for row in rows)
+
+
+def test_changes_since_returns_only_the_delta(pantry):
+    inserted = pantry.insert_items([{"name": "milk", "device_id": "device-1"}, {"name": "eggs", "device_id": "device-1"},
+                                    {"name": "tea", "device_id": "device-2"}])
+    ids = {row["name"]: row["id"] for row in inserted}
+
+    full = pantry.changes_since("device-1", 0)
+    assert names(full["upserts"]) == ["eggs", "milk"] and full["deleted"] == [] and not full["reset"]
+    rev = full["revision"]
+    assert rev > 0
+
+    assert pantry.changes_since("device-1", rev) == {"revision": rev, "upserts": [], "deleted": [], "reset": False}
+
+    pantry.update_item("device-1", ids["milk"], {"quantity": 2, "revision": 10_000})
+    pantry.delete_item("device-1", ids["eggs"])
+    pantry.update_items("device-2", {ids["tea"]: {"quantity": 3}})
+    delta = pantry.changes_since("device-1", rev)
+    assert [(row["name"], row["quantity"]) for row in delta["upserts"]] == [("milk", 2)]
+    assert delta["upserts"][0]["revision"] < 10_000  # clients can't set revisions
+    assert delta["deleted"] == [ids["eggs"]]
+    assert delta["revision"] > rev
+
+    caught_up = pantry.changes_since("device-1", delta["revision"])
+    assert caught_up["upserts"] == [] and caught_up["deleted"] == []
+
+
+def test_client_ahead_of_server_gets_a_reset(pantry):
+    pantry.insert_items([{"name": "milk", "device_id": "device-1"}])
+    changes = pantry.changes_since("device-1", 999)
+    assert changes["reset"] and names(changes["upserts"]) == ["milk"]
+
+
+def test_bulk_delete_tombstones_every_item(pantry):
+    rows = pantry.insert_items([{"name": n, "device_id": "device-1"} for n in ("a", "b", "c")])
+    rev = pantry.changes_since("device-1", 0)["revision"]
+    deleted = pantry.delete_items("device-1", [rows[0]["id"], rows[1]["id"], "missing"])
+    assert len({row["revision"] for row in deleted}) == 1
+    assert sorted(pantry.changes_since("device-1", rev)["deleted"]) == sorted([rows[0]["id"], rows[1]["id"]])
+
+
+def test_writes_that_match_nothing_allocate_no_revision(pantry):
+    pantry.insert_items([{"name": "milk", "device_id": "device-1"}])
+    rev = pantry.changes_since("device-1", 0)["revision"]
+    assert pantry.update_item("device-1", "missing", {"quantity": 2}) is None
+    assert pantry.delete_item("device-1", "missing") is None
+    assert pantry.delete_items("device-1", ["missing"]) == []
+    assert pantry.changes_since("device-1", 0)["revision"] == rev
+
+
+def test_changes_leave_out_revisions_past_the_counter():
+    # A write whose rows are visible but which committed after the counter was read
+    fake = FakeSupabase({
+        "pantry": [{"id": "1", "name": "milk", "device_id": "device-1", "revision": 1},
+                   {"id": "2", "name": "eggs", "device_id": "device-1", "revision": 3}],
+        "pantry_revisions": [{"device_id": "device-1", "revision": 2}],
+        "pantry_tombstones": [{"device_id": "device-1", "item_id": "3", "revision": 3}],
+    })
+    pantry = SupabasePantryRepository(lambda: fake)
+    changes = pantry.changes_since("device-1", 1)
+    assert changes == {"revision": 2, "upserts": [], "deleted": [], "reset": False}
+    assert names(pantry.changes_since("device-1", 0)["upserts"]) == ["milk"]
+
+
+def test_changes_endpoint():
+    fake = FakeSupabase()
+    supabase_client.set(fake)
+    try:
+        client = create_app().test_client()
+        client.post("/pantry/confirm-add", json={"items": [{"name": "rice"}]}, headers=DEVICE)
+        first = client.get("/pantry/changes", headers=DEVICE).get_json()
+        assert [row["name"] for row in first["upserts"]] == ["rice"]
+
+        item_id = first["upserts"][0]["id"]
+        client.delete(f"/pantry/{item_id}", headers=DEVICE)
+        fake.calls.clear()
+        second = client.get(f"/pantry/changes?since={first['revision']}", headers=DEVICE).get_json()
+        assert second["upserts"] == [] and second["deleted"] == [item_id]
+        # Counter, changed rows and tombstones: three indexed lookups regardless of pantry size
+        assert len(fake.calls) == 3
+
+        assert client.get("/pantry/changes?since=abc", headers=DEVICE).status_code == 400
+        assert client.get("/pantry/changes").status_code == 400
+    finally:
+        supabase_client.reset()
+
+
+def test_sqlite_adds_revision_column_to_existing_files(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE pantry (id TEXT PRIMARY KEY, device_id TEXT NOT NULL, name TEXT NOT NULL, "
+                 "name_norm TEXT NOT NULL, category TEXT, quantity NUMERIC, unit TEXT, expiry TEXT, purchase_date TEXT, "
+                 "location TEXT, brand TEXT, barcode TEXT, notes TEXT, is_opened INTEGER, added_at TEXT, image_url TEXT)")
+    conn.execute("INSERT INTO pantry (id, device_id, name, name_norm) VALUES ('1', 'device-1', 'salt', 'salt')")
+    conn.commit()
+    conn.close()
+    pantry = SQLitePantryRepository(SQLiteStore(path))
+    assert pantry.changes_since("device-1", 0)["upserts"][0]["revision"] == 0
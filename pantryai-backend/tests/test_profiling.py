@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from app import create_app
+from config import Config
+from concurrent.futures import ThreadPoolExecutor
+from match_pipeline import MatchPipeline
+from utils.logger import correlation_id
+from utils.profiling import StackSampler, collapse, profile_filename
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+def test_sampler_collects_stacks_of_target_thread():
+    sampler = StackSampler(threading.get_ident(), interval=0.001).start()
+    busy_loop(0.1)
+    counts = sampler.stop()
+    assert sampler.samples > 0
+    assert any("busy_loop (test_profiling.py" in stack for stack in counts)
+    line = collapse(counts).splitlines()[0]
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) >= 1 and ";" in stack
+
+
+def test_sampler_follows_request_work_onto_pipeline_threads():
+    token = correlation_id.set("req-1")
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        sampler = StackSampler(threading.get_ident(), interval=0.001, request_id="req-1").start()
+        with MatchPipeline(budget=5, executor=executor) as pipeline:
+            pipeline.wait("embed", pipeline.submit(busy_loop, 0.1))
+        counts = sampler.stop()
+        # Another request's work on the same pool isn't attributed to this one
+        correlation_id.set("req-2")
+        other = StackSampler(threading.get_ident(), interval=0.001, request_id="req-1").start()
+        with MatchPipeline(budget=5, executor=executor) as pipeline:
+            pipeline.wait("embed", pipeline.submit(busy_loop, 0.05))
+        other_counts = other.stop()
+    finally:
+        correlation_id.reset(token)
+        executor.shutdown()
+    assert any(stack.startswith("[executor];") and "busy_loop (test_profiling.py" in stack for stack in counts)
+    assert not any(stack.startswith("[executor]") for stack in other_counts)
+
+
+def test_profile_filename_tags_route_and_duration():
+    name = profile_filename("GET /recipes/<recipe_id>", 12.4)
+    assert name.endswith("_GET_recipes_recipe_id_12ms.collapsed")
+
+
+def test_disabled_profiling_registers_no_hooks(monkeypatch):
+    monkeypatch.setattr(Config, "PROFILE_ADMIN_TOKEN", None)
+    monkeypatch.setattr(Config, "PROFILE_SAMPLE_RATE", 0.0)
+    hooks = create_app().before_request_funcs.get(None, [])
+    assert not any(fn.__module__ == "utils.profiling" for fn in hooks)
+
+
+def test_admin_token_writes_profile(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PROFILE_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(Config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "PROFILE_INTERVAL_MS", 1.0)
+    client = create_app().test_client()
+
+    assert "X-Profile-File" not in client.get("/").headers
+    assert "X-Profile-File" not in client.get("/", headers={"X-Profile-Token": "wrong"}).headers
+
+    resp = client.get("/", headers={"X-Profile-Token": "secret"})
+    filename = resp.headers["X-Profile-File"]
+    assert "_GET_" in filename and filename.endswith(".collapsed")
+    assert os.path.exists(tmp_path / filename)
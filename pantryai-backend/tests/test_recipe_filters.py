@@ -0,0 +1,125 @@
+import faiss
+import numpy as np
+import pytest
+import recipes
+from app import create_app
+from catalog import SnapshotWriter
+from db import supabase_client
+from ingestion.vector_index import create_index
+from recipe_filters import AttributeBitmaps, search_with_mask
+from tests.fakes import FakeSupabase
+
+DIM = 8
+N = 200
+
+
+def make_records():
+    records = []
+    for i in range(N):
+        baking = i % 40 == 0  # 5 of 200: rare enough to fall outside an unfiltered top-k
+        records.append({
+            "id": f"r{i}",
+            "name": f"recipe {i}",
+            "maincategory": "Baking" if baking else "Dinner",
+            "difficulty": "Easy" if i % 2 else "More effort",
+            "times": {"Preparation": f"{5 + i % 30} mins", "Cooking": "15 mins"} if i % 7 else {},
+        })
+    return records
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(N, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def state(tmp_path, vectors):
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch(make_records())
+    return recipes.load_snapshot_index(writer.finalize(index))
+
+
+def test_masks_combine_filters(state):
+    bitmaps = AttributeBitmaps(state.catalog)
+    assert bitmaps.mask({}) is None
+    assert bitmaps.mask({"maincategory": "baking"}).sum() == 5
+    assert bitmaps.mask({"maincategory": "BAKING", "difficulty": "more effort"}).sum() == 5
+    assert bitmaps.mask({"maincategory": "brunch"}).sum() == 0
+    assert bitmaps.facets()["maincategory"] == {"baking": 5, "dinner": 195}
+
+    quick = bitmaps.mask({"max_minutes": "25"})
+    totals = state.catalog.columns["total_minutes"]
+    # Recipes without times (NaN) never pass a time bound
+    assert quick.sum() > 0 and not quick[np.isnan(totals)].any()
+    assert (totals[quick] <= 25).all()
+
+    with pytest.raises(ValueError):
+        bitmaps.mask({"cuisine": "thai"})
+    with pytest.raises(ValueError):
+        bitmaps.mask({"max_minutes": "soon"})
+
+
+def test_filtered_search_returns_k_matching_rows(state, vectors):
+    query = vectors[1:2] + 0.01
+    mask = AttributeBitmaps(state.catalog).mask({"maincategory": "baking"})
+    D, I = search_with_mask(state.index, query, 5, mask)
+    assert sorted(I[0].tolist()) == np.flatnonzero(mask).tolist()
+    assert D[0].tolist() == sorted(D[0].tolist())
+
+    # Asking for more than qualify returns just the qualifying rows, no -1 padding
+    _, I = search_with_mask(state.index, query, 50, mask)
+    assert len(I[0]) == 5 and (I[0] >= 0).all()
+
+
+def test_filtered_search_through_pretransform_index(vectors):
+    index = create_index(DIM, "cosine", "float16", pca_dim=4)
+    data = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    index.train(data)
+    index.add(data)
+    mask = np.zeros(N, dtype=bool)
+    mask[[3, 50, 120]] = True
+    _, I = search_with_mask(index, data[:1], 10, mask)
+    assert sorted(I[0].tolist()) == [3, 50, 120]
+
+
+def test_match_endpoint_applies_filters(state, vectors):
+    recipes.recipe_index.set(state)
+    supabase_client.set(FakeSupabase())
+    try:
+        matched = recipes.match_recipes(vectors[1].tolist(), k=5, filters={"maincategory": "Baking"})["matched_recipes"]
+        assert len(matched) == 5
+        assert all(int(r["id"][1:]) % 40 == 0 for r in matched)
+        assert recipes.match_recipes(vectors[1].tolist(), k=5)["matched_recipes"][0]["id"] == "r1"
+
+        diverse = recipes.match_recipes(vectors[1].tolist(), k=3, diversity=0.5, filters={"maincategory": "baking"})
+        assert len(diverse["matched_recipes"]) == 3
+
+        with pytest.raises(ValueError):
+            recipes.match_recipes(vectors[1].tolist(), k=5, filters={"cuisine": "thai"})
+
+        client = create_app().test_client()
+        resp = client.get("/recipes/facets")
+        assert resp.status_code == 200
+        assert resp.get_json()["facets"]["difficulty"] == {"easy": 100, "more effort": 100}
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
+
+
+def test_match_route_passes_filters_and_rejects_bad_ones(state, vectors, monkeypatch):
+    import routes.recipes as recipes_module
+    monkeypatch.setattr(recipes_module, "get_pantry_for_match", lambda: ("flour, sugar", ["flour", "sugar"]))
+    monkeypatch.setattr(recipes_module, "generate_text_embedding", lambda text: vectors[1].tolist())
+    recipes.recipe_index.set(state)
+    supabase_client.set(FakeSupabase())
+    try:
+        client = create_app().test_client()
+        resp = client.get("/recipes/match?k=3&maincategory=baking&max_minutes=60")
+        assert resp.status_code == 200
+        assert len(resp.get_json()["matched_recipes"]) == 3
+        assert client.get("/recipes/match?max_minutes=soon").status_code == 400
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
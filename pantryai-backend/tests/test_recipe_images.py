@@ -0,0 +1,197 @@
+import asyncio
+import json
+from aiohttp import web
+from ingestion.images import HostRateLimiter, ImageCheckpoint, ImagePopulator, extract_image_url
+from repositories.sqlite_repo import SQLiteStore, SQLiteRecipeRepository
+
+PAGES = {
+    "og": '<html><head><meta property="og:image" content="/img/og.jpg"></head><body><img src="x.png"></body></html>',
+    "article": '<body><img src="data:image/gif;base64,R0"><img src="/logo.png">'
+               '<article><p>Stew</p><img data-src="img/stew.jpg"></article></body>',
+    "plain": "<html><body><p>No pictures here</p></body></html>",
+}
+
+
+def test_extract_image_url_preference_order():
+    base = "https://example.com/recipes/stew"
+    assert extract_image_url(PAGES["og"], base) == "https://example.com/img/og.jpg"
+    assert extract_image_url(PAGES["article"], base) == "https://example.com/recipes/img/stew.jpg"
+    assert extract_image_url('<meta name="twitter:image" content="https://cdn.test/t.jpg"><img src="a.jpg">',
+                             base) == "https://cdn.test/t.jpg"
+    assert extract_image_url(PAGES["plain"], base) == ""
+    assert extract_image_url("<html><head><meta property=", base) == ""
+
+
+def test_rate_limiter_spaces_request_starts():
+    async def run():
+        limiter = HostRateLimiter(rate=50, per_host=4)
+        starts = []
+
+        async def hit(host):
+            async with limiter.slot(host):
+                starts.append((host, asyncio.get_running_loop().time()))
+        await asyncio.gather(*(hit("a") for _ in range(5)), hit("b"))
+        return starts
+
+    starts = asyncio.run(run())
+    a = sorted(t for host, t in starts if host == "a")
+    assert all(later - earlier >= 0.015 for earlier, later in zip(a, a[1:]))
+    # Another host is not held up by the first one's schedule
+    assert next(t for host, t in starts if host == "b") - a[0] < 0.015
+
+
+class StubServer:
+    """Recipe pages and a Pexels-compatible search endpoint on one local port."""
+
+    def __init__(self):
+        self.hits = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.flaky_failures = 1
+
+    async def _track(self, name):
+        self.hits[name] = self.hits.get(name, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+
+    async def page(self, request):
+        name = request.match_info["name"]
+        await self._track(name)
+        if name == "flaky" and self.flaky_failures:
+            self.flaky_failures -= 1
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if name == "flaky":
+            name = "og"
+        if name not in PAGES:
+            return web.Response(status=404)
+        return web.Response(text=PAGES[name], content_type="text/html")
+
+    async def pexels(self, request):
+        await self._track("pexels")
+        assert request.headers["Authorization"] == "test-key"
+        query = request.query["query"]
+        if query.startswith("Nothing"):
+            return web.json_response({"photos": []})
+        if query.startswith("Outage"):
+            return web.Response(text="<html>Service unavailable</html>", content_type="text/html")
+        if query.startswith("Listing"):
+            return web.json_response([{"src": {"medium": "https://images.pexels.test/list.jpg"}}])
+        return web.json_response({"photos": [{"src": {"medium": f"https://images.pexels.test/{query.split()[0]}.jpg"}}]})
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/recipes/{name}", self.page)
+        app.router.add_get("/v1/search", self.pexels)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def make_repository(tmp_path, base):
+    repo = SQLiteRecipeRepository(SQLiteStore(str(tmp_path / "pantry.db")))
+    repo.upsert([
+        {"id": "r1", "name": "Roast", "url": f"{base}/recipes/og"},
+        {"id": "r2", "name": "Stew", "url": f"{base}/recipes/article"},
+        {"id": "r3", "name": "Salad", "url": f"{base}/recipes/plain"},
+        {"id": "r4", "name": "Soup", "url": f"{base}/recipes/gone"},
+        {"id": "r5", "name": "Pie", "url": f"{base}/recipes/flaky"},
+        {"id": "r6", "name": "Nothing at all"},
+        {"id": "r7", "name": "Toast", "url": f"{base}/recipes/og", "image_url": "https://already.test/t.jpg"},
+    ])
+    return repo
+
+
+def populator(repo, server, checkpoint, **kwargs):
+    return ImagePopulator(repo, pexels_key="test-key", pexels_base=f"{server.base}/v1", concurrency=8,
+                          per_host=2, host_rate=0, batch_size=2, checkpoint=checkpoint,
+                          backoff_base=0.01, page_size=3, **kwargs)
+
+
+def test_populates_images_and_resumes_from_checkpoint(tmp_path):
+    checkpoint_path = str(tmp_path / "images.jsonl")
+
+    async def run():
+        async with StubServer() as server:
+            repo = make_repository(tmp_path, server.base)
+            first = await populator(repo, server, ImageCheckpoint(checkpoint_path)).run(limit=3)
+            hits_after_first = dict(server.hits)
+            second = await populator(repo, server, ImageCheckpoint(checkpoint_path)).run()
+            third = await populator(repo, server, ImageCheckpoint(checkpoint_path)).run()
+            return server, repo, first, hits_after_first, second, third
+
+    server, repo, first, hits_after_first, second, third = asyncio.run(run())
+    images = {r["id"]: r.get("image_url") for r in repo.get_many([f"r{i}" for i in range(1, 8)])}
+    assert images["r1"] == f"{server.base}/img/og.jpg"
+    assert images["r2"] == f"{server.base}/recipes/img/stew.jpg"
+    assert images["r3"] == "https://images.pexels.test/Salad.jpg"
+    assert images["r4"] == "https://images.pexels.test/Soup.jpg"
+    assert images["r5"] == f"{server.base}/img/og.jpg"  # after one 429
+    assert images["r6"] is None
+    assert images["r7"] == "https://already.test/t.jpg"
+
+    assert first["recipes"] == 3 and first["written"] == 3
+    assert second["recipes"] == 3 and second["retries"] == 1 and second["none"] == 1
+    assert hits_after_first == {"og": 1, "article": 1, "plain": 1, "pexels": 1}
+    # Recipes nothing was found for are checkpointed too, so a third run has nothing left to fetch
+    assert third["recipes"] == 0 and third["skipped"] == 1
+    assert server.max_in_flight <= 2
+
+    with open(checkpoint_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert sorted(line["id"] for line in lines) == ["r1", "r2", "r3", "r4", "r5", "r6"]
+    assert {line["id"]: line["source"] for line in lines}["r6"] == "none"
+
+
+def test_failed_writes_are_not_checkpointed(tmp_path):
+    class FailingRepository:
+        def __init__(self, base):
+            self.base = base
+
+        def missing_images(self, after_id="", limit=500):
+            return [] if after_id else [{"id": "r1", "name": "Roast", "url": f"{self.base}/recipes/og"}]
+
+        def set_image_urls(self, urls):
+            raise ConnectionError("database unreachable")
+
+    checkpoint = ImageCheckpoint(str(tmp_path / "images.jsonl"))
+
+    async def run():
+        async with StubServer() as server:
+            return await populator(FailingRepository(server.base), server, checkpoint).run()
+
+    report = asyncio.run(run())
+    assert report["write_failures"] == 1 and report["written"] == 0
+    assert not checkpoint.done and not (tmp_path / "images.jsonl").exists()
+
+
+def test_unusable_responses_fail_only_their_recipe(tmp_path):
+    class Repository:
+        written = {}
+
+        def missing_images(self, after_id="", limit=500):
+            return [] if after_id else [{"id": "r1", "name": "Outage stew"}, {"id": "r2", "name": "Listing pie"},
+                                        {"id": "r3", "name": "Roast"}]
+
+        def set_image_urls(self, urls):
+            self.written.update(urls)
+            return len(urls)
+
+    repo = Repository()
+    checkpoint = ImageCheckpoint(str(tmp_path / "images.jsonl"))
+
+    async def run():
+        async with StubServer() as server:
+            return await populator(repo, server, checkpoint).run()
+
+    report = asyncio.run(run())
+    assert report["error"] == 2 and report["pexels"] == 1
+    assert repo.written == {"r3": "https://images.pexels.test/Roast.jpg"}
+    assert checkpoint.done == {"r3"}
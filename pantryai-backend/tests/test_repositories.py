@@ -0,0 +1,179 @@
+import pytest
+from app import create_app
+from db import repositories, supabase_client
+from repositories.base import normalize_name
+from repositories.replicated import ReplicatedPantryRepository
+from repositories.sqlite_repo import SQLiteStore, SQLitePantryRepository, SQLiteRecipeRepository
+from repositories.supabase_repo import SupabasePantryRepository, SupabaseRecipeRepository
+from tests.fakes import FakeSupabase
+
+PANTRY = [
+    {"id": "1", "name": "Olive Oil", "quantity": 1, "unit": "l", "device_id": "device-1", "is_opened": True},
+    {"id": "2", "name": "eggs", "quantity": 12, "unit": "pcs", "device_id": "device-1"},
+    {"id": "3", "name": "olive tapenade", "quantity": 1, "unit": "jar", "device_id": "device-2"},
+]
+RECIPES = [
+    {"id": "r1", "name": "Omelette", "description": "Quick eggs", "difficulty": "easy", "ratings": 4.5,
+     "cleaned_ingredients_list": ["eggs", "butter"], "times": {"cook": 5}},
+    {"id": "r2", "name": "Pancakes", "description": "Fluffy", "difficulty": "easy", "ratings": 3.0,
+     "cleaned_ingredients_list": ["eggs", "flour", "milk"], "times": {"cook": 15}},
+    {"id": "r3", "name": "Bread", "description": "Crusty loaf", "difficulty": "hard", "ratings": None,
+     "cleaned_ingredients_list": ["flour", "yeast"], "times": {"cook": 40}},
+]
+
+
+@pytest.fixture(params=["supabase", "sqlite"])
+def repos(request, tmp_path):
+    if request.param == "supabase":
+        fake = FakeSupabase({"pantry": PANTRY, "recipes": RECIPES})
+        return SupabasePantryRepository(lambda: fake), SupabaseRecipeRepository(lambda: fake)
+    store = SQLiteStore(str(tmp_path / "pantry.db"))
+    pantry, recipes = SQLitePantryRepository(store), SQLiteRecipeRepository(store)
+    pantry.insert_items(PANTRY)
+    recipes.upsert(RECIPES)
+    return pantry, recipes
+
+
+def test_normalize_name():
+    assert normalize_name("  Extra-Virgin OLIVE oil! ") == "extra virgin olive oil"
+    assert normalize_name(None) == ""
+
+
+def test_pantry_reads_are_device_scoped(repos):
+    pantry, _ = repos
+    assert sorted(item["id"] for item in pantry.list_items("device-1")) == ["1", "2"]
+    assert len(pantry.list_all_items()) == 3
+    assert pantry.get_item("device-1", "1")["is_opened"] is True
+    assert pantry.get_item("device-2", "1") is None
+    assert [item["id"] for item in pantry.search_items("device-1", "OLIVE")] == ["1"]
+
+
+def test_sqlite_searches_normalized_names(tmp_path):
+    store = SQLiteStore(str(tmp_path / "pantry.db"))
+    pantry, recipes = SQLitePantryRepository(store), SQLiteRecipeRepository(store)
+    pantry.insert_items(PANTRY)
+    recipes.upsert(RECIPES)
+    pantry.update_item("device-1", "2", {"name": "Free-Range Eggs"})
+    assert [item["id"] for item in pantry.search_items("device-1", "free range")] == ["2"]
+    assert [item["id"] for item in pantry.search_items("device-1", "OLIVE-oil")] == ["1"]
+    assert pantry.search_items("device-1", "!!") == []
+    assert [r["id"] for r in recipes.search_text("PANCAKE!")] == ["r2"]
+
+
+def test_pantry_writes(repos):
+    pantry, _ = repos
+    inserted = pantry.insert_items([{"name": "milk", "quantity": 1, "device_id": "device-1"}])
+    assert inserted[0]["id"]
+    assert pantry.update_item("device-1", "2", {"quantity": 6})["quantity"] == 6
+    assert pantry.update_item("device-2", "2", {"quantity": 1}) is None
+    assert pantry.delete_item("device-1", "1")["name"] == "Olive Oil"
+    assert pantry.delete_item("device-1", "1") is None
+    assert sorted(item["name"] for item in pantry.list_items("device-1")) == ["eggs", "milk"]
+
+
+def test_pantry_bulk_writes(repos):
+    pantry, _ = repos
+    updated = pantry.update_items("device-1", {"1": {"is_opened": False}, "2": {"quantity": 6}, "3": {"quantity": 9}})
+    assert sorted((row["id"], row["quantity"]) for row in updated) == [("1", 1), ("2", 6)]
+    assert pantry.get_item("device-1", "1")["is_opened"] is False
+    assert pantry.get_item("device-2", "3")["quantity"] == 1  # other devices' items are untouched
+
+    deleted = pantry.delete_items("device-1", ["1", "3", "missing"])
+    assert [row["name"] for row in deleted] == ["Olive Oil"]
+    assert [item["id"] for item in pantry.list_items("device-1")] == ["2"]
+    assert pantry.update_items("device-1", {}) == [] and pantry.delete_items("device-1", []) == []
+
+
+def test_recipe_queries(repos):
+    _, recipes = repos
+    assert recipes.get("r2")["name"] == "Pancakes"
+    assert recipes.get("missing") is None
+    assert sorted(r["id"] for r in recipes.get_many(["r1", "r3", "missing"])) == ["r1", "r3"]
+    assert [r["id"] for r in recipes.search_text("crusty")] == ["r3"]
+    assert sorted(r["id"] for r in recipes.search_ingredients(["eggs"])) == ["r1", "r2"]
+    assert [r["id"] for r in recipes.search_ingredients(["eggs", "milk"])] == ["r2"]
+    assert [r["id"] for r in recipes.filter({"difficulty": "easy"}, sort_by="rating")] == ["r2", "r1"]
+    assert [r["id"] for r in recipes.filter({}, sort_by="time", descending=True)] == ["r3", "r2", "r1"]
+
+
+def test_sqlite_uses_wal_and_indexes(tmp_path):
+    store = SQLiteStore(str(tmp_path / "pantry.db"))
+    conn = store.connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    plan = " ".join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM pantry WHERE device_id = ? AND name_norm = ?", ("d", "n")))
+    assert "idx_pantry_device_name" in plan
+
+
+def test_replicated_pantry_reads_locally_and_mirrors_writes(tmp_path):
+    fake = FakeSupabase({"pantry": PANTRY})
+    replica = SQLitePantryRepository(SQLiteStore(str(tmp_path / "pantry.db")))
+    repo = ReplicatedPantryRepository(SupabasePantryRepository(lambda: fake), replica)
+    assert repo.sync() == 3
+
+    fake.calls.clear()
+    assert len(repo.list_items("device-1")) == 2
+    assert fake.calls == []
+
+    repo.insert_items([{"name": "milk", "device_id": "device-1"}])
+    repo.delete_item("device-1", "2")
+    assert sorted(item["name"] for item in replica.list_items("device-1")) == ["Olive Oil", "milk"]
+    assert sorted(item["name"] for item in fake.tables["pantry"] if item["device_id"] == "device-1") == ["Olive Oil", "milk"]
+
+
+def test_replicated_bulk_writes_reach_both_stores(tmp_path):
+    fake = FakeSupabase({"pantry": PANTRY})
+    replica = SQLitePantryRepository(SQLiteStore(str(tmp_path / "pantry.db")))
+    repo = ReplicatedPantryRepository(SupabasePantryRepository(lambda: fake), replica)
+    repo.sync()
+    repo.update_items("device-1", {"1": {"quantity": 3}})
+    repo.delete_items("device-1", ["2"])
+    assert [(item["id"], item["quantity"]) for item in replica.list_items("device-1")] == [("1", 3)]
+    assert [item["id"] for item in fake.tables["pantry"] if item["device_id"] == "device-1"] == ["1"]
+
+
+def test_sync_repairs_a_delete_whose_mirror_failed(tmp_path, monkeypatch):
+    fake = FakeSupabase()
+    replica = SQLitePantryRepository(SQLiteStore(str(tmp_path / "pantry.db")))
+    repo = ReplicatedPantryRepository(SupabasePantryRepository(lambda: fake), replica)
+    ids = [row["id"] for row in repo.insert_items([{"name": "milk", "device_id": "device-1"},
+                                                   {"name": "eggs", "device_id": "device-1"}])]
+    seen = repo.changes_since("device-1", 0)["revision"]
+
+    def replica_down(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(replica, "delete_items", replica_down)
+    assert repo.delete_item("device-1", ids[1])["id"] == ids[1]
+    assert repo.get_item("device-1", ids[1]) is not None  # still served from the replica
+    monkeypatch.undo()
+
+    repo.sync()
+    assert repo.get_item("device-1", ids[1]) is None
+    assert [item["name"] for item in repo.list_items("device-1")] == ["milk"]
+    # Clients that synced before the delete are told about it
+    assert repo.changes_since("device-1", seen)["deleted"] == [ids[1]]
+
+
+def test_routes_use_sqlite_backend(tmp_path):
+    store = SQLiteStore(str(tmp_path / "pantry.db"))
+    repositories.set((SQLitePantryRepository(store), SQLiteRecipeRepository(store)))
+    supabase_client.reset()
+    try:
+        client = create_app().test_client()
+        resp = client.post("/pantry/confirm-add", json={"items": [{"name": "rice", "quantity": 2}]},
+                           headers={"X-Device-ID": "device-1"})
+        assert resp.status_code == 201
+        assert [item["name"] for item in client.get("/pantry", headers={"X-Device-ID": "device-1"}).get_json()] == ["rice"]
+        assert not supabase_client.initialized
+    finally:
+        repositories.reset()
+
+
+def test_recipe_image_backfill(repos):
+    _, recipes = repos
+    assert [r["id"] for r in recipes.missing_images()] == ["r1", "r2", "r3"]
+    assert [r["id"] for r in recipes.missing_images(after_id="r1", limit=1)] == ["r2"]
+    assert recipes.set_image_urls({"r1": "https://img.test/1.jpg", "r3": "https://img.test/3.jpg", "nope": "x"}) == 2
+    assert recipes.get("r1")["image_url"] == "https://img.test/1.jpg"
+    assert [r["id"] for r in recipes.missing_images()] == ["r2"]
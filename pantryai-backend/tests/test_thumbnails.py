@@ -0,0 +1,125 @@
+import io
+import os
+import faiss
+import numpy as np
+import pytest
+import recipes
+import requests
+from PIL import Image
+from app import create_app
+from catalog import SnapshotWriter
+from db import repositories, supabase_client
+from tests.fakes import FakeSupabase
+from thumbnails import DiskLRUCache, Thumbnailer, thumbnailer
+
+SOURCE_URL = "https://images.example.com/roast.jpg"
+
+
+def make_jpeg(width=1600, height=1200) -> bytes:
+    # Noise compresses like a photo would, unlike a flat colour
+    pixels = np.random.default_rng(0).integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+class FakeSession:
+    """requests.Session stand-in serving fixed bodies by URL and counting fetches."""
+
+    def __init__(self, bodies: dict):
+        self.bodies = bodies
+        self.fetches = []
+
+    def get(self, url, **kwargs):
+        self.fetches.append(url)
+        session = self
+
+        class Resp:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def raise_for_status(self):
+                if url not in session.bodies:
+                    raise requests.HTTPError(f"404 for {url}")
+
+            def iter_content(self, size):
+                body = session.bodies[url]
+                return (body[i:i + size] for i in range(0, len(body), size))
+        return Resp()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=250)
+    cache.put("a", b"a" * 100)
+    cache.put("b", b"b" * 100)
+    assert cache.get("a") == b"a" * 100  # "a" is now the most recent
+    cache.put("c", b"c" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.total_bytes == 200
+
+    # Reopening rebuilds the index from the files and their mtimes
+    os.utime(cache._path("a"), (1, 1))
+    reopened = DiskLRUCache(str(tmp_path), max_bytes=150)
+    assert reopened.total_bytes == 100
+    assert reopened.get("a") is None and reopened.get("c") == b"c" * 100
+
+
+@pytest.fixture
+def app_state(tmp_path):
+    index = faiss.IndexFlatL2(4)
+    index.add(np.zeros((2, 4), dtype=np.float32))
+    writer = SnapshotWriter(str(tmp_path / "snapshots"), version="v1")
+    writer.add_batch([{"id": "r1", "name": "Roast", "image_url": SOURCE_URL}, {"id": "r2", "name": "Stew"}])
+    recipes.recipe_index.set(recipes.load_snapshot_index(writer.finalize(index)))
+    # r2 got its image after ingestion, so only the database knows it
+    supabase_client.set(FakeSupabase({"recipes": [
+        {"id": "r2", "name": "Stew", "image_url": "https://images.example.com/stew.jpg"},
+        {"id": "r3", "name": "Toast"},
+    ]}))
+    repositories.reset()
+    session = FakeSession({SOURCE_URL: make_jpeg()})
+    thumbnailer.set(Thumbnailer(DiskLRUCache(str(tmp_path / "cache"), 50 * 1024 * 1024), [160, 320, 640],
+                                session=session))
+    try:
+        yield create_app().test_client(), session
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
+        repositories.reset()
+        thumbnailer.reset()
+
+
+def test_image_endpoint_serves_small_cached_variants(app_state):
+    client, session = app_state
+    source_size = len(session.bodies[SOURCE_URL])
+
+    resp = client.get("/images/r1?w=300", headers={"Accept": "image/webp,image/*"})
+    assert resp.status_code == 200 and resp.mimetype == "image/webp"
+    assert Image.open(io.BytesIO(resp.data)).size == (320, 240)  # snapped up to a configured width
+    assert len(resp.data) * 10 < source_size
+    assert resp.headers["Cache-Control"] == "public, max-age=2592000"
+    assert "Accept" in resp.headers["Vary"]
+    etag = resp.headers["ETag"]
+
+    assert client.get("/images/r1?w=300", headers={"Accept": "image/webp", "If-None-Match": etag}).status_code == 304
+
+    jpeg = client.get("/images/r1?w=160")
+    assert jpeg.mimetype == "image/jpeg" and Image.open(io.BytesIO(jpeg.data)).size == (160, 120)
+    assert client.get("/images/r1?w=5000&fmt=jpg").mimetype == "image/jpeg"
+    # The original was fetched once for all three variants
+    assert session.fetches == [SOURCE_URL]
+
+
+def test_image_endpoint_errors(app_state):
+    client, session = app_state
+    assert client.get("/images/r3").status_code == 404
+    assert client.get("/images/nope").status_code == 404
+    assert client.get("/images/r1?w=wide").status_code == 400
+    assert client.get("/images/r1?fmt=gif").status_code == 400
+    # Found via the repository, but the source is gone
+    assert client.get("/images/r2").status_code == 502
+    assert session.fetches == ["https://images.example.com/stew.jpg"]
@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+import faiss
+import numpy as np
+import pytest
+import recipes
+from app import create_app
+from catalog import SnapshotWriter
+from db import supabase_client
+from tests.fakes import FakeSupabase
+from use_it_up import IngredientMatrix, build_ingredient_matrix, expiry_weight, rank_pantry_overlap, rank_use_it_up
+
+TODAY = date(2024, 5, 1)
+RECIPES = [
+    {"id": "r1", "name": "Spinach omelette", "cleaned_ingredients_list": ["eggs", "spinach", "butter"]},
+    {"id": "r2", "name": "Chicken traybake", "cleaned_ingredients_list": ["chicken thighs", "potatoes", "garlic"]},
+    {"id": "r3", "name": "Plain rice", "cleaned_ingredients_list": ["rice"]},
+    {"id": "r4", "name": "Chicken and spinach curry", "cleaned_ingredients_list": ["chicken breast", "spinach", "rice"]},
+]
+
+
+def pantry(name, days_left=None):
+    expiry = (TODAY + timedelta(days=days_left)).isoformat() if days_left is not None else None
+    return {"name": name, "expiry": expiry}
+
+
+@pytest.fixture
+def state(tmp_path):
+    index = faiss.IndexFlatL2(4)
+    index.add(np.zeros((len(RECIPES), 4), dtype=np.float32))
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch(RECIPES)
+    return recipes.load_snapshot_index(writer.finalize(index))
+
+
+def test_expiry_weight():
+    assert expiry_weight(0, 3, 14) == 1.0
+    assert expiry_weight(3, 3, 14) == pytest.approx(0.5)
+    assert expiry_weight(15, 3, 14) == 0.0
+    assert expiry_weight(-1, 3, 14) == 0.0
+    assert expiry_weight(None, 3, 14) == 0.0
+
+
+def test_matrix_matches_pantry_names(state):
+    matrix = build_ingredient_matrix(state)
+    vocab = matrix.vocab
+    assert {vocab[c] for c in matrix.match("Chicken")} == {"chicken thighs", "chicken breast"}
+    assert {vocab[c] for c in matrix.match("Fresh Spinach (200g bag)")} == {"spinach"}
+    assert matrix.match("caviar") == set()
+
+
+def test_multi_word_ingredients_match_phrases_before_tokens():
+    recipe_ingredients = [
+        ["chicken", "chicken stock", "rice"],
+        ["boneless chicken breast", "chopped tomatoes"],
+        ["chicken breast", "lemon"],
+    ]
+    vocab = sorted({name for names in recipe_ingredients for name in names})
+    ids = [vocab.index(name) for names in recipe_ingredients for name in names]
+    matrix = IngredientMatrix(vocab, np.array(ids), np.cumsum([0] + [len(names) for names in recipe_ingredients]))
+    names = lambda cols: {vocab[c] for c in cols}
+
+    assert names(matrix.match("Chicken")) == {"chicken"}
+    assert names(matrix.match("chicken breast")) == {"chicken breast"}
+    assert names(matrix.match("breast")) == {"chicken breast", "boneless chicken breast"}
+    assert names(matrix.match("tomatoes, chopped")) == {"chopped tomatoes"}  # token fallback only
+
+    # One pantry item counts once: "chicken" doesn't also score the recipe's "chicken stock"
+    ranked = rank_pantry_overlap(matrix, ["chicken"], k=3)
+    assert [(r["row"], r["matched"]) for r in ranked] == [(0, 1)]
+
+
+def test_ranks_recipes_using_most_urgent_items(state):
+    matrix = state.cached("ingredient_matrix", build_ingredient_matrix)
+    items = [pantry("spinach", 0), pantry("chicken", 3), pantry("rice", None), pantry("eggs", 30)]
+    ranked, at_risk = rank_use_it_up(matrix, items, k=10, today=TODAY, half_life=3, horizon=14)
+
+    assert [a["name"] for a in at_risk] == ["spinach", "chicken"]
+    ids = [state.id_map[r["row"]] for r in ranked]
+    # r4 uses both at-risk items; r1 only spinach; r2 only chicken; r3 uses nothing at risk
+    assert ids == ["r4", "r1", "r2"]
+    assert ranked[0]["uses"] == ["chicken", "spinach"]
+    assert ranked[0]["score"] == pytest.approx(1.5)
+    assert ranked[0]["coverage"] == pytest.approx(1.0)
+
+
+def test_nothing_at_risk_returns_no_recipes(state):
+    matrix = state.cached("ingredient_matrix", build_ingredient_matrix)
+    ranked, at_risk = rank_use_it_up(matrix, [pantry("spinach", None)], today=TODAY)
+    assert ranked == [] and at_risk == []
+
+
+def test_use_it_up_endpoint(state):
+    soon = (date.today() + timedelta(days=1)).isoformat()
+    supabase_client.set(FakeSupabase({"pantry": [
+        {"id": "1", "name": "spinach", "expiry": soon, "device_id": "device-1"},
+        {"id": "2", "name": "chicken", "expiry": soon, "device_id": "device-2"},
+    ]}))
+    recipes.recipe_index.set(state)
+    try:
+        client = create_app().test_client()
+        assert client.get("/recipes/use-it-up").status_code == 400
+        resp = client.get("/recipes/use-it-up?k=2", headers={"X-Device-ID": "device-1"})
+        assert resp.status_code == 200
+        body = resp.get_json()
+        assert [r["id"] for r in body["recipes"]] == ["r1", "r4"]
+        assert body["recipes"][0]["uses_expiring"] == ["spinach"]
+        assert body["at_risk"][0]["name"] == "spinach"
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
+
+
+def test_column_sums_match_dense_product(state):
+    matrix = build_ingredient_matrix(state)
+    dense = np.zeros((matrix.n_recipes, len(matrix.vocab)))
+    for row in range(matrix.n_recipes):
+        dense[row, matrix.recipe_columns(row)] = 1
+    weights = np.arange(1, len(matrix.vocab) + 1, dtype=np.float64)
+    cols = np.array([0, 3, 5])
+    assert np.allclose(matrix.column_sums(cols, weights[cols]), dense[:, cols] @ weights[cols])
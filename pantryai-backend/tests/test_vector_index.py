@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import recipes
+from catalog import SnapshotWriter
+from db import supabase_client
+from ingestion.pipeline import IndexAppender
+from ingestion.vector_index import create_index, index_spec
+from scripts.index_report import evaluate
+from tests.fakes import FakeSupabase
+
+
+def clustered_vectors(n=400, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(8, dim))
+    return (centers[rng.integers(0, 8, n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def test_index_spec():
+    assert index_spec(768) == "Flat"
+    assert index_spec(768, "float16") == "SQfp16"
+    assert index_spec(768, "int8", pca_dim=256) == "PCA256,SQ8"
+    assert index_spec(768, "int8", pca_dim=256, cosine=True) == "PCA256,L2norm,SQ8"
+    assert index_spec(64, "int8", pca_dim=128) == "SQ8"  # PCA can't increase dimensions
+    with pytest.raises(ValueError):
+        index_spec(768, "int4")
+
+
+def test_appender_trains_quantized_index_and_keeps_row_order():
+    vectors = clustered_vectors()
+    appender = IndexAppender(lambda dim: create_index(dim, "cosine", "int8", pca_dim=32))
+    for start in range(0, len(vectors), 64):
+        batch = [{"id": f"r{i}", "embedding": vectors[i].tolist()} for i in range(start, min(start + 64, len(vectors)))]
+        appender(batch)
+    assert appender.index.ntotal == 0  # buffered until trained
+    index = appender.finish()
+    assert index.ntotal == len(vectors) == len(appender.id_map)
+
+    query = vectors[123] / np.linalg.norm(vectors[123])
+    D, I = index.search(query[None, :].astype(np.float32), 1)
+    assert appender.id_map[I[0][0]] == "r123"
+    assert 0.9 < D[0][0] <= 1.01
+
+
+def test_appender_trains_on_a_bounded_sample_and_adds_in_chunks():
+    vectors = clustered_vectors()
+    appender = IndexAppender(lambda dim: create_index(dim, "l2", "int8"), train_size=100, add_chunk=70)
+    for start in range(0, len(vectors), 64):
+        appender([{"id": f"r{i}", "embedding": vectors[i].tolist()} for i in range(start, min(start + 64, len(vectors)))])
+    assert appender._sample.shape[0] == 100 and appender._seen == len(vectors)
+    index = appender.finish()
+    assert index.ntotal == len(vectors) and appender._spill is None
+    for row in (0, 69, 70, len(vectors) - 1):
+        _, I = index.search(vectors[row][None, :].astype(np.float32), 1)
+        assert appender.id_map[I[0][0]] == f"r{row}"
+
+
+def test_cosine_snapshot_scores_are_similarities(tmp_path):
+    vectors = clustered_vectors(n=50, dim=16)
+    appender = IndexAppender(lambda dim: create_index(dim, "cosine", "float16"))
+    appender([{"id": f"r{i}", "embedding": v.tolist()} for i, v in enumerate(vectors)])
+    index = appender.finish()
+    writer = SnapshotWriter(str(tmp_path), version="v1")
+    writer.add_batch([{"id": f"r{i}", "name": f"recipe {i}"} for i in range(len(vectors))])
+    path = writer.finalize(index)
+    state = recipes.load_snapshot_index(path)
+    assert state.cosine and state.catalog.manifest["metric"] == "cosine"
+
+    recipes.recipe_index.set(state)
+    supabase_client.set(FakeSupabase())
+    try:
+        # An unnormalized query gets normalized, so the exact match scores ~1
+        matched = recipes.match_recipes((vectors[7] * 5).tolist(), k=5)["matched_recipes"]
+        assert matched[0]["id"] == "r7"
+        assert matched[0]["score"] == pytest.approx(1.0, abs=1e-2)
+        assert all(-1.01 <= r["score"] <= 1.01 for r in matched)
+        assert [r["score"] for r in matched] == sorted((r["score"] for r in matched), reverse=True)
+    finally:
+        recipes.recipe_index.reset()
+        supabase_client.reset()
+
+
+def test_report_measures_memory_and_recall():
+    rows = {row["variant"]: row for row in evaluate(clustered_vectors(n=2000), k=10, n_queries=50, pca_dims=(32,))}
+    assert rows["l2/float32"]["recall@10"] == 1.0
+    assert rows["cosine/float16"]["recall@10"] > 0.8
+    assert rows["cosine/float16"]["memory_ratio"] < 0.6
+    assert rows["cosine/int8"]["memory_ratio"] < 0.35
+    assert rows["cosine/int8/pca32"]["bytes"] < rows["cosine/int8"]["bytes"]
@@ -0,0 +1,232 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from PIL import Image, ImageOps
+from config import Config
+from utils.lazy import LazyResource
+from utils.logger import logger
+
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+# Encoder settings; bump ENCODER_VERSION when changing them so cached variants are re-rendered
+WEBP_QUALITY = 75
+JPEG_QUALITY = 78
+ENCODER_VERSION = 1
+# Lock stripes for single-flight fetches/renders (bounded, unlike a lock per key)
+_STRIPES = 64
+
+
+class ImageSourceError(Exception):
+    """The original image could not be fetched or decoded."""
+
+
+class DiskLRUCache:
+    """
+    Byte blobs stored as files under `directory`, evicted least recently used first
+    once their total size passes `max_bytes`.
+
+    Recency survives restarts: get() touches the file's mtime, and the index is
+    rebuilt from mtimes when the cache opens. Files are written to a temporary name
+    and renamed into place, so readers (including other worker processes sharing
+    the directory) never see a partial file. Each process accounts only for the
+    files it has seen, so with several workers the bound is approximate.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> size
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.startswith(".tmp"):
+                    os.remove(path)  # left over from a crash mid-write
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(path, None)
+                if size is not None:
+                    self.total_bytes -= size  # evicted by another worker
+            return None
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+            else:
+                self._entries[path] = len(data)  # written by another worker
+                self.total_bytes += len(data)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.total_bytes += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._evict()
+
+
+def render_variant(source: bytes, width: int, fmt: str) -> bytes:
+    """
+    `source` scaled down to `width` pixels wide (never up) and encoded as WebP or
+    JPEG. JPEG sources are decoded directly at a reduced scale via draft(), which
+    skips most of the decoding work for large originals.
+    """
+    try:
+        with Image.open(io.BytesIO(source)) as img:
+            # Both sides at least `width`, so an EXIF rotation still leaves enough pixels
+            img.draft("RGB", (width, width))
+            img = ImageOps.exif_transpose(img)
+            if img.width > width:
+                height = max(1, round(img.height * width / img.width))
+                img = img.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+            out = io.BytesIO()
+            if fmt == "webp":
+                img = img if img.mode in ("RGB", "RGBA") else img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                img.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+            else:
+                img.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            return out.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise ImageSourceError(f"Could not decode source image: {exc}") from exc
+
+
+class Thumbnailer:
+    """
+    Resized variants of remote recipe images, cached on disk.
+
+    Requested widths are snapped up to one of `widths`, so there is a small, fixed
+    set of variants per image. The original is fetched once and cached alongside its
+    variants; concurrent requests for the same variant (or original) wait for the
+    first one instead of fetching and rendering it again. Cache keys include the
+    source URL, so a recipe whose image_url changes gets new variants.
+    """
+
+    def __init__(self, cache: DiskLRUCache, widths: list[int], timeout: float = 10.0,
+                 max_source_bytes: int = 15 * 1024 * 1024, session: requests.Session | None = None):
+        self.cache = cache
+        self.widths = sorted(set(widths))
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self.session = session or requests.Session()
+        self._variant_locks = [threading.Lock() for _ in range(_STRIPES)]
+        self._source_locks = [threading.Lock() for _ in range(_STRIPES)]
+
+    def snap_width(self, width: int) -> int:
+        """The smallest configured width >= `width` (the largest one past the top)."""
+        return next((w for w in self.widths if w >= width), self.widths[-1])
+
+    def _fetch(self, url: str) -> bytes:
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True,
+                                  headers={"User-Agent": "PantryAI-thumbnailer"}) as resp:
+                resp.raise_for_status()
+                body = bytearray()
+                for chunk in resp.iter_content(64 * 1024):
+                    body += chunk
+                    if len(body) > self.max_source_bytes:
+                        raise ImageSourceError(f"Source image is larger than {self.max_source_bytes} bytes")
+                return bytes(body)
+        except requests.RequestException as exc:
+            raise ImageSourceError(f"Could not fetch source image: {exc}") from exc
+
+    def source(self, url: str) -> bytes:
+        key = f"source|{url}"
+        data = self.cache.get(key)
+        if data is None:
+            with self._source_locks[hash(key) % _STRIPES]:
+                data = self.cache.get(key)
+                if data is None:
+                    data = self._fetch(url)
+                    self.cache.put(key, data)
+        return data
+
+    def variant(self, url: str, width: int, fmt: str) -> bytes:
+        """`url`'s image at an exact configured width (see snap_width) in FORMATS `fmt`."""
+        key = f"v{ENCODER_VERSION}|{width}|{fmt}|{url}"
+        data = self.cache.get(key)
+        if data is None:
+            # Variant locks are always taken before source locks, so the two can't deadlock
+            with self._variant_locks[hash(key) % _STRIPES]:
+                data = self.cache.get(key)
+                if data is None:
+                    data = render_variant(self.source(url), width, fmt)
+                    self.cache.put(key, data)
+        return data
+
+    def pregenerate(self, urls: list[str], formats: tuple = tuple(FORMATS), workers: int = 8) -> dict:
+        """Renders every configured width and format of each url ahead of the first request."""
+        counts = {"images": 0, "failed": 0}
+
+        def render_all(url):
+            try:
+                for width in self.widths:
+                    for fmt in formats:
+                        self.variant(url, width, fmt)
+                return True
+            except ImageSourceError as exc:
+                logger.warning("Thumbnail pre-generation failed for %s: %s", url, exc)
+                return False
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for ok in pool.map(render_all, urls):
+                counts["images" if ok else "failed"] += 1
+        return counts
+
+
+def catalog_image_urls(catalog) -> list[str]:
+    """Distinct image_urls of every recipe in a CatalogSnapshot, in row order."""
+    urls = (catalog.record(row).get("image_url") for row in range(len(catalog)))
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+def _create_thumbnailer() -> Thumbnailer:
+    cache = DiskLRUCache(Config.IMAGE_CACHE_DIR, int(Config.IMAGE_CACHE_MAX_MB * 1024 * 1024))
+    return Thumbnailer(cache, Config.IMAGE_VARIANT_WIDTHS, timeout=Config.IMAGE_SOURCE_TIMEOUT_SECONDS)
+
+
+thumbnailer = LazyResource("image thumbnailer", _create_thumbnailer)
+
+
+def get_thumbnailer() -> Thumbnailer:
+    return thumbnailer.get()
@@ -0,0 +1,200 @@
+from datetime import date, datetime
+import numpy as np
+from config import Config
+from recipes import RecipeIndex, register_cache_warmer
+from repositories.base import normalize_name
+from utils.embeddings import parse_ingredient_name
+
+
+class IngredientMatrix:
+    """
+    The catalog's recipe x ingredient incidence matrix, kept both by recipe (the
+    snapshot's CSR arrays) and by ingredient (CSC: the recipes using each vocabulary
+    entry), plus a token -> vocabulary inverted index for mapping free-text pantry
+    names onto the vocabulary. Built once per index generation.
+    """
+
+    def __init__(self, vocab: list[str], ingredient_ids: np.ndarray, ingredient_offsets: np.ndarray):
+        self.vocab = vocab
+        self.n_recipes = len(ingredient_offsets) - 1
+        lengths = np.diff(np.asarray(ingredient_offsets, dtype=np.int64))
+        self.cols = np.asarray(ingredient_ids, dtype=np.int32)
+        self.offsets = np.asarray(ingredient_offsets, dtype=np.int64)
+        self.lengths = np.maximum(lengths, 1).astype(np.float32)
+
+        rows = np.repeat(np.arange(self.n_recipes, dtype=np.int32), lengths)
+        order = np.argsort(self.cols, kind="stable")
+        self.csc_rows = rows[order]
+        self.csc_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.cols, minlength=len(vocab)), out=self.csc_offsets[1:])
+
+        self.vocab_by_name = {}
+        self._by_token = {}
+        for col, name in enumerate(vocab):
+            key = normalize_name(name)
+            self.vocab_by_name.setdefault(key, []).append(col)
+            for token in set(key.split()):
+                self._by_token.setdefault(token, set()).add(col)
+
+    def match(self, pantry_name: str) -> set[int]:
+        """
+        Vocabulary columns a pantry item can stand in for, from the first of these that
+        finds any: the exact cleaned name; ingredients containing it as a phrase
+        ("chicken breast" -> "boneless chicken breast"); and only failing both, ingredients
+        containing all of its words in any order ("tomatoes chopped" -> "chopped tomatoes").
+        Stopping at the first tier keeps "chicken" from also matching "chicken stock"
+        when the vocabulary has "chicken" itself, which would count one item twice.
+        """
+        key = normalize_name(parse_ingredient_name(pantry_name or ""))
+        if not key:
+            return set()
+        exact = self.vocab_by_name.get(key)
+        if exact:
+            return set(exact)
+        token_sets = [self._by_token.get(token) for token in key.split()]
+        if not all(token_sets):
+            return set()
+        candidates = set.intersection(*token_sets)
+        phrase = f" {key} "
+        within = {col for col in candidates if phrase in f" {normalize_name(self.vocab[col])} "}
+        return within or candidates
+
+    def recipe_columns(self, row: int) -> np.ndarray:
+        return self.cols[self.offsets[row]:self.offsets[row + 1]]
+
+    def column_sums(self, cols: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Per-recipe sum of `weights[j]` over the recipe's uses of vocabulary entry
+        `cols[j]`, i.e. the matrix-vector product restricted to the given columns.
+        Only the CSC entries of those columns are touched, not the whole catalog.
+        """
+        starts = self.csc_offsets[cols]
+        counts = self.csc_offsets[cols + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(self.n_recipes, dtype=np.float64)
+        # Flattened positions of every entry in the selected column ranges
+        shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        positions = np.arange(total, dtype=np.int64) + shifts
+        return np.bincount(self.csc_rows[positions], weights=np.repeat(weights, counts), minlength=self.n_recipes)
+
+
+def build_ingredient_matrix(state: RecipeIndex) -> IngredientMatrix | None:
+    catalog = state.catalog
+    if catalog is None:
+        return None
+    return IngredientMatrix(catalog.ingredient_vocab, catalog.ingredient_ids, catalog.ingredient_offsets)
+
+
+@register_cache_warmer
+def _warm_ingredient_matrix(state: RecipeIndex):
+    state.cached("ingredient_matrix", build_ingredient_matrix)
+
+
+def _days_until(expiry, today: date) -> int | None:
+    if not expiry:
+        return None
+    try:
+        return (datetime.fromisoformat(str(expiry)).date() - today).days
+    except ValueError:
+        return None
+
+
+def expiry_weight(days_left: int | None, half_life: float, horizon: int) -> float:
+    """
+    Urgency of using an item up: 1.0 on its expiry day, halving every `half_life`
+    days further out, and 0 beyond `horizon` days, already expired, or undated.
+    """
+    if days_left is None or days_left < 0 or days_left > horizon:
+        return 0.0
+    return 0.5 ** (days_left / half_life)
+
+
+def rank_use_it_up(matrix: IngredientMatrix, pantry_items: list[dict], k: int = 10, today: date | None = None,
+                   half_life: float | None = None, horizon: int | None = None) -> tuple[list[dict], list[dict]]:
+    """
+    Scores every recipe by the summed urgency of the at-risk pantry ingredients it
+    uses, with the share of its ingredients already in the pantry as a smaller
+    secondary term. Both are sparse matrix-vector products over the incidence
+    matrix, covering the whole catalog in one vectorized pass.
+
+    Returns (ranked [{"row", "score", "coverage", "uses"}], at-risk pantry items).
+    """
+    today = today or date.today()
+    half_life = half_life or Config.USE_IT_UP_HALF_LIFE_DAYS
+    horizon = Config.USE_IT_UP_HORIZON_DAYS if horizon is None else horizon
+
+    urgency = np.zeros(len(matrix.vocab), dtype=np.float32)
+    in_pantry = np.zeros(len(matrix.vocab), dtype=np.float32)
+    # Index into pantry_items of the most urgent item covering each vocabulary entry
+    owner = np.full(len(matrix.vocab), -1, dtype=np.int32)
+    at_risk = []
+    for position, item in enumerate(pantry_items):
+        cols = np.fromiter(matrix.match(item.get("name")), dtype=np.int64)
+        days_left = _days_until(item.get("expiry"), today)
+        weight = expiry_weight(days_left, half_life, horizon)
+        if weight > 0:
+            at_risk.append({"name": item.get("name"), "expiry": item.get("expiry"),
+                            "days_left": days_left, "weight": round(weight, 4), "matched_ingredients": len(cols)})
+        if not len(cols):
+            continue
+        in_pantry[cols] = 1.0
+        more_urgent = cols[urgency[cols] < weight]
+        urgency[more_urgent] = weight
+        owner[more_urgent] = position
+
+    if not at_risk or matrix.n_recipes == 0:
+        return [], at_risk
+
+    held = np.flatnonzero(in_pantry)
+    scores = matrix.column_sums(held, urgency[held])
+    coverage = matrix.column_sums(held, in_pantry[held]) / matrix.lengths
+    total = scores + Config.USE_IT_UP_COVERAGE_WEIGHT * coverage
+    total[scores <= 0] = -np.inf
+
+    k = min(k, int(np.count_nonzero(scores > 0)))
+    if k <= 0:
+        return [], at_risk
+    top = np.argpartition(-total, k - 1)[:k]
+    top = top[np.argsort(-total[top], kind="stable")]
+
+    ranked = []
+    for row in top:
+        cols = matrix.recipe_columns(row)
+        uses = sorted({pantry_items[i].get("name") for i in owner[cols[urgency[cols] > 0]].tolist()})
+        ranked.append({"row": int(row), "score": round(float(scores[row]), 4),
+                       "coverage": round(float(coverage[row]), 4), "uses": uses})
+    return ranked, at_risk
+
+
+def rank_pantry_overlap(matrix: IngredientMatrix, pantry_names: list[str], k: int = 10,
+                        mask: np.ndarray | None = None) -> list[dict]:
+    """
+    Lexical stand-in for embedding search: recipes ranked by the share of their
+    ingredients the pantry covers, ties broken by how many pantry ingredients they
+    use. `mask` (see recipe_filters) restricts the candidates.
+
+    Returns [{"row", "score", "matched"}], best first, only recipes using at least one item.
+    """
+    in_pantry = np.zeros(len(matrix.vocab), dtype=np.float32)
+    for name in pantry_names:
+        cols = np.fromiter(matrix.match(name), dtype=np.int64)
+        in_pantry[cols] = 1.0
+    held = np.flatnonzero(in_pantry)
+    if not len(held) or matrix.n_recipes == 0:
+        return []
+
+    matched = matrix.column_sums(held, in_pantry[held])
+    coverage = matched / matrix.lengths
+    # Coverage is at most 1, so a tiny per-match bonus only ever breaks ties
+    total = coverage + 1e-6 * matched
+    total[matched <= 0] = -np.inf
+    if mask is not None:
+        total[~mask] = -np.inf
+
+    k = min(k, int(np.count_nonzero(np.isfinite(total))))
+    if k <= 0:
+        return []
+    top = np.argpartition(-total, k - 1)[:k]
+    top = top[np.argsort(-total[top], kind="stable")]
+    return [{"row": int(row), "score": round(float(coverage[row]), 4), "matched": int(matched[row])} for row in top]
@@ -0,0 +1,97 @@
+import threading
+import time
+from utils.logger import logger
+from utils.metrics import REGISTRY
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    "pantryai_circuit_state", "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open).", ("upstream",),
+)
+UPSTREAM_CALLS = REGISTRY.counter(
+    "pantryai_upstream_calls_total", "Calls to upstream APIs by outcome (ok, error, rejected).",
+    ("upstream", "outcome"),
+)
+
+
+class CircuitOpenError(Exception):
+    """The upstream is failing; the call was rejected without being attempted."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an upstream is down instead of letting every request wait out
+    its timeout.
+
+    After `failure_threshold` consecutive failures (errors and timeouts alike) the
+    circuit opens and calls raise CircuitOpenError straight away. `reset_seconds`
+    later it goes half-open: a single trial call is let through, closing the circuit
+    again if it succeeds and reopening it if it fails. State and call outcomes are
+    exported as pantryai_circuit_state / pantryai_upstream_calls_total.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(_STATE_VALUES[CLOSED], name)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                self._transition(HALF_OPEN)
+            return self._state
+
+    def _transition(self, state: str):
+        if state != self._state:
+            logger.warning("Circuit %s is now %s", self.name, state)
+            self._state = state
+            CIRCUIT_STATE.set(_STATE_VALUES[state], self.name)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; a True in half-open state claims the one trial call."""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        UPSTREAM_CALLS.inc(self.name, "ok")
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        UPSTREAM_CALLS.inc(self.name, "error")
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                self._transition(OPEN)
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) through the breaker; raises CircuitOpenError while it is open."""
+        if not self.allow():
+            UPSTREAM_CALLS.inc(self.name, "rejected")
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
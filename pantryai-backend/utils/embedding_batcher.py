@@ -0,0 +1,177 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.logger import logger
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+    acquire() blocks until a token is available (or `timeout` passes).
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return True
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            self._sleep(wait)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batch calls.
+
+    submit() queues a text and returns a Future. A background thread takes the first
+    waiting text, keeps collecting for up to `window` seconds or until `max_batch`
+    texts are queued, then hands them to a pool of `max_in_flight` threads that sends
+    them as one backend(texts) -> vectors call and fans the vectors back out to each
+    caller. Identical texts in a batch are sent once. While `max_in_flight` batches
+    are out, new texts queue up and join the next batch, so one slow call doesn't
+    hold up everything behind it. If a batch call fails, its texts are retried one
+    at a time, so a text the backend rejects only fails its own callers.
+
+    With a `rate_limiter` (a TokenBucket shared by everything calling the same API),
+    each backend call takes one token; texts arriving while a batch waits for one
+    join that batch. If no token comes within `acquire_timeout` seconds, the call
+    fails with TimeoutError instead of waiting on.
+    """
+
+    def __init__(self, backend, window: float = 0.005, max_batch: int = 32, rate_limiter: TokenBucket | None = None,
+                 acquire_timeout: float | None = None, max_in_flight: int = 4):
+        self.backend = backend
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.rate_limiter = rate_limiter
+        self.acquire_timeout = acquire_timeout
+        self._pending = []  # (text, future)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="embedding-batch")
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future
+
+    def embed(self, text: str, timeout: float | None = None) -> list[float]:
+        return self.submit(text).result(timeout=timeout)
+
+    def _acquire_token(self) -> bool:
+        return self.rate_limiter is None or self.rate_limiter.acquire(self.acquire_timeout)
+
+    def _take_batch(self) -> tuple[list, bool]:
+        """
+        Returns the next batch (empty once closed and drained) and whether it got a
+        rate-limit token. A non-empty batch holds one of the in-flight slots.
+        """
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return [], True
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        self._slots.acquire()
+        acquired = self._acquire_token()
+        with self._cond:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        return batch, acquired
+
+    def _run(self):
+        while True:
+            batch, acquired = self._take_batch()
+            if not batch:
+                return  # closed and drained
+            # Callers that gave up (cancelled futures) don't need their text embedded
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if batch and not acquired:
+                logger.warning("Embedding rate limit: no token within %.1fs, failing %d callers",
+                               self.acquire_timeout, len(batch))
+                error = TimeoutError(f"No embedding rate-limit token within {self.acquire_timeout}s")
+                for _, future in batch:
+                    future.set_exception(error)
+            if not batch or not acquired:
+                self._slots.release()
+                continue
+            self._executor.submit(self._send, batch)
+
+    def _call(self, texts: list[str]) -> list:
+        vectors = self.backend(texts)
+        if len(vectors) != len(texts):
+            raise ValueError(f"Embedding backend returned {len(vectors)} vectors for {len(texts)} texts")
+        return vectors
+
+    def _send(self, batch: list):
+        """Runs on the pool: one backend call for the batch, then one per text if that fails."""
+        try:
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                by_text = dict(zip(texts, self._call(texts)))
+            except Exception as exc:
+                if len(texts) == 1:
+                    by_text = {texts[0]: exc}
+                else:
+                    logger.warning("Embedding a batch of %d texts failed, retrying them one at a time: %s",
+                                   len(texts), exc)
+                    by_text = {text: self._call_one(text) for text in texts}
+            for text, future in batch:
+                outcome = by_text[text]
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+            logger.debug("Embedded a batch of %d texts for %d callers", len(texts), len(batch))
+        finally:
+            self._slots.release()
+
+    def _call_one(self, text: str):
+        """The vector for `text` alone, or the exception the call raised."""
+        try:
+            if not self._acquire_token():
+                raise TimeoutError(f"No embedding rate-limit token within {self.acquire_timeout}s")
+            return self._call([text])[0]
+        except Exception as exc:
+            return exc
+
+    def close(self):
+        """Stops accepting texts; finishes what is queued or in flight, then stops the threads."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
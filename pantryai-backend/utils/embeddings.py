@@ -1,6 +1,10 @@
-import google.generativeai as genai
+import random
+import time
 from config import Config
-from utils.logger import logger
+from utils.logger import logger, SAMPLED
+from utils.lazy import LazyResource
+from utils.circuit import CircuitBreaker, CircuitOpenError
+from utils.embedding_batcher import EmbeddingBatcher, TokenBucket
 import re  # For regex ops
 
 # Precompile regex patterns
@@ -31,33 +35,139 @@ CORRECTIONS = {
     # add more as needed
 }
 
-# Configure embedding
-genai.configure(api_key=Config.GOOGLE_API_KEY)
+def _configure_genai():
+    # Imported lazily: google.generativeai takes over a second to import
+    import google.generativeai as genai
+    genai.configure(api_key=Config.GOOGLE_API_KEY)
+    return genai
+
+
+# Configured once per process, on first use (shared with parsers.py)
+genai_client = LazyResource("Gemini client", _configure_genai)
+
+
+def get_genai():
+    return genai_client.get()
+
+
+# Shared by every request-path embedding call in the process; ingestion retries instead (see below)
+embedding_breaker = CircuitBreaker("gemini_embed", Config.GEMINI_BREAKER_FAILURES, Config.GEMINI_BREAKER_RESET_SECONDS)
+
+
+def embedding_available() -> bool:
+    """False while the embedding circuit is open, i.e. embedding calls would fail fast."""
+    return embedding_breaker.state != "open"
+
+
+def _embed_batch(texts: list[str]) -> list[list[float]]:
+    """One embed_content call for several texts (the Gemini API takes a list as content)."""
+    resp = get_genai().embed_content(
+        model="models/text-embedding-004",
+        content=texts,
+        task_type="RETRIEVAL_DOCUMENT",
+        request_options={"timeout": Config.GEMINI_EMBED_TIMEOUT_SECONDS},
+    )
+    # get embeddings from object or dict
+    embs = getattr(resp, 'embedding', None) or (resp.get('embedding') if isinstance(resp, dict) else None)
+    if isinstance(embs, list) and len(embs) == len(texts) and all(isinstance(e, list) and len(e) == 768 for e in embs):
+        return embs
+    raise ValueError(f"Unexpected embedding format: {type(embs)} with length {len(embs) if hasattr(embs,'__len__') else 'N/A'}")
+
+
+def _create_batcher() -> EmbeddingBatcher:
+    limiter = TokenBucket(Config.EMBED_RATE_PER_SECOND, Config.EMBED_RATE_BURST) if Config.EMBED_RATE_PER_SECOND > 0 else None
+    # The breaker is looked up per call, so each batch counts as one call towards it.
+    # Waiting for a token counts towards the embed deadline: past it, the batch fails.
+    return EmbeddingBatcher(lambda texts: embedding_breaker.call(_embed_batch, texts),
+                            window=Config.EMBED_BATCH_WINDOW_MS / 1000, max_batch=Config.EMBED_BATCH_MAX,
+                            rate_limiter=limiter, acquire_timeout=Config.GEMINI_EMBED_TIMEOUT_SECONDS,
+                            max_in_flight=Config.EMBED_BATCH_IN_FLIGHT)
+
+
+# Coalesces concurrent request-path embedding calls in this process
+embedding_batcher = LazyResource("embedding batcher", _create_batcher)
+
+
+def _create_ingestion_limiter() -> TokenBucket | None:
+    if Config.INGEST_EMBED_RATE_PER_SECOND <= 0:
+        return None
+    return TokenBucket(Config.INGEST_EMBED_RATE_PER_SECOND, Config.INGEST_EMBED_RATE_BURST)
+
+
+# Ingestion's own bucket, so it never spends the request path's quota; it waits for
+# tokens as long as it takes
+ingestion_rate_limiter = LazyResource("ingestion embedding rate limiter", _create_ingestion_limiter)
+
+
+def _embed_batch_with_retries(texts: list[str], max_retries: int | None = None, sleep=time.sleep) -> list[list[float]]:
+    """
+    _embed_batch under the ingestion rate limit, retried with exponential backoff and
+    jitter. No breaker: an outage the request path fails fast on just makes ingestion
+    back off. Raises the last error once `max_retries` (default
+    INGEST_EMBED_MAX_RETRIES) retries are used up.
+    """
+    max_retries = Config.INGEST_EMBED_MAX_RETRIES if max_retries is None else max_retries
+    limiter = ingestion_rate_limiter.get()
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return _embed_batch(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = min(Config.INGEST_EMBED_BACKOFF_MAX, Config.INGEST_EMBED_BACKOFF_BASE * (2 ** attempt))
+            delay *= random.uniform(0.5, 1.0)
+            logger.warning("Embedding %d texts failed (attempt %d/%d), retrying in %.1fs: %s",
+                           len(texts), attempt + 1, max_retries + 1, delay, e)
+            sleep(delay)
+
 
 def generate_text_embedding(text: str) -> list[float]:
     """
     Generates an embedding vector for the given text using the specified model.
+    Concurrent calls are sent together as one batch call (see EmbeddingBatcher),
+    each limited to GEMINI_EMBED_TIMEOUT_SECONDS and going through embedding_breaker;
+    returns [] on failure or while the circuit is open.
     """
     if not text or not text.strip():
         logger.warning("Empty text for embedding, returning zero vector.")
         return [0.0] * 768
 
     try:
-        resp = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="RETRIEVAL_DOCUMENT"
-        )
-        # get embedding from object or dict
-        emb = getattr(resp, 'embedding', None) or (resp.get('embedding') if isinstance(resp, dict) else None)
-        if isinstance(emb, list) and len(emb) == 768:
-            return emb
-        logger.error(f"Unexpected embedding format: {type(emb)} with length {len(emb) if hasattr(emb,'__len__') else 'N/A'}")
+        return embedding_batcher.get().embed(text)
+    except CircuitOpenError as e:
+        logger.warning("Embedding skipped: %s", e, extra=SAMPLED)
     except Exception as e:
-        logger.error(f"Embedding error: {e}", exc_info=True)
+        logger.error("Embedding error: %s", e, exc_info=True)
     return []
 
 
+def generate_ingestion_embeddings(texts: list[str]) -> list[list[float] | None]:
+    """
+    Embeddings for a batch of ingestion texts, in order: one Gemini call, retried with
+    backoff (see _embed_batch_with_retries). If the batch still fails, each text is
+    tried once on its own, so a text Gemini rejects only costs itself. None for each
+    text that could not be embedded.
+    """
+    try:
+        return _embed_batch_with_retries(texts)
+    except Exception as e:
+        if len(texts) == 1:
+            logger.error("Embedding failed after retries: %s", e)
+            return [None]
+        logger.warning("Embedding a batch of %d texts failed after retries, trying them one at a time: %s",
+                       len(texts), e)
+    vectors = []
+    for text in texts:
+        try:
+            vectors.append(_embed_batch_with_retries([text], max_retries=0)[0])
+        except Exception as e:
+            logger.error("Embedding failed: %s", e)
+            vectors.append(None)
+    return vectors
+
+
 def create_recipe_text_for_embedding(recipe: dict) -> str:
     """
     Builds a string for embedding from recipe fields.
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from utils.logger import logger
+
+
+class LazyResource:
+    """
+    A per-process singleton that is only built the first time it is used.
+
+    Heavy clients (FAISS index, Gemini, Supabase) are created through these so that
+    importing the app stays cheap. The owning PID is remembered: if the process forks
+    after initialization (e.g. gunicorn --preload), the child rebuilds its own instance
+    instead of sharing sockets or threads with the parent.
+    """
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._pid == os.getpid()
+
+    def get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    started = time.perf_counter()
+                    self._value = self.factory()
+                    self._pid = os.getpid()
+                    logger.info("Initialized %s in %.1f ms.", self.name, (time.perf_counter() - started) * 1000)
+        return self._value
+
+    def set(self, value):
+        """Replaces the instance for this process (used by tests and hot reloads)."""
+        with self._lock:
+            self._value = value
+            self._pid = os.getpid()
+
+    def reset(self):
+        """Forgets the instance so the next get() rebuilds it."""
+        with self._lock:
+            self._value = None
+            self._pid = None
+
+
+class LazyProxy:
+    """
+    Attribute-forwarding stand-in for a LazyResource, so existing
+    `from module import client` call sites keep working unchanged.
+    """
+
+    def __init__(self, resource: LazyResource):
+        object.__setattr__(self, "_resource", resource)
+
+    def __getattr__(self, name):
+        return getattr(self._resource.get(), name)
+
+    def __repr__(self) -> str:
+        state = "initialized" if self._resource.initialized else "not initialized"
+        return f"<LazyProxy {self._resource.name} ({state})>"
@@ -1,10 +1,181 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+from config import Config
+
+# Id of the request being handled, stamped onto every record logged while serving it
+correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+# Pass as `extra=SAMPLED` on high-volume INFO events; only LOG_INFO_SAMPLE_RATE of them are kept
+SAMPLED = {"sampled": True}
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id", "sampled"}
+
+
+class ContextFilter(logging.Filter):
+    """
+    Runs in the calling thread: stamps the correlation id and drops sampled-out
+    INFO records before anything is formatted or queued.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (getattr(record, "sampled", False) and record.levelno <= logging.INFO
+                and self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return False
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields are included as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", None):
+            entry["correlation_id"] = record.correlation_id
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        cid = getattr(record, "correlation_id", None)
+        return f"{text} [cid={cid}]" if cid else text
+
+
+# %-args of these types can't change before the listener formats the record
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Unlike the stock QueueHandler, does not format in the calling thread: %-args of
+    plain immutable types are left for the listener thread to interpolate, and only
+    records carrying anything else (a list or object that may be mutated after the
+    call) are interpolated now. Tracebacks are rendered here while the frames are
+    live; JSON encoding and the write happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(a, _IMMUTABLE_ARGS) for a in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
 
 logger = logging.getLogger("pantryai")
-handler = logging.StreamHandler()
-formatter = logging.Formatter(
-    "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.INFO)
\ No newline at end of file
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if Config.LOG_FORMAT == "json" else TextFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    return log_queue
+
+
+def configure_logging():
+    """
+    Routes the "pantryai" logger through a queue to a background writer thread, so
+    request threads never block on stderr. Safe to call more than once.
+    """
+    with _listener_lock:
+        if _listener is not None:
+            return
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        for existing in list(logger.filters):
+            logger.removeFilter(existing)
+        logger.addHandler(_DeferredQueueHandler(_start_listener()))
+        logger.addFilter(ContextFilter(Config.LOG_INFO_SAMPLE_RATE))
+        logger.setLevel(Config.LOG_LEVEL)
+
+
+def flush_logging():
+    """Stops the writer thread after draining queued records (registered atexit)."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork(); give the child its own queue and thread
+    global _listener
+    _listener = None
+    for handler in list(logger.handlers):
+        if isinstance(handler, _DeferredQueueHandler):
+            logger.removeHandler(handler)
+            logger.addHandler(_DeferredQueueHandler(_start_listener()))
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def init_app(app):
+    """
+    Gives each request a correlation id (the caller's X-Request-ID, or a fresh one),
+    echoed back in the response's X-Request-ID header.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _bind_correlation_id():
+        g.correlation_token = correlation_id.set(request.headers.get("X-Request-ID") or new_correlation_id())
+
+    @app.after_request
+    def _echo_correlation_id(response):
+        cid = correlation_id.get()
+        if cid:
+            response.headers["X-Request-ID"] = cid
+        return response
+
+    @app.teardown_request
+    def _reset_correlation_id(exc):
+        token = g.pop("correlation_token", None)
+        if token is not None:
+            correlation_id.reset(token)
+
+
+configure_logging()
+atexit.register(flush_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,223 @@
+import bisect
+import threading
+import time
+from functools import wraps
+
+# Seconds; spans cache hits (sub-ms) up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus data model. observe() is a
+    bisect plus three additions under a lock, cheap enough to call on every request.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic count per label set (Prometheus counter)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1.0):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues) -> float:
+        with self._lock:
+            return self._series.get(labelvalues, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Gauge(Counter):
+    """Current value per label set (Prometheus gauge)."""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._series[labelvalues] = float(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._metrics[name]
+
+    def _register(self, name: str, build):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = build()
+            return self._metrics[name]
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(name, lambda: Gauge(name, documentation, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Per-process registry: under gunicorn each worker serves its own /metrics, so scrape
+# every worker (or run a single worker per container) to see the whole picture.
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "pantryai_request_duration_seconds", "End-to-end request latency.", ("endpoint", "method", "status"),
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "pantryai_stage_duration_seconds", "Latency of individual stages within a request.", ("endpoint", "stage"),
+)
+
+
+def _current_endpoint() -> str:
+    from flask import has_request_context, request
+    if not has_request_context():
+        return "none"
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def record_stage(stage: str, seconds: float):
+    """
+    Records one stage timing in STAGE_LATENCY and, inside a request, queues it for
+    that response's Server-Timing header.
+    """
+    from flask import g, has_request_context
+    STAGE_LATENCY.observe(seconds, _current_endpoint(), stage)
+    if has_request_context():
+        timings = g.get("server_timings")
+        if timings is None:
+            timings = g.server_timings = []
+        timings.append((stage, seconds))
+
+
+class timed:
+    """
+    Times a stage, as a context manager (`with timed("embed"):`) or as a decorator
+    (`@timed("hydrate")`). Works outside a request too, e.g. from benchmarks.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(self.stage, time.perf_counter() - self._started)
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_stage(self.stage, time.perf_counter() - started)
+        return wrapper
+
+
+def server_timing_header(timings: list[tuple[str, float]], total: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in timings]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def init_app(app):
+    """
+    Times every request into REQUEST_LATENCY, attaches a Server-Timing header listing
+    the stages recorded during it, and serves the registry at GET /metrics.
+    """
+    from flask import g, request, Response
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        REQUEST_LATENCY.observe(total, _current_endpoint(), request.method, str(response.status_code))
+        response.headers["Server-Timing"] = server_timing_header(g.get("server_timings") or [], total)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def unit_rows(vectors: np.ndarray) -> np.ndarray:
+    """Row-normalizes `vectors` (float32) so dot products are cosine similarities."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def mmr_select(query: np.ndarray, candidates: np.ndarray, k: int, lam: float = 0.7) -> list[int]:
+    """
+    Maximal marginal relevance: greedily picks `k` rows of `candidates` (unit vectors),
+    each maximizing lam * sim(query, d) - (1 - lam) * max sim(d, already picked).
+    lam=1 keeps the pure relevance order; lower values trade relevance for variety.
+
+    The candidate x candidate similarity matrix is one matmul; each greedy step is
+    then a handful of O(n) vector operations. Returns positions into `candidates`.
+    """
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    query = np.asarray(query, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(query)
+    relevance = candidates @ (query / norm if norm else query)
+    similarity = candidates @ candidates.T
+
+    # Picked rows get -inf relevance so they can never win again
+    relevance_term = (lam * relevance).astype(np.float32)
+    max_similarity = np.zeros(n, dtype=np.float32)
+    scores = np.empty(n, dtype=np.float32)
+    best = int(np.argmax(relevance_term))
+    picked = [best]
+    for _ in range(k - 1):
+        relevance_term[best] = -np.inf
+        if len(picked) == 1:
+            max_similarity[:] = similarity[best]
+        else:
+            np.maximum(max_similarity, similarity[best], out=max_similarity)
+        np.multiply(max_similarity, lam - 1, out=scores)
+        scores += relevance_term
+        best = int(np.argmax(scores))
+        picked.append(best)
+    return picked
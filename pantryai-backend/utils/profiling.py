@@ -0,0 +1,152 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from config import Config
+from utils.logger import logger, correlation_id
+
+# Pool threads currently running work on behalf of a request: thread id -> correlation id.
+# Lets a request's sampler follow its work onto executor threads (see working_for_request)
+_request_threads = {}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+@contextmanager
+def working_for_request():
+    """
+    Tags the current (pool) thread with the caller's correlation id for the duration
+    of the block, so the profiler of that request samples it too. Run it inside the
+    copied context of the submitting request.
+    """
+    cid = correlation_id.get()
+    if cid is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    _request_threads[thread_id] = cid
+    try:
+        yield
+    finally:
+        _request_threads.pop(thread_id, None)
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler for one thread, plus (given a `request_id`) any pool
+    threads tagged by working_for_request() with that correlation id; their stacks are
+    rooted at "[executor]". A daemon thread periodically reads the targets' current
+    frames via sys._current_frames() and counts whole stacks, so the profiled code
+    runs unmodified (no tracing hooks, unlike cProfile).
+
+    The sampler needs the GIL to take a sample, so while the request is CPU-bound
+    the effective rate is bounded by sys.getswitchinterval() (5 ms by default).
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, request_id: str | None = None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.request_id = request_id
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return self.counts
+
+    def _stack(self, frame, own_file: str) -> list[str]:
+        stack = []
+        while frame is not None:
+            if frame.f_code.co_filename != own_file:
+                stack.append(_frame_label(frame))
+            frame = frame.f_back
+        return stack[::-1]
+
+    def _run(self):
+        own_file = __file__
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = [self._stack(frames.get(self.thread_id), own_file)]
+            if self.request_id is not None:
+                for thread_id, cid in list(_request_threads.items()):
+                    if cid == self.request_id and thread_id != self.thread_id:
+                        stacks.append(["[executor]"] + self._stack(frames.get(thread_id), own_file))
+            stacks = [stack for stack in stacks if stack and stack != ["[executor]"]]
+            for stack in stacks:
+                self.counts[";".join(stack)] += 1
+            if stacks:
+                self.samples += 1
+
+
+def collapse(counts: Counter) -> str:
+    """Renders stack counts in Brendan Gregg's collapsed format (`a;b;c 12` per line)."""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def profile_filename(route: str, duration_ms: float) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    return f"{time.strftime('%Y%m%dT%H%M%S')}_{os.getpid()}_{slug}_{duration_ms:.0f}ms.collapsed"
+
+
+def should_profile(headers) -> bool:
+    token = Config.PROFILE_ADMIN_TOKEN
+    if token and headers.get("X-Profile-Token") == token:
+        return True
+    return Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE
+
+
+def init_app(app):
+    """
+    Profiles requests that carry a matching X-Profile-Token header, plus a random
+    PROFILE_SAMPLE_RATE fraction of all requests, writing one collapsed-stack file per
+    request into PROFILE_DIR (feed it to flamegraph.pl or speedscope).
+
+    Nothing is registered unless a token or sample rate is configured, so disabled
+    profiling costs nothing per request.
+    """
+    if not Config.PROFILE_ADMIN_TOKEN and Config.PROFILE_SAMPLE_RATE <= 0:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_profiler():
+        if should_profile(request.headers):
+            g.profiler = StackSampler(threading.get_ident(), Config.PROFILE_INTERVAL_MS / 1000.0,
+                                      request_id=correlation_id.get()).start()
+            g.profile_started = time.perf_counter()
+
+    @app.after_request
+    def _write_profile(response):
+        sampler = g.pop("profiler", None)
+        if sampler is None:
+            return response
+        duration_ms = (time.perf_counter() - g.pop("profile_started")) * 1000
+        counts = sampler.stop()
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        try:
+            os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+            path = os.path.join(Config.PROFILE_DIR, profile_filename(f"{request.method} {route}", duration_ms))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(collapse(counts))
+            response.headers["X-Profile-File"] = os.path.basename(path)
+            logger.info("Profiled %s %s (%.1f ms, %s samples) -> %s",
+                        request.method, route, duration_ms, sampler.samples, path)
+        except OSError as e:
+            logger.error("Failed to write request profile: %s", e)
+        return response
@@ -3,10 +3,13 @@ import React, { useEffect, useState } from 'react';
 import { View, Text, StyleSheet, SafeAreaView, ScrollView, TouchableOpacity, Image, RefreshControl, TextInput, ActivityIndicator } from 'react-native';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
-import { pantryApi, recipesApi, Recipe } from '../../services/api';
+import { pantryApi, recipesApi, Recipe, recipeImageUri } from '../../services/api';
 import { useSafeAreaInsets } from 'react-native-safe-area-context';
 import 'react-native-get-random-values';
 
+// Pixels requested for recipe card thumbnails (cards are ~160pt wide; enough for 3x screens)
+const CARD_IMAGE_WIDTH = 480;
+
 
 const QuickActionCard = ({ icon, title, onPress }: { icon: string; title: string; onPress: () => void }) => (
     <TouchableOpacity style={styles.quickActionCard} onPress={onPress}>
@@ -156,7 +159,7 @@ const HomeScreen: React.FC = () => {
                                     })}
                                 >
                                     <Image
-                                        source={recipe.image_url ? { uri: recipe.image_url } : require('../../assets/placeholder_recipe.jpg')}
+                                        source={recipe.image_url ? { uri: recipeImageUri(recipe.id, CARD_IMAGE_WIDTH) } : require('../../assets/placeholder_recipe.jpg')}
                                         style={styles.recipeImage}
                                     />
                                     <View style={styles.recipeInfo}>
@@ -242,7 +245,7 @@ const HomeScreen: React.FC = () => {
                                     })}
                                 >
                                     <Image
-                                        source={recipe.image_url ? { uri: recipe.image_url } : require('../../assets/placeholder_recipe.jpg')}
+                                        source={recipe.image_url ? { uri: recipeImageUri(recipe.id, CARD_IMAGE_WIDTH) } : require('../../assets/placeholder_recipe.jpg')}
                                         style={styles.recipeImage}
                                     />
                                     <View style={styles.recipeInfo}>
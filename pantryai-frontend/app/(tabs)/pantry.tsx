@@ -1,9 +1,9 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { View, Text, StyleSheet, SafeAreaView, FlatList, TouchableOpacity, ActivityIndicator, RefreshControl, Image, Dimensions, Alert, Modal, TextInput } from 'react-native';
 import { useRouter, useLocalSearchParams } from 'expo-router';
 import { BottomTabNavigationProp } from '@react-navigation/bottom-tabs';
 import { Ionicons } from '@expo/vector-icons';
-import { pantryApi, PantryItem } from '../../services/api';
+import { pantryApi, PantryItem, applyPantryChanges } from '../../services/api';
 import DateTimePicker from '@react-native-community/datetimepicker';
 import DropDownPicker from 'react-native-dropdown-picker';
 import { useSafeAreaInsets } from 'react-native-safe-area-context';
@@ -49,6 +49,8 @@ const PantryScreen: React.FC = () => {
     const insets = useSafeAreaInsets();
     const params = useLocalSearchParams();
     const [items, setItems] = useState<PantryItem[]>([]);
+    // Last pantry revision seen; refreshes only fetch what changed since
+    const revisionRef = useRef(0);
     const [loading, setLoading] = useState(true);
     const [refreshing, setRefreshing] = useState(false);
     const [error, setError] = useState<string | null>(null);
@@ -127,8 +129,10 @@ const PantryScreen: React.FC = () => {
         try {
             setLoading(true);
             setError(null);
-            const data = await pantryApi.getAllItems();
-            setItems(data);
+            const since = revisionRef.current;
+            const changes = await pantryApi.getChanges(since);
+            setItems(prevItems => applyPantryChanges(prevItems, changes, since));
+            revisionRef.current = changes.revision;
         } catch (err) {
             console.error('Error fetching pantry items:', err);
             setError('Failed to load pantry items. Please try again.');
@@ -5,7 +5,7 @@ import { View, Text, StyleSheet, TextInput, ScrollView, TouchableOpacity, Image,
 import { Ionicons } from '@expo/vector-icons';
 import RecipeCard from '../../components/RecipeCard';
 import { useRouter } from 'expo-router';
-import { recipesApi, Recipe, RecipeResponse } from '../../services/api';
+import { recipesApi, Recipe, RecipeResponse, recipeImageUri } from '../../services/api';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import OptionsModal from '../../components/OptionsModal';
 import { useSafeAreaInsets } from 'react-native-safe-area-context';
@@ -13,6 +13,8 @@ import { useSafeAreaInsets } from 'react-native-safe-area-context';
 const RECIPES_PER_PAGE = 10;
 const INITIAL_LOAD_COUNT = 30;
 const STORAGE_KEY = '@pantryai_recipes_cache';
+// Pixels requested for recipe card thumbnails (cards are ~160pt wide; enough for 3x screens)
+const CARD_IMAGE_WIDTH = 480;
 
 const RecipesScreen: React.FC = () => {
     const router = useRouter();
@@ -308,7 +310,7 @@ const RecipesScreen: React.FC = () => {
                             id={recipe.id}
                             title={recipe.name}
                             difficulty={recipe.difficulty || 'Medium'}
-                            image={recipe.image_url ? { uri: recipe.image_url } : require('../../assets/placeholder_recipe.jpg')}
+                            image={recipe.image_url ? { uri: recipeImageUri(recipe.id, CARD_IMAGE_WIDTH) } : require('../../assets/placeholder_recipe.jpg')}
                             onPress={() => handleRecipeCardPress(recipe)}
                             viewMode={viewMode}
                         />
@@ -36,6 +36,39 @@ export interface PantryItem {
     is_opened: boolean;
     added_at: string;
     image_url?: string;
+    revision?: number;
+}
+
+export interface PantryChanges {
+    revision: number;
+    upserts: PantryItem[];
+    deleted: string[];
+    reset: boolean;
+}
+
+// Merges a /pantry/changes response into the local list; a full snapshot (since 0 or reset) replaces it
+export const applyPantryChanges = (items: PantryItem[], changes: PantryChanges, since: number): PantryItem[] => {
+    if (since === 0 || changes.reset) {
+        return changes.upserts;
+    }
+    const deleted = new Set(changes.deleted);
+    const byId = new Map(items.filter(item => !deleted.has(item.id)).map(item => [item.id, item] as const));
+    for (const item of changes.upserts) {
+        byId.set(item.id, item);
+    }
+    return Array.from(byId.values());
+};
+
+export interface BulkResult {
+    id: string;
+    status: 'updated' | 'deleted' | 'not_found' | 'invalid';
+    error?: string;
+    item?: PantryItem;
+}
+
+export interface BulkResponse {
+    results: BulkResult[];
+    summary: Partial<Record<BulkResult['status'], number>>;
 }
 
 export interface Recipe {
@@ -68,8 +101,15 @@ export interface Recipe {
     image_url: string;
 }
 
+// Resized, cached copy of a recipe's image served by the backend (/images/<id>?w=); width in pixels
+export const recipeImageUri = (recipeId: string, width: number): string =>
+    `${API_BASE_URL}/images/${encodeURIComponent(recipeId)}?w=${Math.round(width)}`;
+
 export interface RecipeResponse {
     matched_recipes: Recipe[];
+    // Set when the backend couldn't embed the pantry and ranked recipes by ingredient overlap instead
+    degraded?: boolean;
+    degraded_reason?: string;
 }
 
 export const pantryApi = {
@@ -83,6 +123,16 @@ export const pantryApi = {
         }
     },
 
+    getChanges: async (since: number): Promise<PantryChanges> => {
+        try {
+            const response = await api.get('/pantry/changes', { params: { since } });
+            return response.data;
+        } catch (error) {
+            console.error('Error fetching pantry changes:', error);
+            throw error;
+        }
+    },
+
     confirmAddItems: async (items: Omit<PantryItem, 'id'>[]): Promise<{ inserted: PantryItem[] }> => {
         try {
             const response = await api.post('/pantry/confirm-add', { items });
@@ -124,6 +174,27 @@ export const pantryApi = {
             throw error;
         }
     },
+
+    // One request for many edits; each entry comes back with status 'updated' | 'not_found' | 'invalid'
+    bulkUpdateItems: async (items: (Partial<PantryItem> & { id: string })[]): Promise<BulkResponse> => {
+        try {
+            const response = await api.patch('/pantry/bulk', { items });
+            return response.data;
+        } catch (error) {
+            console.error('Error bulk-updating pantry items:', error);
+            throw error;
+        }
+    },
+
+    bulkDeleteItems: async (ids: string[]): Promise<BulkResponse> => {
+        try {
+            const response = await api.delete('/pantry/bulk', { data: { ids } });
+            return response.data;
+        } catch (error) {
+            console.error('Error bulk-deleting pantry items:', error);
+            throw error;
+        }
+    },
 };
 
 export const recipesApi = {
@@ -181,4 +252,25 @@ export const scanApi = {
             throw error;
         }
     },
+
+    // Uploads receipt photos for server-side OCR; the response also carries the recognized text
+    scanReceiptImages: async (imageUris: string[]): Promise<{ parsed_items: PantryItem[]; ocr_text: string }> => {
+        const form = new FormData();
+        imageUris.forEach((uri, index) => {
+            form.append('image', { uri, name: `receipt-${index}.jpg`, type: 'image/jpeg' } as any);
+        });
+        try {
+            const apiResponse = await api.post('/scan', form, {
+                headers: { 'Content-Type': 'multipart/form-data' },
+                timeout: 60000,
+            });
+            return apiResponse.data;
+        } catch (error: any) {
+            console.error('Error scanning receipt images:', error);
+            if (error.response) {
+                throw new Error(error.response.data.error || 'Failed to read receipt');
+            }
+            throw error;
+        }
+    },
 }; 